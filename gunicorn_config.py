@@ -9,6 +9,13 @@ bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
 workers = int(os.getenv("WEB_CONCURRENCY", "1"))
 worker_class = "sync"
 
+# Threads per worker. Default 1 keeps the single sync thread. Setting
+# GUNICORN_THREADS > 1 makes gunicorn switch the worker to "gthread": only do
+# it deliberately, e.g. to let /admin/live/events hold a long-poll
+# (LIVE_POLL_TIMEOUT > 0) while other requests are served. Keep
+# LIVE_POLL_MAX_WAITERS well below the thread count (see services/live_events.py)
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+
 # Reasonable timeouts for slow DB / email operations
 timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
 keepalive = 2
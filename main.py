@@ -25,7 +25,7 @@ socket.getaddrinfo = _force_ipv4_getaddrinfo
 
 from flask import Flask, render_template, request, abort, jsonify
 from flask_mail import Mail
-from flask_caching import Cache
+from utils.shared_cache import init_cache
 from flask_talisman import Talisman
 from flask_compress import Compress
 from models.database import db
@@ -159,23 +159,20 @@ app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', os.getenv('
 db.init_app(app)
 mail = Mail(app)
 
-# Inicializar cache en memoria simple (suficiente para 1 worker eventlet)
-cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache', 'CACHE_DEFAULT_TIMEOUT': 300})
+# Caché compartida: memoria, disco o Redis según CACHE_BACKEND (ver utils/shared_cache.py)
+cache = init_cache(app)
+# Registra también los eventos que invalidan el contexto de plantillas al editar usuarios
+from utils.user_context import get_user_context
 
-# Logging de queries lentas (> 1 segundo) para detectar cuellos de botella
-from sqlalchemy import event
-from sqlalchemy.engine import Engine
-import time
+# Instrumentación SQL: queries lentas (> 1 segundo), nº de consultas por petición,
+# detección de N+1 y presupuestos por endpoint (ver utils/query_stats.py)
+from utils.query_stats import init_query_stats
+init_query_stats(app)
 
-@event.listens_for(Engine, "before_cursor_execute")
-def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-    conn.info.setdefault('query_start_time', []).append(time.time())
-
-@event.listens_for(Engine, "after_cursor_execute")
-def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-    total = time.time() - conn.info['query_start_time'].pop(-1)
-    if total > 1.0:  # Log queries > 1 segundo
-        app.logger.warning(f"⚠️ Slow query ({total:.2f}s): {statement[:200]}")
+# Eventos en vivo de fichajes, pausas y solicitudes para las pantallas de admin:
+# Socket.IO o long-poll según LIVE_EVENTS_TRANSPORT (ver services/live_events.py)
+from services.live_events import init_live_events
+init_live_events(app)
 
 # Log de diagnóstico para confirmar columnas efectivas en el modelo User en tiempo de ejecución
 try:
@@ -246,9 +243,7 @@ def _enforce_origin_for_state_changing():
 @app.context_processor
 def inject_user():
     from flask import session
-    from models.models import User, SystemConfig, Client
     from datetime import datetime
-    from utils.multitenant import get_current_client, get_client_config
 
     user = None
     greeting = ""
@@ -257,19 +252,17 @@ def inject_user():
 
     user_id = session.get("user_id")
 
-    # Cachear el contexto por 5 minutos para evitar 3 queries en cada request
+    # Instantánea serializable cacheada (ver utils/user_context.py): sin
+    # instancias ORM, válida con varios workers y con cualquier backend
     if user_id:
-        cache_key = f"user_context_{user_id}"
-        cached = cache.get(cache_key)
-
-        if cached:
-            return cached
+        context = get_user_context(user_id, session.get("client_id"))
+        if context:
+            user = context["user"]
+            current_client = context["client"]
+            client_config_dict = context["client_config"]
 
-    if user_id:
-        user = db.session.get(User, user_id)
-        if user:
             # Obtener solo el primer nombre
-            first_name = user.full_name.split()[0] if user.full_name else user.username
+            first_name = user["full_name"].split()[0] if user["full_name"] else user["username"]
 
             # Determinar saludo según la hora
             hour = datetime.now().hour
@@ -280,10 +273,6 @@ def inject_user():
             else:
                 greeting = f"Buenas noches, {first_name}"
 
-            # Obtener cliente actual (multi-tenant)
-            current_client = get_current_client()
-            client_config_dict = get_client_config()
-
     # Tema por defecto
     current_theme = 'dark-turquoise'
 
@@ -313,7 +302,7 @@ def inject_user():
             'features': plan_config.get_config()['features']
         }
 
-    result = dict(
+    return dict(
         current_user=user,
         greeting=greeting,
         current_theme=current_theme,
@@ -322,13 +311,6 @@ def inject_user():
         client_config=client_config_dict
     )
 
-    # Guardar en cache por 5 minutos
-    if user_id:
-        cache_key = f"user_context_{user_id}"
-        cache.set(cache_key, result, timeout=300)
-
-    return result
-
 # Registrar blueprints
 app.register_blueprint(auth_bp)
 app.register_blueprint(time_bp)
@@ -399,7 +381,11 @@ def init_scheduler():
         scheduler = BackgroundScheduler(daemon=True)
 
         # Import the task functions and initialize with app reference
-        from tasks.scheduler import auto_close_open_records, init_scheduler_app
+        from tasks.scheduler import (
+            auto_close_open_records, seal_pending_records, verify_signatures_nightly,
+            build_merkle_batches, recompute_dirty_overtime, mark_closed_overtime_week,
+            init_scheduler_app
+        )
         from tasks.email_service_v3 import check_and_send_notifications_v3
 
         # IMPORTANTE: Pasar la referencia de la app al módulo de scheduler
@@ -415,6 +401,51 @@ def init_scheduler():
             replace_existing=True
         )
 
+        # Sellado diferido de fichajes (SEALING_MODE=async): cada minuto
+        scheduler.add_job(
+            func=seal_pending_records,
+            trigger=CronTrigger(minute='*'),
+            id='seal_pending_records',
+            name='Seal pending punches',
+            replace_existing=True
+        )
+
+        # Lotes Merkle de firmas (MERKLE_SEALING=additive|root_only): cada 5 minutos
+        scheduler.add_job(
+            func=build_merkle_batches,
+            trigger=CronTrigger(minute='*/5'),
+            id='build_merkle_batches',
+            name='Build Merkle seal batches',
+            replace_existing=True
+        )
+
+        # Horas extras de las semanas con cambios (overtime_dirty_week): cada minuto
+        scheduler.add_job(
+            func=recompute_dirty_overtime,
+            trigger=CronTrigger(minute='*'),
+            id='recompute_dirty_overtime',
+            name='Recompute overtime of changed weeks',
+            replace_existing=True
+        )
+
+        # Semana recién cerrada de todos los empleados: cada lunes a las 00:15
+        scheduler.add_job(
+            func=mark_closed_overtime_week,
+            trigger=CronTrigger(day_of_week='mon', hour=0, minute=15),
+            id='mark_closed_overtime_week',
+            name='Mark closed overtime week',
+            replace_existing=True
+        )
+
+        # Verificación incremental de firmas nuevas: cada noche a las 03:30
+        scheduler.add_job(
+            func=verify_signatures_nightly,
+            trigger=CronTrigger(hour=3, minute=30),
+            id='verify_signatures_nightly',
+            name='Verify new punch signatures',
+            replace_existing=True
+        )
+
         # Schedule the email notification check to run every 5 minutes (optional)
         # USANDO VERSIÓN V3 con LOCK DISTRIBUIDO para prevenir duplicados en múltiples workers
         scheduler.add_job(
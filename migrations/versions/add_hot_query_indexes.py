@@ -0,0 +1,56 @@
+"""Add composite and partial indexes for hot queries
+
+Revision ID: hot_query_indexes_001
+Revises: tenant_rls_001
+Create Date: 2026-02-23 10:00:00.000000
+
+Índices para las consultas más frecuentes (fichajes por empleado y fecha,
+fichajes abiertos, pausas activas, solicitudes y horas extras pendientes).
+En PostgreSQL se crean con CREATE INDEX CONCURRENTLY para no bloquear
+escrituras en producción; eso exige ejecutarlos fuera de la transacción
+de la migración (autocommit_block). Comprobar el resultado con
+scripts/index_advisor.py.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'hot_query_indexes_001'
+down_revision = 'tenant_rls_001'
+branch_labels = None
+depends_on = None
+
+# (nombre, tabla, columnas, condición del índice parcial)
+INDEXES = (
+    ('ix_time_record_client_user_date', 'time_record', ['client_id', 'user_id', 'date'], None),
+    ('ix_time_record_open', 'time_record', ['client_id', 'date'], 'check_out IS NULL'),
+    ('ix_work_pause_active', 'work_pause', ['time_record_id'], 'pause_end IS NULL'),
+    ('ix_leave_request_client_status_created', 'leave_request', ['client_id', 'status', 'created_at'], None),
+    ('ix_overtime_entry_client_week_status', 'overtime_entry', ['client_id', 'week_start', 'status'], None),
+)
+
+
+def upgrade():
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            kwargs = {}
+            if where:
+                kwargs['postgresql_where'] = sa.text(where)
+                kwargs['sqlite_where'] = sa.text(where)
+            if is_postgres:
+                kwargs['postgresql_concurrently'] = True
+            # if_not_exists: se puede relanzar si una ejecución anterior creó parte de los índices
+            # (un CONCURRENTLY interrumpido deja el índice INVALID: borrarlo antes de relanzar)
+            op.create_index(name, table, columns, if_not_exists=True, **kwargs)
+
+
+def downgrade():
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            kwargs = {'postgresql_concurrently': True} if is_postgres else {}
+            op.drop_index(name, table_name=table, if_exists=True, **kwargs)
@@ -0,0 +1,63 @@
+"""Add Merkle seal batches for punch signatures
+
+Revision ID: merkle_batches_001
+Revises: reseal_checkpoint_001
+Create Date: 2026-02-09 10:00:00.000000
+
+Tabla seal_batch (raíz Merkle firmada por cliente y ventana de tiempo) y
+columnas batch_id / leaf_index / merkle_proof en time_record_signature.
+La firma individual pasa a ser opcional (MERKLE_SEALING=root_only).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'merkle_batches_001'
+down_revision = 'reseal_checkpoint_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('seal_batch',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('window_start', sa.DateTime(), nullable=False),
+        sa.Column('window_end', sa.DateTime(), nullable=False),
+        sa.Column('leaf_count', sa.Integer(), nullable=False),
+        sa.Column('merkle_root', sa.String(length=64), nullable=False),
+        sa.Column('root_signature', sa.String(length=64), nullable=False),
+        sa.Column('key_version', sa.Integer(), nullable=False, server_default=sa.text('1')),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.ForeignKeyConstraint(['client_id'], ['client.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_seal_batch_client_window', 'seal_batch', ['client_id', 'window_start'])
+
+    with op.batch_alter_table('time_record_signature', schema=None) as batch_op:
+        batch_op.alter_column('signature',
+               existing_type=sa.String(length=64),
+               nullable=True)
+        batch_op.add_column(sa.Column('batch_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('leaf_index', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('merkle_proof', sa.Text(), nullable=True))
+        batch_op.create_foreign_key('fk_time_record_signature_batch', 'seal_batch',
+                                    ['batch_id'], ['id'], ondelete='SET NULL')
+        batch_op.create_index('ix_time_record_signature_batch', ['batch_id', 'leaf_index'])
+
+
+def downgrade():
+    with op.batch_alter_table('time_record_signature', schema=None) as batch_op:
+        batch_op.drop_index('ix_time_record_signature_batch')
+        batch_op.drop_constraint('fk_time_record_signature_batch', type_='foreignkey')
+        batch_op.drop_column('merkle_proof')
+        batch_op.drop_column('leaf_index')
+        batch_op.drop_column('batch_id')
+        # Las firmas root_only no tienen HMAC propio: no se puede volver a NOT NULL sin re-sellarlas
+        batch_op.alter_column('signature',
+               existing_type=sa.String(length=64),
+               nullable=True)
+
+    op.drop_index('ix_seal_batch_client_window', table_name='seal_batch')
+    op.drop_table('seal_batch')
@@ -0,0 +1,53 @@
+"""Add partial unique index for open time records (per-user check-in locking)
+
+Revision ID: open_record_index_001
+Revises: 73245cfbcc7e
+Create Date: 2026-01-12 10:00:00.000000
+
+check_in/check_out ya no bloquean la tabla time_record completa: usan un
+advisory lock por usuario. Este índice único parcial garantiza que, aunque
+dos fichajes del mismo usuario lleguen a la vez, solo exista un registro
+abierto (check_out IS NULL) por usuario y día.
+
+Antes de crear el índice se cierran los duplicados históricos (se conserva
+abierto el más reciente), igual que hace check_in al detectar un registro
+abierto de otro día.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'open_record_index_001'
+down_revision = '73245cfbcc7e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Paso 1: cerrar registros abiertos duplicados (mismo usuario y día)
+    op.execute("""
+        UPDATE time_record
+        SET check_out = CAST(date AS timestamp) + INTERVAL '23 hours 59 minutes 59 seconds',
+            notes = COALESCE(notes || ' - ', '') || 'Cerrado automáticamente (registro abierto duplicado)'
+        WHERE check_out IS NULL
+          AND id NOT IN (
+              SELECT MAX(id)
+              FROM time_record
+              WHERE check_out IS NULL
+              GROUP BY client_id, user_id, date
+          )
+    """)
+
+    # Paso 2: índice único parcial sobre registros abiertos
+    op.create_index(
+        'uix_time_record_open_per_day',
+        'time_record',
+        ['client_id', 'user_id', 'date'],
+        unique=True,
+        postgresql_where=sa.text('check_out IS NULL')
+    )
+
+
+def downgrade():
+    op.drop_index('uix_time_record_open_per_day', table_name='time_record')
@@ -0,0 +1,91 @@
+"""Add overtime_dirty_week queue table
+
+Revision ID: overtime_dirty_week_001
+Revises: work_summary_001
+Create Date: 2026-03-16 10:00:00.000000
+
+Semanas de empleado cuyas horas extras hay que recalcular. Las anotan los
+cambios de fichajes, pausas y jornada; el job recompute_dirty_overtime
+(o /admin/cron/overtime) las procesa y el dashboard de horas extras pasa a
+ser solo lectura de overtime_entry.
+
+La migración anota las semanas con entradas Pendientes para que se
+actualicen en la primera ejecución del job. Semanas anteriores que nunca se
+llegaron a generar:
+  python scripts/recompute_overtime.py --all --from 2025-01-01 --run
+
+En PostgreSQL da permisos al rol timepro_tenant_bypass y crea las políticas
+RLS (igual que tenant_rls_001), activándolas si time_record ya tiene RLS.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'overtime_dirty_week_001'
+down_revision = 'work_summary_001'
+branch_labels = None
+depends_on = None
+
+BYPASS_ROLE = 'timepro_tenant_bypass'
+
+TENANT_CONDITION = "client_id = NULLIF(current_setting('app.client_id', true), '')::integer"
+
+BACKFILL_SQL = """
+    INSERT INTO overtime_dirty_week (client_id, user_id, week_start, marked_at)
+    SELECT client_id, user_id, week_start, CURRENT_TIMESTAMP
+    FROM overtime_entry
+    WHERE status = 'Pendiente'
+"""
+
+
+def upgrade():
+    op.create_table('overtime_dirty_week',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('week_start', sa.Date(), nullable=False),
+        sa.Column('marked_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.ForeignKeyConstraint(['client_id'], ['client.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('client_id', 'user_id', 'week_start', name='uix_overtime_dirty_week')
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        op.execute(BACKFILL_SQL)
+        return
+
+    role_exists = bind.execute(
+        sa.text("SELECT 1 FROM pg_roles WHERE rolname = :role"), {"role": BYPASS_ROLE}
+    ).scalar()
+    rls_enabled = bind.execute(
+        sa.text("SELECT relrowsecurity FROM pg_class WHERE relname = 'time_record'")
+    ).scalar()
+
+    if role_exists:
+        op.execute(f"GRANT SELECT, INSERT, UPDATE, DELETE ON overtime_dirty_week TO {BYPASS_ROLE}")
+        op.execute(f"GRANT USAGE, SELECT ON SEQUENCE overtime_dirty_week_id_seq TO {BYPASS_ROLE}")
+        op.execute(
+            f"CREATE POLICY tenant_isolation ON overtime_dirty_week "
+            f"USING ({TENANT_CONDITION}) WITH CHECK ({TENANT_CONDITION})"
+        )
+        op.execute(
+            f"CREATE POLICY tenant_bypass ON overtime_dirty_week TO {BYPASS_ROLE} "
+            f"USING (true) WITH CHECK (true)"
+        )
+        if rls_enabled:
+            op.execute("ALTER TABLE overtime_dirty_week ENABLE ROW LEVEL SECURITY")
+            op.execute("ALTER TABLE overtime_dirty_week FORCE ROW LEVEL SECURITY")
+
+    # Con RLS activo el propietario no ve las entradas: anotar con el rol de bypass
+    if role_exists and rls_enabled:
+        op.execute(f"SET LOCAL ROLE {BYPASS_ROLE}")
+    op.execute(BACKFILL_SQL)
+    if role_exists and rls_enabled:
+        op.execute("RESET ROLE")
+
+
+def downgrade():
+    op.drop_table('overtime_dirty_week')
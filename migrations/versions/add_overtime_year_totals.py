@@ -0,0 +1,133 @@
+"""Add overtime_year_total and overtime_limit_event tables
+
+Revision ID: overtime_year_total_001
+Revises: overtime_dirty_week_001
+Create Date: 2026-03-23 10:00:00.000000
+
+Acumulado anual de horas extras por empleado y eventos de cruce de los
+límites anual (80 h) y semanal (40 h), mantenidos por
+services/overtime_limits_service.py al cambiar overtime_entry.
+
+En PostgreSQL la migración da permisos al rol timepro_tenant_bypass, crea
+las políticas RLS (igual que tenant_rls_001), activándolas si time_record
+ya tiene RLS activo, y rellena el acumulado con los límites por defecto
+(sin eventos). En otros motores, o con otros límites, hay que rellenarlo con:
+  python scripts/recompute_overtime.py --all --year-totals
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'overtime_year_total_001'
+down_revision = 'overtime_dirty_week_001'
+branch_labels = None
+depends_on = None
+
+BYPASS_ROLE = 'timepro_tenant_bypass'
+
+LIMIT_TABLES = ('overtime_year_total', 'overtime_limit_event')
+
+TENANT_CONDITION = "client_id = NULLIF(current_setting('app.client_id', true), '')::integer"
+
+# Misma semántica que services/overtime_limits_service.py con los límites por
+# defecto: 80 h anuales (aviso en 64 h) y 40 h semanales
+BACKFILL_SQL = """
+    INSERT INTO overtime_year_total (client_id, user_id, year, approved_seconds, pending_seconds,
+                                     weeks_over_limit, max_week_seconds, last_week_over_limit,
+                                     annual_level, updated_at)
+    SELECT client_id, user_id, year, approved, pending, weeks_over, max_week, last_over,
+           CASE WHEN approved > 80 * 3600 THEN 2 WHEN approved >= 64 * 3600 THEN 1 ELSE 0 END,
+           now()
+    FROM (
+        SELECT client_id, user_id, CAST(EXTRACT(YEAR FROM week_start) AS integer) AS year,
+               COALESCE(SUM(CASE WHEN status = 'Aprobado' AND overtime_seconds > 0
+                                 THEN overtime_seconds ELSE 0 END), 0) AS approved,
+               COALESCE(SUM(CASE WHEN status = 'Pendiente' AND overtime_seconds > 0
+                                 THEN overtime_seconds ELSE 0 END), 0) AS pending,
+               SUM(CASE WHEN status <> 'Ajustado' AND total_worked_seconds > 40 * 3600
+                        THEN 1 ELSE 0 END) AS weeks_over,
+               COALESCE(MAX(CASE WHEN status <> 'Ajustado' THEN total_worked_seconds END), 0) AS max_week,
+               MAX(CASE WHEN status <> 'Ajustado' AND total_worked_seconds > 40 * 3600
+                        THEN week_start END) AS last_over
+        FROM overtime_entry
+        GROUP BY client_id, user_id, CAST(EXTRACT(YEAR FROM week_start) AS integer)
+    ) totals
+"""
+
+
+def upgrade():
+    op.create_table('overtime_year_total',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('approved_seconds', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('pending_seconds', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('weeks_over_limit', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('max_week_seconds', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('last_week_over_limit', sa.Date(), nullable=True),
+        sa.Column('annual_level', sa.SmallInteger(), nullable=False, server_default=sa.text('0')),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.ForeignKeyConstraint(['client_id'], ['client.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('client_id', 'user_id', 'year', name='uix_overtime_year_total')
+    )
+    op.create_index('ix_overtime_year_total_client_year', 'overtime_year_total', ['client_id', 'year'])
+
+    op.create_table('overtime_limit_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('seconds', sa.Integer(), nullable=False),
+        sa.Column('week_start', sa.Date(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.ForeignKeyConstraint(['client_id'], ['client.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_overtime_limit_event_client_id', 'overtime_limit_event', ['client_id', 'id'])
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    role_exists = bind.execute(
+        sa.text("SELECT 1 FROM pg_roles WHERE rolname = :role"), {"role": BYPASS_ROLE}
+    ).scalar()
+    rls_enabled = bind.execute(
+        sa.text("SELECT relrowsecurity FROM pg_class WHERE relname = 'time_record'")
+    ).scalar()
+
+    if role_exists:
+        for table in LIMIT_TABLES:
+            op.execute(f"GRANT SELECT, INSERT, UPDATE, DELETE ON {table} TO {BYPASS_ROLE}")
+            op.execute(f"GRANT USAGE, SELECT ON SEQUENCE {table}_id_seq TO {BYPASS_ROLE}")
+            op.execute(
+                f"CREATE POLICY tenant_isolation ON {table} "
+                f"USING ({TENANT_CONDITION}) WITH CHECK ({TENANT_CONDITION})"
+            )
+            op.execute(
+                f"CREATE POLICY tenant_bypass ON {table} TO {BYPASS_ROLE} "
+                f"USING (true) WITH CHECK (true)"
+            )
+            if rls_enabled:
+                op.execute(f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY")
+                op.execute(f"ALTER TABLE {table} FORCE ROW LEVEL SECURITY")
+
+    # Con RLS activo el propietario no ve las entradas: rellenar con el rol de bypass
+    if role_exists and rls_enabled:
+        op.execute(f"SET LOCAL ROLE {BYPASS_ROLE}")
+    op.execute(BACKFILL_SQL)
+    if role_exists and rls_enabled:
+        op.execute("RESET ROLE")
+
+
+def downgrade():
+    op.drop_index('ix_overtime_limit_event_client_id', table_name='overtime_limit_event')
+    op.drop_table('overtime_limit_event')
+    op.drop_index('ix_overtime_year_total_client_year', table_name='overtime_year_total')
+    op.drop_table('overtime_year_total')
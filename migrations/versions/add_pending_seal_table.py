@@ -0,0 +1,47 @@
+"""Add pending_seal queue for deferred punch sealing
+
+Revision ID: pending_seal_001
+Revises: open_record_index_001
+Create Date: 2026-01-19 10:00:00.000000
+
+Con SEALING_MODE=async los fichajes no se firman dentro de la petición:
+se encola una fila en pending_seal (momento exacto + terminal) y el worker
+de sellado crea la TimeRecordSignature correspondiente.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'pending_seal_001'
+down_revision = 'open_record_index_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('pending_seal',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('time_record_id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('timestamp_utc', sa.DateTime(), nullable=False),
+        sa.Column('action', sa.String(length=20), nullable=False),
+        sa.Column('terminal_id', sa.String(length=100), nullable=False),
+        sa.Column('user_agent', sa.Text(), nullable=True),
+        sa.Column('ip_address', sa.String(length=45), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.ForeignKeyConstraint(['time_record_id'], ['time_record.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['client_id'], ['client.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # El worker siempre procesa primero los pendientes más antiguos
+    op.create_index('ix_pending_seal_created_at', 'pending_seal', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_pending_seal_created_at', table_name='pending_seal')
+    op.drop_table('pending_seal')
@@ -0,0 +1,41 @@
+"""Add reseal_checkpoint table for signing key rotation
+
+Revision ID: reseal_checkpoint_001
+Revises: signature_verification_001
+Create Date: 2026-02-02 10:00:00.000000
+
+Checkpoint por partición de worker del job de re-sellado de firmas
+(scripts/reseal_signatures.py), para poder reanudarlo tras una interrupción.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'reseal_checkpoint_001'
+down_revision = 'signature_verification_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reseal_checkpoint',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('from_version', sa.Integer(), nullable=False),
+        sa.Column('to_version', sa.Integer(), nullable=False),
+        sa.Column('worker_index', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('worker_count', sa.Integer(), nullable=False, server_default=sa.text('1')),
+        sa.Column('last_signature_id', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('resealed_count', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('invalid_count', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='running'),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('from_version', 'to_version', 'worker_index', 'worker_count',
+                            name='uix_reseal_checkpoint_partition')
+    )
+
+
+def downgrade():
+    op.drop_table('reseal_checkpoint')
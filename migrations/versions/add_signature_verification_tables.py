@@ -0,0 +1,55 @@
+"""Add signature verification report and watermark tables
+
+Revision ID: signature_verification_001
+Revises: pending_seal_001
+Create Date: 2026-01-26 10:00:00.000000
+
+Soporte para la verificación masiva de firmas: informe por ejecución y
+marca de agua por cliente para la verificación nocturna incremental.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'signature_verification_001'
+down_revision = 'pending_seal_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('signature_verification_watermark',
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('last_signature_id', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['client_id'], ['client.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('client_id')
+    )
+
+    op.create_table('signature_verification_report',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('mode', sa.String(length=20), nullable=False),
+        sa.Column('date_from', sa.Date(), nullable=True),
+        sa.Column('date_to', sa.Date(), nullable=True),
+        sa.Column('first_signature_id', sa.Integer(), nullable=True),
+        sa.Column('last_signature_id', sa.Integer(), nullable=True),
+        sa.Column('total_checked', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('valid_count', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('invalid_count', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('invalid_signature_ids', sa.Text(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('duration_seconds', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['client_id'], ['client.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_signature_verification_report_client', 'signature_verification_report',
+                    ['client_id', 'started_at'])
+
+
+def downgrade():
+    op.drop_index('ix_signature_verification_report_client', table_name='signature_verification_report')
+    op.drop_table('signature_verification_report')
+    op.drop_table('signature_verification_watermark')
@@ -0,0 +1,78 @@
+"""Add PostgreSQL row-level security policies per tenant
+
+Revision ID: tenant_rls_001
+Revises: merkle_batches_001
+Create Date: 2026-02-16 10:00:00.000000
+
+Políticas RLS por client_id en las tablas con datos de empleados y el rol
+timepro_tenant_bypass para las tareas de sistema. RLS queda DESACTIVADO en
+las tablas: las políticas no tienen efecto hasta ejecutar
+scripts/manage_tenant_rls.py enable (TENANT_ISOLATION_MODE=rls).
+Solo PostgreSQL; en otros motores no hace nada.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'tenant_rls_001'
+down_revision = 'merkle_batches_001'
+branch_labels = None
+depends_on = None
+
+BYPASS_ROLE = 'timepro_tenant_bypass'
+
+RLS_TABLES = (
+    'time_record',
+    'time_record_signature',
+    'employee_status',
+    'work_pause',
+    'leave_request',
+    'overtime_entry',
+)
+
+TENANT_CONDITION = "client_id = NULLIF(current_setting('app.client_id', true), '')::integer"
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute(f"""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = '{BYPASS_ROLE}') THEN
+                CREATE ROLE {BYPASS_ROLE} NOLOGIN;
+            END IF;
+        END
+        $$;
+    """)
+    # El usuario de la aplicación debe poder hacer SET ROLE al rol de bypass
+    op.execute(f"GRANT {BYPASS_ROLE} TO CURRENT_USER")
+    op.execute(f"GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA public TO {BYPASS_ROLE}")
+    op.execute(f"GRANT USAGE, SELECT ON ALL SEQUENCES IN SCHEMA public TO {BYPASS_ROLE}")
+
+    for table in RLS_TABLES:
+        op.execute(
+            f"CREATE POLICY tenant_isolation ON {table} "
+            f"USING ({TENANT_CONDITION}) WITH CHECK ({TENANT_CONDITION})"
+        )
+        op.execute(
+            f"CREATE POLICY tenant_bypass ON {table} TO {BYPASS_ROLE} "
+            f"USING (true) WITH CHECK (true)"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table in RLS_TABLES:
+        op.execute(f"ALTER TABLE {table} NO FORCE ROW LEVEL SECURITY")
+        op.execute(f"ALTER TABLE {table} DISABLE ROW LEVEL SECURITY")
+        op.execute(f"DROP POLICY IF EXISTS tenant_bypass ON {table}")
+        op.execute(f"DROP POLICY IF EXISTS tenant_isolation ON {table}")
+
+    op.execute(f"REVOKE ALL ON ALL SEQUENCES IN SCHEMA public FROM {BYPASS_ROLE}")
+    op.execute(f"REVOKE ALL ON ALL TABLES IN SCHEMA public FROM {BYPASS_ROLE}")
+    op.execute(f"REVOKE {BYPASS_ROLE} FROM CURRENT_USER")
+    op.execute(f"DROP ROLE IF EXISTS {BYPASS_ROLE}")
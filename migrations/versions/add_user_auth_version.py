@@ -0,0 +1,29 @@
+"""Add auth_version to user for cached request principals
+
+Revision ID: user_auth_version_001
+Revises: hot_query_indexes_001
+Create Date: 2026-03-02 10:00:00.000000
+
+Contador que se incrementa al cambiar rol, centro, cliente o is_active.
+Los principales cacheados (utils/principal.py) se validan contra él en
+cada petición, de modo que una revocación tiene efecto inmediato.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'user_auth_version_001'
+down_revision = 'hot_query_indexes_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('auth_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('auth_version')
@@ -0,0 +1,27 @@
+"""Add key_unavailable_count to signature_verification_report
+
+Revision ID: verification_key_unavailable_001
+Revises: verification_pending_001
+Create Date: 2026-04-07 10:00:00.000000
+
+Las firmas de una versión de clave retirada del entorno no se pueden
+comprobar, pero no están manipuladas: el informe las cuenta aparte.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'verification_key_unavailable_001'
+down_revision = 'verification_pending_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('signature_verification_report',
+                  sa.Column('key_unavailable_count', sa.Integer(), nullable=False, server_default=sa.text('0')))
+
+
+def downgrade():
+    op.drop_column('signature_verification_report', 'key_unavailable_count')
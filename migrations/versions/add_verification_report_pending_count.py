@@ -0,0 +1,27 @@
+"""Add pending_count to signature_verification_report
+
+Revision ID: verification_pending_001
+Revises: work_pause_record_idx_001
+Create Date: 2026-04-06 10:00:00.000000
+
+Las firmas sin HMAC propio (MERKLE_SEALING=root_only) cuya ventana aún no
+se ha agrupado en un lote no son inválidas: el informe las cuenta aparte.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'verification_pending_001'
+down_revision = 'work_pause_record_idx_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('signature_verification_report',
+                  sa.Column('pending_count', sa.Integer(), nullable=False, server_default=sa.text('0')))
+
+
+def downgrade():
+    op.drop_column('signature_verification_report', 'pending_count')
@@ -0,0 +1,33 @@
+"""Add index on work_pause.time_record_id
+
+Revision ID: work_pause_record_idx_001
+Revises: overtime_year_total_001
+Create Date: 2026-03-30 10:00:00.000000
+
+Las pausas de un rango de fichajes (motor de totales por periodo,
+user_day_summary, exportaciones) se buscan por time_record_id; el índice
+parcial ix_work_pause_active solo cubre las pausas abiertas. En PostgreSQL
+se crea con CREATE INDEX CONCURRENTLY fuera de la transacción de la
+migración (autocommit_block), igual que hot_query_indexes_001.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'work_pause_record_idx_001'
+down_revision = 'overtime_year_total_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    kwargs = {'postgresql_concurrently': True} if op.get_bind().dialect.name == 'postgresql' else {}
+    with op.get_context().autocommit_block():
+        # if_not_exists: un CONCURRENTLY interrumpido deja el índice INVALID; borrarlo antes de relanzar
+        op.create_index('ix_work_pause_record', 'work_pause', ['time_record_id'], if_not_exists=True, **kwargs)
+
+
+def downgrade():
+    kwargs = {'postgresql_concurrently': True} if op.get_bind().dialect.name == 'postgresql' else {}
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_work_pause_record', table_name='work_pause', if_exists=True, **kwargs)
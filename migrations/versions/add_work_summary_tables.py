@@ -0,0 +1,145 @@
+"""Add user_day_summary and user_week_summary rollup tables
+
+Revision ID: work_summary_001
+Revises: user_auth_version_001
+Create Date: 2026-03-09 10:00:00.000000
+
+Totales diarios y semanales de trabajo por empleado, mantenidos por
+services/work_summary_service.py al fichar, editar o borrar fichajes y pausas.
+
+En PostgreSQL la migración:
+- da permisos al rol timepro_tenant_bypass y crea las políticas RLS (igual
+  que tenant_rls_001), activándolas si time_record ya tiene RLS activo
+- rellena las tablas con los fichajes existentes
+
+En otros motores hay que rellenarlas con:
+  python scripts/rebuild_work_summaries.py --all
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'work_summary_001'
+down_revision = 'user_auth_version_001'
+branch_labels = None
+depends_on = None
+
+BYPASS_ROLE = 'timepro_tenant_bypass'
+
+SUMMARY_TABLES = ('user_day_summary', 'user_week_summary')
+
+TENANT_CONDITION = "client_id = NULLIF(current_setting('app.client_id', true), '')::integer"
+
+# Misma semántica que services/work_summary_service.py: fichajes cerrados,
+# segundos truncados por fichaje y pausas finalizadas (negativas = 0)
+BACKFILL_DAYS_SQL = """
+    INSERT INTO user_day_summary (client_id, user_id, date, week_start, worked_seconds,
+                                  pause_seconds, effective_seconds, record_count, updated_at)
+    SELECT client_id, user_id, date, CAST(date_trunc('week', date) AS date),
+           SUM(worked), SUM(paused), SUM(worked - paused), COUNT(*), now()
+    FROM (
+        SELECT tr.client_id, tr.user_id, tr.date,
+               CAST(TRUNC(EXTRACT(EPOCH FROM tr.check_out - tr.check_in)) AS integer) AS worked,
+               COALESCE((
+                   SELECT SUM(GREATEST(CAST(TRUNC(EXTRACT(EPOCH FROM p.pause_end - p.pause_start)) AS integer), 0))
+                   FROM work_pause p
+                   WHERE p.time_record_id = tr.id AND p.pause_end IS NOT NULL
+               ), 0) AS paused
+        FROM time_record tr
+        WHERE tr.check_in IS NOT NULL AND tr.check_out IS NOT NULL
+    ) records
+    GROUP BY client_id, user_id, date
+"""
+
+BACKFILL_WEEKS_SQL = """
+    INSERT INTO user_week_summary (client_id, user_id, week_start, worked_seconds,
+                                   pause_seconds, effective_seconds, record_count, updated_at)
+    SELECT client_id, user_id, week_start, SUM(worked_seconds), SUM(pause_seconds),
+           SUM(effective_seconds), SUM(record_count), now()
+    FROM user_day_summary
+    GROUP BY client_id, user_id, week_start
+"""
+
+
+def _summary_columns():
+    return [
+        sa.Column('worked_seconds', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('pause_seconds', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('effective_seconds', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('record_count', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+    ]
+
+
+def upgrade():
+    op.create_table('user_day_summary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('week_start', sa.Date(), nullable=False),
+        *_summary_columns(),
+        sa.ForeignKeyConstraint(['client_id'], ['client.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('client_id', 'user_id', 'date', name='uix_user_day_summary')
+    )
+    op.create_index('ix_user_day_summary_client_week', 'user_day_summary',
+                    ['client_id', 'week_start', 'user_id'])
+
+    op.create_table('user_week_summary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('week_start', sa.Date(), nullable=False),
+        *_summary_columns(),
+        sa.ForeignKeyConstraint(['client_id'], ['client.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('client_id', 'user_id', 'week_start', name='uix_user_week_summary')
+    )
+    op.create_index('ix_user_week_summary_client_week', 'user_week_summary',
+                    ['client_id', 'week_start'])
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    role_exists = bind.execute(
+        sa.text("SELECT 1 FROM pg_roles WHERE rolname = :role"), {"role": BYPASS_ROLE}
+    ).scalar()
+    rls_enabled = bind.execute(
+        sa.text("SELECT relrowsecurity FROM pg_class WHERE relname = 'time_record'")
+    ).scalar()
+
+    if role_exists:
+        for table in SUMMARY_TABLES:
+            op.execute(f"GRANT SELECT, INSERT, UPDATE, DELETE ON {table} TO {BYPASS_ROLE}")
+            op.execute(f"GRANT USAGE, SELECT ON SEQUENCE {table}_id_seq TO {BYPASS_ROLE}")
+            op.execute(
+                f"CREATE POLICY tenant_isolation ON {table} "
+                f"USING ({TENANT_CONDITION}) WITH CHECK ({TENANT_CONDITION})"
+            )
+            op.execute(
+                f"CREATE POLICY tenant_bypass ON {table} TO {BYPASS_ROLE} "
+                f"USING (true) WITH CHECK (true)"
+            )
+            if rls_enabled:
+                op.execute(f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY")
+                op.execute(f"ALTER TABLE {table} FORCE ROW LEVEL SECURITY")
+
+    # Con RLS activo el propietario no ve los fichajes: rellenar con el rol de bypass
+    if role_exists and rls_enabled:
+        op.execute(f"SET LOCAL ROLE {BYPASS_ROLE}")
+    op.execute(BACKFILL_DAYS_SQL)
+    op.execute(BACKFILL_WEEKS_SQL)
+    if role_exists and rls_enabled:
+        op.execute("RESET ROLE")
+
+
+def downgrade():
+    op.drop_index('ix_user_week_summary_client_week', table_name='user_week_summary')
+    op.drop_table('user_week_summary')
+    op.drop_index('ix_user_day_summary_client_week', table_name='user_day_summary')
+    op.drop_table('user_day_summary')
@@ -1,100 +1,182 @@
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import Query
+from flask_sqlalchemy.query import Query
+from sqlalchemy import Column, Integer, event, text
+from sqlalchemy.orm import Session, with_loader_criteria
 
+# Opción de ejecución que desactiva el filtro multitenant de una sentencia
+BYPASS_TENANT_OPTION = "bypass_tenant_filter"
 
-class TenantAwareQuery(Query):
+# Modos de aislamiento multitenant (TENANT_ISOLATION_MODE):
+# - "python": criterio client_id añadido por SQLAlchemy (por defecto)
+# - "rls":    PostgreSQL row-level security con la variable app.client_id
+#             (en SQLite se comporta como "python")
+TENANT_ISOLATION_MODES = ("python", "rls")
+
+# Rol con políticas RLS permisivas, para tareas de sistema (scheduler, cron, scripts)
+TENANT_BYPASS_ROLE = "timepro_tenant_bypass"
+
+_tenant_bypass = ContextVar("tenant_bypass", default=False)
+
+
+class TenantScoped:
     """
-    Query personalizada que aplica filtrado multitenant de forma transparente.
+    Mixin que marca los modelos aislados por client_id.
+
+    Cualquier sentencia ORM (Query legacy, select(), session.get, paginate,
+    update/delete ORM, relaciones y joins) que toque uno de estos modelos
+    recibe el criterio client_id = <cliente de la sesión> al ejecutarse.
+
+    Cada modelo declara su propia columna client_id (con su ForeignKey);
+    esta solo sirve para que with_loader_criteria pueda analizar el criterio.
     """
+    client_id = Column(Integer)
 
-    TENANT_MODELS = {
-        "User",
-        "TimeRecord",
-        "TimeRecordSignature",
-        "EmployeeStatus",
-        "WorkPause",
-        "LeaveRequest",
-        "SystemConfig",
-        "OvertimeEntry",
-    }
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._bypass_tenant = False
-        self._tenant_filtered = False
-
-    def _clone(self):
-        """
-        Propaga banderas personalizadas cuando SQLAlchemy clona la Query.
-        """
-        clone = super()._clone()
-        clone._bypass_tenant = getattr(self, "_bypass_tenant", False)
-        clone._tenant_filtered = getattr(self, "_tenant_filtered", False)
-        return clone
+    # True en los modelos cuya tabla tiene políticas RLS (ver migración tenant_rls_001)
+    __tenant_rls__ = False
 
-    def bypass_tenant_filter(self):
-        """
-        Permite desactivar el filtro multitenant (solo usar en casos controlados).
-        """
-        self._bypass_tenant = True
-        return self
 
-    def _should_filter_entity(self, entity):
-        if entity is None or not hasattr(entity, "__name__"):
-            return False
-        return entity.__name__ in self.TENANT_MODELS and hasattr(entity, "client_id")
+def get_tenant_isolation_mode():
+    """
+    Devuelve el modo configurado en TENANT_ISOLATION_MODE.
+    Cualquier valor desconocido se trata como "python".
+    """
+    mode = os.getenv("TENANT_ISOLATION_MODE", "python").lower()
+    return mode if mode in TENANT_ISOLATION_MODES else "python"
 
-    def _apply_tenant_filter(self):
-        """
-        Inserta el filtro por client_id si corresponde.
-        """
-        if self._bypass_tenant or getattr(self, "_tenant_filtered", False):
-            return self
 
-        try:
-            from utils.multitenant import get_current_client_id
+def _rls_active(session):
+    if get_tenant_isolation_mode() != "rls":
+        return False
+    bind = session.get_bind()
+    return bool(bind and bind.dialect.name == "postgresql")
 
-            client_id = get_current_client_id()
-            if not client_id:
-                return self
-        except (RuntimeError, ImportError):
-            return self
 
-        query = self
+@contextmanager
+def tenant_bypass():
+    """
+    Ejecuta el bloque como tarea de sistema, sin aislamiento multitenant.
+
+    En modo RLS las transacciones que empiecen dentro del bloque asumen el
+    rol TENANT_BYPASS_ROLE; en modo python se omite el criterio client_id.
+    Debe envolver la transacción completa (p.ej. el cuerpo de una tarea del scheduler).
+    """
+    token = _tenant_bypass.set(True)
+    try:
+        yield
+    finally:
+        _tenant_bypass.reset(token)
+
+
+def _get_tenant_client_id():
+    try:
+        from utils.multitenant import get_current_client_id
+
+        return get_current_client_id()
+    except (RuntimeError, ImportError):
+        # Fuera de una petición (scheduler, scripts): sin filtro
+        return None
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _apply_tenant_criteria(execute_state):
+    """
+    Añade el filtro multitenant a nivel de sentencia, una sola vez y para
+    todas las entidades TenantScoped que aparezcan (incluidas las de joins
+    y subconsultas). Las cargas de relaciones heredan el criterio de la
+    sentencia que cargó el objeto padre.
+    """
+    if not (execute_state.is_select or execute_state.is_update or execute_state.is_delete):
+        return
+    if execute_state.is_column_load or execute_state.is_relationship_load:
+        return
+    if execute_state.execution_options.get(BYPASS_TENANT_OPTION, False) or _tenant_bypass.get():
+        return
+
+    client_id = _get_tenant_client_id()
+    if not client_id:
+        return
+
+    options = _tenant_criteria(client_id, _rls_active(execute_state.session))
+    if options:
+        execute_state.statement = execute_state.statement.options(*options)
+
+
+@event.listens_for(Session, "after_begin")
+def _set_rls_context(session, transaction, connection):
+    """
+    Modo RLS: fija el cliente de la transacción (app.client_id, local a la
+    transacción) o el rol de bypass para tareas de sistema. Así las políticas
+    se cumplen también para consultas text() y para cualquier join.
+    """
+    if not _rls_active(session):
+        return
+
+    if _tenant_bypass.get():
+        connection.exec_driver_sql(f"SET LOCAL ROLE {TENANT_BYPASS_ROLE}")
+        return
+
+    client_id = _get_tenant_client_id()
+    if client_id:
+        connection.execute(
+            text("SELECT set_config('app.client_id', :client_id, true)"),
+            {"client_id": str(client_id)}
+        )
 
-        for desc in self.column_descriptions:
-            entity = desc.get("entity")
-            if not self._should_filter_entity(entity):
-                continue
 
-            # Permitir aplicar filtros aunque la Query ya tenga limit/offset
-            query = query.enable_assertions(False)
-            query = Query.filter(query, entity.client_id == client_id)
-            query._tenant_filtered = True
-            break
+# Opciones por (cliente, modo): construirlas en cada sentencia cuesta más que la propia consulta
+_TENANT_CRITERIA_CACHE = {}
 
-        return query
 
-    # ------------------------------------------------------------------
-    # Metodos sobreescritos para asegurar el filtrado
-    # ------------------------------------------------------------------
-    def all(self):
-        return Query.all(self._apply_tenant_filter())
+def _tenant_criteria(client_id, rls):
+    """
+    Criterios client_id para una sentencia.
 
-    def first(self):
-        return Query.first(self._apply_tenant_filter())
+    En modo python un único criterio sobre el mixin cubre todos los modelos;
+    en modo RLS solo se añaden para los modelos sin políticas RLS (el resto
+    los filtra PostgreSQL sin coste en Python).
+    """
+    key = (client_id, rls)
+    options = _TENANT_CRITERIA_CACHE.get(key)
+    if options is None:
+        if not rls:
+            options = (with_loader_criteria(
+                TenantScoped,
+                lambda cls: cls.client_id == client_id,
+                include_aliases=True
+            ),)
+        else:
+            options = tuple(
+                with_loader_criteria(
+                    model,
+                    lambda cls: cls.client_id == client_id,
+                    include_aliases=True
+                )
+                for model in TenantScoped.__subclasses__()
+                if not model.__tenant_rls__
+            )
+        _TENANT_CRITERIA_CACHE[key] = options
+    return options
 
-    def one(self):
-        return Query.one(self._apply_tenant_filter())
 
-    def one_or_none(self):
-        return Query.one_or_none(self._apply_tenant_filter())
+class TenantAwareQuery(Query):
+    """
+    Query personalizada con utilidades multitenant.
 
-    def count(self):
-        return Query.count(self._apply_tenant_filter())
+    El filtrado por client_id ya no se hace aquí sino en el evento
+    do_orm_execute (ver _apply_tenant_criteria), por lo que también cubre
+    get(), paginate(), scalar(), update()/delete() y db.session.execute(select(...)).
+    """
 
-    def __iter__(self):
-        return Query.__iter__(self._apply_tenant_filter())
+    def bypass_tenant_filter(self):
+        """
+        Permite desactivar el filtro multitenant (solo usar en casos controlados).
+        Para sentencias select() usar .execution_options(bypass_tenant_filter=True).
+        """
+        return self.execution_options(**{BYPASS_TENANT_OPTION: True})
 
     def get_or_404(self, ident, description=None):
         """
@@ -1,4 +1,4 @@
-from .database import db
+from .database import db, TenantScoped
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import Index
@@ -70,7 +70,7 @@ class Center(db.Model):
         return f"<Center {self.name} (client_id={self.client_id})>"
 
 
-class User(db.Model):
+class User(TenantScoped, db.Model):
     __tablename__ = "user"
     __table_args__ = (
         db.UniqueConstraint("client_id", "username", name="uix_client_username"),
@@ -89,6 +89,8 @@ class User(db.Model):
         default=None
     )  # null=usuario normal, 'admin'=admin de centro, 'super_admin'=admin global
     is_active = db.Column(db.Boolean, default=True)
+    # Se incrementa al cambiar rol, centro, cliente o is_active (ver utils/principal.py)
+    auth_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     weekly_hours = db.Column(db.Integer, nullable=False, default=0)
     center_id = db.Column(db.Integer, db.ForeignKey("center.id", ondelete="SET NULL"), nullable=True)
     category_id = db.Column(db.Integer, db.ForeignKey("category.id", ondelete="SET NULL"), nullable=True)
@@ -137,7 +139,28 @@ class User(db.Model):
     def __repr__(self):
         return f"<User {self.username}>"
 
-class TimeRecord(db.Model):
+class TimeRecord(TenantScoped, db.Model):
+    __tenant_rls__ = True
+    __table_args__ = (
+        # Un único registro abierto por usuario y día: respaldo del lock por usuario en check_in
+        Index(
+            "uix_time_record_open_per_day",
+            "client_id", "user_id", "date",
+            unique=True,
+            postgresql_where=db.text("check_out IS NULL"),
+            sqlite_where=db.text("check_out IS NULL"),
+        ),
+        # Historial y fichajes de un empleado por fecha
+        Index("ix_time_record_client_user_date", "client_id", "user_id", "date"),
+        # Fichajes abiertos del cliente (dashboard, cierre automático)
+        Index(
+            "ix_time_record_open",
+            "client_id", "date",
+            postgresql_where=db.text("check_out IS NULL"),
+            sqlite_where=db.text("check_out IS NULL"),
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey("client.id", ondelete="CASCADE"), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
@@ -158,11 +181,12 @@ class TimeRecord(db.Model):
         return f"<TimeRecord {self.id}-U{self.user_id}>"
 
 
-class TimeRecordSignature(db.Model):
+class TimeRecordSignature(TenantScoped, db.Model):
     """
     Sello de tiempo y firma digital para cada fichaje (check-in/check-out).
     Cumple con requisitos de la Ley de Fichajes sobre registros infalsificables.
     """
+    __tenant_rls__ = True
     __tablename__ = "time_record_signature"
 
     id = db.Column(db.Integer, primary_key=True)
@@ -193,11 +217,17 @@ class TimeRecordSignature(db.Model):
     content_hash = db.Column(db.String(64), nullable=False)  # Hex del SHA-256
 
     # Firma HMAC del hash (garantiza integridad)
-    signature = db.Column(db.String(64), nullable=False)  # HMAC-SHA256 en hex
+    # NULL en modo MERKLE_SEALING=root_only: la cubre la firma de la raíz de su lote
+    signature = db.Column(db.String(64), nullable=True)  # HMAC-SHA256 en hex
 
     # Versión de la clave (para rotación de claves)
     key_version = db.Column(db.Integer, default=1, nullable=False)
 
+    # Lote Merkle al que pertenece (ver SealBatch) y prueba de inclusión
+    batch_id = db.Column(db.Integer, db.ForeignKey("seal_batch.id", ondelete="SET NULL"), nullable=True)
+    leaf_index = db.Column(db.Integer, nullable=True)
+    merkle_proof = db.Column(db.Text, nullable=True)  # JSON: [["L"|"R", hash], ...] de la hoja a la raíz
+
     # Metadata
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
@@ -206,12 +236,164 @@ class TimeRecordSignature(db.Model):
         "TimeRecord",
         backref=db.backref("signatures", cascade="all, delete-orphan", lazy=True)
     )
+    batch = db.relationship("SealBatch", lazy=True)
 
     def __repr__(self):
         return f"<TimeRecordSignature {self.id} - TR{self.time_record_id} - {self.action}>"
 
 
-class EmployeeStatus(db.Model):
+class SealBatch(db.Model):
+    """
+    Lote Merkle de firmas de un cliente en una ventana de tiempo.
+    Una única firma HMAC de la raíz cubre todas las hojas (content_hash)
+    del lote; cada firma guarda su prueba de inclusión.
+    """
+    __tablename__ = "seal_batch"
+    __table_args__ = (
+        Index("ix_seal_batch_client_window", "client_id", "window_start"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id", ondelete="CASCADE"), nullable=False)
+    window_start = db.Column(db.DateTime, nullable=False)  # UTC
+    window_end = db.Column(db.DateTime, nullable=False)    # UTC (excluido)
+    leaf_count = db.Column(db.Integer, nullable=False)
+    merkle_root = db.Column(db.String(64), nullable=False)
+    root_signature = db.Column(db.String(64), nullable=False)  # HMAC-SHA256 de la raíz
+    key_version = db.Column(db.Integer, default=1, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<SealBatch {self.id} C{self.client_id} {self.window_start} ({self.leaf_count} hojas)>"
+
+
+class PendingSeal(TenantScoped, db.Model):
+    """
+    Cola de fichajes pendientes de sellar (SEALING_MODE=async).
+
+    La petición de fichaje guarda aquí el momento exacto y el terminal;
+    el worker de sellado calcula hash y firma, crea la TimeRecordSignature
+    y elimina la fila.
+    """
+    __tablename__ = "pending_seal"
+    __table_args__ = (
+        Index("ix_pending_seal_created_at", "created_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    time_record_id = db.Column(
+        db.Integer,
+        db.ForeignKey("time_record.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    client_id = db.Column(
+        db.Integer,
+        db.ForeignKey("client.id", ondelete="CASCADE"),
+        nullable=False
+    )
+    user_id = db.Column(db.Integer, nullable=False)  # Copia para firmar sin cargar el TimeRecord
+
+    # Datos capturados en el momento del fichaje
+    timestamp_utc = db.Column(db.DateTime, nullable=False)
+    action = db.Column(db.String(20), nullable=False)  # "check_in" o "check_out"
+    terminal_id = db.Column(db.String(100), nullable=False)
+    user_agent = db.Column(db.Text, nullable=True)
+    ip_address = db.Column(db.String(45), nullable=True)
+
+    # Control de reintentos del worker
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<PendingSeal {self.id} - TR{self.time_record_id} - {self.action}>"
+
+
+class SignatureVerificationWatermark(db.Model):
+    """
+    Última firma verificada por cliente: la verificación nocturna
+    incremental solo revisa firmas con id mayor.
+    """
+    __tablename__ = "signature_verification_watermark"
+
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id", ondelete="CASCADE"), primary_key=True)
+    last_signature_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SignatureVerificationWatermark C{self.client_id} -> {self.last_signature_id}>"
+
+
+class SignatureVerificationReport(db.Model):
+    """Resultado de una verificación masiva de firmas (inspección o nocturna)"""
+    __tablename__ = "signature_verification_report"
+    __table_args__ = (
+        Index("ix_signature_verification_report_client", "client_id", "started_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id", ondelete="CASCADE"), nullable=False)
+    mode = db.Column(db.String(20), nullable=False)  # "full" o "incremental"
+    date_from = db.Column(db.Date, nullable=True)
+    date_to = db.Column(db.Date, nullable=True)
+    first_signature_id = db.Column(db.Integer, nullable=True)
+    last_signature_id = db.Column(db.Integer, nullable=True)
+
+    total_checked = db.Column(db.Integer, nullable=False, default=0)
+    valid_count = db.Column(db.Integer, nullable=False, default=0)
+    invalid_count = db.Column(db.Integer, nullable=False, default=0)
+    # Firmas sin HMAC propio que aún no tienen lote Merkle (no cuentan en total_checked)
+    pending_count = db.Column(db.Integer, nullable=False, default=0)
+    # Firmas cuya versión de clave ya no está en el entorno (no cuentan en total_checked)
+    key_unavailable_count = db.Column(db.Integer, nullable=False, default=0)
+    invalid_signature_ids = db.Column(db.Text, nullable=True)  # JSON con los primeros IDs inválidos
+
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration_seconds = db.Column(db.Float, nullable=True)
+
+    def __repr__(self):
+        return f"<SignatureVerificationReport {self.id} C{self.client_id} {self.invalid_count}/{self.total_checked}>"
+
+
+class ResealCheckpoint(db.Model):
+    """
+    Progreso del re-sellado de firmas tras una rotación de clave.
+    Una fila por (versión origen, versión destino, partición de worker),
+    para poder reanudar el job donde se quedó.
+    """
+    __tablename__ = "reseal_checkpoint"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "from_version", "to_version", "worker_index", "worker_count",
+            name="uix_reseal_checkpoint_partition"
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    from_version = db.Column(db.Integer, nullable=False)
+    to_version = db.Column(db.Integer, nullable=False)
+    worker_index = db.Column(db.Integer, nullable=False, default=0)
+    worker_count = db.Column(db.Integer, nullable=False, default=1)
+
+    last_signature_id = db.Column(db.Integer, nullable=False, default=0)
+    resealed_count = db.Column(db.Integer, nullable=False, default=0)
+    invalid_count = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default="running")  # "running" o "done"
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return (
+            f"<ResealCheckpoint v{self.from_version}->v{self.to_version} "
+            f"{self.worker_index}/{self.worker_count} @{self.last_signature_id}>"
+        )
+
+
+class EmployeeStatus(TenantScoped, db.Model):
+    __tenant_rls__ = True
     __tablename__ = "employee_status"
     __table_args__ = (
         db.UniqueConstraint("client_id", "user_id", "date", name="uix_employee_date"),
@@ -250,9 +432,21 @@ class EmployeeStatus(db.Model):
         )
 
 
-class WorkPause(db.Model):
+class WorkPause(TenantScoped, db.Model):
     """Modelo para registrar pausas/descansos durante la jornada laboral"""
+    __tenant_rls__ = True
     __tablename__ = "work_pause"
+    __table_args__ = (
+        # Pausa activa de un fichaje
+        Index(
+            "ix_work_pause_active",
+            "time_record_id",
+            postgresql_where=db.text("pause_end IS NULL"),
+            sqlite_where=db.text("pause_end IS NULL"),
+        ),
+        # Pausas de un conjunto de fichajes (totales por periodo, exportaciones)
+        Index("ix_work_pause_record", "time_record_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey("client.id", ondelete="CASCADE"), nullable=False)
@@ -293,9 +487,14 @@ class WorkPause(db.Model):
         return f"<WorkPause {self.id} - {self.pause_type}>"
 
 
-class LeaveRequest(db.Model):
+class LeaveRequest(TenantScoped, db.Model):
     """Modelo para solicitudes de vacaciones, bajas y ausencias"""
+    __tenant_rls__ = True
     __tablename__ = "leave_request"
+    __table_args__ = (
+        # Solicitudes pendientes del cliente, las más recientes primero
+        Index("ix_leave_request_client_status_created", "client_id", "status", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey("client.id", ondelete="CASCADE"), nullable=False)
@@ -346,11 +545,13 @@ class LeaveRequest(db.Model):
         return f"<LeaveRequest {self.id} - {self.request_type} - {self.status}>"
 
 
-class OvertimeEntry(db.Model):
+class OvertimeEntry(TenantScoped, db.Model):
     """Modelo para registrar horas extras semanales por empleado"""
+    __tenant_rls__ = True
     __tablename__ = "overtime_entry"
     __table_args__ = (
         db.UniqueConstraint("client_id", "user_id", "week_start", name="uix_overtime_entry_week"),
+        Index("ix_overtime_entry_client_week_status", "client_id", "week_start", "status"),
     )
 
     id = db.Column(db.Integer, primary_key=True)
@@ -401,7 +602,145 @@ class OvertimeEntry(db.Model):
         return "OK"
 
 
-class SystemConfig(db.Model):
+class UserDaySummary(TenantScoped, db.Model):
+    """
+    Totales diarios de trabajo por empleado, mantenidos al modificar
+    fichajes y pausas (ver services/work_summary_service.py).
+    Solo cuentan los fichajes cerrados y sus pausas finalizadas.
+    """
+    __tenant_rls__ = True
+    __tablename__ = "user_day_summary"
+    __table_args__ = (
+        db.UniqueConstraint("client_id", "user_id", "date", name="uix_user_day_summary"),
+        Index("ix_user_day_summary_client_week", "client_id", "week_start", "user_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id", ondelete="CASCADE"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    week_start = db.Column(db.Date, nullable=False)  # Lunes de la semana de date
+
+    worked_seconds = db.Column(db.Integer, nullable=False, default=0)     # check_out - check_in
+    pause_seconds = db.Column(db.Integer, nullable=False, default=0)      # Pausas finalizadas
+    effective_seconds = db.Column(db.Integer, nullable=False, default=0)  # worked - pause
+    record_count = db.Column(db.Integer, nullable=False, default=0)       # Fichajes cerrados
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<UserDaySummary U{self.user_id} {self.date} {self.worked_seconds}s>"
+
+
+class UserWeekSummary(TenantScoped, db.Model):
+    """Totales semanales (lunes a domingo) de trabajo por empleado: suma de UserDaySummary."""
+    __tenant_rls__ = True
+    __tablename__ = "user_week_summary"
+    __table_args__ = (
+        db.UniqueConstraint("client_id", "user_id", "week_start", name="uix_user_week_summary"),
+        Index("ix_user_week_summary_client_week", "client_id", "week_start"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id", ondelete="CASCADE"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    week_start = db.Column(db.Date, nullable=False)
+
+    worked_seconds = db.Column(db.Integer, nullable=False, default=0)
+    pause_seconds = db.Column(db.Integer, nullable=False, default=0)
+    effective_seconds = db.Column(db.Integer, nullable=False, default=0)
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<UserWeekSummary U{self.user_id} W{self.week_start} {self.worked_seconds}s>"
+
+
+class OvertimeDirtyWeek(TenantScoped, db.Model):
+    """
+    Semanas de un empleado cuyas horas extras hay que recalcular.
+
+    Se anotan en la misma transacción que el cambio de fichajes, pausas o
+    jornada del empleado; el job recompute_dirty_overtime las procesa y las
+    borra (ver services/overtime_service.py).
+    """
+    __tenant_rls__ = True
+    __tablename__ = "overtime_dirty_week"
+    __table_args__ = (
+        db.UniqueConstraint("client_id", "user_id", "week_start", name="uix_overtime_dirty_week"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id", ondelete="CASCADE"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    week_start = db.Column(db.Date, nullable=False)
+    # Se actualiza en cada nueva anotación: el job solo borra la que leyó
+    marked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<OvertimeDirtyWeek U{self.user_id} W{self.week_start}>"
+
+
+class OvertimeYearTotal(TenantScoped, db.Model):
+    """
+    Acumulado anual de horas extras por empleado (año del lunes de cada
+    semana), recalculado desde overtime_entry al cambiar sus entradas
+    (ver services/overtime_limits_service.py).
+    """
+    __tenant_rls__ = True
+    __tablename__ = "overtime_year_total"
+    __table_args__ = (
+        db.UniqueConstraint("client_id", "user_id", "year", name="uix_overtime_year_total"),
+        Index("ix_overtime_year_total_client_year", "client_id", "year"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id", ondelete="CASCADE"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+
+    approved_seconds = db.Column(db.Integer, nullable=False, default=0)   # Extras aprobadas
+    pending_seconds = db.Column(db.Integer, nullable=False, default=0)    # Extras aún Pendientes
+    weeks_over_limit = db.Column(db.Integer, nullable=False, default=0)   # Semanas por encima del límite semanal
+    max_week_seconds = db.Column(db.Integer, nullable=False, default=0)   # Semana con más horas trabajadas
+    last_week_over_limit = db.Column(db.Date, nullable=True)
+    annual_level = db.Column(db.SmallInteger, nullable=False, default=0)  # 0 ok, 1 aviso, 2 superado
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    user_rel = db.relationship("User", lazy=True)
+
+    def __repr__(self):
+        return f"<OvertimeYearTotal U{self.user_id} {self.year} {self.approved_seconds}s>"
+
+
+class OvertimeLimitEvent(TenantScoped, db.Model):
+    """
+    Aviso de límite de horas superado: se registra cuando un empleado cruza
+    el umbral de aviso o el límite anual, o una nueva semana supera el
+    límite semanal. Se leen en orden de id (/admin/overtime/limits/events).
+    """
+    __tenant_rls__ = True
+    __tablename__ = "overtime_limit_event"
+    __table_args__ = (
+        Index("ix_overtime_limit_event_client_id", "client_id", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.Integer, db.ForeignKey("client.id", ondelete="CASCADE"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # annual_warning, annual_exceeded, weekly_exceeded
+    seconds = db.Column(db.Integer, nullable=False)  # Acumulado anual o horas de la semana
+    week_start = db.Column(db.Date, nullable=True)   # Solo weekly_exceeded
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<OvertimeLimitEvent {self.id} U{self.user_id} {self.kind}>"
+
+
+class SystemConfig(TenantScoped, db.Model):
     """Modelo para almacenar configuración del sistema"""
     __table_args__ = (
         db.UniqueConstraint("client_id", "key", name="uix_client_key"),
@@ -1,23 +1,40 @@
 from flask import (
     Blueprint, render_template, request, redirect,
-    url_for, flash, session, jsonify, abort
+    url_for, flash, session, jsonify, abort, make_response
 )
 from functools import wraps
+from sqlalchemy import and_, case, false, func, or_, select
+from sqlalchemy.orm import aliased, contains_eager, joinedload
 from datetime import datetime, date, timedelta, timezone
-from models.models import User, TimeRecord, EmployeeStatus, SystemConfig, LeaveRequest, WorkPause, Category, Center, OvertimeEntry
+from models.models import (
+    User, TimeRecord, EmployeeStatus, SystemConfig, LeaveRequest, WorkPause, Category, Center,
+    OvertimeEntry, OvertimeYearTotal
+)
 from services.category_service import CategoryService
+from services.reference_cache import get_reference
+from services.work_summary_service import get_worked_before_by_day
 from services.exceptions import ResourceNotFound, ResourceAlreadyExists, ValidationError, OperationNotAllowed
-from models.database import db
+from models.database import db, tenant_bypass
 import plan_config  # Sistema de configuración multi-plan
 from utils.multitenant import get_client_config
 from services.overtime_service import (
-    get_week_bounds, calculate_weekly_worked_seconds,
-    generate_overtime_entries_for_week, adjust_last_timerecord_auto
+    get_week_bounds, calculate_weekly_worked_seconds, adjust_last_timerecord_auto, decide_week_entries,
+    TOLERANCE_SECONDS, WEEK_DECISIONS
+)
+from services.overtime_simulation_service import get_simulation_data, simulate, summarize, iter_employee_rows
+from services.live_events import get_poll_interval, poll_slot, wait_for_events
+from services.notification_summary import build_summary, etag_matches, summary_etag
+from services.overtime_limits_service import (
+    get_limits, flagged_year_totals_query, get_limit_events, LIMIT_LEVEL_NAMES
 )
 from utils.auth_decorators import admin_required
+from utils.principal import get_current_principal
 from utils.helpers import format_timedelta
-from utils.query_helpers import time_records_query, work_pauses_query
+from utils.query_helpers import time_records_query
 from utils.logging_utils import get_logger
+from utils.pagination import DEFAULT_PAGE_SIZE, paginate_keyset, page_args
+from utils.query_stats import query_budget
+from utils.sql_expressions import duration_seconds, supports_window_functions, time_of_day
 from utils.timezone_utils import get_now_spain
 
 admin_bp = Blueprint(
@@ -46,23 +63,22 @@ def get_categorias_disponibles():
     Retorna una lista de nombres de categorías.
     IMPORTANTE: NO retorna valores hardcodeados, solo lo que está en la BD.
     """
-    client_id = session.get("client_id")
-    if not client_id:
+    reference = get_reference(session.get("client_id"))
+    if not reference:
         return []
 
-    categories = CategoryService.get_all(client_id)
-    return [c.name for c in categories]
+    return [c.name for c in reference.categories]
 
 def get_category_objects():
     """
-    Obtiene los objetos Category del cliente actual desde la BD.
-    Retorna una lista de objetos Category.
+    Obtiene las categorías del cliente actual (instantáneas de la caché de referencia).
+    Retorna una lista de CategoryRef (id, name, description).
     """
-    client_id = session.get("client_id")
-    if not client_id:
+    reference = get_reference(session.get("client_id"))
+    if not reference:
         return []
 
-    return CategoryService.get_all(client_id)
+    return list(reference.categories)
 
 def get_category_id_by_name(category_name):
     """
@@ -72,12 +88,11 @@ def get_category_id_by_name(category_name):
     if not category_name:
         return None
 
-    client_id = session.get("client_id")
-    if not client_id:
+    reference = get_reference(session.get("client_id"))
+    if not reference:
         return None
 
-    # Usar el servicio para buscar por nombre
-    category = CategoryService.get_by_name(category_name, client_id)
+    category = reference.category_by_name.get(category_name)
     return category.id if category else None
 
 
@@ -98,27 +113,22 @@ def get_centros_dinamicos():
     Obtiene los centros dinámicos del cliente actual desde la BD.
     Retorna una lista de nombres de centros.
     """
-    client_id = session.get("client_id")
-    if not client_id:
+    reference = get_reference(session.get("client_id"))
+    if not reference:
         return []
 
-    centers = Center.query.filter_by(client_id=client_id, is_active=True).order_by(Center.name).all()
-    if centers:
-        return [c.name for c in centers]
-
-    return []
+    return [c.name for c in reference.centers]
 
 def get_center_objects():
     """
-    Obtiene los objetos Center del cliente actual desde la BD.
-    Retorna una lista de objetos Center.
+    Obtiene los centros activos del cliente actual (instantáneas de la caché de referencia).
+    Retorna una lista de CenterRef (id, name, is_active).
     """
-    client_id = session.get("client_id")
-    if not client_id:
+    reference = get_reference(session.get("client_id"))
+    if not reference:
         return []
 
-    centers = Center.query.filter_by(client_id=client_id, is_active=True).order_by(Center.name).all()
-    return centers
+    return list(reference.centers)
 
 def get_center_id_by_name(center_name):
     """
@@ -129,21 +139,21 @@ def get_center_id_by_name(center_name):
     if not center_name or center_name == "-- Sin categoría --":
         return None
 
-    client_id = session.get("client_id")
-    if not client_id:
+    reference = get_reference(session.get("client_id"))
+    if not reference:
         return None
 
     # Si ya es un ID (int o string numérico), devolverlo directamente
+    center = None
     if isinstance(center_name, int):
-        center = Center.query.filter_by(client_id=client_id, id=center_name).first()
-        return center.id if center else None
-    if isinstance(center_name, str):
+        center = reference.center_by_id.get(center_name)
+    elif isinstance(center_name, str):
         stripped_value = center_name.strip()
         if stripped_value.isdigit():
-            center = Center.query.filter_by(client_id=client_id, id=int(stripped_value)).first()
-            return center.id if center else None
-        # Mantener compatibilidad con selecciones antiguas por nombre
-        center = Center.query.filter_by(client_id=client_id, name=center_name).first()
+            center = reference.center_by_id.get(int(stripped_value))
+        else:
+            # Mantener compatibilidad con selecciones antiguas por nombre
+            center = reference.center_by_name.get(center_name)
     return center.id if center else None
 
 def apply_leave_request_statuses(leave_request, admin_notes=None, note_suffix="aprobada"):
@@ -195,20 +205,12 @@ def get_admin_centro():
     - Admin de centro: retorna su center_id
     - Usuario normal: retorna None (no es admin)
     """
-    uid = session.get("user_id")
-    if not uid:
-        return None
-    u = User.query.get(uid)
-    # Si no es admin, retornar None
-    if not u or not is_admin_user(u):
-        return None
-    # Si es super admin, retornar None (acceso global)
-    if is_super_admin_user(u):
+    principal = get_current_principal()
+    # Si no es admin o es super admin, retornar None (sin centro / acceso global)
+    if not principal:
         return None
     # Admin de centro: retornar su center_id
-    if u.center_id:
-        return u.center_id
-    return None
+    return principal.center_scope
 
 def get_centros_disponibles():
     """
@@ -217,7 +219,7 @@ def get_centros_disponibles():
     - Admin de centro específico: solo ve su centro
     - Usuario normal: sin centros (no es admin)
     """
-    u = _current_user()
+    u = get_current_principal()
     if not u or not is_admin_user(u):
         return []
 
@@ -225,17 +227,15 @@ def get_centros_disponibles():
     if is_super_admin_user(u):
         return get_centros_dinamicos()
 
-    # Admin de centro: obtener su centro desde la BD
-    if u.center:
-        return [u.center.name]  # Retornar nombre del center desde la relación
+    # Admin de centro: nombre de su centro desde la caché de referencia
+    reference = get_reference(u.client_id)
+    center = reference.center_by_id.get(u.center_id) if reference and u.center_id else None
+    if center:
+        return [center.name]
 
     return []
 
-# Helpers de permisos
-
-def _current_user():
-    uid = session.get("user_id")
-    return User.query.get(uid) if uid else None
+# Helpers de permisos (aceptan un User o el Principal de la petición)
 
 def is_super_admin_user(u: User | None):
     """
@@ -256,11 +256,12 @@ def can_grant_admin():
     Solo super_admin puede crear/asignar otros admins.
     En LITE: no se permite crear admins (solo el inicial).
     """
-    u = _current_user()
+    u = get_current_principal()
     if not u or not is_super_admin_user(u):
         return False
     # Verificar que sea plan PRO
-    client = u.client
+    reference = get_reference(u.client_id)
+    client = reference.client if reference else None
     return client and client.plan == 'pro'
 
 def can_grant_super_admin():
@@ -268,10 +269,11 @@ def can_grant_super_admin():
     Solo super_admin en plan PRO puede crear otros super_admin.
     En LITE: no aplica (no hay super_admin).
     """
-    u = _current_user()
+    u = get_current_principal()
     if not is_super_admin_user(u):
         return False
-    client = u.client
+    reference = get_reference(u.client_id)
+    client = reference.client if reference else None
     return client and client.plan == 'pro'
 
 # --------------------------------------------------------------------
@@ -279,122 +281,183 @@ def can_grant_super_admin():
 # --------------------------------------------------------------------
 @admin_bp.route("/dashboard")
 @admin_required
+@query_budget(8)
 def dashboard():
-    # Centro del admin (None => super admin con acceso global)
-    centro_admin = get_admin_centro()
+    filters = _dashboard_filters()
+
+    # Totales de empleados (usuarios sin rol admin) y de los que tienen un
+    # fichaje abierto, en una sola consulta
+    open_record = (
+        select(TimeRecord.id)
+        .where(TimeRecord.user_id == User.id, TimeRecord.check_in.isnot(None), TimeRecord.check_out.is_(None))
+        .exists()
+    )
+    total_users, active_users = _dashboard_scope(
+        db.session.query(func.count(User.id), func.count(case((open_record, User.id)))),
+        filters,
+    ).one()
 
-    # Filtros opcionales
-    filtro_centro = request.args.get("centro", type=str, default="")
-    filtro_categoria = request.args.get("categoria", type=str, default="")
-    filtro_categoria_id, filtro_categoria_none = parse_category_filter(filtro_categoria)
+    records, next_cursor = _dashboard_records_page(filters)
 
-    # Totales de usuarios (limitados por centro si aplica)
-    # Empleados: usuarios sin rol admin
-    user_q = User.query.filter(User.role.is_(None))
-    if centro_admin:
-        user_q = user_q.filter(User.center_id == centro_admin)
-    elif filtro_centro:
-        user_q = user_q.filter(User.center_id == filtro_centro)
-    if filtro_categoria_id:
-        user_q = user_q.filter(User.category_id == filtro_categoria_id)
-    elif filtro_categoria_none:
-        user_q = user_q.filter(User.category_id.is_(None))
-    total_users = user_q.count()
-
-    # Usuarios activos con fichaje abierto (limitados por centro si aplica)
-    # Solo contar empleados (sin rol admin)
-    active_q = (
-        time_records_query()
-        .join(User, TimeRecord.user_id == User.id)
-        .filter(TimeRecord.check_in.isnot(None), TimeRecord.check_out.is_(None), User.role.is_(None))
-        .with_entities(TimeRecord.user_id)
+    # Obtener centros disponibles según el rol del admin
+    centros = get_centros_disponibles()
+    categorias = get_categorias_disponibles()
+
+    return render_template(
+        "admin_dashboard.html",
+        user_count=total_users,
+        active_user_count=active_users,
+        recent_records=records,
+        next_cursor=next_cursor,
+        centros=centros,
+        categorias=categorias
     )
-    if centro_admin:
-        active_q = active_q.filter(User.center_id == centro_admin)
-    elif filtro_centro:
-        active_q = active_q.filter(User.center_id == filtro_centro)
-    if filtro_categoria_id:
-        active_q = active_q.filter(User.category_id == filtro_categoria_id)
-    elif filtro_categoria_none:
-        active_q = active_q.filter(User.category_id.is_(None))
-    active_users = active_q.distinct().count()
 
+
+@admin_bp.route("/dashboard/records")
+@admin_required
+@query_budget(5)
+def dashboard_records():
+    """
+    Siguiente página de fichajes de la semana del dashboard (?cursor= de la
+    página anterior, ?limit=, mismos filtros centro / categoria) en JSON.
+    """
+    cursor, limit = page_args(request.args)
+    try:
+        records, next_cursor = _dashboard_records_page(_dashboard_filters(), cursor, limit)
+    except ValueError:
+        return jsonify({"ok": False, "error": "Cursor no válido."}), 400
+
+    return jsonify({
+        "records": [
+            {
+                "id": item["record"].id,
+                "username": item["record"].user.username,
+                "date": item["record"].date.strftime("%d-%m-%Y"),
+                "check_in": item["record"].check_in.strftime("%H:%M:%S") if item["record"].check_in else None,
+                "check_out": item["record"].check_out.strftime("%H:%M:%S") if item["record"].check_out else None,
+                "duration": item["duration_formatted"],
+                "remaining": item["remaining_formatted"],
+                "is_over": item["is_over"],
+                "is_open": item["is_open"],
+                "pause_type": item["active_pause"]["pause_type"] if item["active_pause"] else None,
+                "category": item["record"].user.category.name if item["record"].user.category else None,
+                "center": item["record"].user.center.name if item["record"].user.center else None,
+                "notes": item["record"].notes or "",
+                "admin_notes": item["record"].admin_notes or "",
+            }
+            for item in records
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+def _dashboard_filters():
+    """Centro (id) y categoría del dashboard: el centro del admin o los filtros de la URL."""
+    centro_admin = get_admin_centro()
+    filtro_centro = request.args.get("centro", type=str, default="")
+    filtro_categoria_id, filtro_categoria_none = parse_category_filter(
+        request.args.get("categoria", type=str, default="")
+    )
+    center_id = centro_admin or get_center_id_by_name(filtro_centro)
+    return {
+        "center_id": center_id,
+        # Centro filtrado que no existe: ningún empleado
+        "center_unknown": bool(filtro_centro) and not center_id,
+        "category_id": filtro_categoria_id,
+        "category_none": filtro_categoria_none,
+    }
+
+
+def _dashboard_scope(query, filters):
+    """Solo empleados (sin rol admin) del centro y categoría filtrados."""
+    query = query.filter(User.role.is_(None))
+    if filters["center_id"]:
+        query = query.filter(User.center_id == filters["center_id"])
+    elif filters["center_unknown"]:
+        query = query.filter(false())
+    if filters["category_id"]:
+        query = query.filter(User.category_id == filters["category_id"])
+    elif filters["category_none"]:
+        query = query.filter(User.category_id.is_(None))
+    return query
+
+
+def _dashboard_records_page(filters, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Una página de los fichajes de la semana (más recientes primero), con su
+    empleado, centro y categoría, la pausa activa si el fichaje está abierto
+    y lo trabajado ese día hasta el fichaje, en una sola consulta; más una
+    sobre user_day_summary para el acumulado de los días anteriores.
+
+    Returns:
+        tuple: (lista de dicts para la plantilla, cursor de la siguiente página)
+    """
     today = date.today()
     start_of_week = today - timedelta(days=today.weekday())
     end_of_week = start_of_week + timedelta(days=6)
 
-    q = (
-        time_records_query()
-        .join(User, TimeRecord.user_id == User.id)
-        .filter(
-            TimeRecord.date >= start_of_week,
-            TimeRecord.date <= end_of_week,
-            User.role.is_(None)  # Solo empleados (sin rol admin)
+    # Acumulado del día: fichajes cerrados del empleado ese día hasta este
+    # (incluido). La ventana se calcula sobre toda la semana antes de paginar.
+    closed_seconds = case(
+        (TimeRecord.check_out.isnot(None), duration_seconds(TimeRecord.check_in, TimeRecord.check_out)),
+        else_=0,
+    )
+    week_records = _dashboard_scope(
+        db.session.query(
+            TimeRecord.id.label("id"),
+            func.sum(closed_seconds).over(
+                partition_by=(TimeRecord.user_id, TimeRecord.date),
+                order_by=(TimeRecord.check_in, TimeRecord.id),
+            ).label("day_seconds"),
         )
+        .join(User, TimeRecord.user_id == User.id)
+        .filter(TimeRecord.date >= start_of_week, TimeRecord.date <= end_of_week),
+        filters,
+    ).subquery()
+
+    active_pause_type = (
+        select(WorkPause.pause_type)
+        .where(WorkPause.time_record_id == TimeRecord.id, WorkPause.pause_end.is_(None))
+        .order_by(WorkPause.id.desc())
+        .limit(1)
+        .scalar_subquery()
     )
-    if centro_admin:
-        q = q.filter(User.center_id == centro_admin)
-    elif filtro_centro:
-        q = q.filter(User.center_id == filtro_centro)
-    if filtro_categoria_id:
-        q = q.filter(User.category_id == filtro_categoria_id)
-    elif filtro_categoria_none:
-        q = q.filter(User.category_id.is_(None))
-
-    # Limitar a 500 registros para evitar cargar miles en memoria
-    total_count = q.count()
-    records = q.order_by(TimeRecord.date.asc(), TimeRecord.check_in.asc()).limit(500).all()
-
-    if total_count > 500:
-        flash(f"Mostrando solo los primeros 500 registros de {total_count} totales. Usa filtros para refinar la búsqueda.", "info")
-
-    week_acc, records_with_accum = {}, []
-    for rec in records:
-        uid = rec.user_id
+    query = (
+        db.session.query(TimeRecord, week_records.c.day_seconds, active_pause_type)
+        .join(week_records, TimeRecord.id == week_records.c.id)
+        .options(joinedload(TimeRecord.user).joinedload(User.center),
+                 joinedload(TimeRecord.user).joinedload(User.category))
+    )
+    rows, next_cursor = paginate_keyset(
+        query, TimeRecord.date, TimeRecord.id, cursor, limit,
+        key=lambda row: (row[0].date, row[0].id),
+    )
+
+    worked_before = get_worked_before_by_day(start_of_week, {rec.user_id for rec, _, _ in rows})
+    records = []
+    for rec, day_seconds, pause_type in rows:
         weekly_secs = rec.user.weekly_hours * 3600 if rec.user.weekly_hours else 0
         dur = rec.check_out - rec.check_in if rec.check_in and rec.check_out else None
-        secs = dur.total_seconds() if dur else 0
-        prev = week_acc.get(uid, 0)
-        curr = prev + secs if rec.check_out else prev
-        week_acc[uid] = curr
+        curr = worked_before.get((rec.user_id, rec.date), 0) + (day_seconds or 0)
         rem = weekly_secs - curr
+        is_open = bool(rec.check_in and not rec.check_out)
 
-        # Buscar pausa activa del usuario si el registro está abierto
-        active_pause = None
-        if rec.check_in and not rec.check_out:
-            active_pause = work_pauses_query(user_id=uid, include_active_only=True) \
-                .order_by(WorkPause.id.desc()).first()
-
-        records_with_accum.append({
+        records.append({
             "record": rec,
             "duration_formatted": format_timedelta(dur) if dur else "-",
             "remaining_formatted": format_timedelta(timedelta(seconds=abs(int(rem)))),
             "is_over": rem < 0,
-            "is_open": rec.check_in and not rec.check_out,
-            "active_pause": active_pause
+            "is_open": is_open,
+            "active_pause": {"pause_type": pause_type} if is_open and pause_type else None,
         })
-
-    records_with_accum.reverse()
-
-    # Obtener centros disponibles según el rol del admin
-    centros = get_centros_disponibles()
-    categorias = get_categorias_disponibles()
-
-    return render_template(
-        "admin_dashboard.html",
-        user_count=total_users,
-        active_user_count=active_users,
-        recent_records=records_with_accum,
-        centros=centros,
-        categorias=categorias
-    )
+    return records, next_cursor
 
 # --------------------------------------------------------------------
 #  USUARIOS
 # --------------------------------------------------------------------
-@admin_bp.route("/users")
-@admin_required
-def manage_users():
+def _manage_users_query():
+    """Consulta de usuarios con los filtros de la URL (centro, categoria, search)."""
     centro_admin = get_admin_centro()
 
     # Filtros opcionales
@@ -403,7 +466,7 @@ def manage_users():
     search_query = request.args.get("search", type=str, default="")
 
     # Usar TenantAwareQuery que filtra automáticamente por client_id
-    q = User.query
+    q = User.query.options(joinedload(User.center), joinedload(User.category))
 
     if centro_admin:
         # Filtrar por ID de centro (el admin solo ve su centro)
@@ -420,14 +483,45 @@ def manage_users():
             (User.full_name.ilike(f"%{search_query}%")) |
             (User.username.ilike(f"%{search_query}%"))
         )
+    return q, centro_admin
 
-    users = q.order_by(User.username).all()
+
+def _manage_users_page(q, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Página de usuarios por username (id como desempate)."""
+    return paginate_keyset(q, User.username, User.id, cursor, limit, descending=False)
+
+
+@admin_bp.route("/users")
+@admin_required
+def manage_users():
+    q, centro_admin = _manage_users_query()
+    users, next_cursor = _manage_users_page(q)
 
     # Obtener centros disponibles según el rol del admin
     centros = get_centros_disponibles()
     categorias = get_categorias_disponibles()
 
-    return render_template("manage_users.html", users=users, centros=centros, categorias=categorias, centro_admin=centro_admin)
+    return render_template(
+        "manage_users.html", users=users, next_cursor=next_cursor, centros=centros,
+        categorias=categorias, centro_admin=centro_admin
+    )
+
+
+@admin_bp.route("/users/rows")
+@admin_required
+def manage_users_rows():
+    """Siguiente página de usuarios ("cargar más", mismos filtros): filas HTML y cursor en JSON."""
+    q, _ = _manage_users_query()
+    cursor, limit = page_args(request.args)
+    try:
+        users, next_cursor = _manage_users_page(q, cursor, limit)
+    except ValueError:
+        return jsonify({"ok": False, "error": "Cursor no válido."}), 400
+    return jsonify({
+        "ok": True,
+        "html": render_template("manage_users_rows.html", users=users),
+        "next_cursor": next_cursor,
+    })
 
 @admin_bp.route("/users/add", methods=["GET", "POST"])
 @admin_required
@@ -899,6 +993,56 @@ def delete_center(center_id):
 # ----
 #  REGISTROS
 # ----
+def _record_filters(model, date_from=None, date_to=None, time_from=None, time_to=None):
+    """Filtros de la vista de registros que dependen de cada fichaje (fechas y franja horaria)."""
+    conditions = []
+    if date_from:
+        conditions.append(model.date >= date_from)
+    if date_to:
+        conditions.append(model.date <= date_to)
+    if time_from:
+        conditions.append(time_of_day(model.check_in) >= time_from)
+    if time_to:
+        conditions.append(time_of_day(model.check_out) <= time_to)
+    return conditions
+
+
+def _week_running_seconds(start_of_week, end_of_week, record_filters=None):
+    """
+    Segundos trabajados por el empleado en la semana hasta el fichaje
+    (incluido), para una consulta de fichajes cerrados de esa semana:
+    SUM() OVER (PARTITION BY user_id ORDER BY check_in, id) — la consulta
+    cubre una sola semana, así que la partición por empleado es la de
+    (empleado, semana). La ventana se evalúa tras el WHERE: el acumulado
+    solo suma los fichajes que muestra la vista. En SQLite sin funciones de
+    ventana (< 3.25), la misma suma con una subconsulta correlacionada que
+    repite los filtros por fichaje (record_filters, ver _record_filters);
+    los de empleado (centro, categoría, búsqueda) no cambian la partición.
+    """
+    if supports_window_functions(db.session.get_bind()):
+        return func.sum(duration_seconds(TimeRecord.check_in, TimeRecord.check_out)).over(
+            partition_by=TimeRecord.user_id,
+            order_by=(TimeRecord.check_in, TimeRecord.id),
+        )
+
+    prior = aliased(TimeRecord)
+    return (
+        select(func.sum(duration_seconds(prior.check_in, prior.check_out)))
+        .where(
+            prior.user_id == TimeRecord.user_id,
+            prior.date >= start_of_week,
+            prior.date <= end_of_week,
+            prior.check_out.isnot(None),
+            *_record_filters(prior, **(record_filters or {})),
+            or_(
+                prior.check_in < TimeRecord.check_in,
+                and_(prior.check_in == TimeRecord.check_in, prior.id <= TimeRecord.id),
+            ),
+        )
+        .scalar_subquery()
+    )
+
+
 @admin_bp.route("/records")
 @admin_required
 def manage_records():
@@ -933,89 +1077,73 @@ def manage_records():
     filtro_centro = request.args.get("centro", type=str, default="")
     search_query = request.args.get("search", type=str, default="")
 
-    # Buscar registros solo de esa semana + filtros
-    q = (
-        TimeRecord.query
+    # Filtros opcionales por fichaje (fechas y franja horaria)
+    record_range = {}
+    try:
+        if date_from:
+            record_range["date_from"] = datetime.strptime(date_from, "%Y-%m-%d").date()
+        if date_to:
+            record_range["date_to"] = datetime.strptime(date_to, "%Y-%m-%d").date()
+        if time_from:
+            record_range["time_from"] = datetime.strptime(time_from, "%H:%M").time()
+        if time_to:
+            record_range["time_to"] = datetime.strptime(time_to, "%H:%M").time()
+    except ValueError:
+        flash("Formato de fecha/hora inválido en filtros.", "warning")
+
+    # Fichajes cerrados de la semana que muestra la vista (todos sus filtros)
+    # con el acumulado semanal de cada uno: lo trabajado en la semana hasta
+    # ese fichaje, incluido, sumando solo los fichajes filtrados
+    week_records = (
+        db.session.query(
+            TimeRecord.id.label("id"),
+            _week_running_seconds(start_of_week, end_of_week, record_range).label("week_seconds"),
+        )
         .join(User, TimeRecord.user_id == User.id)
         .filter(
             TimeRecord.date >= start_of_week,
             TimeRecord.date <= end_of_week,
+            TimeRecord.check_out.isnot(None),
             User.role.is_(None),  # Solo empleados (sin rol admin)
-            TimeRecord.check_out.isnot(None)
+            *_record_filters(TimeRecord, **record_range)
         )
     )
 
     # Scope por centro del admin, si aplica. Si es super admin, permitir filtro por centro
     centro_admin = get_admin_centro()
     if centro_admin:
-        q = q.filter(User.center_id == centro_admin)
+        week_records = week_records.filter(User.center_id == centro_admin)
     elif filtro_centro:
-        q = q.filter(User.center_id == filtro_centro)
-
-    # Aplicar filtros opcionales (fechas)
-    ci_from = co_to = None
-    try:
-        if date_from:
-            df = datetime.strptime(date_from, "%Y-%m-%d").date()
-            q = q.filter(TimeRecord.date >= df)
-        if date_to:
-            dt = datetime.strptime(date_to, "%Y-%m-%d").date()
-            q = q.filter(TimeRecord.date <= dt)
-        if time_from:
-            ci_from = datetime.strptime(time_from, "%H:%M").time()
-        if time_to:
-            co_to = datetime.strptime(time_to, "%H:%M").time()
-    except ValueError:
-        flash("Formato de fecha/hora inválido en filtros.", "warning")
+        week_records = week_records.filter(User.center_id == filtro_centro)
 
     if categoria:
         # Filtrar por nombre de categoría a través de la relación
-        q = q.join(Category, User.category_id == Category.id).filter(Category.name == categoria)
+        week_records = week_records.join(Category, User.category_id == Category.id).filter(Category.name == categoria)
     
     # Filtrar por búsqueda de nombre completo y username
     if search_query:
-        q = q.filter(
+        week_records = week_records.filter(
             (User.full_name.ilike(f"%{search_query}%")) | 
             (User.username.ilike(f"%{search_query}%"))
         )
 
-    # Ordenar de más antiguo a más reciente por fecha y hora de entrada
-    recs = q.order_by(TimeRecord.check_in.asc()).all()
-
-    # Filtrar por horas en Python para compatibilidad con SQLite/Postgres
-    if ci_from or co_to:
-        filtered = []
-        for r in recs:
-            ok = True
-            if ci_from and (not r.check_in or r.check_in.time() < ci_from):
-                ok = False
-            if co_to and (not r.check_out or r.check_out.time() > co_to):
-                ok = False
-            if ok:
-                filtered.append(r)
-        recs = filtered
-
-    # Lógica de acumulados (igual que antes)
-    weekly_acc = {}
-    enriched = []
-    for rec in recs:
-        uid = rec.user_id
-        # Lunes de la semana correspondiente
-        sow = rec.date - timedelta(days=rec.date.weekday())
-        sow_str = sow.strftime('%Y-%m-%d')
-        wh_secs = rec.user.weekly_hours * 3600 if rec.user.weekly_hours else 0
+    week_records = week_records.subquery()
+    q = (
+        db.session.query(TimeRecord, week_records.c.week_seconds)
+        .join(week_records, TimeRecord.id == week_records.c.id)
+        .join(User, TimeRecord.user_id == User.id)
+        .options(contains_eager(TimeRecord.user).joinedload(User.center),
+                 contains_eager(TimeRecord.user).joinedload(User.category))
+    )
 
-        if uid not in weekly_acc:
-            weekly_acc[uid] = {}
-        if sow_str not in weekly_acc[uid]:
-            weekly_acc[uid][sow_str] = 0
+    # Semana más reciente primero
+    rows = q.order_by(TimeRecord.check_in.desc(), TimeRecord.id.desc()).all()
 
+    enriched = []
+    for rec, week_seconds in rows:
+        wh_secs = rec.user.weekly_hours * 3600 if rec.user.weekly_hours else 0
         dur = rec.check_out - rec.check_in if rec.check_in and rec.check_out else None
-        secs = dur.total_seconds() if dur else 0
-
-        weekly_acc[uid][sow_str] += secs
-        curr_week_total = weekly_acc[uid][sow_str]
-        rem = wh_secs - curr_week_total
+        rem = wh_secs - (week_seconds or 0)
 
         enriched.append({
             "record": rec,
@@ -1031,9 +1159,6 @@ def manage_records():
         first_week = earliest_record.date - timedelta(days=earliest_record.date.weekday())
         has_next = start_of_week > first_week
 
-    # Mostramos la semana más reciente primero
-    enriched = enriched[::-1]
-
     # Calcular si es la semana actual
     is_current_week = (start_of_week == start_of_current)
 
@@ -1107,6 +1232,7 @@ def admin_calendar():
 
 @admin_bp.route("/api/events")
 @admin_required
+@query_budget(10)
 def api_events():
     """Eventos para el calendario global."""
     user_id = request.args.get("user_id", type=int)
@@ -1208,15 +1334,28 @@ def api_events():
 
     # Agregar eventos de EmployeeStatus con eager loading para evitar N+1
     from sqlalchemy.orm import joinedload
-    for es in q.options(
+    statuses = q.options(
         joinedload(EmployeeStatus.user).joinedload(User.category)
-    ).all():
+    ).all()
+
+    # TimeRecord del mismo día para pre-rellenar horas en el modal: una sola
+    # consulta para todos los estados en vez de una por evento
+    records_by_day = {}
+    if statuses:
+        day_records = TimeRecord.query.filter(
+            TimeRecord.user_id.in_({es.user_id for es in statuses}),
+            TimeRecord.date >= min(es.date for es in statuses),
+            TimeRecord.date <= max(es.date for es in statuses)
+        ).order_by(TimeRecord.id).all()
+        for record in day_records:
+            records_by_day.setdefault((record.user_id, record.date), record)
+
+    for es in statuses:
         # Determinar color: si hay request_type, usarlo; si no, usar status
         color_key = es.request_type if es.request_type else es.status
         color = color_map.get(color_key, "#9ca3af")
 
-        # Buscar TimeRecord del mismo día para pre-rellenar horas en el modal
-        tr = TimeRecord.query.filter_by(user_id=es.user_id, date=es.date).first()
+        tr = records_by_day.get((es.user_id, es.date))
         check_in_time = tr.check_in.strftime("%H:%M:%S") if tr and tr.check_in else None
         check_out_time = tr.check_out.strftime("%H:%M:%S") if tr and tr.check_out else None
 
@@ -1268,14 +1407,15 @@ def api_employees():
 @admin_required
 def api_centro_info():
     centro = request.args.get("centro")
-    users = User.query.filter_by(is_admin=False)
+    users = User.query.filter(User.role.is_(None))  # Solo empleados (sin rol admin)
 
     centro_admin = get_admin_centro()
     if centro_admin:
         users = users.filter(User.center_id == centro_admin)
     elif centro:
-        # Convertir nombre del centro a su ID
-        centro_obj = Center.query.filter_by(name=centro).first()
+        # Convertir nombre del centro a su ID (solo centros del cliente actual)
+        reference = get_reference(session.get("client_id"))
+        centro_obj = reference.center_by_name.get(centro) if reference else None
         if centro_obj:
             users = users.filter(User.center_id == centro_obj.id)
         else:
@@ -1533,46 +1673,41 @@ def close_today_records():
 # --------------------------------------------------------------------
 #  GESTIÓN DE SOLICITUDES DE IMPUTACIONES
 # --------------------------------------------------------------------
-@admin_bp.route("/leave_requests")
-@admin_required
-def leave_requests():
-    """Ver y gestionar solicitudes de vacaciones/bajas/ausencias"""
-    centro_admin = get_admin_centro()
-
-    # Obtener filtros de la URL
-    filter_centro = request.args.get("centro", "all")
-    filter_categoria = request.args.get("categoria", "all")
-    filter_categoria_id, filter_categoria_none = parse_category_filter(
-        filter_categoria if filter_categoria != "all" else ""
-    )
-    filter_usuario = request.args.get("usuario", "")
-
-    # Navegación por fechas
+def _leave_request_filters():
+    """Filtros de la URL de la gestión de solicitudes (centro, categoria, usuario, date)."""
     filter_date = request.args.get("date", date.today().isoformat())
-
     try:
         filter_date = datetime.strptime(filter_date, "%Y-%m-%d").date()
     except ValueError:
         filter_date = date.today()
 
-    # Obtener todas las solicitudes pendientes
-    query = (
-        LeaveRequest.query
-        .join(User, LeaveRequest.user_id == User.id)
-        .filter(LeaveRequest.status == "Pendiente")
+    return {
+        "centro_admin": get_admin_centro(),
+        "filter_centro": request.args.get("centro", "all"),
+        "filter_categoria": request.args.get("categoria", "all"),
+        "filter_usuario": request.args.get("usuario", ""),
+        "filter_date": filter_date,
+    }
+
+
+def _scope_leave_requests(query, filters):
+    """Aplica los filtros de centro, categoría y usuario (query ya unida a User)."""
+    filter_categoria = filters["filter_categoria"]
+    filter_categoria_id, filter_categoria_none = parse_category_filter(
+        filter_categoria if filter_categoria != "all" else ""
     )
 
-    # Aplicar filtros
-    if centro_admin:
-        query = query.filter(User.center_id == centro_admin)
-    elif filter_centro != "all":
-        query = query.filter(User.center_id == filter_centro)
+    if filters["centro_admin"]:
+        query = query.filter(User.center_id == filters["centro_admin"])
+    elif filters["filter_centro"] != "all":
+        query = query.filter(User.center_id == filters["filter_centro"])
 
     if filter_categoria_id:
         query = query.filter(User.category_id == filter_categoria_id)
     elif filter_categoria_none:
         query = query.filter(User.category_id.is_(None))
 
+    filter_usuario = filters["filter_usuario"]
     if filter_usuario:
         query = query.filter(
             db.or_(
@@ -1580,44 +1715,51 @@ def leave_requests():
                 User.username.ilike(f"%{filter_usuario}%")
             )
         )
+    return query
 
-    pending_requests = query.order_by(LeaveRequest.created_at.desc()).all()
 
-    # Obtener historial de solicitudes procesadas para la fecha filtrada
+def _leave_history_page(filters, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Página del historial de solicitudes procesadas creadas en filter_date,
+    por última modificación (las nunca modificadas, por creación).
+    """
     # No mostramos "Cancelado" porque se usan para rastrear cuando se elimina un EmployeeStatus
-    history_query = (
+    history_query = _scope_leave_requests(
         LeaveRequest.query
         .join(User, LeaveRequest.user_id == User.id)
         .filter(LeaveRequest.status.in_(["Aprobado", "Rechazado"]))
+        .filter(db.func.date(LeaveRequest.created_at) == filters["filter_date"])
+        .options(joinedload(LeaveRequest.user_rel), joinedload(LeaveRequest.approver_rel)),
+        filters
+    )
+    return paginate_keyset(
+        history_query,
+        func.coalesce(LeaveRequest.updated_at, LeaveRequest.created_at), LeaveRequest.id,
+        cursor, limit,
+        key=lambda leave: (leave.updated_at or leave.created_at, leave.id),
     )
 
-    # Aplicar filtros al historial
-    if centro_admin:
-        history_query = history_query.filter(User.center_id == centro_admin)
-    elif filter_centro != "all":
-        history_query = history_query.filter(User.center_id == filter_centro)
-
-    if filter_categoria_id:
-        history_query = history_query.filter(User.category_id == filter_categoria_id)
-    elif filter_categoria_none:
-        history_query = history_query.filter(User.category_id.is_(None))
 
-    if filter_usuario:
-        history_query = history_query.filter(
-            db.or_(
-                User.full_name.ilike(f"%{filter_usuario}%"),
-                User.username.ilike(f"%{filter_usuario}%")
-            )
-        )
+@admin_bp.route("/leave_requests")
+@admin_required
+def leave_requests():
+    """Ver y gestionar solicitudes de vacaciones/bajas/ausencias"""
+    filters = _leave_request_filters()
+    filter_date = filters["filter_date"]
 
-    # Filtrar histórico por el día seleccionado
-    history_query = history_query.filter(
-        db.func.date(LeaveRequest.created_at) == filter_date
+    # Obtener todas las solicitudes pendientes (con el empleado del mismo JOIN y su centro)
+    query = _scope_leave_requests(
+        LeaveRequest.query
+        .join(User, LeaveRequest.user_id == User.id)
+        .filter(LeaveRequest.status == "Pendiente")
+        .options(contains_eager(LeaveRequest.user_rel).joinedload(User.center)),
+        filters
     )
 
-    history_requests = history_query.order_by(
-        LeaveRequest.updated_at.desc()
-    ).all()
+    pending_requests = query.order_by(LeaveRequest.created_at.desc()).all()
+
+    # Historial de la fecha filtrada, paginado ("cargar más")
+    history_requests, next_cursor = _leave_history_page(filters)
 
     # Calcular fechas de navegación
     prev_date = (filter_date - timedelta(days=1)).isoformat()
@@ -1633,20 +1775,33 @@ def leave_requests():
         "admin_leave_requests.html",
         pending_requests=pending_requests,
         history_requests=history_requests,
+        next_cursor=next_cursor,
         centros=centros,
         categorias=categorias,
-        filter_centro=filter_centro,
-        filter_categoria=filter_categoria,
-        filter_usuario=filter_usuario,
-        filter_date=filter_date,
         prev_date=prev_date,
         next_date=next_date,
         today_iso=today_iso,
         is_today=is_today,
-        centro_admin=centro_admin
+        **filters
     )
 
 
+@admin_bp.route("/leave_requests/history")
+@admin_required
+def leave_requests_history():
+    """Siguiente página del historial de solicitudes ("cargar más", mismos filtros) en JSON."""
+    cursor, limit = page_args(request.args)
+    try:
+        history_requests, next_cursor = _leave_history_page(_leave_request_filters(), cursor, limit)
+    except ValueError:
+        return jsonify({"ok": False, "error": "Cursor no válido."}), 400
+    return jsonify({
+        "ok": True,
+        "html": render_template("leave_history_rows.html", history_requests=history_requests),
+        "next_cursor": next_cursor,
+    })
+
+
 @admin_bp.route("/leave_requests/approve/<int:request_id>", methods=["POST"])
 @admin_required
 def approve_leave_request(request_id):
@@ -1776,9 +1931,9 @@ def reject_leave_request(request_id):
 # --------------------------------------------------------------------
 @admin_bp.route("/overtime")
 @admin_required
+@query_budget(10)
 def overtime_dashboard():
     """Dashboard principal de gestión de horas extras"""
-    client_id = session.get("client_id")
     centro_admin = get_admin_centro()
 
     # Obtener fecha actual para filtrar solo semanas completadas
@@ -1806,13 +1961,16 @@ def overtime_dashboard():
     prev_week = (week_start - timedelta(days=7)).isoformat()
     next_week = (week_start + timedelta(days=7)).isoformat()
 
-    # Generar entradas de horas extras para la semana seleccionada
-    generate_overtime_entries_for_week(client_id, week_start)
-
-    # Query base con joins
+    # Solo lectura: las entradas las mantiene el job recompute_dirty_overtime
+    # a partir de las semanas anotadas en overtime_dirty_week
+    # Query base con joins (empleado, centro y categoría en la misma consulta)
     base_query = (
         OvertimeEntry.query
         .join(User, OvertimeEntry.user_id == User.id)
+        .options(
+            contains_eager(OvertimeEntry.user_rel).joinedload(User.center),
+            contains_eager(OvertimeEntry.user_rel).joinedload(User.category),
+        )
         .filter(OvertimeEntry.week_start == week_start)
     )
 
@@ -1980,6 +2138,186 @@ def overtime_reject(entry_id):
     return redirect(url_for("admin.overtime_dashboard", week=entry.week_start.isoformat()))
 
 
+@admin_bp.route("/overtime/bulk", methods=["POST"])
+@admin_required
+def overtime_bulk():
+    """Ajustar, aprobar o rechazar en bloque las entradas seleccionadas de una semana"""
+    client_id = session.get("client_id")
+    admin_id = session.get("user_id")
+    action = request.form.get("action")
+    tab = request.form.get("tab", "pending")
+
+    try:
+        week_start = datetime.strptime(request.form.get("week", ""), "%Y-%m-%d").date()
+    except ValueError:
+        abort(400)
+    week_start, _ = get_week_bounds(week_start)
+
+    entry_ids = request.form.getlist("entry_ids", type=int)
+    if action not in WEEK_DECISIONS or not entry_ids:
+        flash("Selecciona al menos un empleado y una acción", "warning")
+        return redirect(url_for("admin.overtime_dashboard", week=week_start.isoformat(), tab=tab))
+
+    result = decide_week_entries(
+        client_id, week_start, entry_ids, action, admin_id,
+        notes=request.form.get("notes"), center_id=get_admin_centro(),
+    )
+
+    status = WEEK_DECISIONS[action][0]
+    message = f"{result['processed']} entradas marcadas como {status}"
+    if result["failed"]:
+        message += f"; {result['failed']} no se pudieron ajustar automáticamente"
+    if result["skipped"]:
+        message += f"; {result['skipped']} ya no estaban pendientes"
+    flash(message, "success" if result["processed"] and not result["failed"] else "warning")
+    return redirect(url_for("admin.overtime_dashboard", week=week_start.isoformat(), tab=tab))
+
+
+@admin_bp.route("/overtime/limits")
+@admin_required
+@query_budget(10)
+def overtime_limits():
+    """
+    Empleados en aviso o por encima de los límites de horas del año
+    (?year=, por defecto el actual): una fila de overtime_year_total por
+    empleado, sin recorrer sus entradas.
+    """
+    centro_admin = get_admin_centro()
+    year = request.args.get("year", type=int) or get_now_spain().year
+    limits = get_limits()
+
+    query = (
+        flagged_year_totals_query(year, limits)
+        .join(User, OvertimeYearTotal.user_id == User.id)
+        .options(contains_eager(OvertimeYearTotal.user_rel))
+    )
+    if centro_admin:
+        query = query.filter(User.center_id == centro_admin)
+
+    reference = get_reference(session.get("client_id"))
+    center_by_id = reference.center_by_id if reference else {}
+    employees = []
+    for total in query.order_by(OvertimeYearTotal.annual_level.desc(), OvertimeYearTotal.approved_seconds.desc()):
+        user = total.user_rel
+        employees.append({
+            "user_id": user.id,
+            "full_name": user.full_name,
+            "center": center_by_id[user.center_id].name if user.center_id in center_by_id else "Sin centro",
+            "level": LIMIT_LEVEL_NAMES[total.annual_level],
+            "approved_hours": round(total.approved_seconds / 3600, 2),
+            "pending_hours": round(total.pending_seconds / 3600, 2),
+            "remaining_hours": round(max(limits.annual_seconds - total.approved_seconds, 0) / 3600, 2),
+            "weeks_over_limit": total.weeks_over_limit,
+            "max_week_hours": round(total.max_week_seconds / 3600, 2),
+            "last_week_over_limit": (
+                total.last_week_over_limit.isoformat() if total.last_week_over_limit else None
+            ),
+        })
+
+    return jsonify({
+        "year": year,
+        "limits": {
+            "annual_hours": limits.annual_seconds / 3600,
+            "warning_hours": limits.warning_seconds / 3600,
+            "weekly_hours": limits.weekly_seconds / 3600,
+        },
+        "employees": employees,
+    })
+
+
+@admin_bp.route("/overtime/limits/events")
+@admin_required
+@query_budget(5)
+def overtime_limit_events():
+    """
+    Eventos de cruce de límites posteriores a ?after=<id> (en orden). El
+    cliente guarda el último id recibido y vuelve a preguntar con él.
+    """
+    centro_admin = get_admin_centro()
+    after_id = request.args.get("after", 0, type=int)
+    limit = min(request.args.get("limit", 100, type=int), 500)
+
+    events = [
+        {
+            "id": e.id,
+            "user_id": e.user_id,
+            "full_name": full_name,
+            "year": e.year,
+            "kind": e.kind,
+            "hours": round(e.seconds / 3600, 2),
+            "week_start": e.week_start.isoformat() if e.week_start else None,
+            "created_at": e.created_at.isoformat(),
+        }
+        for e, full_name in get_limit_events(after_id, limit, centro_admin)
+    ]
+    return jsonify({"events": events, "last_id": events[-1]["id"] if events else after_id})
+
+
+@admin_bp.route("/overtime/simulate")
+@admin_required
+def overtime_simulate():
+    """
+    Simulación de horas extras del año sin escribir nada: ¿cuántas semanas
+    y horas EXTRA / DEFICIT habría con otra jornada o tolerancia?
+
+    Parámetros: year, center_id, category_id, weekly_hours (jornada para
+    todos los empleados del alcance), tolerance_minutes, detail=1 (filas por
+    empleado) y refresh=1 (volver a leer los datos en lugar de la caché).
+    """
+    client_id = session.get("client_id")
+    centro_admin = get_admin_centro()
+    year = request.args.get("year", type=int) or get_now_spain().year
+    center_id = centro_admin or request.args.get("center_id", type=int)
+    category_id = request.args.get("category_id", type=int)
+    weekly_hours = request.args.get("weekly_hours", type=float)
+    tolerance_minutes = request.args.get("tolerance_minutes", type=float)
+
+    if weekly_hours is not None and not 0 <= weekly_hours <= 168:
+        return jsonify({"ok": False, "error": "weekly_hours debe estar entre 0 y 168."}), 400
+    if tolerance_minutes is not None and tolerance_minutes < 0:
+        return jsonify({"ok": False, "error": "tolerance_minutes no puede ser negativo."}), 400
+
+    data = get_simulation_data(client_id, year, refresh=request.args.get("refresh") == "1")
+    result = simulate(
+        data,
+        center_id=center_id,
+        category_id=category_id,
+        weekly_hours=weekly_hours,
+        tolerance_seconds=None if tolerance_minutes is None else round(tolerance_minutes * 60),
+    )
+
+    response = {
+        "year": year,
+        "weeks": len(data.week_starts),
+        "last_week": data.week_starts[-1].isoformat() if data.week_starts else None,
+        "data_loaded_at": data.loaded_at.isoformat(),
+        "scope": {"center_id": center_id, "category_id": category_id, "employees": len(result.rows)},
+        "parameters": {
+            "weekly_hours": weekly_hours,
+            "tolerance_minutes": TOLERANCE_SECONDS / 60 if tolerance_minutes is None else tolerance_minutes,
+        },
+        "baseline": summarize(result.baseline),
+        "simulated": summarize(result.simulated),
+    }
+    if request.args.get("detail") == "1":
+        reference = get_reference(client_id)
+        center_by_id = reference.center_by_id if reference else {}
+        response["employees"] = [
+            {
+                "user_id": user_id,
+                "full_name": full_name,
+                "center": center_by_id[user_center_id].name if user_center_id in center_by_id else "Sin centro",
+                "weekly_hours": current_hours,
+                "simulated_weekly_hours": simulated_hours,
+                "baseline": baseline,
+                "simulated": simulated,
+            }
+            for user_id, full_name, user_center_id, current_hours, simulated_hours, baseline, simulated
+            in iter_employee_rows(data, result)
+        ]
+    return jsonify(response)
+
+
 @admin_bp.route("/notifications/pending-overtime")
 @admin_required
 def get_pending_overtime_count():
@@ -2135,10 +2473,11 @@ def manual_close_records():
     return redirect(url_for("admin.dashboard"))
 
 
-@admin_bp.route("/work_pauses")
-@admin_required
-def work_pauses():
-    """Ver pausas/descansos de los empleados"""
+def _work_pauses_query():
+    """
+    Consulta de pausas con los filtros de la URL (date, centro, categoria,
+    usuario) y el dict de filtros aplicados para la plantilla.
+    """
     centro_admin = get_admin_centro()
 
     # Obtener filtros desde la URL
@@ -2187,20 +2526,49 @@ def work_pauses():
             )
         )
 
-    pauses = query.order_by(WorkPause.pause_start.desc()).all()
+    return query, {
+        "filter_date": filter_date,
+        "filter_centro": filter_centro,
+        "filter_categoria": filter_categoria,
+        "filter_usuario": filter_usuario,
+        "centro_admin": centro_admin,
+    }
 
-    # Calcular estadísticas
-    total_pauses = len(pauses)
-    active_pauses = sum(1 for p in pauses if p.pause_end is None)
 
-    # Calcular tiempo total de pausas
-    total_pause_time = timedelta()
-    for pause in pauses:
-        if pause.pause_end:
-            total_pause_time += pause.pause_end - pause.pause_start
-        else:
-            # Para pausas activas, calcular hasta ahora
-            total_pause_time += datetime.now() - pause.pause_start
+def _work_pauses_page(query, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Página de pausas (más recientes primero) con empleado y centro cargados."""
+    return paginate_keyset(
+        query.options(joinedload(WorkPause.user_rel).joinedload(User.center)),
+        WorkPause.pause_start, WorkPause.id, cursor, limit,
+    )
+
+
+@admin_bp.route("/work_pauses")
+@admin_required
+def work_pauses():
+    """Ver pausas/descansos de los empleados"""
+    query, filters = _work_pauses_query()
+    filter_date = filters["filter_date"]
+
+    # Estadísticas de todas las pausas del día en una consulta (la lista va
+    # paginada); las pausas activas cuentan hasta ahora
+    now = datetime.now()
+    stats = (
+        query.with_entities(
+            WorkPause.pause_type,
+            func.count(WorkPause.id),
+            func.count(case((WorkPause.pause_end.is_(None), WorkPause.id))),
+            func.sum(duration_seconds(WorkPause.pause_start, func.coalesce(WorkPause.pause_end, now))),
+        )
+        .group_by(WorkPause.pause_type)
+        .all()
+    )
+    pause_counts = {pause_type: count for pause_type, count, _, _ in stats}
+    total_pauses = sum(pause_counts.values())
+    active_pauses = sum(active for _, _, active, _ in stats)
+    total_pause_time = timedelta(seconds=sum(seconds or 0 for _, _, _, seconds in stats))
+
+    pauses, next_cursor = _work_pauses_page(query)
 
     prev_date = (filter_date - timedelta(days=1)).isoformat()
     next_date = (filter_date + timedelta(days=1)).isoformat()
@@ -2212,7 +2580,8 @@ def work_pauses():
     return render_template(
         "admin_work_pauses.html",
         pauses=pauses,
-        filter_date=filter_date,
+        next_cursor=next_cursor,
+        pause_counts=pause_counts,
         total_pauses=total_pauses,
         active_pauses=active_pauses,
         total_pause_time=format_timedelta(total_pause_time),
@@ -2222,13 +2591,56 @@ def work_pauses():
         is_today=is_today,
         centros=centros,
         categorias=get_categorias_disponibles(),
-        filter_centro=filter_centro,
-        filter_categoria=filter_categoria,
-        filter_usuario=filter_usuario,
-        centro_admin=centro_admin
+        **filters
     )
 
 
+@admin_bp.route("/work_pauses/rows")
+@admin_required
+def work_pauses_rows():
+    """Siguiente página de pausas ("cargar más", mismos filtros): filas HTML y cursor en JSON."""
+    query, _ = _work_pauses_query()
+    cursor, limit = page_args(request.args)
+    try:
+        pauses, next_cursor = _work_pauses_page(query, cursor, limit)
+    except ValueError:
+        return jsonify({"ok": False, "error": "Cursor no válido."}), 400
+    return jsonify({
+        "ok": True,
+        "html": render_template("work_pause_rows.html", pauses=pauses),
+        "next_cursor": next_cursor,
+    })
+
+
+# --------------------------------------------------------------------
+#  EVENTOS EN VIVO (long-poll, ver services/live_events.py)
+# --------------------------------------------------------------------
+@admin_bp.route("/live/events")
+@admin_required
+def live_events_poll():
+    """
+    Eventos en vivo del cliente (del centro, si es admin de centro)
+    posteriores a ?after=<última secuencia recibida>, esperando hasta
+    LIVE_POLL_TIMEOUT segundos si hay turno (LIVE_POLL_MAX_WAITERS). Sin
+    ?after= devuelve al momento la secuencia actual para empezar a escuchar.
+    """
+    principal = get_current_principal()
+    after = request.args.get("after", type=int)
+
+    # La espera no usa la BD: devolver antes la conexión al pool
+    db.session.close()
+    with poll_slot() as timeout:
+        events, last, reset = wait_for_events(principal.client_id, after, principal.center_scope, timeout)
+    return jsonify({
+        "ok": True,
+        "events": events,
+        "last": last,
+        "reset": reset,
+        # Sin espera en el servidor el navegador repite cada LIVE_POLL_INTERVAL
+        "retry_ms": 0 if timeout else get_poll_interval() * 1000,
+    })
+
+
 # --------------------------------------------------------------------
 #  NOTIFICACIONES DE BAJAS AUTO-APROBADAS
 # --------------------------------------------------------------------
@@ -2349,20 +2761,40 @@ def get_pending_requests():
     })
 
 
+
+@admin_bp.route("/notifications/summary")
+@admin_required
+@query_budget(6)
+def get_notifications_summary():
+    """
+    Resumen de la campanita: todos los contadores y los últimos elementos
+    (services/notification_summary.py). Responde 304 si el navegador ya
+    tiene la versión actual (If-None-Match), sin consultar las tablas del
+    resumen; solo queda la lectura por PK de auth_version de admin_required.
+    """
+    principal = get_current_principal()
+    centro_admin = get_admin_centro()
+    etag = summary_etag(principal.client_id, centro_admin)
+    if etag is not None and etag_matches(request.if_none_match, etag):
+        response = make_response("", 304)
+    else:
+        response = jsonify({"success": True, **build_summary(principal.client_id, centro_admin)})
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    # El navegador guarda la respuesta pero la revalida en cada sondeo
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
 # --------------------------------------------------------------------
 #  RENDER CRON JOB ENDPOINT
 # --------------------------------------------------------------------
-@admin_bp.route("/cron/notifications", methods=["POST"])
-def cron_notifications():
+def _require_cron_key():
     """
-    Endpoint para ejecutar tareas programadas desde Render Cron Jobs.
-    Reemplaza APScheduler en producción (incompatible con eventlet).
-
-    Debe ser llamado desde Render Cron Job con header X-Render-Cron-Key
+    Valida la cabecera X-Render-Cron-Key de los endpoints /cron/*.
+    Aborta con 500 si no está configurada y con 403 si no coincide.
     """
     import os
 
-    # Validar API key para seguridad
     api_key = request.headers.get('X-Render-Cron-Key')
     expected_key = os.getenv('RENDER_CRON_KEY')
 
@@ -2374,6 +2806,17 @@ def cron_notifications():
         logger.warning(f"Invalid cron key attempt from {request.remote_addr}")
         abort(403, description="Forbidden")
 
+
+@admin_bp.route("/cron/notifications", methods=["POST"])
+def cron_notifications():
+    """
+    Endpoint para ejecutar tareas programadas desde Render Cron Jobs.
+    Reemplaza APScheduler en producción (incompatible con eventlet).
+
+    Debe ser llamado desde Render Cron Job con header X-Render-Cron-Key
+    """
+    _require_cron_key()
+
     try:
         # Ejecutar tareas de notificaciones
         from tasks.email_service_v3 import check_and_send_notifications_v3
@@ -2395,3 +2838,65 @@ def cron_notifications():
             "status": "error",
             "message": str(e)
         }), 500
+
+
+@admin_bp.route("/cron/seals", methods=["POST"])
+def cron_seals():
+    """
+    Sella los fichajes pendientes (SEALING_MODE=async) desde Render Cron Jobs
+    y, si MERKLE_SEALING está activo, agrupa en lotes las ventanas cerradas.
+
+    Responde 500 si tras la ejecución quedan fichajes sin sellar fuera de
+    SEAL_DEADLINE_SECONDS, para que la alerta del cron lo haga visible.
+    """
+    _require_cron_key()
+
+    try:
+        from services.seal_service import run_seal_worker
+        from services.merkle_service import get_merkle_mode, build_seal_batches
+
+        # Tarea de sistema: en modo RLS asume el rol de bypass
+        with tenant_bypass():
+            result = run_seal_worker()
+            if get_merkle_mode() != "off":
+                result["merkle_batches"] = build_seal_batches()
+        status = "success" if not result["overdue"] else "overdue"
+        return jsonify({"status": status, "result": result}), 200 if status == "success" else 500
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Seal cron job failed: {str(e)}", exc_info=True)
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
+
+
+@admin_bp.route("/cron/overtime", methods=["POST"])
+def cron_overtime():
+    """
+    Recalcula las horas extras de las semanas anotadas en overtime_dirty_week
+    desde Render Cron Jobs (alternativa al job recompute_dirty_overtime).
+    Con ?closed_week=1 anota antes la semana recién cerrada de todos los
+    empleados (ejecutar los lunes).
+    """
+    _require_cron_key()
+
+    try:
+        from services.overtime_service import recompute_dirty_weeks, mark_closed_week_dirty
+
+        # Tarea de sistema: en modo RLS asume el rol de bypass
+        with tenant_bypass():
+            marked = mark_closed_week_dirty() if request.args.get("closed_week") == "1" else 0
+            result = recompute_dirty_weeks()
+        result["marked"] = marked
+        status = "success" if not result["errors"] else "partial"
+        return jsonify({"status": status, "result": result}), 200 if status == "success" else 500
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Overtime cron job failed: {str(e)}", exc_info=True)
+        return jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 500
@@ -54,6 +54,7 @@ def login():
             session["user_id"] = user.id
             session["is_admin"] = user.role is not None  # True si tiene algún rol (admin o super_admin)
             session["client_id"] = user.client_id  # Multi-tenant: guardar client_id
+            session["center_id"] = user.center_id  # Centro del empleado (avisos en vivo de sus fichajes)
             # Guardar el centro del admin si está asignado
             if user.role and user.center_id:
                 session["admin_center_id"] = user.center_id
@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_file
 from functools import wraps
-from models.models import User, TimeRecord, EmployeeStatus, Center, Category, OvertimeEntry
+from models.models import User, TimeRecord, EmployeeStatus, OvertimeEntry
 from models.database import db
 from werkzeug.security import generate_password_hash
 from datetime import datetime, timedelta, date
@@ -13,8 +13,13 @@ from openpyxl.utils import get_column_letter
 from collections import defaultdict
 from routes.auth import admin_required
 from utils.logging_utils import get_logger
+from utils.query_helpers import users_by_id
+from services.reference_cache import get_reference
+from services.work_summary_service import get_range_totals_by_week, EMPTY_TOTALS
+from utils.query_stats import query_budget
 
 export_bp = Blueprint("export", __name__, template_folder="../templates")
+logger = get_logger(__name__)
 
 STATUS_GROUPS = {
     "Trabajado": ["Trabajado"],
@@ -84,12 +89,12 @@ def resolve_center_filter(value):
     if not value or value in ("", "all", "Todos"):
         return None
 
-    client_id = session.get("client_id")
-    if not client_id:
+    reference = get_reference(session.get("client_id"))
+    if not reference:
         return None
 
     # Intentar buscar por nombre
-    center = Center.query.filter_by(client_id=client_id, name=value).first()
+    center = reference.center_by_name.get(value)
     if center:
         return center.id
 
@@ -109,11 +114,11 @@ def resolve_category_filter(value):
     if normalized in CATEGORY_NONE_VALUES:
         return None, True
 
-    client_id = session.get("client_id")
-    if not client_id:
+    reference = get_reference(session.get("client_id"))
+    if not reference:
         return None, False
 
-    category = Category.query.filter_by(client_id=client_id, name=value).first()
+    category = reference.category_by_name.get(value)
     return (category.id if category else None), False
 
 
@@ -161,10 +166,11 @@ def add_overtime_sheet_to_workbook(wb, overtime_entries):
         cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
 
     # Datos
+    deciders = users_by_id(entry.decided_by for entry in overtime_entries)
     row_num = 2
     for entry in overtime_entries:
         user = entry.user_rel
-        decider = User.query.get(entry.decided_by) if entry.decided_by else None
+        decider = deciders.get(entry.decided_by)
 
         # Convertir segundos a horas
         worked_hours = entry.total_worked_seconds / 3600
@@ -628,6 +634,7 @@ def handle_daily_pdf_export(req):
 
 @export_bp.route("/excel", methods=["GET", "POST"])
 @admin_required
+@query_budget(10)
 def export_excel():
     if request.method == "POST":
         # Detectar botones de Excel/PDF Diario
@@ -730,6 +737,7 @@ def export_excel():
         if 'Trabajado' in status_filters:
             query = TimeRecord.query.join(User, TimeRecord.user_id == User.id).options(
                 joinedload(TimeRecord.user).joinedload(User.center),
+                joinedload(TimeRecord.user).joinedload(User.category),
                 joinedload(TimeRecord.pauses)
             ).filter(
                 TimeRecord.date >= start_date,
@@ -762,7 +770,8 @@ def export_excel():
         selected_statuses = expand_status_filters([s for s in status_filters if s not in ('Trabajado', 'Pausas', 'Horas Extras')])
         if selected_statuses:
             status_query = EmployeeStatus.query.join(User, EmployeeStatus.user_id == User.id).options(
-                joinedload(EmployeeStatus.user).joinedload(User.center)
+                joinedload(EmployeeStatus.user).joinedload(User.center),
+                joinedload(EmployeeStatus.user).joinedload(User.category)
             ).filter(
                 EmployeeStatus.status.in_(selected_statuses),
                 EmployeeStatus.date >= start_date,
@@ -821,11 +830,12 @@ def export_excel():
                 cell.alignment = Alignment(horizontal='center')
                 cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
 
+            modifiers = users_by_id(record.modified_by for record in time_records)
             row_num = 2
             for record in time_records:
                 # Usar el usuario cargado por joinedload (evita N+1)
                 user = record.user
-                modified_by = User.query.get(record.modified_by) if record.modified_by else None
+                modified_by = modifiers.get(record.modified_by)
 
                 # Calcular horas totales
                 total_seconds = None
@@ -1079,6 +1089,7 @@ def export_excel():
 
 @export_bp.route("/excel_monthly", methods=["GET", "POST"])
 @admin_required
+@query_budget(10)
 def export_excel_monthly():
     if request.method == "POST":
         # Obtener filtros de estado
@@ -1139,11 +1150,13 @@ def export_excel_monthly():
             return redirect(url_for("export.export_excel_monthly"))
 
         # Consultar TimeRecord si "Trabajado" está seleccionado
-        # Eager loading: cargar User y Center para evitar N+1
+        # Eager loading: cargar User, Center y pauses para evitar N+1
         records = []
         if 'Trabajado' in status_filters:
             query = TimeRecord.query.join(User, TimeRecord.user_id == User.id).options(
-                joinedload(TimeRecord.user).joinedload(User.center)
+                joinedload(TimeRecord.user).joinedload(User.center),
+                joinedload(TimeRecord.user).joinedload(User.category),
+                joinedload(TimeRecord.pauses)
             ).filter(
                 TimeRecord.date >= start_date,
                 TimeRecord.date <= end_date
@@ -1174,7 +1187,8 @@ def export_excel_monthly():
         selected_statuses = expand_status_filters([s for s in status_filters if s not in ('Trabajado', 'Pausas', 'Horas Extras')])
         if selected_statuses:
             status_query = EmployeeStatus.query.join(User, EmployeeStatus.user_id == User.id).options(
-                joinedload(EmployeeStatus.user).joinedload(User.center)
+                joinedload(EmployeeStatus.user).joinedload(User.center),
+                joinedload(EmployeeStatus.user).joinedload(User.category)
             ).filter(
                 EmployeeStatus.status.in_(selected_statuses),
                 EmployeeStatus.date >= start_date,
@@ -1209,6 +1223,13 @@ def export_excel_monthly():
         if 'Pausas' in status_filters and records:
             pause_seconds_by_record, pause_details = calculate_pause_data_for_records(records)
 
+        # Usuarios de todas las pestañas (empleados y "modificado por") en una sola consulta
+        users = users_by_id(
+            [record.user_id for record in records]
+            + [record.modified_by for record in records]
+            + [status_record.user_id for status_record in employee_statuses]
+        )
+
         # Generar Excel con pestañas condicionales (hasta 5 pestañas)
         wb = openpyxl.Workbook()
 
@@ -1222,16 +1243,11 @@ def export_excel_monthly():
                 return date_obj - timedelta(days=date_obj.weekday())
 
             weekly_data = defaultdict(lambda: defaultdict(list))
-            weekly_totals = defaultdict(lambda: defaultdict(float))
-
             for record in records:
-                week_start = get_week_start(record.date)
-                weekly_data[record.user_id][week_start].append(record)
+                weekly_data[record.user_id][get_week_start(record.date)].append(record)
 
-                if record.check_in and record.check_out:
-                    time_diff = record.check_out - record.check_in
-                    hours = time_diff.total_seconds() / 3600
-                    weekly_totals[record.user_id][week_start] += hours
+            # Totales semanales precalculados: una fila por empleado y día del rango
+            weekly_totals = get_range_totals_by_week(start_date, end_date, list(weekly_data))
 
             # Header condicional según filtro de Pausas
             if 'Pausas' in status_filters:
@@ -1249,18 +1265,15 @@ def export_excel_monthly():
             row_num = 2
 
             for user_id in sorted(weekly_data.keys()):
-                user = User.query.get(user_id)
+                user = users.get(user_id)
 
                 for week_start in sorted(weekly_data[user_id].keys()):
                     week_end = week_start + timedelta(days=6)
-                    total_hours = weekly_totals[user_id][week_start]
+                    week_totals = weekly_totals.get((user_id, week_start), EMPTY_TOTALS)
+                    total_hours = week_totals.worked_seconds / 3600
 
-                    # Calcular total de pausas de la semana si filtro activo
-                    total_pause_hours = 0
-                    if 'Pausas' in status_filters:
-                        for record in weekly_data[user_id][week_start]:
-                            pause_seconds = pause_seconds_by_record.get(record.id, 0)
-                            total_pause_hours += pause_seconds / 3600
+                    # Total de pausas de la semana (columna solo con el filtro de Pausas)
+                    total_pause_hours = week_totals.pause_seconds / 3600
 
                     # Fila de total semanal
                     cell = ws1.cell(row=row_num, column=1)
@@ -1356,7 +1369,7 @@ def export_excel_monthly():
 
                     # Registros individuales
                     for record in weekly_data[user_id][week_start]:
-                        modified_by = User.query.get(record.modified_by) if record.modified_by else None
+                        modified_by = users.get(record.modified_by)
                         total_seconds = 0
                         if record.check_in and record.check_out:
                             time_diff = record.check_out - record.check_in
@@ -1457,7 +1470,7 @@ def export_excel_monthly():
 
             row_num = 2
             for status_record in employee_statuses:
-                user = User.query.get(status_record.user_id)
+                user = users.get(status_record.user_id)
                 ws2.cell(row=row_num, column=1).value = user.username if user else f"ID: {status_record.user_id}"
                 ws2.cell(row=row_num, column=2).value = user.full_name if user else "-"
                 ws2.cell(row=row_num, column=3).value = get_user_category_label(user)
@@ -1520,7 +1533,7 @@ def export_excel_monthly():
 
         consolidated_records = []
         for record in records:
-            user = User.query.get(record.user_id)
+            user = users.get(record.user_id)
             hours_worked = ""
             if record.check_in and record.check_out:
                 time_diff = record.check_out - record.check_in
@@ -1542,7 +1555,7 @@ def export_excel_monthly():
             })
 
         for status_record in employee_statuses:
-            user = User.query.get(status_record.user_id)
+            user = users.get(status_record.user_id)
             consolidated_records.append({
                 'user_id': status_record.user_id,
                 'username': user.username if user else f"ID: {status_record.user_id}",
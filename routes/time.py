@@ -2,10 +2,11 @@ from flask import (
     Blueprint, render_template, request, redirect,
     url_for, flash, session, jsonify, current_app
 )
-from sqlalchemy import desc, text, and_
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import desc, and_, select
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from datetime import datetime, date, timedelta, time as dt_time
 import calendar
+from types import SimpleNamespace
 
 from models.models import TimeRecord, User, EmployeeStatus, WorkPause, LeaveRequest
 from models.database import db
@@ -16,11 +17,139 @@ from utils.auth_decorators import client_required
 from utils.query_helpers import time_records_query, employee_status_query, work_pauses_query, leave_requests_query
 from utils.logging_utils import get_logger
 from utils.db_helpers import db_transaction
+from utils.pagination import DEFAULT_PAGE_SIZE, paginate_keyset, page_args
 from utils.timezone_utils import get_now_spain
+from services.seal_service import is_async_sealing, enqueue_seal, build_pending_seal_values
+from services.merkle_service import is_root_only
+from services.work_summary_service import get_week_totals, mark_records_dirty
+from services.punch_service import (
+    lock_user_punches, is_open_record_conflict, fast_check_in, NON_WORKING_STATUSES
+)
+from services import live_events
 
 time_bp = Blueprint("time", __name__)
 
 
+# ------------------------------------------------------------------
+#  SELLADO DE FICHAJES (Ley de Fichajes)
+# ------------------------------------------------------------------
+def _seal_punch(time_record, action, client_id):
+    """
+    Sella un fichaje y añade su TimeRecordSignature a la sesión.
+
+    time_record solo necesita id, user_id y client_id, por lo que la ruta
+    rápida de entrada puede sellar sin cargar el TimeRecord completo.
+    Con SEALING_MODE=async solo se encola en pending_seal y firma el worker.
+    Si el sellado falla se registra el error y no se bloquea al usuario.
+    """
+    from services.timestamp_service import TimestampService
+    from models.models import TimeRecordSignature
+
+    if is_async_sealing():
+        enqueue_seal(time_record.id, time_record.user_id, client_id, action, request)
+        return
+
+    try:
+        key_version = TimestampService.get_current_key_version()
+        content_hash, signature, timestamp_utc, terminal_id = TimestampService.seal_record(
+            time_record=time_record,
+            action=action,
+            request=request,
+            key_version=key_version
+        )
+
+        # Crear registro de firma
+        sig = TimeRecordSignature(
+            time_record_id=time_record.id,
+            client_id=client_id,
+            timestamp_utc=timestamp_utc,
+            action=action,
+            terminal_id=terminal_id,
+            user_agent=request.headers.get("User-Agent"),
+            ip_address=request.remote_addr,
+            content_hash=content_hash,
+            # En modo root_only la firma individual la sustituye la raíz del lote Merkle
+            signature=None if is_root_only() else signature,
+            key_version=key_version
+        )
+        db.session.add(sig)
+    except Exception as e:
+        current_app.logger.error(f"Error al sellar {action.replace('_', '-')}: {str(e)}")
+        # Continuar aunque falle el sellado (no bloquear al usuario)
+
+
+def _notify_admins(event_type, **data):
+    """
+    Aviso en vivo a los admins del cliente y del centro del empleado
+    (services/live_events.py); se publica al hacer commit.
+
+    El centro sale de la sesión (se guarda en el login), así que el aviso no
+    añade consultas a la transacción del fichaje. Un cambio de centro se
+    refleja en el siguiente login: los eventos solo avisan de refrescar.
+    """
+    user_id = session.get("user_id")
+    if user_id is None:
+        return
+    if "center_id" not in session:
+        # Sesión iniciada antes de guardar el centro: una consulta por sesión
+        session["center_id"] = db.session.execute(
+            select(User.center_id).where(User.id == user_id)
+        ).scalar()
+    live_events.notify(
+        db.session, event_type, session.get("client_id"), session["center_id"],
+        user_id=user_id, **data
+    )
+
+
+def _fast_check_in(client_id, user_id):
+    """
+    Ruta rápida de fichaje de entrada (PostgreSQL): valida e inserta en una
+    única sentencia y solo añade después la firma antes del commit
+    (en modo async ni eso: la fila pendiente de sellado va en la sentencia).
+
+    Returns:
+        Response si la ruta rápida resolvió el fichaje, None para seguir
+        con la ruta ORM (SQLite, ruta desactivada o registro abierto de
+        un día anterior que hay que cerrar primero).
+    """
+    now = get_now_spain()
+    # En modo async la fila pendiente de sellado va en la misma sentencia
+    pending_seal = (
+        build_pending_seal_values(None, user_id, client_id, "check_in", request)
+        if is_async_sealing() else None
+    )
+    result = fast_check_in(client_id, user_id, now, pending_seal=pending_seal)
+    if result is None:
+        return None
+
+    if result.record_id is None:
+        if result.open_record_date is not None:
+            if result.open_record_date < date.today():
+                # La ruta ORM se encarga de cerrarlo y volver a fichar
+                return None
+            flash("Ya tienes un registro abierto para hoy.", "warning")
+        elif result.today_status in NON_WORKING_STATUSES:
+            flash(
+                f"No puedes fichar — tu estado de hoy es «{result.today_status}».",
+                "danger"
+            )
+        else:
+            # Perdió la carrera contra otro fichaje simultáneo (ON CONFLICT)
+            flash("Ya tienes un registro abierto para hoy.", "warning")
+        return redirect(url_for("time.dashboard_employee"))
+
+    if pending_seal is None:
+        _seal_punch(
+            SimpleNamespace(id=result.record_id, user_id=user_id, client_id=client_id),
+            "check_in",
+            client_id
+        )
+    _notify_admins(live_events.CHECK_IN, record_id=result.record_id)
+    db.session.commit()
+    flash("Entrada registrada correctamente.", "success")
+    return redirect(url_for("time.dashboard_employee"))
+
+
 # ------------------------------------------------------------------
 #  FICHAR ENTRADA
 # ------------------------------------------------------------------
@@ -32,6 +161,11 @@ def check_in(client_id):
         return redirect(url_for("auth.login"))
     user_id = session["user_id"]
 
+    # RUTA RÁPIDA: validación + INSERT en un solo round-trip
+    response = _fast_check_in(client_id, user_id)
+    if response is not None:
+        return response
+
     # BUSCA REGISTRO ABIERTO (de cualquier fecha)
     existing_open = time_records_query(
         user_id=user_id,
@@ -60,6 +194,8 @@ def check_in(client_id):
                     " - Cerrado automáticamente"
                 )
             }, synchronize_session=False)
+            mark_records_dirty([existing_open.id])
+            _notify_admins(live_events.CHECK_OUT, record_id=existing_open.id, auto_closed=True)
 
             db.session.commit()
             flash(f"Se cerró automáticamente tu fichaje del {existing_open.date.strftime('%d-%m-%Y')}.", "info")
@@ -83,12 +219,8 @@ def check_in(client_id):
             )
             return redirect(url_for("time.dashboard_employee"))
 
-        # 2) Bloqueo en Postgres (por si lo usas)
-        bind = db.session.get_bind()
-        if bind and bind.dialect.name == "postgresql":
-            db.session.execute(
-                text("LOCK TABLE public.time_record IN SHARE ROW EXCLUSIVE MODE")
-            )
+        # 2) Bloqueo en Postgres: solo se serializan los fichajes de este usuario
+        lock_user_punches(user_id)
 
         # 3) ¿Ya hay un fichaje abierto HOY? (los del día anterior ya se cerraron arriba)
         existing_open_today = time_records_query(
@@ -113,36 +245,18 @@ def check_in(client_id):
                 date=now.date()
             )
             db.session.add(new_rec)
-            db.session.flush()  # Genera el ID del registro
-
-            # --- SELLAR EL FICHAJE (Ley de Fichajes) ---
-            from services.timestamp_service import TimestampService
-            from models.models import TimeRecordSignature
-
             try:
-                content_hash, signature, timestamp_utc, terminal_id = TimestampService.seal_record(
-                    time_record=new_rec,
-                    action="check_in",
-                    request=request
-                )
+                db.session.flush()  # Genera el ID del registro
+            except IntegrityError as e:
+                # Otro fichaje simultáneo del mismo usuario ganó la carrera
+                if not is_open_record_conflict(e):
+                    raise
+                db.session.rollback()
+                flash("Ya tienes un registro abierto para hoy.", "warning")
+                return redirect(url_for("time.dashboard_employee"))
 
-                # Crear registro de firma
-                sig = TimeRecordSignature(
-                    time_record_id=new_rec.id,
-                    client_id=client_id,
-                    timestamp_utc=timestamp_utc,
-                    action="check_in",
-                    terminal_id=terminal_id,
-                    user_agent=request.headers.get("User-Agent"),
-                    ip_address=request.remote_addr,
-                    content_hash=content_hash,
-                    signature=signature,
-                    key_version=1
-                )
-                db.session.add(sig)
-            except Exception as e:
-                current_app.logger.error(f"Error al sellar check-in: {str(e)}")
-                # Continuar aunque falle el sellado (no bloquear al usuario)
+            # --- SELLAR EL FICHAJE (Ley de Fichajes) ---
+            _seal_punch(new_rec, "check_in", client_id)
 
             # --- si no existe EmployeeStatus hoy, crearlo como Trabajado ---
             if not today_status:
@@ -154,6 +268,7 @@ def check_in(client_id):
                     notes="Registro automático de fichaje"
                 ))
 
+            _notify_admins(live_events.CHECK_IN, record_id=new_rec.id)
             db.session.commit()
             flash("Entrada registrada correctamente.", "success")
 
@@ -176,11 +291,7 @@ def check_out(client_id):
     user_id = session["user_id"]
 
     try:
-        bind = db.session.get_bind()
-        if bind and bind.dialect.name == "postgresql":
-            db.session.execute(
-                text("LOCK TABLE public.time_record IN SHARE ROW EXCLUSIVE MODE")
-            )
+        lock_user_punches(user_id)
 
         open_record = time_records_query(
             user_id=user_id,
@@ -193,33 +304,7 @@ def check_out(client_id):
             open_record.notes = sanitize_text(request.form.get("notes", ""))
 
             # --- SELLAR EL FICHAJE (Ley de Fichajes) ---
-            from services.timestamp_service import TimestampService
-            from models.models import TimeRecordSignature
-
-            try:
-                content_hash, signature, timestamp_utc, terminal_id = TimestampService.seal_record(
-                    time_record=open_record,
-                    action="check_out",
-                    request=request
-                )
-
-                # Crear registro de firma
-                sig = TimeRecordSignature(
-                    time_record_id=open_record.id,
-                    client_id=client_id,
-                    timestamp_utc=timestamp_utc,
-                    action="check_out",
-                    terminal_id=terminal_id,
-                    user_agent=request.headers.get("User-Agent"),
-                    ip_address=request.remote_addr,
-                    content_hash=content_hash,
-                    signature=signature,
-                    key_version=1
-                )
-                db.session.add(sig)
-            except Exception as e:
-                current_app.logger.error(f"Error al sellar check-out: {str(e)}")
-                # Continuar aunque falle el sellado (no bloquear al usuario)
+            _seal_punch(open_record, "check_out", client_id)
 
             # --- CERRAR PAUSAS ACTIVAS DEL FICHAJE ---
             from models.models import WorkPause
@@ -234,6 +319,7 @@ def check_out(client_id):
                 pause.notes = (pause.notes or "") + (" - " if pause.notes else "") + "Cerrado automáticamente con el fichaje"
                 pauses_closed += 1
 
+            _notify_admins(live_events.CHECK_OUT, record_id=open_record.id, pauses_closed=pauses_closed)
             db.session.commit()
 
             if pauses_closed > 0:
@@ -267,20 +353,9 @@ def dashboard_employee():
 
     today = date.today()
     start_week = today - timedelta(days=today.weekday())
-    end_week   = start_week + timedelta(days=7)
-
-    weekly_records = (
-        time_records_query(user_id=user_id)
-        .filter(
-            TimeRecord.date >= start_week,
-            TimeRecord.date < end_week,
-            TimeRecord.check_in.isnot(None),
-            TimeRecord.check_out.isnot(None)
-        )
-        .all()
-    )
 
-    worked_secs   = sum((r.check_out - r.check_in).total_seconds() for r in weekly_records)
+    # Total semanal precalculado (una fila, ver services/work_summary_service.py)
+    worked_secs   = get_week_totals(user_id, start_week).worked_seconds
     allowed_secs  = (user.weekly_hours or 0) * 3600
     remain_secs   = max(allowed_secs - worked_secs, 0)
 
@@ -330,21 +405,42 @@ def dashboard_employee():
 # ------------------------------------------------------------------
 #  HISTÓRICO INDIVIDUAL
 # ------------------------------------------------------------------
+def _history_page(user_id, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Una página del historial del empleado (más recientes primero) y el cursor de la siguiente."""
+    recs, next_cursor = paginate_keyset(
+        time_records_query(user_id=user_id), TimeRecord.date, TimeRecord.id, cursor, limit
+    )
+    data = []
+    for r in recs:
+        dur = r.check_out - r.check_in if r.check_in and r.check_out else None
+        data.append({"record": r, "duration_formatted": format_timedelta(dur)})
+    return data, next_cursor
+
+
 @time_bp.route("/history")
 def history():
     if "user_id" not in session:
         return redirect(url_for("auth.login"))
-    user_id = session["user_id"]
 
-    recs = time_records_query(user_id=user_id) \
-        .order_by(desc(TimeRecord.id)) \
-        .all()
-    data = []
-    for r in recs:
-        dur = r.check_out - r.check_in if r.check_in and r.check_out else None
-        data.append({"record": r, "duration_formatted": format_timedelta(dur)})
+    data, next_cursor = _history_page(session["user_id"])
+    return render_template("history.html", records=data, next_cursor=next_cursor)
+
+
+@time_bp.route("/history/records")
+def history_records():
+    """Siguiente página del historial ("cargar más"): filas HTML y cursor en JSON."""
+    if "user_id" not in session:
+        return jsonify({"error": "No autenticado"}), 401
 
-    return render_template("history.html", records=data)
+    cursor, limit = page_args(request.args)
+    try:
+        data, next_cursor = _history_page(session["user_id"], cursor, limit)
+    except ValueError:
+        return jsonify({"error": "Cursor no válido"}), 400
+    return jsonify({
+        "html": render_template("history_rows.html", records=data),
+        "next_cursor": next_cursor,
+    })
 
 
 # ------------------------------------------------------------------
@@ -543,6 +639,7 @@ def start_pause(client_id):
                 }), 400
 
         db.session.add(new_pause)
+        _notify_admins(live_events.PAUSE_START, record_id=today_record.id, pause_type=new_pause.pause_type)
         db.session.commit()
 
         response_data = {
@@ -589,6 +686,7 @@ def end_pause(pause_id):
 
         # Finalizar la pausa
         pause.pause_end = get_now_spain()
+        _notify_admins(live_events.PAUSE_END, record_id=pause.time_record_id, pause_type=pause.pause_type)
         db.session.commit()
 
         # Calcular duración
@@ -698,6 +796,9 @@ def create_leave_request(client_id):
         db.session.add(new_request)
         db.session.flush()  # Para obtener el ID
 
+        _notify_admins(
+            live_events.LEAVE_REQUEST, request_id=new_request.id, request_type=request_type, status=status
+        )
         db.session.commit()
 
         # Mensaje unificado: todas las solicitudes requieren aprobación
@@ -730,11 +831,13 @@ def get_my_requests():
         return jsonify({"error": "No autenticado"}), 401
 
     user_id = session["user_id"]
+    cursor, limit = page_args(request.args)
 
     try:
-        requests = LeaveRequest.query.filter_by(
-            user_id=user_id
-        ).order_by(desc(LeaveRequest.created_at)).all()
+        requests, next_cursor = paginate_keyset(
+            LeaveRequest.query.filter_by(user_id=user_id),
+            LeaveRequest.created_at, LeaveRequest.id, cursor, limit,
+        )
 
         requests_data = []
         for req in requests:
@@ -750,9 +853,12 @@ def get_my_requests():
 
         return jsonify({
             "success": True,
-            "requests": requests_data
+            "requests": requests_data,
+            "next_cursor": next_cursor
         })
 
+    except ValueError:
+        return jsonify({"success": False, "error": "Cursor no válido"}), 400
     except Exception as e:
         return jsonify({
             "success": False,
@@ -784,6 +890,10 @@ def cancel_leave_request(request_id):
 
         # Cancelar la solicitud
         leave_request.status = "Cancelado"
+        _notify_admins(
+            live_events.LEAVE_REQUEST, request_id=leave_request.id,
+            request_type=leave_request.request_type, status=leave_request.status
+        )
         db.session.commit()
 
         return jsonify({
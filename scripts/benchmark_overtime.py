@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la generación de horas extras y del dashboard /admin/overtime.
+
+Para cada tamaño crea un cliente sintético con N empleados y una semana de
+fichajes (con sus totales en user_week_summary) y mide:
+  - generación:  generate_overtime_entries_for_week (consultas y ms)
+  - dashboard:   GET /admin/overtime de esa semana (consultas y ms)
+  - anterior:    réplica del bucle por empleado previo (solo con --legacy)
+
+El número de consultas de la generación y del dashboard debe ser el mismo
+para cualquier N. Los clientes sintéticos se borran al terminar.
+
+Uso:
+  python scripts/benchmark_overtime.py [--sizes 500,1000,5000] [--legacy]
+"""
+import argparse
+import sys
+import time
+from datetime import date, datetime, timedelta, time as dt_time
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import delete, insert
+
+from main import app
+from models.database import db, tenant_bypass
+from models.models import (
+    Client, User, TimeRecord, WorkPause, OvertimeEntry, UserDaySummary, UserWeekSummary
+)
+from services.overtime_service import (
+    generate_overtime_entries_for_week, get_week_bounds, TOLERANCE_SECONDS
+)
+from services.work_summary_service import rebuild_summaries
+from utils.query_stats import get_request_stats
+
+# Horas trabajadas en la semana según el empleado: déficit, en rango y exceso
+WEEK_HOURS_CYCLE = (30, 40, 48)
+
+
+def seed_client(employees, week_start):
+    """Crea el cliente sintético con un admin y employees empleados. Devuelve (client_id, admin_id)."""
+    stamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+    conn = db.session.connection()
+    client_id = conn.execute(insert(Client.__table__).values(
+        name=f"benchmark-overtime-{stamp}", slug=f"benchmark-overtime-{stamp}", plan="pro"
+    )).inserted_primary_key[0]
+    admin_id = conn.execute(insert(User.__table__).values(
+        client_id=client_id, username="bench-admin", password_hash="-", full_name="Admin",
+        email="bench-admin@example.invalid", role="super_admin", weekly_hours=40
+    )).inserted_primary_key[0]
+    conn.execute(insert(User.__table__), [
+        {
+            "client_id": client_id, "username": f"bench{u}", "password_hash": "-",
+            "full_name": f"Empleado {u}", "email": f"bench{u}@example.invalid", "weekly_hours": 40,
+        }
+        for u in range(employees)
+    ])
+    user_ids = [
+        row.id for row in conn.execute(
+            User.__table__.select().where(User.__table__.c.client_id == client_id, User.__table__.c.role.is_(None))
+        )
+    ]
+
+    records = []
+    for n, user_id in enumerate(user_ids):
+        daily = timedelta(hours=WEEK_HOURS_CYCLE[n % len(WEEK_HOURS_CYCLE)] / 5)
+        for d in range(5):
+            day = week_start + timedelta(days=d)
+            check_in = datetime.combine(day, dt_time(8, 0))
+            records.append({
+                "client_id": client_id, "user_id": user_id, "date": day,
+                "check_in": check_in, "check_out": check_in + daily,
+            })
+    conn.execute(insert(TimeRecord.__table__), records)
+    rebuild_summaries(client_id, week_start, week_start + timedelta(days=6))
+    db.session.commit()
+    return client_id, admin_id
+
+
+def drop_client(client_id):
+    for model in (OvertimeEntry, UserWeekSummary, UserDaySummary, WorkPause, TimeRecord, User):
+        db.session.execute(delete(model.__table__).where(model.__table__.c.client_id == client_id))
+    db.session.execute(delete(Client.__table__).where(Client.__table__.c.id == client_id))
+    db.session.commit()
+
+
+def legacy_generate(client_id, week_start, week_end):
+    """Réplica del cálculo anterior: por empleado, todos sus fichajes y su entrada."""
+    for user in User.query.filter_by(client_id=client_id, is_active=True).all():
+        if not user.weekly_hours:
+            continue
+        records = TimeRecord.query.filter(
+            TimeRecord.user_id == user.id,
+            TimeRecord.date >= week_start,
+            TimeRecord.date <= week_end,
+            TimeRecord.check_in.isnot(None),
+            TimeRecord.check_out.isnot(None),
+        ).all()
+        worked = sum(int((r.check_out - r.check_in).total_seconds()) for r in records)
+        if abs(worked - user.weekly_hours * 3600) > TOLERANCE_SECONDS:
+            OvertimeEntry.query.filter_by(client_id=client_id, user_id=user.id, week_start=week_start).first()
+    db.session.rollback()
+
+
+def measure(fn):
+    """Ejecuta fn en una petición simulada (contexto nuevo). Devuelve (consultas, ms)."""
+    with app.test_request_context(), tenant_bypass():
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        stats = get_request_stats()
+        return stats.count, elapsed * 1000
+
+
+def measure_dashboard(client, week_start):
+    started = time.perf_counter()
+    response = client.get(f"/admin/overtime?week={week_start.isoformat()}&tab=pending")
+    elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        raise SystemExit(f"❌ /admin/overtime respondió {response.status_code}")
+    return int(response.headers["X-DB-Query-Count"]), elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="500,1000,5000", help="Nº de empleados a probar, separados por comas")
+    parser.add_argument("--legacy", action="store_true", help="Medir también el bucle por empleado anterior (lento)")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    app.config["QUERY_STATS_HEADERS"] = True
+    week_start, week_end = get_week_bounds(date.today() - timedelta(days=7))
+
+    print(f"{'Empleados':>10}{'generación':>22}{'dashboard':>22}{'anterior':>22}")
+    for size in sizes:
+        # Cada medición abre su propio contexto para no compartir flask.g
+        with app.app_context(), tenant_bypass():
+            client_id, admin_id = seed_client(size, week_start)
+        try:
+            # Primera pasada crea las entradas; se mide la siguiente (actualización)
+            measure(lambda: generate_overtime_entries_for_week(client_id, week_start))
+            gen_queries, gen_ms = measure(lambda: generate_overtime_entries_for_week(client_id, week_start))
+
+            with app.test_client() as client:
+                with client.session_transaction() as sess:
+                    sess["user_id"] = admin_id
+                    sess["client_id"] = client_id
+                # Primera petición en frío (principal y datos de referencia); se mide la segunda
+                measure_dashboard(client, week_start)
+                dash_queries, dash_ms = measure_dashboard(client, week_start)
+
+            legacy = "-"
+            if args.legacy:
+                legacy_queries, legacy_ms = measure(lambda: legacy_generate(client_id, week_start, week_end))
+                legacy = f"{legacy_queries} q / {legacy_ms:.0f} ms"
+
+            print(f"{size:>10}{f'{gen_queries} q / {gen_ms:.0f} ms':>22}"
+                  f"{f'{dash_queries} q / {dash_ms:.0f} ms':>22}{legacy:>22}")
+        finally:
+            with app.app_context(), tenant_bypass():
+                drop_client(client_id)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark del motor de totales por periodo (services/period_engine.py).
+
+Crea un cliente sintético con N empleados y un año de fichajes de lunes a
+viernes (cada uno con una pausa) y mide, para el backend NumPy y el de
+Python puro (el cálculo fila a fila anterior):
+  - carga:    consulta de fichajes y pausas y paso a columnas
+  - día / semana / mes: totales agrupados por empleado y periodo
+  - deltas:   diferencia semanal frente a la jornada
+
+Comprueba además que ambos backends dan el mismo resultado. El cliente
+sintético se borra al terminar.
+
+Uso:
+  python scripts/benchmark_period_engine.py [--employees 2000] [--year 2025] [--repeat 3]
+"""
+import argparse
+import sys
+import time
+from datetime import date, datetime, timedelta, time as dt_time
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import delete, insert, select
+
+from main import app
+from models.database import db, tenant_bypass
+from models.models import Client, User, TimeRecord, WorkPause
+from services import period_engine
+from services.period_engine import BACKEND_NUMPY, BACKEND_PYTHON, DAY, WEEK, MONTH
+
+# Filas por sentencia al sembrar
+SEED_CHUNK = 20000
+
+
+def seed_client(employees, year):
+    """Crea el cliente sintético con un año de fichajes por empleado. Devuelve (client_id, nº fichajes)."""
+    stamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+    conn = db.session.connection()
+    client_id = conn.execute(insert(Client.__table__).values(
+        name=f"benchmark-period-{stamp}", slug=f"benchmark-period-{stamp}", plan="pro"
+    )).inserted_primary_key[0]
+    conn.execute(insert(User.__table__), [
+        {
+            "client_id": client_id, "username": f"bench{u}", "password_hash": "-",
+            "full_name": f"Empleado {u}", "email": f"bench{u}@example.invalid", "weekly_hours": 40,
+        }
+        for u in range(employees)
+    ])
+    user_ids = conn.execute(
+        select(User.__table__.c.id).where(User.__table__.c.client_id == client_id)
+    ).scalars().all()
+
+    workdays = [
+        date(year, 1, 1) + timedelta(days=d)
+        for d in range((date(year, 12, 31) - date(year, 1, 1)).days + 1)
+        if (date(year, 1, 1) + timedelta(days=d)).weekday() < 5
+    ]
+    records = []
+    for n, user_id in enumerate(user_ids):
+        for d, day in enumerate(workdays):
+            check_in = datetime.combine(day, dt_time(8, 0)) + timedelta(seconds=(n * 7 + d * 13) % 900)
+            records.append({
+                "client_id": client_id, "user_id": user_id, "date": day,
+                "check_in": check_in, "check_out": check_in + timedelta(hours=8, seconds=(n + d) % 3600),
+            })
+    for start in range(0, len(records), SEED_CHUNK):
+        conn.execute(insert(TimeRecord.__table__), records[start:start + SEED_CHUNK])
+
+    pauses = []
+    for row in conn.execute(
+        select(TimeRecord.__table__.c.id, TimeRecord.__table__.c.user_id, TimeRecord.__table__.c.check_in)
+        .where(TimeRecord.__table__.c.client_id == client_id)
+    ):
+        pause_start = row.check_in + timedelta(hours=4)
+        pauses.append({
+            "client_id": client_id, "user_id": row.user_id, "time_record_id": row.id,
+            "pause_type": "Comida", "pause_start": pause_start,
+            "pause_end": pause_start + timedelta(minutes=30, seconds=row.id % 600),
+        })
+    for start in range(0, len(pauses), SEED_CHUNK):
+        conn.execute(insert(WorkPause.__table__), pauses[start:start + SEED_CHUNK])
+    db.session.commit()
+    return client_id, len(records)
+
+
+def drop_client(client_id):
+    for model in (WorkPause, TimeRecord, User):
+        db.session.execute(delete(model.__table__).where(model.__table__.c.client_id == client_id))
+    db.session.execute(delete(Client.__table__).where(Client.__table__.c.id == client_id))
+    db.session.commit()
+
+
+def best_of(repeat, fn):
+    """Ejecuta fn repeat veces. Devuelve (último resultado, mejor tiempo en ms)."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=2000, help="Nº de empleados")
+    parser.add_argument("--year", type=int, default=date.today().year - 1, help="Año de fichajes")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por medición (se toma la mejor)")
+    args = parser.parse_args()
+
+    if not period_engine.NUMPY_AVAILABLE:
+        print("❌ NumPy no está instalado: solo hay backend de Python puro")
+        return 1
+
+    date_from, date_to = date(args.year, 1, 1), date(args.year, 12, 31)
+    with app.app_context(), tenant_bypass():
+        print(f"Sembrando {args.employees} empleados x año {args.year}...")
+        client_id, record_count = seed_client(args.employees, args.year)
+        print(f"  {record_count} fichajes")
+        try:
+            connection = db.session.connection()
+            weekly_hours = dict(db.session.execute(
+                select(User.id, User.weekly_hours).where(User.client_id == client_id)
+            ).all())
+
+            results = {}
+            timings = {}
+            for backend in (BACKEND_PYTHON, BACKEND_NUMPY):
+                columns, timings[(backend, "carga")] = best_of(args.repeat, lambda: period_engine.load_period_columns(
+                    connection, client_id, date_from, date_to, backend=backend
+                ))
+                for period in (DAY, WEEK, MONTH):
+                    totals, timings[(backend, period)] = best_of(
+                        args.repeat, lambda: period_engine.compute_totals(columns, period, backend)
+                    )
+                    results[(backend, period)] = list(period_engine.iter_totals(totals))
+                    if period == WEEK:
+                        deltas, timings[(backend, "deltas")] = best_of(
+                            args.repeat, lambda: period_engine.contract_deltas(totals, weekly_hours)
+                        )
+                        results[(backend, "deltas")] = list(deltas)
+        finally:
+            drop_client(client_id)
+
+    print(f"\n{'':>10}{'Python':>14}{'NumPy':>14}{'mejora':>10}")
+    for step in ("carga", DAY, WEEK, MONTH, "deltas"):
+        python_ms, numpy_ms = timings[(BACKEND_PYTHON, step)], timings[(BACKEND_NUMPY, step)]
+        print(f"{step:>10}{python_ms:>11.1f} ms{numpy_ms:>11.1f} ms{python_ms / max(numpy_ms, 0.001):>9.1f}x")
+
+    different = [
+        step for step in (DAY, WEEK, MONTH, "deltas")
+        if results[(BACKEND_PYTHON, step)] != results[(BACKEND_NUMPY, step)]
+    ]
+    if different:
+        print(f"❌ Los backends no coinciden en: {', '.join(different)}")
+        return 1
+    print("✅ Ambos backends dan los mismos totales")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
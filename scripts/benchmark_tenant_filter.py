@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark del filtro multitenant: coste por consulta del filtrado a nivel de
+sentencia (do_orm_execute + with_loader_criteria) frente al enfoque anterior
+(TenantAwareQuery sobrescribiendo all/first/count y clonando la Query).
+
+Mide, para las mismas consultas de solo lectura contra la base de datos
+configurada:
+  - sin filtro          (bypass, referencia)
+  - anterior            (réplica de la Query que sobrescribía all/first/count)
+  - sentencia / Query   (Model.query con el criterio en do_orm_execute)
+  - sentencia / select  (db.session.execute(select(...)), con caché de compilación)
+
+Uso: python scripts/benchmark_tenant_filter.py --client-id 1 [--iterations 2000]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from flask import session
+from sqlalchemy import select, desc
+from sqlalchemy.orm import Query
+
+from main import app
+from models.database import db, BYPASS_TENANT_OPTION
+from models.models import TimeRecord, User
+
+
+class LegacyTenantQuery(Query):
+    """Réplica del enfoque anterior: filtro añadido al ejecutar all()/first()."""
+
+    def _apply_tenant_filter(self):
+        client_id = session.get("client_id")
+        entity = self.column_descriptions[0].get("entity")
+        query = self.enable_assertions(False)
+        return Query.filter(query, entity.client_id == client_id)
+
+    def all(self):
+        return Query.all(self._apply_tenant_filter())
+
+    def first(self):
+        return Query.first(self._apply_tenant_filter())
+
+
+def legacy_query(model):
+    # Sin el criterio nuevo, para medir solo el coste del enfoque anterior
+    return LegacyTenantQuery(model, session=db.session()).execution_options(**{BYPASS_TENANT_OPTION: True})
+
+
+def scenarios(user_id):
+    return {
+        "sin filtro": lambda: TimeRecord.query.bypass_tenant_filter()
+            .filter(TimeRecord.user_id == user_id).order_by(desc(TimeRecord.id)).first(),
+        "anterior": lambda: legacy_query(TimeRecord)
+            .filter(TimeRecord.user_id == user_id).order_by(desc(TimeRecord.id)).first(),
+        "sentencia / Query": lambda: TimeRecord.query
+            .filter(TimeRecord.user_id == user_id).order_by(desc(TimeRecord.id)).first(),
+        "sentencia / select": lambda: db.session.execute(
+            select(TimeRecord).where(TimeRecord.user_id == user_id)
+            .order_by(desc(TimeRecord.id)).limit(1)
+        ).scalars().first(),
+    }
+
+
+def measure(fn, iterations):
+    """Devuelve los µs por consulta de una tanda de iterations consultas."""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - started
+    db.session.rollback()
+    return elapsed / iterations * 1_000_000
+
+
+def run_benchmark(user_id, iterations, rounds):
+    """
+    Alterna los escenarios en varias rondas y se queda con la mediana de
+    cada uno, para que el ruido de la máquina o de la red afecte a todos por igual.
+    """
+    cases = scenarios(user_id)
+
+    # Calentamiento: caché de compilación y conexión del pool
+    for fn in cases.values():
+        for _ in range(20):
+            fn()
+    db.session.rollback()
+
+    samples = {name: [] for name in cases}
+    per_round = max(1, iterations // rounds)
+    for _ in range(rounds):
+        for name, fn in cases.items():
+            samples[name].append(measure(fn, per_round))
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--client-id", type=int, required=True, help="Cliente con el que simular la sesión")
+    parser.add_argument("--iterations", type=int, default=2000, help="Consultas por escenario")
+    parser.add_argument("--rounds", type=int, default=10, help="Rondas alternando escenarios")
+    args = parser.parse_args()
+
+    with app.test_request_context():
+        session["client_id"] = args.client_id
+
+        user = User.query.first()
+        if user is None:
+            print("❌ El cliente no tiene usuarios")
+            return 1
+
+        results = run_benchmark(user.id, args.iterations, args.rounds)
+
+    baseline = results["sin filtro"]
+    print(f"{'Escenario':<22}{'µs/consulta':>14}{'sobrecoste':>14}")
+    for name, micros in results.items():
+        print(f"{name:<22}{micros:>14.1f}{micros - baseline:>+14.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
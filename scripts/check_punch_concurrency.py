@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Prueba de concurrencia de fichajes contra la base de datos configurada (PostgreSQL).
+
+Comprueba que el lock de fichaje solo serializa a un mismo usuario:
+  1. Una transacción retiene el lock del usuario A.
+  2. Un fichaje del usuario B debe obtener su lock al instante.
+  3. Un segundo fichaje del usuario A debe quedar bloqueado (lock_timeout).
+
+Con --compare también mide el modo anterior (LOCK TABLE), en el que el
+paso 2 queda bloqueado.
+
+No escribe datos: todas las transacciones terminan en rollback.
+
+Uso: python scripts/check_punch_concurrency.py --user-a 1 --user-b 2 [--compare]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from main import app
+from models.database import db
+from services.punch_service import lock_user_punches
+
+
+LOCK_TIMEOUT_MS = 500
+
+
+def try_lock(user_id):
+    """
+    Intenta tomar el lock de fichaje de user_id en una sesión nueva.
+
+    Returns:
+        tuple: (obtenido, segundos_esperados)
+    """
+    session = Session(bind=db.engine)
+    try:
+        session.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT_MS}ms'"))
+        started = time.perf_counter()
+        try:
+            lock_user_punches(user_id, session=session)
+            return True, time.perf_counter() - started
+        except OperationalError:
+            return False, time.perf_counter() - started
+    finally:
+        session.rollback()
+        session.close()
+
+
+def run_scenario(user_a, user_b):
+    holder = Session(bind=db.engine)
+    try:
+        lock_user_punches(user_a, session=holder)
+
+        other_ok, other_wait = try_lock(user_b)
+        same_ok, same_wait = try_lock(user_a)
+    finally:
+        holder.rollback()
+        holder.close()
+
+    print(f"  Usuario B mientras A retiene el lock: {'OK' if other_ok else 'BLOQUEADO'} ({other_wait * 1000:.1f} ms)")
+    print(f"  Usuario A mientras A retiene el lock: {'OK' if same_ok else 'BLOQUEADO'} ({same_wait * 1000:.1f} ms)")
+    return other_ok, same_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-a", type=int, required=True, help="ID del primer usuario")
+    parser.add_argument("--user-b", type=int, required=True, help="ID de un usuario distinto")
+    parser.add_argument("--compare", action="store_true", help="Medir también el modo LOCK TABLE anterior")
+    args = parser.parse_args()
+
+    with app.app_context():
+        if db.engine.dialect.name != "postgresql":
+            print("❌ Esta prueba requiere PostgreSQL (en SQLite el lock por usuario no aplica).")
+            return 1
+
+        print("Modo 'user' (advisory lock por usuario):")
+        os.environ["PUNCH_LOCK_MODE"] = "user"
+        other_ok, same_ok = run_scenario(args.user_a, args.user_b)
+        passed = other_ok and not same_ok
+
+        if args.compare:
+            print("Modo 'table' (LOCK TABLE, comportamiento anterior):")
+            os.environ["PUNCH_LOCK_MODE"] = "table"
+            run_scenario(args.user_a, args.user_b)
+
+    print("✅ Fichajes de usuarios distintos no se bloquean entre sí" if passed
+          else "❌ El lock por usuario no se comporta como se esperaba")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
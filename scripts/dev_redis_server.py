@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Servidor mínimo compatible con el protocolo de Redis (RESP) para desarrollo.
+
+Permite probar CACHE_BACKEND=redis con varios workers en local sin instalar
+Redis. Guarda los datos en memoria y solo implementa los comandos que usa
+la caché de Flask-Caching (GET, SET, SETEX, DEL, MGET, INCR, KEYS, pipelines
+MULTI/EXEC...). No usar en producción.
+
+Uso:
+  python scripts/dev_redis_server.py [--host 127.0.0.1] [--port 6379]
+
+  CACHE_BACKEND=redis CACHE_REDIS_URL=redis://127.0.0.1:6379/0 flask run
+"""
+import argparse
+import fnmatch
+import socketserver
+import sys
+import threading
+import time
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class CommandError(Exception):
+    pass
+
+
+class Store:
+    """Bases de datos numeradas de claves → (valor, caducidad monotónica o None)."""
+
+    def __init__(self):
+        self.databases = {}
+        self.lock = threading.Lock()
+
+    def db(self, index):
+        return self.databases.setdefault(index, {})
+
+    @staticmethod
+    def alive(data, key):
+        entry = data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del data[key]
+            return None
+        return entry
+
+
+def _expiry(seconds):
+    return time.monotonic() + seconds
+
+
+def _int(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise CommandError("ERR value is not an integer or out of range")
+
+
+def execute(store, state, args):
+    """Ejecuta un comando y devuelve la respuesta en forma de objeto Python."""
+    name = args[0].decode().upper()
+    params = args[1:]
+    data = store.db(state["db"])
+
+    if name == "PING":
+        return params[0] if params else "+PONG"
+    if name in ("CLIENT", "INFO", "ECHO", "READONLY"):
+        return params[0] if name == "ECHO" else "+OK"
+    if name == "SELECT":
+        state["db"] = _int(params[0])
+        return "+OK"
+    if name == "GET":
+        entry = store.alive(data, params[0])
+        return entry[0] if entry else None
+    if name == "MGET":
+        return [(store.alive(data, k) or (None,))[0] for k in params]
+    if name == "SET":
+        key, value, expiry, only_new = params[0], params[1], None, False
+        options = [p.decode().upper() for p in params[2:]]
+        i = 0
+        while i < len(options):
+            if options[i] == "EX":
+                expiry = _expiry(_int(options[i + 1]))
+                i += 1
+            elif options[i] == "PX":
+                expiry = _expiry(_int(options[i + 1]) / 1000)
+                i += 1
+            elif options[i] == "NX":
+                only_new = True
+            i += 1
+        if only_new and store.alive(data, key):
+            return None
+        data[key] = (value, expiry)
+        return "+OK"
+    if name == "SETEX":
+        data[params[0]] = (params[2], _expiry(_int(params[1])))
+        return "+OK"
+    if name == "SETNX":
+        if store.alive(data, params[0]):
+            return 0
+        data[params[0]] = (params[1], None)
+        return 1
+    if name == "DEL":
+        return sum(1 for k in params if store.alive(data, k) and data.pop(k))
+    if name == "EXISTS":
+        return sum(1 for k in params if store.alive(data, k))
+    if name in ("INCR", "INCRBY"):
+        entry = store.alive(data, params[0])
+        value = _int(entry[0]) if entry else 0
+        value += _int(params[1]) if name == "INCRBY" else 1
+        data[params[0]] = (str(value).encode(), entry[1] if entry else None)
+        return value
+    if name == "EXPIRE":
+        entry = store.alive(data, params[0])
+        if not entry:
+            return 0
+        data[params[0]] = (entry[0], _expiry(_int(params[1])))
+        return 1
+    if name == "KEYS":
+        pattern = params[0].decode()
+        return [k for k in list(data) if store.alive(data, k) and fnmatch.fnmatchcase(k.decode(), pattern)]
+    if name == "FLUSHDB":
+        data.clear()
+        return "+OK"
+    raise CommandError(f"ERR unknown command '{name}'")
+
+
+def encode(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, CommandError):
+        return f"-{value}\r\n".encode()
+    if isinstance(value, str):
+        return f"{value}\r\n".encode()
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    return b"*%d\r\n" % len(value) + b"".join(encode(v) for v in value)
+
+
+def read_command(stream):
+    line = stream.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Comando "inline" (p.ej. escrito a mano con telnet)
+        return line.split()
+    args = []
+    for _ in range(int(line[1:])):
+        header = stream.readline()
+        if not header.startswith(b"$"):
+            raise ProtocolError("se esperaba un bulk string")
+        length = int(header[1:])
+        args.append(stream.read(length + 2)[:-2])
+    return args
+
+
+class RedisHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        store = self.server.store
+        state = {"db": 0}
+        queued = None
+        while True:
+            try:
+                args = read_command(self.rfile)
+            except (ProtocolError, ValueError):
+                return
+            if args is None:
+                return
+            if not args:
+                continue
+
+            name = args[0].decode().upper()
+            if name == "MULTI":
+                queued = []
+                reply = "+OK"
+            elif name == "EXEC" and queued is not None:
+                with store.lock:
+                    reply = []
+                    for command in queued:
+                        try:
+                            reply.append(execute(store, state, command))
+                        except CommandError as e:
+                            reply.append(e)
+                queued = None
+            elif name == "DISCARD":
+                queued = None
+                reply = "+OK"
+            elif queued is not None:
+                queued.append(args)
+                reply = "+QUEUED"
+            else:
+                try:
+                    with store.lock:
+                        reply = execute(store, state, args)
+                except CommandError as e:
+                    reply = e
+            self.wfile.write(encode(reply))
+
+
+class RedisServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address):
+        super().__init__(address, RedisHandler)
+        self.store = Store()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección de escucha (por defecto 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=6379, help="Puerto (por defecto 6379)")
+    args = parser.parse_args()
+
+    with RedisServer((args.host, args.port)) as server:
+        print(f"Servidor Redis de desarrollo en {args.host}:{args.port} (Ctrl+C para salir)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Asesor de índices: ejecuta EXPLAIN de las consultas más frecuentes de la
+aplicación e informa de los recorridos secuenciales (Seq Scan / SCAN).
+
+Con --seed crea antes un conjunto de datos sintético (varios clientes con
+empleados, fichajes, pausas, solicitudes y horas extras), actualiza las
+estadísticas del planificador y, al terminar, deshace todo con rollback:
+no quedan datos en la base de datos.
+
+Sin --seed usa los datos existentes del cliente indicado.
+
+Uso:
+  python scripts/index_advisor.py --seed [--seed-clients 3 --seed-users 200 --seed-days 90]
+  python scripts/index_advisor.py --client-id 1
+
+Devuelve código 1 si alguna consulta recorre secuencialmente una tabla vigilada.
+"""
+import argparse
+import sys
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+from sqlalchemy import select, insert, func, text
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from main import app
+from models.database import db
+from models.models import (
+    Client, User, TimeRecord, WorkPause, LeaveRequest, OvertimeEntry
+)
+
+# Tablas en las que un recorrido secuencial se considera un problema
+WATCHED_TABLES = {"time_record", "work_pause", "leave_request", "overtime_entry"}
+
+
+# ------------------------------------------------------------------
+#  Consultas registradas (reflejan las de routes/ y services/)
+# ------------------------------------------------------------------
+HOT_QUERIES = {
+    # check_in / check_out: registro abierto del empleado hoy
+    "open_record_today": lambda p: select(TimeRecord.id).where(
+        TimeRecord.client_id == p["client_id"],
+        TimeRecord.user_id == p["user_id"],
+        TimeRecord.date == p["date"],
+        TimeRecord.check_out.is_(None),
+    ),
+    # Historial de fichajes de un empleado
+    "user_history": lambda p: select(TimeRecord).where(
+        TimeRecord.client_id == p["client_id"],
+        TimeRecord.user_id == p["user_id"],
+        TimeRecord.date.between(p["date"] - timedelta(days=30), p["date"]),
+    ).order_by(TimeRecord.date.desc()),
+    # Dashboard: empleados con fichaje abierto
+    "open_records_client": lambda p: select(TimeRecord.user_id).where(
+        TimeRecord.client_id == p["client_id"],
+        TimeRecord.check_in.isnot(None),
+        TimeRecord.check_out.is_(None),
+    ),
+    # Pausa activa de un fichaje
+    "active_pause": lambda p: select(WorkPause.id).where(
+        WorkPause.time_record_id == p["time_record_id"],
+        WorkPause.pause_end.is_(None),
+    ),
+    # Notificaciones: solicitudes pendientes más recientes
+    "pending_leaves": lambda p: select(LeaveRequest).where(
+        LeaveRequest.client_id == p["client_id"],
+        LeaveRequest.status == "Pendiente",
+    ).order_by(LeaveRequest.created_at.desc()).limit(50),
+    # Horas extras pendientes de una semana
+    "pending_overtime_week": lambda p: select(OvertimeEntry).where(
+        OvertimeEntry.client_id == p["client_id"],
+        OvertimeEntry.week_start == p["week_start"],
+        OvertimeEntry.status == "Pendiente",
+    ),
+}
+
+
+# ------------------------------------------------------------------
+#  Datos sintéticos
+# ------------------------------------------------------------------
+def seed_dataset(conn, clients, users_per_client, days):
+    """
+    Inserta el conjunto de datos de prueba en la transacción de conn.
+
+    Returns:
+        int: id del primer cliente sembrado (objetivo del análisis)
+    """
+    today = date.today()
+    stamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    client_ids = []
+
+    for c in range(clients):
+        client_id = conn.execute(insert(Client.__table__).values(
+            name=f"index-advisor-{stamp}-{c}", slug=f"index-advisor-{stamp}-{c}", plan="pro"
+        )).inserted_primary_key[0]
+        client_ids.append(client_id)
+
+        user_ids = [
+            conn.execute(insert(User.__table__).values(
+                client_id=client_id, username=f"ia{u}", password_hash="-",
+                full_name=f"Empleado {u}", email=f"ia{u}@example.invalid", weekly_hours=40
+            )).inserted_primary_key[0]
+            for u in range(users_per_client)
+        ]
+
+        records = []
+        for user_id in user_ids:
+            for d in range(days):
+                day = today - timedelta(days=d)
+                records.append({
+                    "client_id": client_id,
+                    "user_id": user_id,
+                    "date": day,
+                    "check_in": datetime.combine(day, time(8, 0)),
+                    # Solo el día de hoy queda abierto
+                    "check_out": None if d == 0 else datetime.combine(day, time(16, 0)),
+                })
+        conn.execute(insert(TimeRecord.__table__), records)
+
+        rows = conn.execute(
+            select(TimeRecord.id, TimeRecord.user_id, TimeRecord.date, TimeRecord.check_out)
+            .where(TimeRecord.client_id == client_id)
+        ).all()
+        conn.execute(insert(WorkPause.__table__), [
+            {
+                "client_id": client_id,
+                "user_id": user_id,
+                "time_record_id": record_id,
+                "pause_type": "Descanso",
+                "pause_start": datetime.combine(day, time(11, 0)),
+                "pause_end": None if check_out is None else datetime.combine(day, time(11, 15)),
+            }
+            for record_id, user_id, day, check_out in rows
+        ])
+
+        conn.execute(insert(LeaveRequest.__table__), [
+            {
+                "client_id": client_id,
+                "user_id": user_id,
+                "request_type": "Vacaciones",
+                "start_date": today + timedelta(days=n),
+                "end_date": today + timedelta(days=n + 2),
+                # 1 de cada 10 pendiente
+                "status": "Pendiente" if (user_id + n) % 10 == 0 else "Aprobado",
+                "created_at": datetime.utcnow() - timedelta(days=n),
+            }
+            for user_id in user_ids
+            for n in range(0, days, 15)
+        ])
+
+        week_start = today - timedelta(days=today.weekday())
+        conn.execute(insert(OvertimeEntry.__table__), [
+            {
+                "client_id": client_id,
+                "user_id": user_id,
+                "week_start": week_start - timedelta(weeks=w),
+                "week_end": week_start - timedelta(weeks=w) + timedelta(days=6),
+                "total_worked_seconds": 40 * 3600,
+                "contract_seconds": 40 * 3600,
+                "overtime_seconds": 0,
+                "status": "Pendiente" if w < 2 else "Aprobado",
+            }
+            for user_id in user_ids
+            for w in range(days // 7)
+        ])
+
+    if conn.dialect.name == "postgresql":
+        for table in WATCHED_TABLES | {"user", "client"}:
+            conn.exec_driver_sql(f'ANALYZE "{table}"')
+    else:
+        conn.exec_driver_sql("ANALYZE")
+
+    return client_ids[0]
+
+
+def query_params(conn, client_id):
+    """Parámetros representativos del cliente: un empleado con fichajes y uno de sus registros."""
+    row = conn.execute(
+        select(TimeRecord.user_id, TimeRecord.id, TimeRecord.date)
+        .where(TimeRecord.client_id == client_id)
+        .order_by(TimeRecord.date.desc(), TimeRecord.id.desc())
+        .limit(1)
+    ).first()
+    if row is None:
+        raise SystemExit(f"❌ El cliente {client_id} no tiene fichajes: usa --seed")
+
+    user_id, record_id, day = row
+    week_start = conn.execute(
+        select(func.max(OvertimeEntry.week_start)).where(OvertimeEntry.client_id == client_id)
+    ).scalar() or day - timedelta(days=day.weekday())
+    return {
+        "client_id": client_id,
+        "user_id": user_id,
+        "time_record_id": record_id,
+        "date": day,
+        "week_start": week_start,
+    }
+
+
+# ------------------------------------------------------------------
+#  EXPLAIN
+# ------------------------------------------------------------------
+def _walk_pg_plan(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk_pg_plan(child)
+
+
+def explain(conn, statement):
+    """
+    Returns:
+        tuple: (lista de (tipo de nodo, tabla, índice), tablas con recorrido secuencial)
+    """
+    # Parámetros internos y sintéticos: se pueden renderizar como literales
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+
+    if conn.dialect.name == "postgresql":
+        plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()[0]["Plan"]
+        nodes = [
+            (node["Node Type"], node.get("Relation Name"), node.get("Index Name"))
+            for node in _walk_pg_plan(plan)
+        ]
+        seq_tables = {table for kind, table, _ in nodes if kind == "Seq Scan"}
+        return nodes, seq_tables
+
+    nodes = []
+    seq_tables = set()
+    for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"):
+        detail = row[-1]
+        nodes.append((detail, None, None))
+        words = detail.split()
+        if len(words) > 1 and words[0] == "SCAN" and "INDEX" not in detail:
+            seq_tables.add(words[1])
+    return nodes, seq_tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--client-id", type=int, help="Analizar con los datos existentes de este cliente")
+    target.add_argument("--seed", action="store_true", help="Crear datos sintéticos (se deshacen al terminar)")
+    parser.add_argument("--seed-clients", type=int, default=3, help="Clientes sintéticos")
+    parser.add_argument("--seed-users", type=int, default=200, help="Empleados por cliente")
+    parser.add_argument("--seed-days", type=int, default=90, help="Días de fichajes por empleado")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar el plan completo de cada consulta")
+    args = parser.parse_args()
+
+    with app.app_context():
+        with db.engine.connect() as conn:
+            trans = conn.begin()
+            try:
+                if args.seed:
+                    print(f"Sembrando {args.seed_clients} cliente(s) × {args.seed_users} empleados × {args.seed_days} días...")
+                    client_id = seed_dataset(conn, args.seed_clients, args.seed_users, args.seed_days)
+                else:
+                    client_id = args.client_id
+
+                if conn.dialect.name == "postgresql":
+                    # Con TENANT_ISOLATION_MODE=rls las políticas exigen el cliente de la transacción
+                    conn.execute(text("SELECT set_config('app.client_id', :cid, true)"), {"cid": str(client_id)})
+
+                params = query_params(conn, client_id)
+                problems = 0
+                print(f"\n📊 EXPLAIN de {len(HOT_QUERIES)} consultas ({conn.dialect.name}, cliente {client_id})\n")
+                for name, build in HOT_QUERIES.items():
+                    nodes, seq_tables = explain(conn, build(params))
+                    flagged = seq_tables & WATCHED_TABLES
+                    problems += bool(flagged)
+                    indexes = sorted({index for _, _, index in nodes if index and conn.dialect.name == "postgresql"})
+                    status = f"❌ Seq Scan en {', '.join(sorted(flagged))}" if flagged else "✅"
+                    used = f"  índices: {', '.join(indexes)}" if indexes else ""
+                    print(f"  {name:<24} {status}{used}")
+                    if args.verbose or flagged:
+                        for kind, table, extra in nodes:
+                            print(f"      {kind} {table or ''} {extra or ''}".rstrip())
+            finally:
+                trans.rollback()
+
+    print(f"\n{'❌' if problems else '✅'} {problems} consulta(s) con recorridos secuenciales en tablas vigiladas")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Activa o desactiva el aislamiento multitenant por row-level security (PostgreSQL).
+
+Las políticas las crea la migración tenant_rls_001; este script solo
+activa/desactiva RLS en las tablas. Orden recomendado al cambiar de modo:
+
+  1. python scripts/manage_tenant_rls.py enable
+  2. TENANT_ISOLATION_MODE=rls y reiniciar la aplicación
+
+y al volver atrás, primero TENANT_ISOLATION_MODE=python y después disable.
+
+Uso:
+  python scripts/manage_tenant_rls.py status
+  python scripts/manage_tenant_rls.py enable
+  python scripts/manage_tenant_rls.py disable
+
+Nota: los superusuarios y los roles con BYPASSRLS ignoran las políticas;
+la aplicación debe conectarse con un rol normal para que RLS tenga efecto.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from sqlalchemy import text
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from main import app
+from models.database import db, TenantScoped
+
+
+def rls_tables():
+    return sorted(
+        model.__tablename__
+        for model in TenantScoped.__subclasses__()
+        if model.__tenant_rls__
+    )
+
+
+def print_status():
+    rows = db.session.execute(text("""
+        SELECT c.relname, c.relrowsecurity, c.relforcerowsecurity,
+               (SELECT count(*) FROM pg_policies p WHERE p.tablename = c.relname) AS policies
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relname = ANY(:tables)
+        ORDER BY c.relname
+    """), {"tables": rls_tables()}).all()
+
+    role = db.session.execute(text("SELECT current_user, rolsuper, rolbypassrls FROM pg_roles WHERE rolname = current_user")).one()
+    print(f"Rol de conexión: {role[0]} (superuser={role[1]}, bypassrls={role[2]})")
+    for table, enabled, forced, policies in rows:
+        print(f"  {table:<25} RLS={'on' if enabled else 'off'} force={'on' if forced else 'off'} políticas={policies}")
+
+
+def set_rls(enable):
+    for table in rls_tables():
+        if enable:
+            db.session.execute(text(f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY"))
+            # FORCE: también para el propietario de la tabla (el usuario de la app)
+            db.session.execute(text(f"ALTER TABLE {table} FORCE ROW LEVEL SECURITY"))
+        else:
+            db.session.execute(text(f"ALTER TABLE {table} NO FORCE ROW LEVEL SECURITY"))
+            db.session.execute(text(f"ALTER TABLE {table} DISABLE ROW LEVEL SECURITY"))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["status", "enable", "disable"])
+    args = parser.parse_args()
+
+    with app.app_context():
+        if db.engine.dialect.name != "postgresql":
+            print("❌ Row-level security solo está disponible en PostgreSQL")
+            return 1
+
+        if args.command != "status":
+            set_rls(args.command == "enable")
+            print(f"✅ RLS {'activado' if args.command == 'enable' else 'desactivado'}")
+        print_status()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Reconstrucción y verificación de los totales user_day_summary / user_week_summary.
+
+Los totales se mantienen solos al fichar o editar registros; este script
+sirve para rellenarlos la primera vez (fuera de PostgreSQL), repararlos
+tras cargas masivas por SQL y comprobar que cuadran con los fichajes.
+
+Uso:
+  python scripts/rebuild_work_summaries.py --all
+  python scripts/rebuild_work_summaries.py --client-id 1 [--from 2025-01-01] [--to 2025-12-31]
+  python scripts/rebuild_work_summaries.py --all --check        (solo verificar; sale con 1 si hay diferencias)
+"""
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from main import app
+from models.database import db, tenant_bypass
+from models.models import Client
+from services.work_summary_service import rebuild_summaries, check_summaries
+
+# Diferencias que se muestran por cliente
+MAX_MISMATCHES_SHOWN = 20
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def format_totals(totals):
+    if totals is None:
+        return "(sin fila)"
+    return (
+        f"trabajado={totals.worked_seconds}s pausa={totals.pause_seconds}s "
+        f"efectivo={totals.effective_seconds}s fichajes={totals.record_count}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--client-id", type=int, help="ID del cliente")
+    target.add_argument("--all", action="store_true", help="Todos los clientes")
+    parser.add_argument("--from", dest="date_from", type=parse_date, help="Fecha inicial YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", type=parse_date, help="Fecha final YYYY-MM-DD (incluida)")
+    parser.add_argument("--check", action="store_true", help="Solo verificar, sin modificar")
+    args = parser.parse_args()
+
+    with app.app_context(), tenant_bypass():
+        if args.all:
+            client_ids = [c.id for c in Client.query.order_by(Client.id)]
+        else:
+            client_ids = [args.client_id]
+
+        total_mismatches = 0
+        for client_id in client_ids:
+            if args.check:
+                mismatches = check_summaries(client_id, args.date_from, args.date_to)
+                db.session.rollback()
+                total_mismatches += len(mismatches)
+                print(f"  Cliente {client_id}: {len(mismatches)} diferencias")
+                for m in mismatches[:MAX_MISMATCHES_SHOWN]:
+                    print(f"    {m.kind} U{m.user_id} {m.period}: esperado {format_totals(m.expected)}, "
+                          f"guardado {format_totals(m.stored)}")
+            else:
+                days = rebuild_summaries(client_id, args.date_from, args.date_to)
+                db.session.commit()
+                print(f"  Cliente {client_id}: {days} días reconstruidos")
+
+    if args.check:
+        if total_mismatches:
+            print("❌ Los totales no cuadran con los fichajes (ejecuta el script sin --check para repararlos)")
+            return 1
+        print("✅ Los totales cuadran con los fichajes")
+    else:
+        print("✅ Totales reconstruidos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
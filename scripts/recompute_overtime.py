@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Anotación y recálculo de horas extras por semanas (overtime_dirty_week).
+
+El job recompute_dirty_overtime procesa las semanas anotadas al fichar o
+editar; este script sirve para generar semanas que nunca se calcularon
+(datos anteriores al job, cargas masivas por SQL) o para vaciar la cola a
+mano. Con --year-totals reconstruye además el acumulado anual de
+overtime_year_total (sin generar avisos).
+
+Uso:
+  python scripts/recompute_overtime.py --all --from 2025-01-01 [--to 2025-12-31] [--run]
+  python scripts/recompute_overtime.py --client-id 1 --from 2025-06-02 --run
+  python scripts/recompute_overtime.py --run          (solo procesar la cola)
+  python scripts/recompute_overtime.py --all --year-totals [--year 2025]
+"""
+import argparse
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import select
+
+from main import app
+from models.database import db, tenant_bypass
+from models.models import Client, User
+from services.overtime_limits_service import rebuild_year_totals
+from services.overtime_service import get_week_bounds, recompute_dirty_weeks
+from services.work_summary_service import mark_weeks_dirty
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def mark_range(client_id, date_from, date_to):
+    """Anota todas las semanas del rango para los empleados activos con jornada. Devuelve cuántas."""
+    user_ids = db.session.execute(
+        select(User.id).where(
+            User.client_id == client_id, User.is_active.is_(True), User.weekly_hours > 0
+        )
+    ).scalars().all()
+    week_start, _ = get_week_bounds(date_from)
+    weeks = []
+    while week_start <= date_to:
+        weeks.append(week_start)
+        week_start += timedelta(days=7)
+    mark_weeks_dirty(db.session.connection(), client_id, {(u, w) for u in user_ids for w in weeks})
+    db.session.commit()
+    return len(user_ids) * len(weeks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--client-id", type=int, help="ID del cliente")
+    target.add_argument("--all", action="store_true", help="Todos los clientes activos")
+    parser.add_argument("--from", dest="date_from", type=parse_date, help="Fecha inicial YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", type=parse_date,
+                        help="Fecha final YYYY-MM-DD (por defecto, la semana pasada)")
+    parser.add_argument("--run", action="store_true", help="Procesar la cola hasta vaciarla")
+    parser.add_argument("--year-totals", action="store_true",
+                        help="Reconstruir el acumulado anual de horas extras")
+    parser.add_argument("--year", type=int, help="Año a reconstruir con --year-totals (por defecto, todos)")
+    args = parser.parse_args()
+
+    targeted = args.client_id or args.all
+    if targeted and not (args.date_from or args.year_totals):
+        parser.error("indica --from para anotar semanas o --year-totals")
+    if args.year_totals and not targeted:
+        parser.error("--year-totals necesita --client-id o --all")
+    if not (targeted or args.run):
+        parser.error("indica --client-id/--all con --from o --year-totals, o --run")
+
+    with app.app_context(), tenant_bypass():
+        if targeted:
+            if args.all:
+                client_ids = db.session.execute(
+                    select(Client.id).where(Client.is_active.is_(True)).order_by(Client.id)
+                ).scalars().all()
+            else:
+                client_ids = [args.client_id]
+        if targeted and args.date_from:
+            date_to = args.date_to or date.today() - timedelta(days=7)
+            for client_id in client_ids:
+                marked = mark_range(client_id, args.date_from, date_to)
+                print(f"  Cliente {client_id}: {marked} semanas de empleado anotadas")
+
+        if args.run:
+            while True:
+                result = recompute_dirty_weeks()
+                print(f"  {result['entries']} semanas recalculadas "
+                      f"({result['created']} creadas, {result['updated']} actualizadas), "
+                      f"{result['remaining']} pendientes")
+                if result["errors"]:
+                    print("❌ Errores al recalcular (ver el log)")
+                    return 1
+                if not result["remaining"] or not result["entries"]:
+                    break
+
+        # Después de --run, para incluir las entradas recién generadas
+        if args.year_totals:
+            for client_id in client_ids:
+                rebuilt = rebuild_year_totals(client_id, args.year)
+                db.session.commit()
+                print(f"  Cliente {client_id}: {rebuilt} acumulados anuales reconstruidos")
+
+    print("✅ Hecho")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Re-sellado de firmas tras rotar la clave de firma (SIGNING_KEY_Vn).
+
+Verifica cada firma con su clave antigua y crea una firma nueva con la
+versión destino. Es reanudable: cada partición guarda su checkpoint en
+reseal_checkpoint y una nueva ejecución continúa donde se quedó.
+
+Pasos de una rotación:
+  1. Añadir SIGNING_KEY_V2 al entorno (manteniendo SIGNING_KEY_V1).
+  2. Subir SIGNING_KEY_CURRENT_VERSION=2 para que los fichajes nuevos usen V2.
+  3. Ejecutar este script hasta que todas las particiones estén en "done".
+
+Uso:
+  python scripts/reseal_signatures.py --from-version 1 --to-version 2
+  python scripts/reseal_signatures.py --from-version 1 --to-version 2 --parallel 4 --sleep 0.2
+  python scripts/reseal_signatures.py --from-version 1 --to-version 2 --worker-index 0 --worker-count 4
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from-version", type=int, required=True, help="Versión de clave actual de las firmas")
+    parser.add_argument("--to-version", type=int, required=True, help="Versión de clave nueva")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Firmas por bloque/transacción")
+    parser.add_argument("--sleep", type=float, default=0.0, help="Pausa en segundos entre bloques (throttling)")
+    parser.add_argument("--max-chunks", type=int, help="Parar tras N bloques (se reanuda en la siguiente ejecución)")
+    parser.add_argument("--parallel", type=int, help="Lanzar N procesos, uno por partición")
+    parser.add_argument("--worker-index", type=int, default=0, help="Partición a procesar (0..worker-count-1)")
+    parser.add_argument("--worker-count", type=int, default=1, help="Número total de particiones")
+    return parser
+
+
+def run_parallel(args):
+    """Lanza un proceso hijo por partición y espera a que terminen todos."""
+    base = [
+        sys.executable, __file__,
+        "--from-version", str(args.from_version),
+        "--to-version", str(args.to_version),
+        "--chunk-size", str(args.chunk_size),
+        "--sleep", str(args.sleep),
+        "--worker-count", str(args.parallel),
+    ]
+    if args.max_chunks:
+        base += ["--max-chunks", str(args.max_chunks)]
+
+    processes = [
+        subprocess.Popen(base + ["--worker-index", str(index)])
+        for index in range(args.parallel)
+    ]
+    codes = [process.wait() for process in processes]
+    return 0 if all(code == 0 for code in codes) else 1
+
+
+def main():
+    args = build_parser().parse_args()
+
+    if args.from_version == args.to_version:
+        print("❌ La versión origen y destino deben ser distintas")
+        return 1
+
+    if args.parallel and args.parallel > 1:
+        return run_parallel(args)
+
+    from main import app
+    from models.database import tenant_bypass
+    from services.reseal_service import run_reseal
+
+    with app.app_context(), tenant_bypass():
+        checkpoint = run_reseal(
+            args.from_version,
+            args.to_version,
+            worker_index=args.worker_index,
+            worker_count=args.worker_count,
+            chunk_size=args.chunk_size,
+            sleep_seconds=args.sleep,
+            max_chunks=args.max_chunks
+        )
+        print(
+            f"Partición {checkpoint.worker_index}/{checkpoint.worker_count}: "
+            f"{checkpoint.resealed_count} re-selladas, {checkpoint.invalid_count} inválidas, "
+            f"último id {checkpoint.last_signature_id} ({checkpoint.status})"
+        )
+        return 1 if checkpoint.invalid_count else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Verificación masiva de firmas de fichajes de un cliente.
+
+Pensado para inspecciones de trabajo: verifica años de fichajes por
+bloques y en paralelo, y guarda el resultado en signature_verification_report.
+
+Uso:
+  python scripts/verify_signatures.py --client-id 1 [--from 2023-01-01] [--to 2025-12-31]
+  python scripts/verify_signatures.py --client-id 1 --incremental
+  python scripts/verify_signatures.py --all --incremental    (igual que el job nocturno)
+"""
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Agregar el directorio raíz al path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from main import app
+from models.database import tenant_bypass
+from services.verification_service import (
+    verify_signatures_bulk, run_nightly_verification, DEFAULT_CHUNK_SIZE
+)
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--client-id", type=int, help="ID del cliente a verificar")
+    target.add_argument("--all", action="store_true", help="Todos los clientes activos (solo incremental)")
+    parser.add_argument("--from", dest="date_from", type=parse_date, help="Fecha inicial YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", type=parse_date, help="Fecha final YYYY-MM-DD (incluida)")
+    parser.add_argument("--incremental", action="store_true", help="Solo firmas nuevas desde la última ejecución")
+    parser.add_argument("--workers", type=int, help="Procesos en paralelo (por defecto VERIFY_WORKERS o nº de CPUs)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Firmas por bloque")
+    args = parser.parse_args()
+
+    with app.app_context(), tenant_bypass():
+        if args.all:
+            summary = run_nightly_verification(workers=args.workers)
+            invalid = sum(bad for _, bad in summary.values())
+            for client_id, (total, bad) in summary.items():
+                print(f"  Cliente {client_id}: {total} verificadas, {bad} inválidas")
+            return 1 if invalid else 0
+
+        report = verify_signatures_bulk(
+            args.client_id,
+            date_from=args.date_from,
+            date_to=args.date_to,
+            incremental=args.incremental,
+            workers=args.workers,
+            chunk_size=args.chunk_size
+        )
+
+    rate = report.total_checked / report.duration_seconds if report.duration_seconds else 0
+    print(f"Informe #{report.id} ({report.mode})")
+    print(f"  Firmas verificadas: {report.total_checked} en {report.duration_seconds}s ({rate:.0f}/s)")
+    print(f"  Válidas: {report.valid_count}")
+    print(f"  Inválidas: {report.invalid_count}")
+    if report.pending_count:
+        print(f"  Pendientes de lote Merkle: {report.pending_count}")
+    if report.key_unavailable_count:
+        print(f"  Con clave no disponible (SIGNING_KEY_Vn retirada): {report.key_unavailable_count}")
+    if report.invalid_count:
+        print(f"  IDs inválidos (primeros): {report.invalid_signature_ids}")
+        print("❌ Hay firmas que no superan la verificación")
+        return 1
+
+    print("✅ Todas las firmas son válidas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""
+Eventos en vivo para las pantallas de administración (fichajes, pausas y
+solicitudes), en lugar de sondear la BD cada pocos segundos.
+
+Las rutas de escritura (routes/time.py) anuncian el evento con notify()
+antes del commit: se publica solo si la transacción se confirma
+(after_commit) y se descarta si se deshace. Cada evento pertenece a un
+cliente y a un centro; lo reciben los super admin del cliente y los admin
+de ese centro.
+
+Transportes (LIVE_EVENTS_TRANSPORT):
+- "socketio": Flask-SocketIO empuja el evento a las salas del cliente y
+  del centro. Con varios workers necesita SOCKETIO_MESSAGE_QUEUE (Redis)
+  y sesiones persistentes en el balanceador.
+- "longpoll" (por defecto): GET /admin/live/events?after=<seq> lee los
+  eventos nuevos de la caché, sin consultar la BD. Con LIVE_POLL_TIMEOUT=0
+  (por defecto) responde al momento y el navegador repite cada
+  LIVE_POLL_INTERVAL: apto para el worker síncrono de un solo thread.
+  Con LIVE_POLL_TIMEOUT > 0 espera hasta ese tiempo a que haya eventos;
+  necesita varios threads por worker (GUNICORN_THREADS, worker gthread) y
+  como mucho LIVE_POLL_MAX_WAITERS peticiones esperan a la vez en cada
+  proceso (las demás responden al momento), para que las pestañas de admin
+  abiertas no ocupen los threads que necesitan los fichajes.
+- "off": sin canal; las pantallas vuelven a sondear como antes.
+
+Los eventos se guardan en la caché compartida (utils/shared_cache.py) con
+una secuencia por cliente y caducan a los LIVE_EVENTS_TTL segundos: los
+long-poll de cualquier worker los leen de ahí (con CACHE_BACKEND "memory"
+solo ven los publicados en su propio proceso). Dos publicaciones
+simultáneas en workers distintos pueden obtener la misma secuencia y
+perderse una: los eventos son avisos para refrescar, no la fuente de datos.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from utils.logging_utils import get_logger
+from utils.principal import get_current_principal
+from utils.shared_cache import cache, cache_ready
+
+try:
+    from flask_socketio import SocketIO, join_room
+    SOCKETIO_AVAILABLE = True
+except ImportError:
+    SOCKETIO_AVAILABLE = False
+
+logger = get_logger(__name__)
+
+CHECK_IN = "check_in"
+CHECK_OUT = "check_out"
+PAUSE_START = "pause_start"
+PAUSE_END = "pause_end"
+LEAVE_REQUEST = "leave_request"
+
+TRANSPORTS = ("socketio", "longpoll", "off")
+DEFAULT_POLL_TIMEOUT = 0
+DEFAULT_POLL_INTERVAL = 15
+DEFAULT_POLL_MAX_WAITERS = 2
+DEFAULT_EVENTS_BUFFER = 200
+DEFAULT_EVENTS_TTL = 600
+
+# Cada cuánto se vuelve a mirar la caché durante la espera (eventos de
+# otros workers; los del propio proceso despiertan al momento)
+_CHECK_INTERVAL_SECONDS = 1.0
+_PENDING_EVENTS = "live_events_pending"
+
+socketio = SocketIO() if SOCKETIO_AVAILABLE else None
+_published = threading.Condition()
+_waiters_lock = threading.Lock()
+_waiters = 0
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def get_live_transport():
+    """Transporte configurado en LIVE_EVENTS_TRANSPORT ("longpoll" si no es válido o falta Flask-SocketIO)."""
+    transport = os.getenv("LIVE_EVENTS_TRANSPORT", "longpoll").lower()
+    if transport not in TRANSPORTS:
+        return "longpoll"
+    if transport == "socketio" and not SOCKETIO_AVAILABLE:
+        return "longpoll"
+    return transport
+
+
+def get_poll_timeout():
+    return max(_env_int("LIVE_POLL_TIMEOUT", DEFAULT_POLL_TIMEOUT), 0)
+
+
+def get_poll_interval():
+    return max(_env_int("LIVE_POLL_INTERVAL", DEFAULT_POLL_INTERVAL), 1)
+
+
+def get_poll_max_waiters():
+    return max(_env_int("LIVE_POLL_MAX_WAITERS", DEFAULT_POLL_MAX_WAITERS), 0)
+
+
+@contextmanager
+def poll_slot():
+    """
+    Turno de espera de un long-poll en este proceso. Devuelve los segundos
+    que puede esperar la petición: LIVE_POLL_TIMEOUT si hay hueco entre los
+    LIVE_POLL_MAX_WAITERS, 0 (responder al momento) si no.
+    """
+    global _waiters
+    timeout = get_poll_timeout()
+    acquired = False
+    if timeout:
+        with _waiters_lock:
+            if _waiters < get_poll_max_waiters():
+                _waiters += 1
+                acquired = True
+    try:
+        yield timeout if acquired else 0
+    finally:
+        if acquired:
+            with _waiters_lock:
+                _waiters -= 1
+
+
+def init_live_events(app):
+    """
+    Activa el transporte configurado. Con "socketio" envuelve la app WSGI
+    (gunicorn sigue sirviendo wsgi:app) y registra la conexión de los admins.
+    """
+    transport = get_live_transport()
+    if transport == "socketio":
+        socketio.init_app(
+            app,
+            message_queue=os.getenv("SOCKETIO_MESSAGE_QUEUE") or None,
+            manage_session=False,
+        )
+        socketio.on_event("connect", _on_connect)
+    elif os.getenv("LIVE_EVENTS_TRANSPORT", "").lower() == "socketio":
+        logger.error("LIVE_EVENTS_TRANSPORT=socketio sin Flask-SocketIO instalado; se usa 'longpoll'")
+
+    app.config["LIVE_EVENTS_TRANSPORT"] = transport
+    app.config["LIVE_POLL_INTERVAL"] = get_poll_interval()
+    app.logger.info(f"Live events transport: {transport}")
+    return transport
+
+
+def _room(client_id, center_id=None):
+    if center_id is None:
+        return f"client:{client_id}"
+    return f"client:{client_id}:center:{center_id}"
+
+
+def _on_connect(auth=None):
+    """Solo admins: sala del cliente (super admin) o de su centro (admin de centro)."""
+    principal = get_current_principal()
+    if principal is None or not principal.is_admin:
+        return False
+    join_room(_room(principal.client_id, principal.center_scope))
+    return True
+
+
+# --------------------------------------------------------------------
+#  Publicación (después del commit)
+# --------------------------------------------------------------------
+def notify(session, event_type, client_id, center_id=None, **data):
+    """
+    Anuncia un evento que se publicará cuando session confirme la
+    transacción (no se publica si se deshace).
+
+    Args:
+        event_type: CHECK_IN, CHECK_OUT, PAUSE_START, PAUSE_END o LEAVE_REQUEST
+        center_id: centro del empleado (None si no tiene)
+        data: datos simples del evento (ids, tipo, estado...)
+    """
+    if get_live_transport() == "off":
+        return
+    live_event = {
+        "type": event_type,
+        "center_id": center_id,
+        "at": datetime.utcnow().isoformat(timespec="seconds"),
+        **data,
+    }
+    session.info.setdefault(_PENDING_EVENTS, []).append((client_id, live_event))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    for client_id, live_event in session.info.pop(_PENDING_EVENTS, ()):
+        publish(client_id, live_event)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session, previous_transaction):
+    session.info.pop(_PENDING_EVENTS, None)
+
+
+def _seq_key(client_id):
+    return f"live:{client_id}:seq"
+
+
+def _event_key(client_id, seq):
+    return f"live:{client_id}:{seq}"
+
+
+def _last_seq(client_id):
+    try:
+        return cache.get(_seq_key(client_id)) or 0
+    except Exception as e:
+        logger.warning(f"No se pudo leer la secuencia de eventos del cliente {client_id}: {e}")
+        return 0
+
+
+def publish(client_id, live_event):
+    """Publica ya un evento del cliente (normalmente vía notify + commit)."""
+    if cache_ready():
+        try:
+            # Sin caducidad: si volviese a 0 los clientes esperarían una secuencia ya pasada
+            seq = _last_seq(client_id) + 1
+            cache.set(_seq_key(client_id), seq, timeout=0)
+            live_event = dict(live_event, seq=seq)
+            cache.set(_event_key(client_id, seq), live_event,
+                      timeout=_env_int("LIVE_EVENTS_TTL", DEFAULT_EVENTS_TTL))
+        except Exception as e:
+            # Un aviso perdido no debe romper la escritura ya confirmada
+            logger.warning(f"No se pudo guardar el evento {live_event['type']} del cliente {client_id}: {e}")
+
+    with _published:
+        _published.notify_all()
+
+    if get_live_transport() == "socketio":
+        try:
+            socketio.emit("live_event", live_event, to=_room(client_id))
+            if live_event.get("center_id") is not None:
+                socketio.emit("live_event", live_event, to=_room(client_id, live_event["center_id"]))
+        except Exception as e:
+            logger.warning(f"No se pudo emitir el evento {live_event['type']} del cliente {client_id}: {e}")
+
+
+# --------------------------------------------------------------------
+#  Lectura (long-poll)
+# --------------------------------------------------------------------
+def read_events(client_id, after, center_id=None):
+    """
+    Eventos del cliente con secuencia posterior a after, del centro
+    center_id (None = todos).
+
+    Returns:
+        tuple: (eventos, última secuencia, reset). reset es True si after
+        ya no se puede continuar (eventos caducados o secuencia reiniciada)
+        y la pantalla debe recargar sus datos.
+    """
+    last = _last_seq(client_id)
+    if after is None:
+        return [], last, False
+    if after > last:
+        return [], last, True
+
+    first = max(after + 1, last - _env_int("LIVE_EVENTS_BUFFER", DEFAULT_EVENTS_BUFFER) + 1)
+    if first > last:
+        return [], last, False
+    try:
+        stored = cache.get_many(*[_event_key(client_id, seq) for seq in range(first, last + 1)])
+    except Exception as e:
+        logger.warning(f"No se pudieron leer los eventos del cliente {client_id}: {e}")
+        return [], last, True
+
+    events = [
+        live_event for live_event in stored
+        if live_event is not None and (center_id is None or live_event.get("center_id") == center_id)
+    ]
+    return events, last, first > after + 1
+
+
+def wait_for_events(client_id, after, center_id=None, timeout=None):
+    """
+    read_events esperando hasta timeout segundos (LIVE_POLL_TIMEOUT por
+    defecto) a que haya algún evento. No usa la BD: la vista debe liberar
+    antes su conexión.
+    """
+    timeout = get_poll_timeout() if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    while True:
+        events, last, reset = read_events(client_id, after, center_id)
+        remaining = deadline - time.monotonic()
+        if events or reset or after is None or remaining <= 0:
+            return events, last, reset
+        # Los eventos de otros centros ya leídos no se vuelven a leer
+        after = last
+        with _published:
+            _published.wait(min(_CHECK_INTERVAL_SECONDS, remaining))
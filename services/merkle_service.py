@@ -0,0 +1,302 @@
+"""
+Sellado por lotes Merkle (Ley de Fichajes).
+
+Las firmas de un cliente en una ventana de tiempo (MERKLE_WINDOW_MINUTES)
+se agrupan en un árbol Merkle cuyas hojas son los content_hash de cada
+fichaje. Se firma solo la raíz (HMAC con TimestampService.sign_hash) y
+cada firma guarda su prueba de inclusión, verificable en O(log n).
+
+Modos (MERKLE_SEALING):
+- "off":       sin lotes (por defecto)
+- "additive":  se mantiene la firma HMAC de cada fichaje y además se agrupan en lotes
+- "root_only": los fichajes se guardan sin firma individual; la firma de la raíz
+               del lote los cubre a todos (menos almacenamiento de firmas)
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+
+from models.models import TimeRecordSignature, SealBatch
+from models.database import db
+from services.timestamp_service import TimestampService
+from utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+MERKLE_SEALING_MODES = ("off", "additive", "root_only")
+DEFAULT_MERKLE_WINDOW_MINUTES = 60
+DEFAULT_MERKLE_BATCH_LIMIT = 5000
+
+# Espacio de claves para pg_try_advisory_xact_lock(int4, int4) (ver punch_service)
+MERKLE_LOCK_NAMESPACE = 7302
+
+
+def get_merkle_mode():
+    """
+    Devuelve el modo configurado en MERKLE_SEALING.
+    Cualquier valor desconocido se trata como "off".
+    """
+    mode = os.getenv("MERKLE_SEALING", "off").lower()
+    return mode if mode in MERKLE_SEALING_MODES else "off"
+
+
+def is_root_only():
+    return get_merkle_mode() == "root_only"
+
+
+def get_window_minutes():
+    try:
+        return max(1, int(os.getenv("MERKLE_WINDOW_MINUTES", DEFAULT_MERKLE_WINDOW_MINUTES)))
+    except ValueError:
+        return DEFAULT_MERKLE_WINDOW_MINUTES
+
+
+def get_batch_limit():
+    """Firmas que agrupa como máximo cada ejecución (MERKLE_BATCH_LIMIT)."""
+    try:
+        return max(1, int(os.getenv("MERKLE_BATCH_LIMIT", DEFAULT_MERKLE_BATCH_LIMIT)))
+    except ValueError:
+        return DEFAULT_MERKLE_BATCH_LIMIT
+
+
+# ------------------------------------------------------------------
+#  Árbol Merkle
+# ------------------------------------------------------------------
+def merkle_parent(left, right):
+    """Hash de un nodo interno a partir de sus dos hijos."""
+    return TimestampService.generate_content_hash({"left": left, "right": right})
+
+
+def build_merkle_levels(leaves):
+    """
+    Construye el árbol completo.
+
+    Un nodo sin pareja sube tal cual al nivel siguiente (no se duplica),
+    por lo que su prueba simplemente no tiene paso en ese nivel.
+
+    Returns:
+        list: niveles del árbol, de las hojas (0) a la raíz (último)
+    """
+    if not leaves:
+        raise ValueError("No se puede construir un árbol Merkle sin hojas")
+
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        current = levels[-1]
+        parents = []
+        for i in range(0, len(current), 2):
+            if i + 1 < len(current):
+                parents.append(merkle_parent(current[i], current[i + 1]))
+            else:
+                parents.append(current[i])
+        levels.append(parents)
+    return levels
+
+
+def merkle_proof(levels, index):
+    """
+    Prueba de inclusión de la hoja index.
+
+    Returns:
+        list: [["L"|"R", hash_hermano], ...] desde la hoja hasta la raíz
+    """
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(["L" if sibling < index else "R", level[sibling]])
+        index //= 2
+    return proof
+
+
+def root_from_proof(leaf, proof):
+    """Recalcula la raíz a partir de una hoja y su prueba."""
+    node = leaf
+    for side, sibling in proof:
+        node = merkle_parent(sibling, node) if side == "L" else merkle_parent(node, sibling)
+    return node
+
+
+# ------------------------------------------------------------------
+#  Construcción de lotes
+# ------------------------------------------------------------------
+def _window_start(moment, window_minutes):
+    minutes = (moment.hour * 60 + moment.minute) // window_minutes * window_minutes
+    return datetime.combine(moment.date(), datetime.min.time()) + timedelta(minutes=minutes)
+
+
+def _try_lock_batches():
+    """
+    Una sola construcción de lotes a la vez (scheduler de cada worker y
+    /admin/cron/seals): dos ejecuciones simultáneas leerían las mismas
+    firmas sin lote y la segunda reescribiría batch_id/leaf_index del primer
+    lote, que ya no se podría verificar. En PostgreSQL toma un advisory lock
+    de transacción sin esperar; en otros motores (SQLite local) no hace nada.
+
+    Returns:
+        bool: False si otra ejecución tiene el lock
+    """
+    bind = db.session.get_bind()
+    if not bind or bind.dialect.name != "postgresql":
+        return True
+    return bool(db.session.execute(
+        text("SELECT pg_try_advisory_xact_lock(:namespace, 0)"),
+        {"namespace": MERKLE_LOCK_NAMESPACE}
+    ).scalar())
+
+
+def build_seal_batches(now=None, window_minutes=None, limit=None):
+    """
+    Agrupa en lotes las firmas aún sin lote de las ventanas ya cerradas.
+
+    Cada ejecución toma como máximo limit firmas (MERKLE_BATCH_LIMIT), las
+    más antiguas de cada cliente, y crea todos sus lotes en una sola
+    transacción, bajo el lock de _try_lock_batches. El resto queda para las
+    siguientes ejecuciones.
+
+    Returns:
+        int: número de lotes creados
+    """
+    window_minutes = window_minutes or get_window_minutes()
+    limit = limit or get_batch_limit()
+    now = now or datetime.utcnow()
+    closed_before = _window_start(now, window_minutes)
+    key_version = TimestampService.get_current_key_version()
+
+    if not _try_lock_batches():
+        db.session.rollback()
+        logger.info("Sellado Merkle: otra ejecución está construyendo lotes; se omite esta")
+        return 0
+
+    rows = db.session.execute(
+        select(
+            TimeRecordSignature.id,
+            TimeRecordSignature.client_id,
+            TimeRecordSignature.timestamp_utc,
+            TimeRecordSignature.content_hash,
+        )
+        .where(
+            TimeRecordSignature.batch_id.is_(None),
+            TimeRecordSignature.timestamp_utc < closed_before,
+        )
+        .order_by(TimeRecordSignature.client_id, TimeRecordSignature.timestamp_utc, TimeRecordSignature.id)
+        .limit(limit)
+    ).all()
+
+    groups = {}
+    for sig_id, client_id, timestamp_utc, content_hash in rows:
+        key = (client_id, _window_start(timestamp_utc, window_minutes))
+        groups.setdefault(key, []).append((sig_id, content_hash))
+
+    # Con el límite alcanzado la última ventana puede estar incompleta: se
+    # deja para la siguiente ejecución salvo que sea la única (ventana mayor que el límite)
+    if len(rows) == limit and len(groups) > 1:
+        groups.popitem()
+
+    created = 0
+    signatures = 0
+    for (client_id, window_start), leaves in groups.items():
+        # Las firmas que llegan tarde a una ventana ya sellada forman un lote propio
+        levels = build_merkle_levels([content_hash for _, content_hash in leaves])
+        root = levels[-1][0]
+        batch = SealBatch(
+            client_id=client_id,
+            window_start=window_start,
+            window_end=window_start + timedelta(minutes=window_minutes),
+            leaf_count=len(leaves),
+            merkle_root=root,
+            root_signature=TimestampService.sign_hash(root, key_version),
+            key_version=key_version
+        )
+        db.session.add(batch)
+        db.session.flush()
+
+        db.session.bulk_update_mappings(TimeRecordSignature, [
+            {
+                "id": sig_id,
+                "batch_id": batch.id,
+                "leaf_index": index,
+                "merkle_proof": json.dumps(merkle_proof(levels, index)),
+            }
+            for index, (sig_id, _) in enumerate(leaves)
+        ])
+        created += 1
+        signatures += len(leaves)
+
+    # Un solo commit: el lock se mantiene hasta que todos los lotes están escritos
+    db.session.commit()
+
+    if created:
+        logger.info(f"Sellado Merkle: {created} lote(s) creados con {signatures} firma(s)")
+    return created
+
+
+# ------------------------------------------------------------------
+#  Verificación
+# ------------------------------------------------------------------
+def verify_batch_root(batch):
+    """Comprueba la firma HMAC de la raíz de un lote."""
+    return TimestampService.verify_signature(batch.merkle_root, batch.root_signature, batch.key_version)
+
+
+def verify_leaf(signature_record):
+    """
+    Verifica en O(log n) que una firma pertenece a su lote y que la raíz
+    del lote está firmada. No recalcula el content_hash (lo hace el llamador).
+    """
+    batch = signature_record.batch
+    if batch is None or not signature_record.merkle_proof:
+        return False
+    proof = json.loads(signature_record.merkle_proof)
+    if root_from_proof(signature_record.content_hash, proof) != batch.merkle_root:
+        return False
+    return verify_batch_root(batch)
+
+
+def verify_batch(batch_id):
+    """
+    Verificación completa de un lote: recalcula la raíz con todas sus hojas.
+
+    Returns:
+        bool: True si la raíz coincide y su firma es válida
+    """
+    batch = db.session.get(SealBatch, batch_id)
+    if batch is None:
+        return False
+
+    leaves = db.session.execute(
+        select(TimeRecordSignature.content_hash)
+        .where(TimeRecordSignature.batch_id == batch_id)
+        .order_by(TimeRecordSignature.leaf_index)
+    ).scalars().all()
+
+    if len(leaves) != batch.leaf_count:
+        return False
+    return build_merkle_levels(leaves)[-1][0] == batch.merkle_root and verify_batch_root(batch)
+
+
+def verify_period(client_id, start, end):
+    """
+    Comprobación de integridad de un periodo completo: un árbol por lote.
+
+    Returns:
+        dict: batches, valid, invalid_batch_ids
+    """
+    batch_ids = db.session.execute(
+        select(SealBatch.id)
+        .where(
+            SealBatch.client_id == client_id,
+            SealBatch.window_start >= start,
+            SealBatch.window_start < end,
+        )
+        .order_by(SealBatch.window_start)
+    ).scalars().all()
+
+    invalid = [batch_id for batch_id in batch_ids if not verify_batch(batch_id)]
+    return {
+        "batches": len(batch_ids),
+        "valid": len(batch_ids) - len(invalid),
+        "invalid_batch_ids": invalid,
+    }
@@ -0,0 +1,337 @@
+"""
+Resumen de notificaciones de admin (campanita) en una sola petición.
+
+GET /admin/notifications/summary devuelve todos los contadores (solicitudes
+pendientes por tipo, horas extras pendientes y procesadas, bajas
+auto-aprobadas) y los últimos elementos de cada lista. Los contadores salen
+de una sola consulta (UNION ALL de COUNT ... GROUP BY) y los ids de los
+últimos elementos de otra; después se cargan esas filas con su empleado.
+
+Versión por cliente: las escrituras de leave_request y overtime_entry (y
+los cambios de centro o nombre de un empleado) marcan el cliente en la
+sesión; tras el commit se incrementa la generación "notifications:<id>"
+de la caché compartida (utils/shared_cache.py). El ETag del resumen se
+construye con esa generación, el centro del admin, la fecha (las semanas
+completadas y la ventana de 7 días cambian cada día) y un tramo de
+NOTIFICATIONS_ETAG_TTL segundos, que acota la respuesta obsoleta si otro
+worker no ve la generación (CACHE_BACKEND "memory"). Un sondeo sin
+cambios responde 304 sin consultar estas tablas: solo queda la lectura por
+PK de User.auth_version con la que admin_required valida al usuario
+(utils/principal.py), que no se puede saltar sin perder las revocaciones.
+
+Las escrituras masivas que no pasan por el flush del ORM (upsert de
+overtime_service) deben llamar a mark_notifications_changed().
+"""
+import os
+import re
+import time
+from datetime import timedelta
+
+from sqlalchemy import String, cast, event, func, literal, null, select, union_all
+from sqlalchemy.orm import Session, attributes, joinedload
+
+from models.models import LeaveRequest, OvertimeEntry, User
+from models.database import db
+from utils.shared_cache import bump_generation, cache_ready, get_generation
+from utils.timezone_utils import get_now_spain
+
+DEFAULT_ETAG_TTL = 300
+
+PENDING_REQUESTS_LIMIT = 50
+OVERTIME_ITEMS_LIMIT = 5
+AUTO_LEAVES_LIMIT = 20
+AUTO_LEAVES_DAYS = 7
+
+PROCESSED_STATUSES = ("Aprobado", "Ajustado", "Rechazado")
+AUTO_LEAVE_TYPES = ("Baja médica", "Ausencia justificada", "Ausencia injustificada")
+ABSENCE_TYPES = ("Ausencia justificada", "Ausencia injustificada", "Permiso especial")
+
+# Campos del empleado que se muestran o deciden el centro del admin que ve la notificación
+_USER_ATTRIBUTES = ("center_id", "full_name", "username", "is_active")
+
+_PENDING_KEY = "notifications_changed"
+
+# Flask-Compress (main.py) añade ":<algoritmo>" al ETag de las respuestas comprimidas
+_COMPRESSED_ETAG_SUFFIX = re.compile(r":(?:gzip|br|deflate|zstd)$")
+
+
+def get_etag_ttl():
+    try:
+        return max(int(os.getenv("NOTIFICATIONS_ETAG_TTL", DEFAULT_ETAG_TTL)), 1)
+    except ValueError:
+        return DEFAULT_ETAG_TTL
+
+
+def notifications_scope(client_id):
+    """Ámbito de invalidación compartido de las notificaciones de un cliente."""
+    return f"notifications:{client_id}"
+
+
+def summary_etag(client_id, center_id=None):
+    """
+    Versión del resumen para el cliente y el centro del admin, o None si
+    la caché compartida no está disponible (no hay forma de saber si ha
+    cambiado y hay que calcularlo siempre).
+    """
+    if not client_id or not cache_ready():
+        return None
+    generation = get_generation(notifications_scope(client_id))
+    today = get_now_spain().date()
+    window = int(time.time() // get_etag_ttl())
+    return f"notif-{client_id}-{center_id or 0}-{generation}-{today.isoformat()}-{window}"
+
+
+def etag_matches(if_none_match, etag):
+    """
+    True si la cabecera If-None-Match (request.if_none_match) incluye etag,
+    también en la forma que devuelve el navegador tras una respuesta
+    comprimida (W/"notif-...:br").
+    """
+    if if_none_match.star_tag:
+        return True
+    return any(
+        _COMPRESSED_ETAG_SUFFIX.sub("", tag) == etag
+        for tag in if_none_match.as_set(include_weak=True)
+    )
+
+
+# --------------------------------------------------------------------
+#  Invalidación (eventos de sesión)
+# --------------------------------------------------------------------
+def mark_notifications_changed(client_id, session=None):
+    """
+    Anota el cliente para cambiar su versión de notificaciones en el
+    commit. Necesario tras escrituras masivas que no pasan por el flush.
+    """
+    session = session or db.session
+    session.info.setdefault(_PENDING_KEY, set()).add(client_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    changed = set()
+    for obj in session.new | session.deleted:
+        if isinstance(obj, (LeaveRequest, OvertimeEntry)) or (isinstance(obj, User) and obj in session.deleted):
+            changed.add(obj.client_id)
+    for obj in session.dirty:
+        if isinstance(obj, (LeaveRequest, OvertimeEntry)):
+            if session.is_modified(obj, include_collections=False):
+                changed.add(obj.client_id)
+        elif isinstance(obj, User):
+            state = attributes.instance_state(obj)
+            if any(state.attrs[name].history.has_changes() for name in _USER_ATTRIBUTES):
+                changed.add(obj.client_id)
+    changed.discard(None)
+    if changed:
+        session.info.setdefault(_PENDING_KEY, set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session):
+    for client_id in session.info.pop(_PENDING_KEY, ()):
+        bump_generation(notifications_scope(client_id))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_changes(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
+
+
+# --------------------------------------------------------------------
+#  Consultas
+# --------------------------------------------------------------------
+def _scoped(statement, model, client_id, center_id):
+    statement = statement.select_from(model).where(model.client_id == client_id)
+    if center_id:
+        statement = statement.join(User, model.user_id == User.id).where(User.center_id == center_id)
+    return statement
+
+
+def _count_rows(kind, model, key, client_id, center_id, *conditions):
+    # (tipo, clave, número) agrupado por clave
+    grouped = key is not None
+    key = cast(key, String) if grouped else cast(null(), String)
+    statement = select(
+        literal(kind, String).label("kind"), key.label("key"), func.count().label("value")
+    ).where(*conditions)
+    statement = _scoped(statement, model, client_id, center_id)
+    return statement.group_by(key) if grouped else statement
+
+
+def _latest_ids(kind, model, client_id, center_id, order_column, limit, *conditions):
+    # (tipo, NULL, id) de las últimas filas; en subconsulta porque SQLite no
+    # admite ORDER BY/LIMIT en cada rama de un UNION
+    latest = _scoped(select(model.id), model, client_id, center_id).where(*conditions)
+    latest = latest.order_by(order_column.desc(), model.id.desc()).limit(limit).subquery()
+    return select(literal(kind, String).label("kind"), cast(null(), String).label("key"), latest.c.id.label("value"))
+
+
+def _conditions(today):
+    return {
+        "requests": (LeaveRequest.status == "Pendiente",),
+        "overtime": (OvertimeEntry.week_end < today,),  # Solo semanas completadas
+        "pending_overtime": (OvertimeEntry.status == "Pendiente", OvertimeEntry.week_end < today),
+        "processed_overtime": (OvertimeEntry.status.in_(PROCESSED_STATUSES), OvertimeEntry.week_end < today),
+        "auto_leaves": (
+            LeaveRequest.status == "Aprobado",
+            LeaveRequest.request_type.in_(AUTO_LEAVE_TYPES),
+            LeaveRequest.created_at >= today - timedelta(days=AUTO_LEAVES_DAYS),
+            LeaveRequest.approved_by.is_(None),  # Auto-aprobadas (sin admin que las apruebe)
+        ),
+    }
+
+
+def build_summary(client_id, center_id=None):
+    """
+    Contadores y últimos elementos de la campanita del admin.
+
+    Args:
+        client_id: cliente del admin
+        center_id: centro del admin de centro (None = super admin, todos)
+
+    Returns:
+        dict: counts, requests (por tipo), pending_overtime,
+        processed_overtime y auto_leaves
+    """
+    today = get_now_spain().date()
+    where = _conditions(today)
+
+    counts_query = union_all(
+        _count_rows("requests", LeaveRequest, LeaveRequest.request_type, client_id, center_id,
+                    *where["requests"]),
+        _count_rows("overtime", OvertimeEntry, OvertimeEntry.status, client_id, center_id,
+                    *where["overtime"]),
+        _count_rows("auto_leaves", LeaveRequest, None, client_id, center_id, *where["auto_leaves"]),
+    )
+    by_request_type = {}
+    by_overtime_status = {}
+    auto_leaves_count = 0
+    for row in db.session.execute(counts_query):
+        if row.kind == "requests":
+            by_request_type[row.key] = row.value
+        elif row.kind == "overtime":
+            by_overtime_status[row.key] = row.value
+        else:
+            auto_leaves_count = row.value
+
+    ids_query = union_all(
+        _latest_ids("requests", LeaveRequest, client_id, center_id, LeaveRequest.created_at,
+                    PENDING_REQUESTS_LIMIT, *where["requests"]),
+        _latest_ids("pending_overtime", OvertimeEntry, client_id, center_id, OvertimeEntry.created_at,
+                    OVERTIME_ITEMS_LIMIT, *where["pending_overtime"]),
+        _latest_ids("processed_overtime", OvertimeEntry, client_id, center_id, OvertimeEntry.updated_at,
+                    OVERTIME_ITEMS_LIMIT, *where["processed_overtime"]),
+        _latest_ids("auto_leaves", LeaveRequest, client_id, center_id, LeaveRequest.created_at,
+                    AUTO_LEAVES_LIMIT, *where["auto_leaves"]),
+    )
+    ids = {"requests": [], "pending_overtime": [], "processed_overtime": [], "auto_leaves": []}
+    for row in db.session.execute(ids_query):
+        ids[row.kind].append(row.value)
+
+    leave_ids = set(ids["requests"]) | set(ids["auto_leaves"])
+    overtime_ids = set(ids["pending_overtime"]) | set(ids["processed_overtime"])
+    leaves = {
+        req.id: req for req in LeaveRequest.query
+        .options(joinedload(LeaveRequest.user_rel))
+        .filter(LeaveRequest.id.in_(leave_ids))
+    } if leave_ids else {}
+    entries = {
+        entry.id: entry for entry in OvertimeEntry.query
+        .options(joinedload(OvertimeEntry.user_rel))
+        .filter(OvertimeEntry.id.in_(overtime_ids))
+    } if overtime_ids else {}
+
+    # Los ids ya llegan en orden (más recientes primero) dentro de cada rama
+    requests = {"vacaciones": [], "bajas": [], "ausencias": []}
+    for req in (leaves[i] for i in ids["requests"]):
+        if req.request_type == "Vacaciones":
+            requests["vacaciones"].append(pending_request_item(req))
+        elif req.request_type == "Baja médica":
+            requests["bajas"].append(pending_request_item(req))
+        elif req.request_type in ABSENCE_TYPES:
+            requests["ausencias"].append(pending_request_item(req))
+
+    pending_requests = sum(by_request_type.values())
+    pending_overtime = by_overtime_status.get("Pendiente", 0)
+    return {
+        "counts": {
+            "requests": pending_requests,
+            "vacaciones": by_request_type.get("Vacaciones", 0),
+            "bajas": by_request_type.get("Baja médica", 0),
+            "ausencias": sum(by_request_type.get(t, 0) for t in ABSENCE_TYPES),
+            "pending_overtime": pending_overtime,
+            "processed_overtime": sum(by_overtime_status.get(s, 0) for s in PROCESSED_STATUSES),
+            "auto_leaves": auto_leaves_count,
+            # Lo que suma la campanita
+            "badge": pending_requests + pending_overtime,
+        },
+        "requests": requests,
+        "pending_overtime": [pending_overtime_item(entries[i]) for i in ids["pending_overtime"]],
+        "processed_overtime": [processed_overtime_item(entries[i]) for i in ids["processed_overtime"]],
+        "auto_leaves": [auto_leave_item(leaves[i]) for i in ids["auto_leaves"]],
+    }
+
+
+# --------------------------------------------------------------------
+#  Serialización (mismos campos que los endpoints /notifications/*)
+# --------------------------------------------------------------------
+def pending_request_item(req):
+    return {
+        "id": req.id,
+        "employee_name": req.user_rel.full_name or req.user_rel.username,
+        "employee_username": req.user_rel.username,
+        "request_type": req.request_type,
+        "start_date": req.start_date.strftime("%d/%m/%Y"),
+        "end_date": req.end_date.strftime("%d/%m/%Y"),
+        "days_count": (req.end_date - req.start_date).days + 1,
+        "reason": req.reason or "Sin motivo especificado",
+        "created_at": req.created_at.strftime("%d/%m/%Y %H:%M"),
+        "status": req.status,
+        "has_attachment": req.attachment_url is not None,
+        "attachment_url": req.attachment_url,
+        "attachment_filename": req.attachment_filename,
+    }
+
+
+def auto_leave_item(req):
+    # Sin "is_recent": depende de la hora y la respuesta puede reutilizarse (304);
+    # created_at_iso permite calcularlo en el navegador
+    return {
+        "id": req.id,
+        "employee_name": req.user_rel.full_name,
+        "employee_username": req.user_rel.username,
+        "request_type": req.request_type,
+        "start_date": req.start_date.strftime("%d/%m/%Y"),
+        "end_date": req.end_date.strftime("%d/%m/%Y"),
+        "days_count": (req.end_date - req.start_date).days + 1,
+        "reason": req.reason or "Sin motivo especificado",
+        "created_at": req.created_at.strftime("%d/%m/%Y %H:%M"),
+        "created_at_iso": req.created_at.isoformat(timespec="seconds"),
+        "has_attachment": req.attachment_url is not None,
+        "attachment_url": req.attachment_url,
+        "attachment_filename": req.attachment_filename,
+        "attachment_type": req.attachment_type,
+    }
+
+
+def pending_overtime_item(entry):
+    return {
+        "id": entry.id,
+        "user_name": entry.user_rel.full_name,
+        "week_start": entry.week_start.strftime("%d/%m/%Y"),
+        "week_end": entry.week_end.strftime("%d/%m/%Y"),
+        "week_start_iso": entry.week_start.isoformat(),
+        "overtime_hours": f"{entry.overtime_seconds / 3600:+.2f}",
+    }
+
+
+def processed_overtime_item(entry):
+    return {
+        "id": entry.id,
+        "user_name": entry.user_rel.full_name,
+        "week_start": entry.week_start.strftime("%d/%m/%Y"),
+        "week_end": entry.week_end.strftime("%d/%m/%Y"),
+        "overtime_hours": round(entry.overtime_seconds / 3600, 2),
+        "status": entry.status,
+        "updated_at": entry.updated_at.strftime("%d/%m/%Y %H:%M") if entry.updated_at else None,
+    }
@@ -0,0 +1,375 @@
+"""
+Acumulado anual de horas extras y avisos de límites (overtime_year_total).
+
+Límites (configurables por entorno):
+- Anual: OVERTIME_ANNUAL_LIMIT_HOURS (80 h de extras aprobadas al año) con
+  aviso previo en OVERTIME_ANNUAL_WARNING_HOURS (64 h).
+- Semanal: OVERTIME_WEEKLY_LIMIT_HOURS (40 h trabajadas en una semana).
+
+Cada semana cuenta en el año de su lunes. Las semanas en estado Ajustado no
+cuentan para el límite semanal: su fichaje se modificó para cuadrar la
+jornada.
+
+Mantenimiento incremental y transaccional, igual que work_summary_service:
+- after_flush anota (cliente, empleado, año) de cualquier alta, edición o
+  borrado de OvertimeEntry; el upsert masivo de overtime_service las anota
+  con mark_overtime_years().
+- before_commit vuelve a agregar solo esas filas desde overtime_entry
+  (≤ 53 entradas por empleado y año) y registra un OvertimeLimitEvent cada
+  vez que un empleado sube de nivel anual o suma una semana más por encima
+  del límite semanal.
+
+/admin/overtime/limits lee una fila por empleado; scripts/recompute_overtime.py
+--year-totals reconstruye el acumulado.
+"""
+import os
+from collections import namedtuple
+from datetime import date, datetime
+
+from sqlalchemy import and_, case, delete, event, func, insert, select
+from sqlalchemy.orm import Session, attributes
+
+from models.database import db
+from models.models import OvertimeEntry, OvertimeLimitEvent, OvertimeYearTotal, User
+from services.punch_service import lock_user_punches
+from utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+_PENDING_YEARS = "overtime_year_totals"
+
+# Atributos de la entrada que cambian el acumulado
+_ENTRY_ATTRIBUTES = ("status", "overtime_seconds", "total_worked_seconds", "week_start", "user_id")
+
+DEFAULT_ANNUAL_LIMIT_HOURS = 80
+DEFAULT_ANNUAL_WARNING_HOURS = 64
+DEFAULT_WEEKLY_LIMIT_HOURS = 40
+
+LEVEL_OK = 0
+LEVEL_WARNING = 1
+LEVEL_EXCEEDED = 2
+LIMIT_LEVEL_NAMES = {LEVEL_OK: "ok", LEVEL_WARNING: "warning", LEVEL_EXCEEDED: "exceeded"}
+
+EVENT_ANNUAL_WARNING = "annual_warning"
+EVENT_ANNUAL_EXCEEDED = "annual_exceeded"
+EVENT_WEEKLY_EXCEEDED = "weekly_exceeded"
+
+OvertimeLimits = namedtuple("OvertimeLimits", "annual_seconds warning_seconds weekly_seconds")
+
+_overtime_entry = OvertimeEntry.__table__
+_year_total = OvertimeYearTotal.__table__
+_limit_event = OvertimeLimitEvent.__table__
+
+
+def _hours_from_env(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        logger.warning(f"{name} no es un número; se usa {default}")
+        return default
+
+
+def get_limits():
+    """Límites vigentes en segundos (OvertimeLimits)."""
+    return OvertimeLimits(
+        annual_seconds=int(_hours_from_env("OVERTIME_ANNUAL_LIMIT_HOURS", DEFAULT_ANNUAL_LIMIT_HOURS) * 3600),
+        warning_seconds=int(_hours_from_env("OVERTIME_ANNUAL_WARNING_HOURS", DEFAULT_ANNUAL_WARNING_HOURS) * 3600),
+        weekly_seconds=int(_hours_from_env("OVERTIME_WEEKLY_LIMIT_HOURS", DEFAULT_WEEKLY_LIMIT_HOURS) * 3600),
+    )
+
+
+def annual_level(approved_seconds, limits):
+    if approved_seconds > limits.annual_seconds:
+        return LEVEL_EXCEEDED
+    if approved_seconds >= limits.warning_seconds:
+        return LEVEL_WARNING
+    return LEVEL_OK
+
+
+# --------------------------------------------------------------------
+#  Cálculo desde overtime_entry
+# --------------------------------------------------------------------
+def _compute_year_totals(connection, client_id, year, limits, user_ids=None):
+    """
+    Acumulado del año por empleado, agregado desde overtime_entry.
+
+    Returns:
+        dict {user_id: dict con las columnas de overtime_year_total}
+    """
+    counts_weekly = and_(_overtime_entry.c.status != "Ajustado",
+                         _overtime_entry.c.total_worked_seconds > limits.weekly_seconds)
+    conditions = [
+        _overtime_entry.c.client_id == client_id,
+        _overtime_entry.c.week_start >= date(year, 1, 1),
+        _overtime_entry.c.week_start <= date(year, 12, 31),
+    ]
+    if user_ids is not None:
+        conditions.append(_overtime_entry.c.user_id.in_(user_ids))
+
+    rows = connection.execute(
+        select(
+            _overtime_entry.c.user_id,
+            func.coalesce(func.sum(case(
+                (and_(_overtime_entry.c.status == "Aprobado", _overtime_entry.c.overtime_seconds > 0),
+                 _overtime_entry.c.overtime_seconds),
+                else_=0,
+            )), 0).label("approved_seconds"),
+            func.coalesce(func.sum(case(
+                (and_(_overtime_entry.c.status == "Pendiente", _overtime_entry.c.overtime_seconds > 0),
+                 _overtime_entry.c.overtime_seconds),
+                else_=0,
+            )), 0).label("pending_seconds"),
+            func.coalesce(func.sum(case((counts_weekly, 1), else_=0)), 0).label("weeks_over_limit"),
+            func.coalesce(func.max(case(
+                (_overtime_entry.c.status != "Ajustado", _overtime_entry.c.total_worked_seconds),
+            )), 0).label("max_week_seconds"),
+            func.max(case((counts_weekly, _overtime_entry.c.week_start))).label("last_week_over_limit"),
+        )
+        .where(*conditions)
+        .group_by(_overtime_entry.c.user_id)
+    ).all()
+
+    return {
+        row.user_id: {
+            "approved_seconds": int(row.approved_seconds),
+            "pending_seconds": int(row.pending_seconds),
+            "weeks_over_limit": int(row.weeks_over_limit),
+            "max_week_seconds": int(row.max_week_seconds),
+            "last_week_over_limit": row.last_week_over_limit,
+            "annual_level": annual_level(int(row.approved_seconds), limits),
+        }
+        for row in rows
+    }
+
+
+def _crossing_events(connection, client_id, year, user_id, before, after, limits, now):
+    """Eventos de un empleado al pasar de before (fila anterior o None) a after."""
+    events = []
+    old_level = before.annual_level if before is not None else LEVEL_OK
+    for level, kind in ((LEVEL_WARNING, EVENT_ANNUAL_WARNING), (LEVEL_EXCEEDED, EVENT_ANNUAL_EXCEEDED)):
+        if old_level < level <= after["annual_level"]:
+            events.append({
+                "client_id": client_id, "user_id": user_id, "year": year, "kind": kind,
+                "seconds": after["approved_seconds"], "week_start": None, "created_at": now,
+            })
+
+    # Una por semana nueva por encima del límite (las más recientes)
+    new_weeks = after["weeks_over_limit"] - (before.weeks_over_limit if before is not None else 0)
+    if new_weeks > 0:
+        weeks = connection.execute(
+            select(_overtime_entry.c.week_start, _overtime_entry.c.total_worked_seconds)
+            .where(
+                _overtime_entry.c.client_id == client_id,
+                _overtime_entry.c.user_id == user_id,
+                _overtime_entry.c.week_start >= date(year, 1, 1),
+                _overtime_entry.c.week_start <= date(year, 12, 31),
+                _overtime_entry.c.status != "Ajustado",
+                _overtime_entry.c.total_worked_seconds > limits.weekly_seconds,
+            )
+            .order_by(_overtime_entry.c.week_start.desc())
+            .limit(new_weeks)
+        ).all()
+        events.extend(
+            {
+                "client_id": client_id, "user_id": user_id, "year": year, "kind": EVENT_WEEKLY_EXCEEDED,
+                "seconds": week.total_worked_seconds, "week_start": week.week_start, "created_at": now,
+            }
+            for week in reversed(weeks)
+        )
+    return events
+
+
+def refresh_year_totals(connection, client_id, user_years, emit_events=True):
+    """
+    Recalcula el acumulado de los (user_id, year) indicados de un cliente y
+    registra los eventos de cruce de umbral.
+
+    Args:
+        connection: conexión de la transacción en curso
+        client_id: ID del cliente
+        user_years: iterable de (user_id, year)
+        emit_events: False al reconstruir (no se avisa del estado inicial)
+
+    Returns:
+        int: eventos registrados
+    """
+    by_year = {}
+    for user_id, year in set(user_years):
+        by_year.setdefault(year, set()).add(user_id)
+
+    limits = get_limits()
+    now = datetime.utcnow()
+    events = []
+    for year, user_ids in sorted(by_year.items()):
+        user_ids = sorted(user_ids)
+        computed = _compute_year_totals(connection, client_id, year, limits, user_ids)
+        year_filter = and_(
+            _year_total.c.client_id == client_id,
+            _year_total.c.year == year,
+            _year_total.c.user_id.in_(user_ids),
+        )
+        previous = {
+            row.user_id: row for row in connection.execute(
+                select(_year_total.c.user_id, _year_total.c.annual_level, _year_total.c.weeks_over_limit)
+                .where(year_filter)
+            )
+        }
+
+        connection.execute(delete(_year_total).where(year_filter))
+        if computed:
+            connection.execute(insert(_year_total), [
+                {"client_id": client_id, "user_id": user_id, "year": year, "updated_at": now, **values}
+                for user_id, values in computed.items()
+            ])
+
+        if emit_events:
+            for user_id, values in computed.items():
+                events.extend(_crossing_events(
+                    connection, client_id, year, user_id, previous.get(user_id), values, limits, now
+                ))
+
+    if events:
+        connection.execute(insert(_limit_event), events)
+        for e in events:
+            logger.warning(f"Overtime limit event for client {client_id}: user {e['user_id']} {e['kind']} "
+                           f"({e['seconds'] / 3600:.2f} h, {e['year']})")
+    return len(events)
+
+
+# --------------------------------------------------------------------
+#  Mantenimiento incremental (eventos de sesión)
+# --------------------------------------------------------------------
+def mark_overtime_years(keys, session=None):
+    """
+    Anota (client_id, user_id, year) para recalcular su acumulado en el
+    commit. Necesario tras escrituras masivas de overtime_entry que no
+    pasan por el flush del ORM (upsert de overtime_service).
+    """
+    session = session or db.session
+    session.info.setdefault(_PENDING_YEARS, set()).update(keys)
+
+
+def _history_values(state, name):
+    history = state.attrs[name].history
+    return list(history.deleted or ()) + [getattr(state.object, name)]
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_entry_changes(session, flush_context):
+    for obj in session.new | session.dirty | session.deleted:
+        if not isinstance(obj, OvertimeEntry):
+            continue
+        state = attributes.instance_state(obj)
+        if obj in session.dirty and not any(
+            state.attrs[name].history.has_changes() for name in _ENTRY_ATTRIBUTES
+        ):
+            continue
+        pending = session.info.setdefault(_PENDING_YEARS, set())
+        for user_id in _history_values(state, "user_id"):
+            for week_start in _history_values(state, "week_start"):
+                if user_id is not None and week_start is not None:
+                    pending.add((obj.client_id, user_id, week_start.year))
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_entry_changes(session):
+    # Enviar los cambios pendientes para que after_flush anote sus años
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    keys = session.info.pop(_PENDING_YEARS, None)
+    if not keys:
+        return
+
+    by_client = {}
+    for client_id, user_id, year in keys:
+        by_client.setdefault(client_id, set()).add((user_id, year))
+
+    # Mismo orden de locks que work_summary_service para evitar interbloqueos
+    for user_id in sorted({user_id for _, user_id, _ in keys}):
+        lock_user_punches(user_id, session)
+
+    connection = session.connection()
+    for client_id, user_years in by_client.items():
+        refresh_year_totals(connection, client_id, user_years)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_entry_changes(session, previous_transaction):
+    session.info.pop(_PENDING_YEARS, None)
+
+
+# --------------------------------------------------------------------
+#  Lectura
+# --------------------------------------------------------------------
+def get_year_total(user_id, year):
+    """OvertimeYearTotal de un empleado o None si no tiene entradas ese año."""
+    return OvertimeYearTotal.query.filter_by(user_id=user_id, year=year).first()
+
+
+def flagged_year_totals_query(year, limits=None):
+    """
+    Acumulados del año de los empleados en aviso o por encima de un límite:
+    nivel anual en aviso o superado, extras aprobadas + pendientes que ya
+    alcanzan el aviso, o alguna semana por encima del límite semanal.
+    """
+    limits = limits or get_limits()
+    return OvertimeYearTotal.query.filter(
+        OvertimeYearTotal.year == year,
+        (OvertimeYearTotal.annual_level > LEVEL_OK)
+        | (OvertimeYearTotal.approved_seconds + OvertimeYearTotal.pending_seconds >= limits.warning_seconds)
+        | (OvertimeYearTotal.weeks_over_limit > 0),
+    )
+
+
+def get_limit_events(after_id=0, limit=100, center_id=None):
+    """
+    Eventos de límite con id > after_id, en orden de registro, con el
+    nombre del empleado (solo los de center_id si se indica).
+
+    Returns:
+        list de (OvertimeLimitEvent, full_name)
+    """
+    query = (
+        db.session.query(OvertimeLimitEvent, User.full_name)
+        .join(User, OvertimeLimitEvent.user_id == User.id)
+        .filter(OvertimeLimitEvent.id > after_id)
+    )
+    if center_id:
+        query = query.filter(User.center_id == center_id)
+    return query.order_by(OvertimeLimitEvent.id).limit(limit).all()
+
+
+# --------------------------------------------------------------------
+#  Reconstrucción
+# --------------------------------------------------------------------
+def rebuild_year_totals(client_id, year=None):
+    """
+    Reconstruye el acumulado de un cliente (sin commit ni eventos), para
+    todos los años con entradas o solo para year.
+
+    Returns:
+        int: filas (empleado, año) reconstruidas
+    """
+    connection = db.session.connection()
+    conditions = [_overtime_entry.c.client_id == client_id]
+    if year is not None:
+        conditions += [
+            _overtime_entry.c.week_start >= date(year, 1, 1),
+            _overtime_entry.c.week_start <= date(year, 12, 31),
+        ]
+    user_years = {
+        (row.user_id, row.week_start.year)
+        for row in connection.execute(
+            select(_overtime_entry.c.user_id, _overtime_entry.c.week_start).where(*conditions)
+        )
+    }
+    stale = connection.execute(
+        select(_year_total.c.user_id, _year_total.c.year).where(
+            _year_total.c.client_id == client_id,
+            *([_year_total.c.year == year] if year is not None else []),
+        )
+    ).all()
+    user_years.update((row.user_id, row.year) for row in stale)
+
+    refresh_year_totals(connection, client_id, user_years, emit_events=False)
+    return len(user_years)
@@ -1,16 +1,41 @@
 """
 Servicio de cálculo y gestión de horas extras.
+
+Las entradas de overtime_entry no se calculan al abrir el dashboard: los
+cambios de fichajes y pausas (work_summary_service) y de jornada o estado
+del empleado anotan la semana en overtime_dirty_week, y el job
+recompute_dirty_overtime (cada minuto, o /admin/cron/overtime) recalcula
+solo esas semanas con recompute_dirty_weeks(). Cada lunes
+mark_closed_week_dirty() anota la semana que acaba de cerrar para todos
+los empleados, para que aparezcan también los que no ficharon.
 """
+import os
 from datetime import datetime, date, timedelta
-from models.models import User, TimeRecord, OvertimeEntry
+from models.models import Client, User, TimeRecord, OvertimeEntry, OvertimeDirtyWeek, UserWeekSummary
 from models.database import db
-from sqlalchemy import func
+from services.notification_summary import mark_notifications_changed
+from services.overtime_limits_service import mark_overtime_years
+from services.work_summary_service import (
+    get_week_totals, get_range_totals_by_week, mark_weeks_dirty, week_start_of
+)
+from sqlalchemy import and_, delete, event, func, select, tuple_
+from sqlalchemy.orm import Session, attributes
 from utils.logging_utils import get_logger
+from utils.sql_expressions import duration_seconds
 
 logger = get_logger(__name__)
 
 TOLERANCE_SECONDS = 3600  # ±1 hora
 
+# Semanas anotadas que procesa cada ejecución del job
+DEFAULT_RECOMPUTE_BATCH_SIZE = 5000
+
+# Atributos del empleado que cambian sus horas extras
+_USER_ATTRIBUTES = ("weekly_hours", "is_active")
+
+_dirty_week = OvertimeDirtyWeek.__table__
+_overtime_entry = OvertimeEntry.__table__
+
 
 def get_week_bounds(target_date):
     """
@@ -38,6 +63,10 @@ def calculate_weekly_worked_seconds(user_id, week_start, week_end):
     Solo cuenta registros cerrados (check_in y check_out no nulos).
     NO resta pausas (según requisitos del usuario).
 
+    Lee los totales precalculados (services/work_summary_service.py):
+    una fila para una semana completa de lunes a domingo, una por día en
+    otro rango.
+
     Args:
         user_id: ID del usuario
         week_start: date object (lunes)
@@ -46,98 +75,209 @@ def calculate_weekly_worked_seconds(user_id, week_start, week_end):
     Returns:
         int: Total de segundos trabajados en la semana
     """
-    records = (
-        TimeRecord.query
-        .filter(
-            TimeRecord.user_id == user_id,
-            TimeRecord.date >= week_start,
-            TimeRecord.date <= week_end,
-            TimeRecord.check_in.isnot(None),
-            TimeRecord.check_out.isnot(None)
+    if week_start.weekday() == 0 and week_end == week_start + timedelta(days=6):
+        return get_week_totals(user_id, week_start).worked_seconds
+
+    totals = get_range_totals_by_week(week_start, week_end, [user_id])
+    return sum(t.worked_seconds for t in totals.values())
+
+
+def _weekly_worked_by_user(client_id, week_start, user_ids=None):
+    """
+    Empleados activos del cliente (o solo user_ids) con su jornada y lo
+    trabajado en la semana, en una sola consulta sobre user_week_summary.
+
+    Returns:
+        list de filas (user_id, weekly_hours, worked_seconds)
+    """
+    query = (
+        db.session.query(
+            User.id.label("user_id"),
+            User.weekly_hours,
+            func.coalesce(UserWeekSummary.worked_seconds, 0).label("worked_seconds"),
+        )
+        .outerjoin(
+            UserWeekSummary,
+            and_(
+                UserWeekSummary.client_id == client_id,
+                UserWeekSummary.user_id == User.id,
+                UserWeekSummary.week_start == week_start,
+            )
         )
-        .all()
+        .filter(User.client_id == client_id, User.is_active.is_(True))
     )
+    if user_ids is not None:
+        query = query.filter(User.id.in_(user_ids))
+    return query.all()
 
-    total_seconds = 0
-    for record in records:
-        delta = record.check_out - record.check_in
-        total_seconds += int(delta.total_seconds())
 
-    return total_seconds
+def _upsert_overtime_entries(rows):
+    """
+    Inserta las entradas de la semana o actualiza las existentes en estado
+    Pendiente, en una sola sentencia INSERT ... ON CONFLICT DO UPDATE
+    (PostgreSQL y SQLite). Las ya gestionadas no se tocan.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        _merge_overtime_entries(rows)
+        return
+
+    table = OvertimeEntry.__table__
+    statement = dialect_insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.client_id, table.c.user_id, table.c.week_start],
+        set_={
+            "total_worked_seconds": statement.excluded.total_worked_seconds,
+            "contract_seconds": statement.excluded.contract_seconds,
+            "overtime_seconds": statement.excluded.overtime_seconds,
+            "updated_at": statement.excluded.updated_at,
+        },
+        where=table.c.status == "Pendiente",
+    )
+    db.session.execute(statement, rows)
 
 
-def generate_overtime_entries_for_week(client_id, target_date):
+def _merge_overtime_entries(rows):
+    # Otros motores: mismo resultado con el ORM (una consulta + inserts/updates)
+    if not rows:
+        return
+    existing = {
+        entry.user_id: entry
+        for entry in OvertimeEntry.query.filter_by(
+            client_id=rows[0]["client_id"], week_start=rows[0]["week_start"]
+        )
+    }
+    for row in rows:
+        entry = existing.get(row["user_id"])
+        if entry is None:
+            db.session.add(OvertimeEntry(**row))
+        elif entry.status == "Pendiente":
+            entry.total_worked_seconds = row["total_worked_seconds"]
+            entry.contract_seconds = row["contract_seconds"]
+            entry.overtime_seconds = row["overtime_seconds"]
+            entry.updated_at = row["updated_at"]
+
+
+def _generate_week_entries(client_id, week_start, user_ids=None):
     """
-    Genera/actualiza registros de overtime_entry para todos los usuarios activos
-    del cliente, para la semana que contiene target_date.
-
-    Solo crea registros si el delta excede la tolerancia de ±1 hora.
-    Si ya existe un registro Pendiente, lo actualiza con los nuevos valores.
-    Si existe pero está en otro estado (Aprobado/Ajustado), lo deja intacto.
+    Calcula y guarda (sin commit) las entradas de la semana que empieza en
+    week_start, para todos los empleados activos o solo para user_ids.
 
-    Args:
-        client_id: ID del cliente
-        target_date: date object de la semana a procesar
+    Una entrada Pendiente cuya semana vuelve a quedar dentro de la tolerancia
+    (o cuyo empleado ya no tiene jornada) se borra: si no, se podría aprobar
+    con horas extras que ya no existen.
 
     Returns:
-        tuple: (created_count, updated_count, skipped_count)
+        tuple: (created_count, updated_count, skipped_count); updated_count
+        incluye las entradas Pendientes borradas
     """
-    week_start, week_end = get_week_bounds(target_date)
-
-    # Obtener usuarios activos del cliente
-    users = User.query.filter_by(client_id=client_id, is_active=True).all()
+    week_end = week_start + timedelta(days=6)
 
     created = 0
     updated = 0
     skipped = 0
 
-    for user in users:
-        if user.weekly_hours == 0 or user.weekly_hours is None:
+    status_query = (
+        db.session.query(OvertimeEntry.user_id, OvertimeEntry.status)
+        .filter(OvertimeEntry.client_id == client_id, OvertimeEntry.week_start == week_start)
+    )
+    if user_ids is not None:
+        status_query = status_query.filter(OvertimeEntry.user_id.in_(user_ids))
+    existing_status = dict(status_query.all())
+
+    now = datetime.utcnow()
+    rows = []
+    stale_user_ids = []
+    for user_id, weekly_hours, worked_secs in _weekly_worked_by_user(client_id, week_start, user_ids):
+        if weekly_hours == 0 or weekly_hours is None:
+            if existing_status.get(user_id) == "Pendiente":
+                stale_user_ids.append(user_id)
             skipped += 1
             continue
 
-        # Calcular tiempo trabajado
-        worked_secs = calculate_weekly_worked_seconds(user.id, week_start, week_end)
-        contract_secs = user.weekly_hours * 3600
+        contract_secs = weekly_hours * 3600
         delta_secs = worked_secs - contract_secs
 
         # Solo crear registro si excede tolerancia
         if abs(delta_secs) <= TOLERANCE_SECONDS:
+            if existing_status.get(user_id) == "Pendiente":
+                stale_user_ids.append(user_id)
             skipped += 1
             continue
 
-        # Buscar si ya existe
-        existing = OvertimeEntry.query.filter_by(
-            client_id=client_id,
-            user_id=user.id,
-            week_start=week_start
-        ).first()
-
-        if existing:
-            # Actualizar solo si está pendiente
-            if existing.status == "Pendiente":
-                existing.total_worked_seconds = worked_secs
-                existing.contract_seconds = contract_secs
-                existing.overtime_seconds = delta_secs
-                existing.updated_at = datetime.utcnow()
-                updated += 1
-            else:
-                # Ya fue procesado (Aprobado/Ajustado/Rechazado), no tocar
-                skipped += 1
+        status = existing_status.get(user_id)
+        if status is None:
+            created += 1
+        elif status == "Pendiente":
+            updated += 1
         else:
-            # Crear nuevo
-            entry = OvertimeEntry(
-                client_id=client_id,
-                user_id=user.id,
-                week_start=week_start,
-                week_end=week_end,
-                total_worked_seconds=worked_secs,
-                contract_seconds=contract_secs,
-                overtime_seconds=delta_secs,
-                status="Pendiente"
+            # Ya fue procesado (Aprobado/Ajustado/Rechazado), no tocar
+            skipped += 1
+            continue
+
+        rows.append({
+            "client_id": client_id,
+            "user_id": user_id,
+            "week_start": week_start,
+            "week_end": week_end,
+            "total_worked_seconds": worked_secs,
+            "contract_seconds": contract_secs,
+            "overtime_seconds": delta_secs,
+            "status": "Pendiente",
+            "created_at": now,
+            "updated_at": now,
+        })
+
+    if rows:
+        _upsert_overtime_entries(rows)
+        # El upsert no pasa por el flush: anotar el acumulado anual a mano
+        mark_overtime_years({(client_id, row["user_id"], week_start.year) for row in rows})
+        mark_notifications_changed(client_id)
+
+    if stale_user_ids:
+        db.session.execute(
+            delete(_overtime_entry).where(
+                _overtime_entry.c.client_id == client_id,
+                _overtime_entry.c.week_start == week_start,
+                _overtime_entry.c.user_id.in_(stale_user_ids),
+                _overtime_entry.c.status == "Pendiente",
             )
-            db.session.add(entry)
-            created += 1
+        )
+        mark_overtime_years({(client_id, user_id, week_start.year) for user_id in stale_user_ids})
+        mark_notifications_changed(client_id)
+        skipped -= len(stale_user_ids)
+        updated += len(stale_user_ids)
+
+    return created, updated, skipped
+
+
+def generate_overtime_entries_for_week(client_id, target_date):
+    """
+    Genera/actualiza registros de overtime_entry para todos los usuarios activos
+    del cliente, para la semana que contiene target_date.
+
+    Solo crea registros si el delta excede la tolerancia de ±1 hora.
+    Si ya existe un registro Pendiente, lo actualiza con los nuevos valores
+    (o lo borra si el delta ha vuelto a la tolerancia).
+    Si existe pero está en otro estado (Aprobado/Ajustado), lo deja intacto.
+
+    Coste constante en número de consultas: una agregada para lo trabajado,
+    una para los estados existentes y un único upsert para todas las entradas.
+
+    Args:
+        client_id: ID del cliente
+        target_date: date object de la semana a procesar
+
+    Returns:
+        tuple: (created_count, updated_count, skipped_count)
+    """
+    week_start, _ = get_week_bounds(target_date)
+
+    created, updated, skipped = _generate_week_entries(client_id, week_start)
 
     db.session.commit()
     logger.info(f"Overtime generation for client {client_id}, week {week_start}: created={created}, updated={updated}, skipped={skipped}")
@@ -145,6 +285,212 @@ def generate_overtime_entries_for_week(client_id, target_date):
     return created, updated, skipped
 
 
+def get_recompute_batch_size():
+    """Semanas anotadas por ejecución del job (OVERTIME_RECOMPUTE_BATCH_SIZE)."""
+    try:
+        return int(os.getenv("OVERTIME_RECOMPUTE_BATCH_SIZE", DEFAULT_RECOMPUTE_BATCH_SIZE))
+    except ValueError:
+        return DEFAULT_RECOMPUTE_BATCH_SIZE
+
+
+def recompute_dirty_weeks(batch_size=None):
+    """
+    Recalcula las horas extras de las semanas anotadas en overtime_dirty_week.
+
+    Agrupa las anotaciones por (cliente, semana) y procesa cada grupo en su
+    propia transacción: upsert de las entradas de esos empleados y borrado
+    de las anotaciones leídas. Si una semana se vuelve a anotar mientras se
+    procesa (marked_at distinto), la anotación se conserva para la siguiente
+    ejecución.
+
+    Debe ejecutarse con tenant_bypass() (scheduler o /admin/cron/overtime).
+
+    Returns:
+        dict: weeks, entries, created, updated, errors y remaining (anotaciones pendientes)
+    """
+    batch_size = batch_size or get_recompute_batch_size()
+    marks = db.session.execute(
+        select(_dirty_week.c.id, _dirty_week.c.client_id, _dirty_week.c.user_id,
+               _dirty_week.c.week_start, _dirty_week.c.marked_at)
+        .order_by(_dirty_week.c.client_id, _dirty_week.c.week_start, _dirty_week.c.user_id)
+        .limit(batch_size)
+    ).all()
+
+    groups = {}
+    for mark in marks:
+        groups.setdefault((mark.client_id, mark.week_start), []).append(mark)
+
+    result = {"weeks": 0, "entries": 0, "created": 0, "updated": 0, "errors": 0}
+    for (client_id, week_start), group in groups.items():
+        try:
+            created, updated, _ = _generate_week_entries(
+                client_id, week_start, [mark.user_id for mark in group]
+            )
+            db.session.execute(delete(_dirty_week).where(
+                tuple_(_dirty_week.c.id, _dirty_week.c.marked_at).in_(
+                    [(mark.id, mark.marked_at) for mark in group]
+                )
+            ))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            result["errors"] += 1
+            logger.error(f"Overtime recompute failed for client {client_id}, week {week_start}", exc_info=True)
+            continue
+        result["weeks"] += 1
+        result["entries"] += len(group)
+        result["created"] += created
+        result["updated"] += updated
+
+    result["remaining"] = db.session.execute(select(func.count()).select_from(_dirty_week)).scalar()
+    if result["weeks"] or result["errors"]:
+        logger.info(f"Overtime recompute: {result}")
+    return result
+
+
+def mark_closed_week_dirty(target_date=None):
+    """
+    Anota la semana anterior a target_date (por defecto, hoy) para todos los
+    empleados activos con jornada de todos los clientes. Así se generan
+    también los déficits de quien no fichó en toda la semana, que ningún
+    cambio de fichajes habría anotado.
+
+    Debe ejecutarse con tenant_bypass().
+
+    Returns:
+        int: semanas de empleado anotadas
+    """
+    week_start, _ = get_week_bounds((target_date or date.today()) - timedelta(days=7))
+    employees = db.session.execute(
+        select(User.client_id, User.id)
+        .join(Client, Client.id == User.client_id)
+        .where(Client.is_active.is_(True), User.is_active.is_(True), User.weekly_hours > 0)
+    ).all()
+
+    by_client = {}
+    for client_id, user_id in employees:
+        by_client.setdefault(client_id, set()).add((user_id, week_start))
+
+    connection = db.session.connection()
+    for client_id, week_keys in sorted(by_client.items()):
+        mark_weeks_dirty(connection, client_id, week_keys)
+    db.session.commit()
+    marked = len(employees)
+    logger.info(f"Overtime week {week_start} marked for recompute: {marked} employee weeks")
+    return marked
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_user_changes(session, flush_context):
+    """
+    Un cambio de jornada o de estado del empleado cambia sus horas extras:
+    anota la semana en curso y las semanas con entradas aún Pendientes.
+    """
+    changed = [
+        obj for obj in session.dirty
+        if isinstance(obj, User) and obj.client_id is not None and any(
+            attributes.instance_state(obj).attrs[name].history.has_changes() for name in _USER_ATTRIBUTES
+        )
+    ]
+    if not changed:
+        return
+
+    connection = session.connection()
+    current_week = week_start_of(date.today())
+    for user in changed:
+        weeks = {(user.id, current_week)}
+        weeks.update(
+            (user.id, week_start) for week_start in connection.execute(
+                select(_overtime_entry.c.week_start).where(
+                    _overtime_entry.c.client_id == user.client_id,
+                    _overtime_entry.c.user_id == user.id,
+                    _overtime_entry.c.status == "Pendiente",
+                )
+            ).scalars()
+        )
+        mark_weeks_dirty(connection, user.client_id, weeks)
+
+
+def adjust_last_timerecords_auto(week_start, week_end, target_by_user):
+    """
+    Ajusta en bloque, sin commit, el último TimeRecord cerrado de la semana de
+    cada empleado para cuadrar su total semanal con su objetivo (generalmente
+    contract_seconds): modifica el check_out y añade una nota de auditoría
+    en admin_notes.
+
+    Una sola consulta con funciones de ventana lee, por empleado, el último
+    registro cerrado de la semana y la suma de los demás; los cambios se
+    escriben en el mismo flush (y los resúmenes se actualizan en el commit).
+
+    Args:
+        week_start: date object (lunes)
+        week_end: date object (domingo)
+        target_by_user: dict {user_id: segundos objetivo}
+
+    Returns:
+        dict {user_id: TimeRecord ajustado} (sin los que no se pudieron ajustar)
+    """
+    if not target_by_user:
+        return {}
+
+    record_seconds = duration_seconds(TimeRecord.check_in, TimeRecord.check_out)
+    ranked = (
+        select(
+            TimeRecord.id.label("id"),
+            func.row_number().over(
+                partition_by=TimeRecord.user_id,
+                order_by=(TimeRecord.date.desc(), TimeRecord.check_out.desc(), TimeRecord.id.desc()),
+            ).label("position"),
+            (func.sum(record_seconds).over(partition_by=TimeRecord.user_id) - record_seconds).label("other_seconds"),
+        )
+        .where(
+            TimeRecord.user_id.in_(list(target_by_user)),
+            TimeRecord.date >= week_start,
+            TimeRecord.date <= week_end,
+            TimeRecord.check_in.isnot(None),
+            TimeRecord.check_out.isnot(None),
+        )
+        .subquery()
+    )
+    last_records = db.session.execute(
+        select(TimeRecord, ranked.c.other_seconds)
+        .join(ranked, TimeRecord.id == ranked.c.id)
+        .where(ranked.c.position == 1)
+    ).all()
+
+    now = datetime.utcnow()
+    adjusted = {}
+    for last_record, total_other in last_records:
+        user_id = last_record.user_id
+        # Calcular cuánto debe durar el último registro
+        needed_last = target_by_user[user_id] - total_other
+        if needed_last < 0:
+            logger.warning(f"Cannot adjust: needed_last={needed_last} < 0 for user {user_id}")
+            continue
+
+        new_checkout = last_record.check_in + timedelta(seconds=needed_last)
+        old_checkout = last_record.check_out
+        last_record.check_out = new_checkout
+
+        # Añadir nota de auditoría
+        adjustment_note = (
+            f"[Ajuste automático horas extras {now.strftime('%d/%m/%Y %H:%M')}] "
+            f"Checkout modificado de {old_checkout.strftime('%H:%M')} a {new_checkout.strftime('%H:%M')} "
+            f"para cuadrar semana {week_start.strftime('%d/%m/%Y')}"
+        )
+        if last_record.admin_notes:
+            last_record.admin_notes += f"\n{adjustment_note}"
+        else:
+            last_record.admin_notes = adjustment_note
+
+        last_record.updated_at = now
+        adjusted[user_id] = last_record
+
+    for user_id in target_by_user.keys() - {record.user_id for record, _ in last_records}:
+        logger.warning(f"No closed records found for user {user_id} in week {week_start}")
+    return adjusted
+
+
 def adjust_last_timerecord_auto(user_id, week_start, week_end, target_seconds):
     """
     Ajusta automáticamente el último TimeRecord de la semana para cuadrar
@@ -162,72 +508,72 @@ def adjust_last_timerecord_auto(user_id, week_start, week_end, target_seconds):
     Returns:
         bool: True si se ajustó correctamente, False si no fue posible
     """
-    # Buscar último registro de la semana (cerrado)
-    last_record = (
-        TimeRecord.query
-        .filter(
-            TimeRecord.user_id == user_id,
-            TimeRecord.date >= week_start,
-            TimeRecord.date <= week_end,
-            TimeRecord.check_in.isnot(None),
-            TimeRecord.check_out.isnot(None)
-        )
-        .order_by(TimeRecord.date.desc(), TimeRecord.check_out.desc())
-        .first()
-    )
-
-    if not last_record:
-        logger.warning(f"No closed records found for user {user_id} in week {week_start}")
+    last_record = adjust_last_timerecords_auto(week_start, week_end, {user_id: target_seconds}).get(user_id)
+    if last_record is None:
         return False
 
-    # Calcular total sin el último registro
-    other_records = (
-        TimeRecord.query
-        .filter(
-            TimeRecord.user_id == user_id,
-            TimeRecord.date >= week_start,
-            TimeRecord.date <= week_end,
-            TimeRecord.check_in.isnot(None),
-            TimeRecord.check_out.isnot(None),
-            TimeRecord.id != last_record.id
-        )
-        .all()
-    )
+    db.session.commit()
+    logger.info(f"Adjusted TimeRecord {last_record.id} for user {user_id}: new_checkout={last_record.check_out}")
 
-    total_other = sum(
-        int((r.check_out - r.check_in).total_seconds())
-        for r in other_records
-    )
+    return True
 
-    # Calcular cuánto debe durar el último registro
-    needed_last = target_seconds - total_other
 
-    if needed_last < 0:
-        logger.warning(f"Cannot adjust: needed_last={needed_last} < 0 for user {user_id}")
-        return False
+# Acciones en bloque sobre las entradas Pendiente de una semana: (estado, nota por defecto)
+WEEK_DECISIONS = {
+    "adjust": ("Ajustado", "Ajuste automático aplicado"),
+    "approve": ("Aprobado", "Horas extras aprobadas"),
+    "reject": ("Rechazado", "Horas extras rechazadas"),
+}
 
-    # Ajustar check_out del último registro
-    new_checkout = last_record.check_in + timedelta(seconds=needed_last)
 
-    # Guardar admin_notes indicando el ajuste
-    old_checkout = last_record.check_out
-    last_record.check_out = new_checkout
+def decide_week_entries(client_id, week_start, entry_ids, action, decided_by, notes=None, center_id=None):
+    """
+    Ajusta, aprueba o rechaza en una sola transacción las entradas
+    seleccionadas de una semana (solo las que siguen en Pendiente; con
+    center_id, solo las de empleados de ese centro).
 
-    # Añadir nota de auditoría
-    adjustment_note = (
-        f"[Ajuste automático horas extras {datetime.utcnow().strftime('%d/%m/%Y %H:%M')}] "
-        f"Checkout modificado de {old_checkout.strftime('%H:%M')} a {new_checkout.strftime('%H:%M')} "
-        f"para cuadrar semana {week_start.strftime('%d/%m/%Y')}"
-    )
+    "adjust" aplica adjust_last_timerecords_auto a todos los empleados a la
+    vez; las entradas que no se pueden ajustar se quedan en Pendiente.
 
-    if last_record.admin_notes:
-        last_record.admin_notes += f"\n{adjustment_note}"
+    Returns:
+        dict: processed, failed (no ajustables) y skipped (no seleccionables)
+    """
+    status, default_notes = WEEK_DECISIONS[action]
+    entry_ids = set(entry_ids)
+
+    query = OvertimeEntry.query.filter(
+        OvertimeEntry.client_id == client_id,
+        OvertimeEntry.week_start == week_start,
+        OvertimeEntry.id.in_(entry_ids),
+        OvertimeEntry.status == "Pendiente",
+    )
+    if center_id:
+        query = query.join(User, OvertimeEntry.user_id == User.id).filter(User.center_id == center_id)
+    entries = query.all()
+
+    if action == "adjust":
+        adjusted = adjust_last_timerecords_auto(
+            week_start, week_start + timedelta(days=6),
+            {entry.user_id: entry.contract_seconds for entry in entries},
+        )
+        decided = [entry for entry in entries if entry.user_id in adjusted]
     else:
-        last_record.admin_notes = adjustment_note
+        decided = entries
 
-    last_record.updated_at = datetime.utcnow()
+    now = datetime.utcnow()
+    for entry in decided:
+        entry.status = status
+        entry.decided_by = decided_by
+        entry.decided_at = now
+        entry.decision_notes = notes or default_notes
 
     db.session.commit()
-    logger.info(f"Adjusted TimeRecord {last_record.id} for user {user_id}: new_checkout={new_checkout}")
-
-    return True
+    logger.info(
+        f"Overtime week {week_start} client {client_id}: {action} {len(decided)} entries "
+        f"(failed={len(entries) - len(decided)}, skipped={len(entry_ids) - len(entries)}) by user {decided_by}"
+    )
+    return {
+        "processed": len(decided),
+        "failed": len(entries) - len(decided),
+        "skipped": len(entry_ids) - len(entries),
+    }
@@ -0,0 +1,299 @@
+"""
+Simulación de horas extras con otra jornada o tolerancia ("¿qué pasaría si...?").
+
+Responde, para un año y un alcance (cliente, centro o categoría), cuántas
+semanas EXTRA y DEFICIT y cuántas horas saldrían si los empleados tuvieran
+otra weekly_hours o si la tolerancia fuese otra en lugar de
+TOLERANCE_SECONDS, sin modificar empleados ni entradas de overtime_entry.
+
+Mismas reglas que _generate_week_entries (overtime_service): empleados
+activos con jornada > 0, semanas completadas (lunes a domingo) que empiezan
+en el año, lo trabajado sin restar pausas (0 si no fichó) y una semana
+cuenta si |trabajado - jornada| supera la tolerancia. Además solo cuentan
+las semanas entre hire_date y termination_date del empleado. No tiene en
+cuenta las entradas ya gestionadas (Aprobado, Ajustado...): es el cálculo
+desde cero.
+
+Los datos (empleados x semanas con lo trabajado, leídos de
+user_week_summary con services/period_engine.py) se guardan por
+(cliente, año) en memoria del proceso durante OVERTIME_SIMULATION_CACHE_TTL
+segundos: las simulaciones siguientes solo recalculan con NumPy sobre la
+matriz ya cargada.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select
+
+from models.database import db
+from models.models import User
+from services import period_engine
+from services.overtime_service import TOLERANCE_SECONDS
+from services.period_engine import BACKEND_NUMPY, np
+from services.work_summary_service import week_start_of
+from utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_SIMULATION_CACHE_TTL = 300
+
+SimulationData = namedtuple("SimulationData", [
+    "client_id",
+    "year",
+    "week_starts",      # lista de lunes de las semanas completadas del año
+    "user_ids",         # empleados activos, ordenados por id
+    "full_names",
+    "center_ids",
+    "category_ids",
+    "weekly_hours",     # jornada actual de cada empleado
+    "first_week",       # índice de la primera semana en plantilla (hire_date)
+    "last_week",        # índice de la última semana en plantilla (termination_date)
+    "worked",           # segundos trabajados [empleado][semana]
+    "backend",
+    "loaded_at",
+])
+
+ScenarioTotals = namedtuple(
+    "ScenarioTotals", "extra_weeks deficit_weeks extra_seconds deficit_seconds"
+)
+ScenarioTotals.__doc__ = """
+Totales de un escenario por empleado (listas o ndarrays alineados con las
+filas simuladas). deficit_seconds es positivo (horas por debajo de la jornada).
+"""
+
+SimulationResult = namedtuple("SimulationResult", "rows contract_seconds baseline simulated")
+SimulationResult.__doc__ = """
+rows: índices de los empleados simulados en SimulationData;
+contract_seconds: jornada simulada de cada uno; baseline / simulated:
+ScenarioTotals con la jornada y tolerancia actuales y con las simuladas.
+"""
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def get_simulation_cache_ttl():
+    try:
+        return int(os.getenv("OVERTIME_SIMULATION_CACHE_TTL", DEFAULT_SIMULATION_CACHE_TTL))
+    except ValueError:
+        return DEFAULT_SIMULATION_CACHE_TTL
+
+
+def closed_weeks(year, today=None):
+    """Lunes de las semanas del año (por su lunes) ya completadas."""
+    today = today or date.today()
+    first = date(year, 1, 1)
+    week_start = first + timedelta(days=(7 - first.weekday()) % 7)
+    weeks = []
+    while week_start.year == year and week_start + timedelta(days=6) < today:
+        weeks.append(week_start)
+        week_start += timedelta(days=7)
+    return weeks
+
+
+def _week_index(week_starts, day, default):
+    if day is None or not week_starts:
+        return default
+    return (week_start_of(day) - week_starts[0]).days // 7
+
+
+def _load(client_id, year, backend):
+    week_starts = closed_weeks(year)
+    users = db.session.execute(
+        select(
+            User.id, User.full_name, User.center_id, User.category_id,
+            User.weekly_hours, User.hire_date, User.termination_date,
+        )
+        .where(User.client_id == client_id, User.is_active.is_(True))
+        .order_by(User.id)
+    ).all()
+
+    user_ids = [u.id for u in users]
+    first_week = [max(_week_index(week_starts, u.hire_date, 0), 0) for u in users]
+    # -1 si dejó la empresa antes de la primera semana (ninguna en plantilla)
+    last_week = [
+        max(min(_week_index(week_starts, u.termination_date, len(week_starts) - 1), len(week_starts) - 1), -1)
+        for u in users
+    ]
+    weekly_hours = [u.weekly_hours or 0 for u in users]
+
+    totals = None
+    if week_starts and users:
+        totals = period_engine.load_week_totals(
+            db.session.connection(), client_id, week_starts[0], week_starts[-1], backend=backend
+        )
+
+    if backend == BACKEND_NUMPY:
+        user_array = np.array(user_ids, dtype=np.int64)
+        worked = np.zeros((len(users), len(week_starts)), dtype=np.int64)
+        if totals is not None and len(totals.user_id):
+            # Filas del resumen de empleados activos: posición en la matriz
+            positions = np.clip(np.searchsorted(user_array, totals.user_id), 0, len(users) - 1)
+            found = user_array[positions] == totals.user_id
+            weeks = (totals.start - np.datetime64(week_starts[0], "D")).astype(np.int64) // 7
+            worked[positions[found], weeks[found]] = totals.worked_seconds[found]
+        return SimulationData(
+            client_id, year, week_starts, user_array, [u.full_name for u in users],
+            [u.center_id for u in users], [u.category_id for u in users],
+            np.array(weekly_hours, dtype=np.int64), np.array(first_week, dtype=np.int64),
+            np.array(last_week, dtype=np.int64), worked, backend, datetime.utcnow(),
+        )
+
+    worked = [[0] * len(week_starts) for _ in users]
+    if totals is not None:
+        row_by_user = {user_id: row for row, user_id in enumerate(user_ids)}
+        for user_id, week_start, worked_seconds in zip(totals.user_id, totals.start, totals.worked_seconds):
+            if user_id in row_by_user:
+                worked[row_by_user[user_id]][(week_start - week_starts[0]).days // 7] = worked_seconds
+    return SimulationData(
+        client_id, year, week_starts, user_ids, [u.full_name for u in users],
+        [u.center_id for u in users], [u.category_id for u in users],
+        weekly_hours, first_week, last_week, worked, backend, datetime.utcnow(),
+    )
+
+
+def get_simulation_data(client_id, year, refresh=False):
+    """
+    Datos de simulación del cliente y año, de la caché del proceso si no han
+    caducado (refresh=True los vuelve a leer de la BD).
+
+    Returns:
+        SimulationData
+    """
+    key = (client_id, year)
+    now = time.monotonic()
+    entry = _cache.get(key)
+    if entry is not None and entry[0] > now and not refresh:
+        return entry[1]
+
+    started = time.perf_counter()
+    data = _load(client_id, year, period_engine.resolve_backend())
+    logger.info(
+        f"Overtime simulation data loaded: client={client_id} year={year} "
+        f"employees={len(data.user_ids)} weeks={len(data.week_starts)} "
+        f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+    )
+    with _lock:
+        # Descartar de paso las entradas caducadas de otros clientes o años
+        for stale in [k for k, (expires, _) in _cache.items() if expires <= now]:
+            _cache.pop(stale, None)
+        _cache[key] = (now + get_simulation_cache_ttl(), data)
+    return data
+
+
+def _scenario(data, rows, contract_seconds, tolerance_seconds):
+    if data.backend == BACKEND_NUMPY:
+        weeks = np.arange(len(data.week_starts))
+        valid = (
+            (weeks >= data.first_week[rows, None])
+            & (weeks <= data.last_week[rows, None])
+            & (contract_seconds[:, None] > 0)
+        )
+        delta = data.worked[rows] - contract_seconds[:, None]
+        extra = valid & (delta > tolerance_seconds)
+        deficit = valid & (delta < -tolerance_seconds)
+        return ScenarioTotals(
+            extra.sum(axis=1), deficit.sum(axis=1),
+            np.where(extra, delta, 0).sum(axis=1), np.where(deficit, -delta, 0).sum(axis=1),
+        )
+
+    totals = ScenarioTotals([], [], [], [])
+    for row, contract in zip(rows, contract_seconds):
+        extra_weeks = deficit_weeks = extra_seconds = deficit_seconds = 0
+        if contract > 0:
+            for worked in data.worked[row][data.first_week[row]:data.last_week[row] + 1]:
+                delta = worked - contract
+                if delta > tolerance_seconds:
+                    extra_weeks += 1
+                    extra_seconds += delta
+                elif delta < -tolerance_seconds:
+                    deficit_weeks += 1
+                    deficit_seconds -= delta
+        totals.extra_weeks.append(extra_weeks)
+        totals.deficit_weeks.append(deficit_weeks)
+        totals.extra_seconds.append(extra_seconds)
+        totals.deficit_seconds.append(deficit_seconds)
+    return totals
+
+
+def simulate(data, center_id=None, category_id=None, weekly_hours=None, tolerance_seconds=None):
+    """
+    Compara el escenario actual con el simulado para los empleados del
+    alcance (centro y/o categoría, o todo el cliente).
+
+    Args:
+        data: SimulationData (get_simulation_data)
+        weekly_hours: jornada simulada para todos los empleados del alcance
+            (None = la de cada uno)
+        tolerance_seconds: tolerancia simulada (None = TOLERANCE_SECONDS)
+
+    Returns:
+        SimulationResult
+    """
+    rows = [
+        row for row in range(len(data.full_names))
+        if (center_id is None or data.center_ids[row] == center_id)
+        and (category_id is None or data.category_ids[row] == category_id)
+    ]
+    tolerance = TOLERANCE_SECONDS if tolerance_seconds is None else tolerance_seconds
+
+    if data.backend == BACKEND_NUMPY:
+        rows = np.array(rows, dtype=np.int64)
+        current = data.weekly_hours[rows] * 3600
+        contract = current if weekly_hours is None else np.full(len(rows), round(weekly_hours * 3600), dtype=np.int64)
+    else:
+        current = [data.weekly_hours[row] * 3600 for row in rows]
+        contract = current if weekly_hours is None else [round(weekly_hours * 3600)] * len(rows)
+
+    return SimulationResult(
+        rows,
+        contract,
+        _scenario(data, rows, current, TOLERANCE_SECONDS),
+        _scenario(data, rows, contract, tolerance),
+    )
+
+
+def summarize(totals):
+    """Suma de un ScenarioTotals: dict con semanas y horas EXTRA / DEFICIT."""
+    extra_seconds = int(sum(totals.extra_seconds))
+    deficit_seconds = int(sum(totals.deficit_seconds))
+    return {
+        "extra_weeks": int(sum(totals.extra_weeks)),
+        "deficit_weeks": int(sum(totals.deficit_weeks)),
+        "extra_hours": round(extra_seconds / 3600, 2),
+        "deficit_hours": round(deficit_seconds / 3600, 2),
+        "net_hours": round((extra_seconds - deficit_seconds) / 3600, 2),
+    }
+
+
+def _employee_summary(extra_weeks, deficit_weeks, extra_seconds, deficit_seconds):
+    return {
+        "extra_weeks": extra_weeks,
+        "deficit_weeks": deficit_weeks,
+        "extra_hours": round(extra_seconds / 3600, 2),
+        "deficit_hours": round(deficit_seconds / 3600, 2),
+    }
+
+
+def iter_employee_rows(data, result):
+    """
+    Filas por empleado con tipos Python: (user_id, full_name, center_id,
+    weekly_hours, simulated_weekly_hours, baseline, simulated), donde
+    baseline / simulated son dicts con semanas y horas EXTRA / DEFICIT.
+    """
+    def as_list(values):
+        return values.tolist() if hasattr(values, "tolist") else list(values)
+
+    rows = as_list(result.rows)
+    contract = as_list(result.contract_seconds)
+    baseline = zip(*(as_list(column) for column in result.baseline))
+    simulated = zip(*(as_list(column) for column in result.simulated))
+    for row, contract_seconds, base, sim in zip(rows, contract, baseline, simulated):
+        yield (
+            int(data.user_ids[row]), data.full_names[row], data.center_ids[row],
+            int(data.weekly_hours[row]), contract_seconds / 3600,
+            _employee_summary(*base), _employee_summary(*sim),
+        )
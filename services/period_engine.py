@@ -0,0 +1,332 @@
+"""
+Motor columnar de totales de tiempo por periodo (día, semana y mes).
+
+Carga los fichajes cerrados de un cliente y rango como columnas
+(record_id, user_id, date, worked_seconds, pause_seconds) y calcula los
+totales por (empleado, periodo) con agrupaciones vectorizadas de NumPy:
+trabajado, pausas, efectivo (trabajado - pausas) y nº de fichajes, y la
+diferencia semanal frente a la jornada (weekly_hours).
+
+Misma semántica que los totales de work_summary_service: segundos
+truncados por fichaje y pausas finalizadas con duración negativa = 0.
+
+NumPy es opcional: sin él (o con backend="python") se usa una
+implementación en Python puro con el mismo resultado.
+scripts/benchmark_period_engine.py compara ambas.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+from models.models import TimeRecord, UserWeekSummary, WorkPause
+from utils.logging_utils import get_logger
+from utils.sql_expressions import duration_seconds
+
+logger = get_logger(__name__)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+BACKEND_NUMPY = "numpy"
+BACKEND_PYTHON = "python"
+
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+
+PeriodColumns = namedtuple("PeriodColumns", "record_id user_id date worked_seconds pause_seconds")
+PeriodColumns.__doc__ = """
+Fichajes cerrados en columnas, ordenados por record_id. Con NumPy son
+ndarrays (date en datetime64[D]); en Python puro, listas.
+"""
+
+PeriodTotals = namedtuple(
+    "PeriodTotals", "period user_id start worked_seconds pause_seconds effective_seconds record_count"
+)
+PeriodTotals.__doc__ = """
+Totales por (user_id, start) de un periodo (DAY, WEEK o MONTH), ordenados
+por user_id y start. start es el día, el lunes o el día 1 del mes.
+"""
+
+_time_record = TimeRecord.__table__
+_work_pause = WorkPause.__table__
+_week_summary = UserWeekSummary.__table__
+
+# 1970-01-01 fue jueves: desplazamiento para calcular el lunes de cada día
+_EPOCH_WEEKDAY = 3
+_EPOCH = date(1970, 1, 1)
+
+
+def resolve_backend(backend=None):
+    """Backend a usar: el pedido si está disponible; por defecto NumPy si está instalado."""
+    if backend == BACKEND_NUMPY and not NUMPY_AVAILABLE:
+        logger.warning("NumPy not installed: period engine falls back to pure Python")
+        return BACKEND_PYTHON
+    if backend in (BACKEND_NUMPY, BACKEND_PYTHON):
+        return backend
+    return BACKEND_NUMPY if NUMPY_AVAILABLE else BACKEND_PYTHON
+
+
+# --------------------------------------------------------------------
+#  Carga
+# --------------------------------------------------------------------
+def load_period_columns(connection, client_id, date_from, date_to, user_ids=None, backend=None):
+    """
+    Fichajes cerrados del cliente en el rango (ambos incluidos) como columnas,
+    con los segundos de pausa de cada fichaje. Dos consultas (fichajes y
+    pausas) que ya devuelven duraciones en segundos (utils/sql_expressions.py):
+    Python no recorre fechas y horas fila a fila.
+    """
+    backend = resolve_backend(backend)
+    conditions = [
+        _time_record.c.client_id == client_id,
+        _time_record.c.date >= date_from,
+        _time_record.c.date <= date_to,
+        _time_record.c.check_in.isnot(None),
+        _time_record.c.check_out.isnot(None),
+    ]
+    if user_ids is not None:
+        conditions.append(_time_record.c.user_id.in_(user_ids))
+
+    records = connection.execute(
+        select(
+            _time_record.c.id, _time_record.c.user_id, _time_record.c.date,
+            duration_seconds(_time_record.c.check_in, _time_record.c.check_out),
+        )
+        .where(*conditions)
+        .order_by(_time_record.c.id)
+    ).all()
+    pauses = []
+    if records:
+        pauses = connection.execute(
+            select(_work_pause.c.time_record_id, duration_seconds(_work_pause.c.pause_start, _work_pause.c.pause_end))
+            .join(_time_record, _work_pause.c.time_record_id == _time_record.c.id)
+            .where(*conditions, _work_pause.c.pause_end.isnot(None))
+        ).all()
+
+    if backend == BACKEND_NUMPY:
+        return _numpy_columns(records, pauses)
+    return _python_columns(records, pauses)
+
+
+def _python_columns(records, pauses):
+    pause_by_record = {}
+    for record_id, seconds in pauses:
+        pause_by_record[record_id] = pause_by_record.get(record_id, 0) + max(seconds, 0)
+    return PeriodColumns(
+        record_id=[r[0] for r in records],
+        user_id=[r[1] for r in records],
+        date=[r[2] for r in records],
+        worked_seconds=[r[3] for r in records],
+        pause_seconds=[pause_by_record.get(r[0], 0) for r in records],
+    )
+
+
+def _numpy_column(rows, index, count):
+    return np.fromiter((row[index] for row in rows), dtype=np.int64, count=count)
+
+
+def _numpy_columns(records, pauses):
+    count = len(records)
+    record_id = _numpy_column(records, 0, count)
+
+    pause_seconds = np.zeros(count, dtype=np.int64)
+    if pauses:
+        durations = np.maximum(_numpy_column(pauses, 1, len(pauses)), 0)
+        # record_id está ordenado: posición de cada pausa por búsqueda binaria
+        positions = np.searchsorted(record_id, _numpy_column(pauses, 0, len(pauses)))
+        pause_seconds = np.bincount(positions, weights=durations, minlength=count).astype(np.int64)
+
+    # Fechas como ordinal (rápido) y después días desde 1970-01-01
+    ordinals = np.fromiter((row[2].toordinal() for row in records), dtype=np.int64, count=count)
+    return PeriodColumns(
+        record_id=record_id,
+        user_id=_numpy_column(records, 1, count),
+        date=(ordinals - _EPOCH.toordinal()).astype("datetime64[D]"),
+        worked_seconds=_numpy_column(records, 3, count),
+        pause_seconds=pause_seconds,
+    )
+
+
+# --------------------------------------------------------------------
+#  Agrupación
+# --------------------------------------------------------------------
+def period_start(day, period):
+    """Primer día del periodo que contiene day (date)."""
+    if period == DAY:
+        return day
+    if period == WEEK:
+        return day - timedelta(days=day.weekday())
+    if period == MONTH:
+        return day.replace(day=1)
+    raise ValueError(f"Periodo no soportado: {period}")
+
+
+def compute_totals(columns, period=DAY, backend=None):
+    """
+    Totales por (user_id, periodo) de unas PeriodColumns.
+
+    Args:
+        columns: PeriodColumns (de load_period_columns con el mismo backend)
+        period: DAY, WEEK o MONTH
+
+    Returns:
+        PeriodTotals
+    """
+    if resolve_backend(backend) == BACKEND_NUMPY and not isinstance(columns.user_id, list):
+        return _numpy_totals(columns, period)
+    return _python_totals(columns, period)
+
+
+def _python_totals(columns, period):
+    totals = {}
+    for user_id, day, worked, paused in zip(
+        columns.user_id, columns.date, columns.worked_seconds, columns.pause_seconds
+    ):
+        key = (user_id, period_start(day, period))
+        current = totals.get(key, (0, 0, 0))
+        totals[key] = (current[0] + worked, current[1] + paused, current[2] + 1)
+
+    keys = sorted(totals)
+    worked = [totals[k][0] for k in keys]
+    paused = [totals[k][1] for k in keys]
+    return PeriodTotals(
+        period=period,
+        user_id=[k[0] for k in keys],
+        start=[k[1] for k in keys],
+        worked_seconds=worked,
+        pause_seconds=paused,
+        effective_seconds=[w - p for w, p in zip(worked, paused)],
+        record_count=[totals[k][2] for k in keys],
+    )
+
+
+def _numpy_period_days(days, period):
+    """Días desde 1970-01-01 del inicio del periodo de cada fecha (datetime64[D])."""
+    day_numbers = days.astype(np.int64)
+    if period == DAY:
+        return day_numbers
+    if period == WEEK:
+        return day_numbers - (day_numbers + _EPOCH_WEEKDAY) % 7
+    if period == MONTH:
+        return days.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    raise ValueError(f"Periodo no soportado: {period}")
+
+
+def _numpy_totals(columns, period):
+    starts = _numpy_period_days(columns.date, period)
+    # Clave única (empleado, periodo): los días caben en 32 bits
+    keys = (columns.user_id << 32) | (starts & 0xFFFFFFFF)
+    unique_keys, groups = np.unique(keys, return_inverse=True)
+
+    def group_sum(values):
+        return np.bincount(groups, weights=values, minlength=len(unique_keys)).astype(np.int64)
+
+    worked = group_sum(columns.worked_seconds)
+    paused = group_sum(columns.pause_seconds)
+    return PeriodTotals(
+        period=period,
+        user_id=unique_keys >> 32,
+        start=(unique_keys & 0xFFFFFFFF).astype("datetime64[D]"),
+        worked_seconds=worked,
+        pause_seconds=paused,
+        effective_seconds=worked - paused,
+        record_count=np.bincount(groups, minlength=len(unique_keys)).astype(np.int64),
+    )
+
+
+def contract_deltas(totals, weekly_hours_by_user):
+    """
+    Diferencia (trabajado - jornada) en segundos de cada fila de unos
+    PeriodTotals semanales.
+
+    Args:
+        totals: PeriodTotals con period=WEEK
+        weekly_hours_by_user: {user_id: weekly_hours} (sin jornada = 0)
+
+    Returns:
+        lista o ndarray alineado con totals
+    """
+    if totals.period != WEEK:
+        raise ValueError("contract_deltas solo admite totales semanales")
+    if isinstance(totals.user_id, list):
+        return [
+            worked - (weekly_hours_by_user.get(user_id) or 0) * 3600
+            for user_id, worked in zip(totals.user_id, totals.worked_seconds)
+        ]
+
+    # Jornada de cada fila por búsqueda binaria sobre los empleados ordenados
+    users = np.array(sorted(weekly_hours_by_user), dtype=np.int64)
+    hours = np.array([weekly_hours_by_user[u] or 0 for u in users.tolist()], dtype=np.int64)
+    contract = np.zeros(len(totals.user_id), dtype=np.int64)
+    if len(users):
+        positions = np.clip(np.searchsorted(users, totals.user_id), 0, len(users) - 1)
+        found = users[positions] == totals.user_id
+        contract[found] = hours[positions[found]] * 3600
+    return totals.worked_seconds - contract
+
+
+def iter_totals(totals):
+    """
+    Filas de unos PeriodTotals como tuplas de tipos Python:
+    (user_id, start, worked_seconds, pause_seconds, effective_seconds, record_count).
+    """
+    if isinstance(totals.user_id, list):
+        starts = totals.start
+        columns = (totals.user_id, totals.worked_seconds, totals.pause_seconds,
+                   totals.effective_seconds, totals.record_count)
+    else:
+        starts = [_EPOCH + timedelta(days=d) for d in totals.start.astype(np.int64).tolist()]
+        columns = (totals.user_id.tolist(), totals.worked_seconds.tolist(), totals.pause_seconds.tolist(),
+                   totals.effective_seconds.tolist(), totals.record_count.tolist())
+    user_ids, worked, paused, effective, count = columns
+    return zip(user_ids, starts, worked, paused, effective, count)
+
+
+def load_week_totals(connection, client_id, date_from, date_to, user_ids=None, backend=None):
+    """
+    PeriodTotals semanales ya agregados en user_week_summary para las semanas
+    que empiezan en el rango (ambos incluidos): una sola consulta, sin volver
+    a leer fichajes ni pausas. Mismos valores que compute_totals(..., WEEK)
+    sobre las semanas completas.
+    """
+    backend = resolve_backend(backend)
+    query = (
+        select(
+            _week_summary.c.user_id, _week_summary.c.week_start, _week_summary.c.worked_seconds,
+            _week_summary.c.pause_seconds, _week_summary.c.effective_seconds, _week_summary.c.record_count,
+        )
+        .where(
+            _week_summary.c.client_id == client_id,
+            _week_summary.c.week_start >= date_from,
+            _week_summary.c.week_start <= date_to,
+        )
+        .order_by(_week_summary.c.user_id, _week_summary.c.week_start)
+    )
+    if user_ids is not None:
+        query = query.where(_week_summary.c.user_id.in_(user_ids))
+    rows = connection.execute(query).all()
+
+    if backend == BACKEND_NUMPY:
+        count = len(rows)
+        ordinals = np.fromiter((row[1].toordinal() for row in rows), dtype=np.int64, count=count)
+        return PeriodTotals(
+            WEEK,
+            _numpy_column(rows, 0, count),
+            (ordinals - _EPOCH.toordinal()).astype("datetime64[D]"),
+            *(_numpy_column(rows, index, count) for index in range(2, 6)),
+        )
+    columns = [list(column) for column in zip(*rows)] or [[] for _ in range(6)]
+    return PeriodTotals(WEEK, *columns)
+
+
+def period_totals(connection, client_id, date_from, date_to, period=DAY, user_ids=None, backend=None):
+    """Atajo: carga las columnas del rango y devuelve sus PeriodTotals."""
+    backend = resolve_backend(backend)
+    columns = load_period_columns(connection, client_id, date_from, date_to, user_ids, backend)
+    return compute_totals(columns, period, backend)
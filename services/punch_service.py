@@ -0,0 +1,209 @@
+"""
+Servicio de fichajes (entrada/salida).
+
+Centraliza la serialización de fichajes concurrentes. En lugar de bloquear
+la tabla time_record completa, cada fichaje toma un advisory lock de
+transacción por usuario, de modo que solo se serializan los fichajes
+del mismo empleado y los de empleados distintos avanzan en paralelo.
+"""
+import os
+from collections import namedtuple
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+from models.database import db
+
+# Espacio de claves para pg_advisory_xact_lock(int4, int4).
+# Las claves de dos enteros no se solapan con las de un bigint
+# (p.ej. el LOCK_ID del scheduler de emails).
+PUNCH_LOCK_NAMESPACE = 7301
+
+# Modos de concurrencia soportados:
+# - "user":  advisory lock por usuario (por defecto)
+# - "table": LOCK TABLE clásico (comportamiento anterior, solo como respaldo)
+PUNCH_LOCK_MODES = ("user", "table")
+
+# Estados del día que impiden fichar
+NON_WORKING_STATUSES = ("Vacaciones", "Baja", "Ausente")
+
+
+FastCheckInResult = namedtuple(
+    "FastCheckInResult",
+    ["record_id", "open_record_date", "today_status"]
+)
+FastCheckInResult.__doc__ = """
+Resultado de fast_check_in.
+
+- record_id: ID del TimeRecord creado (None si no se insertó)
+- open_record_date: fecha del registro abierto que impidió el fichaje (si lo hay)
+- today_status: estado de EmployeeStatus de hoy (si existe)
+"""
+
+
+# Validación + INSERT en una única sentencia (un solo round-trip al pooler).
+# Todas las sub-sentencias del CTE comparten snapshot, por lo que la carrera
+# entre dos fichajes simultáneos la resuelve el índice único parcial
+# uix_time_record_open_per_day mediante ON CONFLICT DO NOTHING.
+_FAST_CHECK_IN_TEMPLATE = """
+    WITH open_record AS (
+        SELECT id, date
+        FROM time_record
+        WHERE client_id = :client_id AND user_id = :user_id AND check_out IS NULL
+        ORDER BY id DESC
+        LIMIT 1
+    ),
+    today_status AS (
+        SELECT status
+        FROM employee_status
+        WHERE client_id = :client_id AND user_id = :user_id AND date = :today
+        LIMIT 1
+    ),
+    new_record AS (
+        INSERT INTO time_record (client_id, user_id, check_in, date, created_at, updated_at)
+        SELECT :client_id, :user_id, :check_in, :record_date, :created_at, :created_at
+        WHERE NOT EXISTS (SELECT 1 FROM open_record)
+          AND NOT EXISTS (
+              SELECT 1 FROM today_status
+              WHERE CAST(status AS TEXT) IN ('Vacaciones', 'Baja', 'Ausente')
+          )
+        ON CONFLICT (client_id, user_id, date) WHERE check_out IS NULL DO NOTHING
+        RETURNING id
+    ),
+    new_status AS (
+        INSERT INTO employee_status (client_id, user_id, date, status, notes, created_at, updated_at)
+        SELECT :client_id, :user_id, :record_date, 'Trabajado', 'Registro automático de fichaje',
+               :created_at, :created_at
+        FROM new_record
+        ON CONFLICT (client_id, user_id, date) DO NOTHING
+    ){pending_seal}
+    SELECT
+        (SELECT id FROM new_record) AS record_id,
+        (SELECT date FROM open_record) AS open_record_date,
+        (SELECT CAST(status AS TEXT) FROM today_status) AS today_status
+"""
+
+# Fila de sellado diferido (SEALING_MODE=async) en la misma sentencia
+_PENDING_SEAL_CTE = """,
+    new_pending_seal AS (
+        INSERT INTO pending_seal (time_record_id, client_id, user_id, timestamp_utc, action,
+                                  terminal_id, user_agent, ip_address, attempts, created_at)
+        SELECT id, :client_id, :user_id, :seal_timestamp_utc, 'check_in',
+               :seal_terminal_id, :seal_user_agent, :seal_ip_address, 0, :seal_created_at
+        FROM new_record
+    )"""
+
+FAST_CHECK_IN_SQL = text(_FAST_CHECK_IN_TEMPLATE.replace("{pending_seal}", ""))
+FAST_CHECK_IN_WITH_SEAL_SQL = text(_FAST_CHECK_IN_TEMPLATE.replace("{pending_seal}", _PENDING_SEAL_CTE))
+
+
+def get_punch_lock_mode():
+    """
+    Devuelve el modo de bloqueo configurado en PUNCH_LOCK_MODE.
+    Cualquier valor desconocido se trata como "user".
+    """
+    mode = os.getenv("PUNCH_LOCK_MODE", "user").lower()
+    return mode if mode in PUNCH_LOCK_MODES else "user"
+
+
+def lock_user_punches(user_id, session=None):
+    """
+    Serializa los fichajes de un único usuario dentro de la transacción actual.
+
+    En PostgreSQL toma pg_advisory_xact_lock, que se libera automáticamente
+    en el commit/rollback. En otros motores (SQLite local) no hace nada:
+    el índice único parcial sobre registros abiertos actúa como red de seguridad.
+
+    Args:
+        user_id: ID del usuario que ficha
+        session: Sesión a usar (por defecto db.session)
+    """
+    session = session or db.session
+    bind = session.get_bind()
+    if not bind or bind.dialect.name != "postgresql":
+        return
+
+    if get_punch_lock_mode() == "table":
+        session.execute(
+            text("LOCK TABLE public.time_record IN SHARE ROW EXCLUSIVE MODE")
+        )
+        return
+
+    session.execute(
+        text("SELECT pg_advisory_xact_lock(:namespace, :user_id)"),
+        {"namespace": PUNCH_LOCK_NAMESPACE, "user_id": user_id}
+    )
+
+
+def is_open_record_conflict(exc):
+    """
+    Indica si una IntegrityError corresponde al índice único de registros abiertos
+    (dos fichajes de entrada simultáneos del mismo usuario en el mismo día).
+    """
+    message = str(getattr(exc, "orig", exc))
+    return "uix_time_record_open_per_day" in message or (
+        "time_record" in message and "UNIQUE" in message.upper()
+    )
+
+
+def fast_check_in_enabled():
+    """
+    La ruta rápida está activa por defecto en PostgreSQL.
+    Se puede desactivar con CHECKIN_FAST_PATH=false.
+    """
+    if os.getenv("CHECKIN_FAST_PATH", "true").lower() != "true":
+        return False
+    bind = db.session.get_bind()
+    return bool(bind and bind.dialect.name == "postgresql")
+
+
+def fast_check_in(client_id, user_id, check_in_time, pending_seal=None):
+    """
+    Valida y registra un fichaje de entrada en una única sentencia SQL.
+
+    En una sola ida y vuelta comprueba que no haya registros abiertos ni un
+    estado no trabajable hoy, inserta el TimeRecord y, si no existía,
+    el EmployeeStatus "Trabajado" del día.
+
+    No hace commit: la vista sigue siendo responsable de confirmar la transacción.
+    En motores distintos de PostgreSQL devuelve None y la vista usa la ruta ORM.
+
+    Args:
+        client_id: ID del cliente
+        user_id: ID del usuario que ficha
+        check_in_time: datetime de entrada (hora de España)
+        pending_seal: valores de pending_seal (build_pending_seal_values) para
+            encolar el sellado en la misma sentencia, o None
+
+    Returns:
+        FastCheckInResult o None si la ruta rápida no aplica
+    """
+    if not fast_check_in_enabled():
+        return None
+
+    params = {
+        "client_id": client_id,
+        "user_id": user_id,
+        "today": date.today(),
+        "record_date": check_in_time.date(),
+        "check_in": check_in_time,
+        "created_at": datetime.utcnow(),
+    }
+    statement = FAST_CHECK_IN_SQL
+    if pending_seal is not None:
+        statement = FAST_CHECK_IN_WITH_SEAL_SQL
+        params.update({
+            "seal_timestamp_utc": pending_seal["timestamp_utc"],
+            "seal_terminal_id": pending_seal["terminal_id"],
+            "seal_user_agent": pending_seal["user_agent"],
+            "seal_ip_address": pending_seal["ip_address"],
+            "seal_created_at": pending_seal["created_at"],
+        })
+
+    row = db.session.execute(statement, params).one()
+
+    return FastCheckInResult(
+        record_id=row.record_id,
+        open_record_date=row.open_record_date,
+        today_status=row.today_status,
+    )
@@ -0,0 +1,156 @@
+"""
+Caché de datos de referencia por cliente (centros, categorías y cliente).
+
+Los helpers de filtros de admin/export resuelven nombres de centro y
+categoría en casi cada petición. En lugar de consultar la BD cada vez,
+se guarda por cliente una instantánea inmutable (namedtuples y mapas de
+solo lectura) con los mapas nombre→id e id→objeto.
+
+Invalidación: los eventos de mapper de Center, Category y Client marcan el
+cliente afectado; la instantánea se descarta al momento y otra vez tras
+el commit/rollback (por si se recargó dentro de la transacción con datos
+sin confirmar). Tras el commit se incrementa además la generación
+"reference:<client_id>" de la caché compartida (utils/shared_cache.py),
+que cada proceso comprueba una vez por petición: así los demás workers
+también descartan su instantánea. REFERENCE_CACHE_TTL acota la vida de
+cada instantánea si la caché compartida no está disponible.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from models.models import Center, Category, Client
+from models.database import db
+from utils.shared_cache import get_generation, bump_generation
+
+DEFAULT_REFERENCE_CACHE_TTL = 300
+
+CenterRef = namedtuple("CenterRef", "id name is_active")
+CategoryRef = namedtuple("CategoryRef", "id name description")
+ClientRef = namedtuple(
+    "ClientRef",
+    "id name slug plan logo_url is_active primary_color secondary_color"
+)
+
+TenantReference = namedtuple("TenantReference", [
+    "client",             # ClientRef o None
+    "centers",            # tupla de CenterRef activos, por nombre
+    "categories",         # tupla de CategoryRef, por nombre
+    "center_by_id",       # {id: CenterRef} (incluye inactivos)
+    "center_by_name",     # {nombre: CenterRef} (incluye inactivos)
+    "category_by_id",     # {id: CategoryRef}
+    "category_by_name",   # {nombre: CategoryRef}
+])
+
+_cache = {}
+_lock = threading.Lock()
+
+_PENDING_KEY = "reference_cache_invalidate"
+
+
+def get_cache_ttl():
+    try:
+        return int(os.getenv("REFERENCE_CACHE_TTL", DEFAULT_REFERENCE_CACHE_TTL))
+    except ValueError:
+        return DEFAULT_REFERENCE_CACHE_TTL
+
+
+def reference_scope(client_id):
+    """Ámbito de invalidación compartido de los datos de referencia de un cliente."""
+    return f"reference:{client_id}"
+
+
+def _current_generation(client_id):
+    # Una lectura de la caché compartida por cliente y petición
+    if not has_request_context():
+        return get_generation(reference_scope(client_id))
+    generations = g.setdefault("_reference_generations", {})
+    if client_id not in generations:
+        generations[client_id] = get_generation(reference_scope(client_id))
+    return generations[client_id]
+
+
+def _load(client_id):
+    client = db.session.get(Client, client_id)
+    centers = Center.query.filter_by(client_id=client_id).order_by(Center.name).all()
+    categories = Category.query.filter_by(client_id=client_id).order_by(Category.name).all()
+
+    center_refs = [CenterRef(c.id, c.name, c.is_active) for c in centers]
+    category_refs = [CategoryRef(c.id, c.name, c.description) for c in categories]
+
+    return TenantReference(
+        client=ClientRef(
+            client.id, client.name, client.slug, client.plan, client.logo_url,
+            client.is_active, client.primary_color, client.secondary_color
+        ) if client else None,
+        centers=tuple(c for c in center_refs if c.is_active),
+        categories=tuple(category_refs),
+        center_by_id=MappingProxyType({c.id: c for c in center_refs}),
+        center_by_name=MappingProxyType({c.name: c for c in center_refs}),
+        category_by_id=MappingProxyType({c.id: c for c in category_refs}),
+        category_by_name=MappingProxyType({c.name: c for c in category_refs}),
+    )
+
+
+def get_reference(client_id):
+    """
+    Instantánea de referencia del cliente (se carga de la BD si no está en caché).
+
+    Returns:
+        TenantReference o None si client_id es None
+    """
+    if not client_id:
+        return None
+
+    generation = _current_generation(client_id)
+    entry = _cache.get(client_id)
+    if entry is not None and entry[0] > time.monotonic() and entry[2] == generation:
+        return entry[1]
+
+    snapshot = _load(client_id)
+    with _lock:
+        _cache[client_id] = (time.monotonic() + get_cache_ttl(), snapshot, generation)
+    return snapshot
+
+
+def invalidate(client_id=None):
+    """Descarta la instantánea de un cliente (o de todos si client_id es None)."""
+    with _lock:
+        if client_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(client_id, None)
+
+
+def _mark_changed(mapper, connection, target):
+    client_id = target.id if isinstance(target, Client) else target.client_id
+    invalidate(client_id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(client_id)
+
+
+for _model in (Center, Category, Client):
+    for _event_name in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event_name, _mark_changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_invalidations(session):
+    for client_id in session.info.pop(_PENDING_KEY, ()):
+        invalidate(client_id)
+        bump_generation(reference_scope(client_id))
+        if has_request_context():
+            g.get("_reference_generations", {}).pop(client_id, None)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_invalidations(session, previous_transaction):
+    for client_id in session.info.pop(_PENDING_KEY, ()):
+        invalidate(client_id)
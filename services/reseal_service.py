@@ -0,0 +1,185 @@
+"""
+Re-sellado de firmas tras una rotación de clave (SIGNING_KEY_Vn).
+
+Cada firma con key_version = versión origen se verifica con su clave
+antigua y, si es válida, se crea una TimeRecordSignature nueva con los
+mismos datos (timestamp, terminal, hash) firmada con la versión destino.
+Las firmas originales no se tocan. Las que no superan la verificación no
+se vuelven a firmar: se cuentan y se registran para revisión manual.
+
+El job trabaja por bloques cortos (una transacción por bloque), guarda un
+checkpoint por partición de worker (id % worker_count) y puede pausar entre
+bloques para no cargar la base de datos de producción.
+"""
+import time
+from datetime import datetime
+
+from sqlalchemy import select, and_, exists
+from sqlalchemy.orm import aliased
+
+from models.models import TimeRecord, TimeRecordSignature, ResealCheckpoint
+from models.database import db
+from services.timestamp_service import TimestampService
+from services.verification_service import (
+    signature_row_columns, verify_signature_rows, load_signing_keys
+)
+from utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_RESEAL_CHUNK_SIZE = 1000
+
+
+def get_checkpoint(from_version, to_version, worker_index=0, worker_count=1):
+    """
+    Devuelve (creándolo si no existe) el checkpoint de una partición.
+    """
+    checkpoint = ResealCheckpoint.query.filter_by(
+        from_version=from_version,
+        to_version=to_version,
+        worker_index=worker_index,
+        worker_count=worker_count
+    ).first()
+
+    if checkpoint is None:
+        checkpoint = ResealCheckpoint(
+            from_version=from_version,
+            to_version=to_version,
+            worker_index=worker_index,
+            worker_count=worker_count,
+            last_signature_id=0,
+            resealed_count=0,
+            invalid_count=0,
+            status="running"
+        )
+        db.session.add(checkpoint)
+        db.session.commit()
+    return checkpoint
+
+
+def _pending_signatures_query(from_version, to_version, worker_index, worker_count):
+    """
+    Firmas de la versión origen que aún no tienen su equivalente en la versión
+    destino (mismo fichaje, acción y timestamp), dentro de la partición.
+    """
+    resealed = aliased(TimeRecordSignature)
+    query = (
+        select(*signature_row_columns())
+        .join(TimeRecord, TimeRecord.id == TimeRecordSignature.time_record_id)
+        .where(
+            TimeRecordSignature.key_version == from_version,
+            # Las firmas sin HMAC propio (root_only) las cubre la raíz de su lote
+            TimeRecordSignature.signature.isnot(None),
+            ~exists().where(and_(
+                resealed.time_record_id == TimeRecordSignature.time_record_id,
+                resealed.action == TimeRecordSignature.action,
+                resealed.timestamp_utc == TimeRecordSignature.timestamp_utc,
+                resealed.key_version == to_version,
+            ))
+        )
+    )
+    if worker_count > 1:
+        query = query.where(TimeRecordSignature.id % worker_count == worker_index)
+    return query
+
+
+def reseal_chunk(checkpoint, keys, chunk_size=DEFAULT_RESEAL_CHUNK_SIZE):
+    """
+    Re-sella un bloque a partir del checkpoint y lo confirma.
+
+    Returns:
+        int: firmas leídas en el bloque (0 = partición terminada)
+    """
+    rows = db.session.execute(
+        _pending_signatures_query(
+            checkpoint.from_version, checkpoint.to_version,
+            checkpoint.worker_index, checkpoint.worker_count
+        )
+        .where(TimeRecordSignature.id > checkpoint.last_signature_id)
+        .order_by(TimeRecordSignature.id)
+        .limit(chunk_size)
+    ).all()
+
+    if not rows:
+        checkpoint.status = "done"
+        db.session.commit()
+        return 0
+
+    rows = [tuple(row) for row in rows]
+    _, invalid_ids, _, _, unavailable_ids = verify_signature_rows(rows, keys)
+    invalid = set(invalid_ids)
+    # run_reseal exige la clave origen: no debería haber ninguna sin clave
+    skipped = invalid | set(unavailable_ids)
+
+    now = datetime.utcnow()
+    new_signatures = []
+    for (sig_id, time_record_id, user_id, client, action, timestamp_utc,
+         terminal_id, content_hash, signature, key_version, batch_id) in rows:
+        if sig_id in skipped:
+            continue
+        new_signatures.append({
+            "time_record_id": time_record_id,
+            "client_id": client,
+            "timestamp_utc": timestamp_utc,
+            "action": action,
+            "terminal_id": terminal_id,
+            "content_hash": content_hash,
+            "signature": TimestampService.sign_hash(content_hash, checkpoint.to_version),
+            "key_version": checkpoint.to_version,
+            "created_at": now,
+        })
+
+    if new_signatures:
+        db.session.bulk_insert_mappings(TimeRecordSignature, new_signatures)
+
+    if invalid:
+        logger.error(
+            f"Re-sellado v{checkpoint.from_version}->v{checkpoint.to_version}: "
+            f"{len(invalid)} firma(s) inválidas no re-selladas: {sorted(invalid)[:50]}"
+        )
+
+    checkpoint.last_signature_id = rows[-1][0]
+    checkpoint.resealed_count += len(new_signatures)
+    checkpoint.invalid_count += len(invalid)
+    db.session.commit()
+    return len(rows)
+
+
+def run_reseal(from_version, to_version, worker_index=0, worker_count=1,
+               chunk_size=DEFAULT_RESEAL_CHUNK_SIZE, sleep_seconds=0.0,
+               max_chunks=None):
+    """
+    Re-sella la partición indicada hasta terminarla (o hasta max_chunks bloques).
+    Se puede interrumpir en cualquier momento: la siguiente ejecución
+    continúa desde el checkpoint.
+
+    Returns:
+        ResealCheckpoint de la partición
+    """
+    keys = load_signing_keys()
+    for version in (from_version, to_version):
+        if version not in keys:
+            # Falla pronto con el mismo error que el sellado normal
+            TimestampService.get_signing_key(version)
+
+    checkpoint = get_checkpoint(from_version, to_version, worker_index, worker_count)
+    if checkpoint.status == "done":
+        return checkpoint
+
+    chunks = 0
+    while True:
+        processed = reseal_chunk(checkpoint, keys, chunk_size)
+        if not processed:
+            break
+        chunks += 1
+        if max_chunks and chunks >= max_chunks:
+            break
+        if sleep_seconds:
+            time.sleep(sleep_seconds)
+
+    logger.info(
+        f"Re-sellado v{from_version}->v{to_version} partición {worker_index}/{worker_count}: "
+        f"{checkpoint.resealed_count} re-selladas, {checkpoint.invalid_count} inválidas "
+        f"(estado {checkpoint.status})"
+    )
+    return checkpoint
@@ -0,0 +1,210 @@
+"""
+Servicio de sellado diferido de fichajes (Ley de Fichajes).
+
+Con SEALING_MODE=async la petición de fichaje solo guarda una fila en
+pending_seal con el momento exacto y el terminal. El worker de sellado
+(APScheduler o /admin/cron/seals) firma lotes con las claves cacheadas,
+crea las TimeRecordSignature y vacía la cola.
+
+Garantía de integridad: ningún fichaje debe quedar sin sellar más de
+SEAL_DEADLINE_SECONDS. El worker procesa siempre primero los pendientes
+más antiguos y avisa (log de error + estado del cron) si queda alguno
+fuera de plazo.
+"""
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from models.models import PendingSeal, TimeRecordSignature
+from models.database import db
+from services.timestamp_service import TimestampService
+from services.merkle_service import is_root_only
+from utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Modos de sellado soportados:
+# - "sync":  se firma dentro de la petición (comportamiento anterior, por defecto)
+# - "async": se encola en pending_seal y lo firma el worker
+SEALING_MODES = ("sync", "async")
+
+DEFAULT_SEAL_DEADLINE_SECONDS = 300
+DEFAULT_SEAL_BATCH_SIZE = 200
+
+# Tras este número de fallos la fila deja de reintentarse automáticamente
+MAX_SEAL_ATTEMPTS = 5
+
+
+def get_sealing_mode():
+    """
+    Devuelve el modo configurado en SEALING_MODE.
+    Cualquier valor desconocido se trata como "sync".
+    """
+    mode = os.getenv("SEALING_MODE", "sync").lower()
+    return mode if mode in SEALING_MODES else "sync"
+
+
+def is_async_sealing():
+    return get_sealing_mode() == "async"
+
+
+def get_seal_deadline_seconds():
+    """Plazo máximo (segundos) que un fichaje puede quedar sin sellar."""
+    try:
+        return int(os.getenv("SEAL_DEADLINE_SECONDS", DEFAULT_SEAL_DEADLINE_SECONDS))
+    except ValueError:
+        return DEFAULT_SEAL_DEADLINE_SECONDS
+
+
+def build_pending_seal_values(time_record_id, user_id, client_id, action, request):
+    """
+    Captura en la petición los datos que se firmarán después.
+
+    Returns:
+        dict: columnas de pending_seal (sin id)
+    """
+    now = datetime.utcnow()
+    return {
+        "time_record_id": time_record_id,
+        "client_id": client_id,
+        "user_id": user_id,
+        "timestamp_utc": now,
+        "action": action,
+        "terminal_id": TimestampService.get_terminal_id(request),
+        "user_agent": request.headers.get("User-Agent"),
+        "ip_address": request.remote_addr,
+        "attempts": 0,
+        "created_at": now,
+    }
+
+
+def enqueue_seal(time_record_id, user_id, client_id, action, request):
+    """
+    Añade a la sesión actual la fila pendiente de sellado de un fichaje.
+    No hace commit: se confirma junto con el propio fichaje.
+    """
+    pending = PendingSeal(**build_pending_seal_values(
+        time_record_id, user_id, client_id, action, request
+    ))
+    db.session.add(pending)
+    return pending
+
+
+def seal_pending_batch(batch_size=DEFAULT_SEAL_BATCH_SIZE):
+    """
+    Sella un lote de fichajes pendientes (los más antiguos primero).
+
+    En PostgreSQL usa FOR UPDATE SKIP LOCKED, de modo que varios workers
+    pueden vaciar la cola en paralelo sin firmar dos veces la misma fila.
+    Se ejecuta sin filtro multitenant: la cola es global.
+
+    Returns:
+        dict: {"sealed": n, "failed": n}
+    """
+    pending = (
+        PendingSeal.query.bypass_tenant_filter()
+        .filter(PendingSeal.attempts < MAX_SEAL_ATTEMPTS)
+        .order_by(PendingSeal.created_at, PendingSeal.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+    key_version = TimestampService.get_current_key_version()
+    root_only = is_root_only()
+    sealed = 0
+    failed = 0
+    signatures = []
+    for row in pending:
+        try:
+            content_hash, signature = TimestampService.seal_values(
+                time_record_id=row.time_record_id,
+                user_id=row.user_id,
+                client_id=row.client_id,
+                action=row.action,
+                timestamp_utc=row.timestamp_utc,
+                terminal_id=row.terminal_id,
+                key_version=key_version
+            )
+        except Exception as e:
+            row.attempts += 1
+            row.last_error = str(e)
+            failed += 1
+            continue
+
+        signatures.append({
+            "time_record_id": row.time_record_id,
+            "client_id": row.client_id,
+            "timestamp_utc": row.timestamp_utc,
+            "action": row.action,
+            "terminal_id": row.terminal_id,
+            "user_agent": row.user_agent,
+            "ip_address": row.ip_address,
+            "content_hash": content_hash,
+            "signature": None if root_only else signature,
+            "key_version": key_version,
+            "created_at": datetime.utcnow(),
+        })
+        db.session.delete(row)
+        sealed += 1
+
+    if signatures:
+        db.session.bulk_insert_mappings(TimeRecordSignature, signatures)
+    db.session.commit()
+
+    if failed:
+        logger.error(f"Sellado diferido: {failed} fichaje(s) no se pudieron sellar en este lote")
+
+    return {"sealed": sealed, "failed": failed}
+
+
+def get_seal_backlog():
+    """
+    Estado de la cola de sellado.
+
+    Returns:
+        dict: pending, overdue (fuera de plazo) y oldest_age_seconds
+    """
+    deadline = datetime.utcnow() - timedelta(seconds=get_seal_deadline_seconds())
+
+    pending, oldest, overdue = db.session.query(
+        func.count(PendingSeal.id),
+        func.min(PendingSeal.created_at),
+        func.count(PendingSeal.id).filter(PendingSeal.created_at < deadline),
+    ).one()
+
+    oldest_age = (datetime.utcnow() - oldest).total_seconds() if oldest else 0
+    return {
+        "pending": pending,
+        "overdue": overdue,
+        "oldest_age_seconds": int(oldest_age),
+    }
+
+
+def run_seal_worker(batch_size=DEFAULT_SEAL_BATCH_SIZE, max_batches=50):
+    """
+    Vacía la cola de sellado por lotes y comprueba el plazo máximo.
+
+    Returns:
+        dict: totales sellados/fallidos y estado final de la cola
+    """
+    totals = {"sealed": 0, "failed": 0}
+    for _ in range(max_batches):
+        result = seal_pending_batch(batch_size)
+        totals["sealed"] += result["sealed"]
+        totals["failed"] += result["failed"]
+        if result["sealed"] + result["failed"] < batch_size:
+            break
+
+    backlog = get_seal_backlog()
+    if backlog["overdue"]:
+        logger.error(
+            f"⚠️ {backlog['overdue']} fichaje(s) siguen sin sellar tras "
+            f"{get_seal_deadline_seconds()}s (más antiguo: {backlog['oldest_age_seconds']}s)"
+        )
+    elif totals["sealed"]:
+        logger.info(f"Sellado diferido: {totals['sealed']} fichaje(s) sellados")
+
+    totals.update(backlog)
+    return totals
@@ -18,6 +18,9 @@ class TimestampService:
     Soporta rotación de claves mediante versiones.
     """
 
+    # Claves ya leídas del entorno, por versión (ver clear_key_cache)
+    _key_cache: Dict[int, bytes] = {}
+
     @staticmethod
     def get_signing_key(version: int = 1) -> bytes:
         """
@@ -32,6 +35,10 @@ class TimestampService:
         Raises:
             ValueError: Si la clave no existe en las variables de entorno
         """
+        cached = TimestampService._key_cache.get(version)
+        if cached is not None:
+            return cached
+
         key_var = f"SIGNING_KEY_V{version}"
         key = os.getenv(key_var)
 
@@ -42,7 +49,28 @@ class TimestampService:
                 f"Generate one with: python -c \"import secrets; print(secrets.token_hex(32))\""
             )
 
-        return key.encode('utf-8')
+        key_bytes = key.encode('utf-8')
+        TimestampService._key_cache[version] = key_bytes
+        return key_bytes
+
+    @staticmethod
+    def get_current_key_version() -> int:
+        """
+        Versión de clave con la que se firman los fichajes nuevos
+        (SIGNING_KEY_CURRENT_VERSION, por defecto 1). Tras una rotación se
+        sube a la nueva versión y se re-sellan las firmas antiguas.
+        """
+        try:
+            return int(os.getenv("SIGNING_KEY_CURRENT_VERSION", "1"))
+        except ValueError:
+            return 1
+
+    @staticmethod
+    def clear_key_cache() -> None:
+        """
+        Olvida las claves cacheadas (tras cambiar SIGNING_KEY_Vn en caliente).
+        """
+        TimestampService._key_cache.clear()
 
     @staticmethod
     def generate_content_hash(data: Dict[str, any]) -> str:
@@ -131,6 +159,45 @@ class TimestampService:
             "terminal_id": terminal_id
         }
 
+    @staticmethod
+    def get_terminal_id(request) -> str:
+        """
+        Identificador del terminal a partir de la petición (ej: "web_192.168.1.1").
+        """
+        ip_address = request.remote_addr or "unknown"
+        return f"web_{ip_address}"
+
+    @staticmethod
+    def seal_values(
+        time_record_id: int,
+        user_id: int,
+        client_id: int,
+        action: str,
+        timestamp_utc: datetime,
+        terminal_id: str,
+        key_version: int = 1
+    ) -> Tuple[str, str]:
+        """
+        Calcula hash y firma para unos datos de fichaje ya capturados.
+
+        Lo usan tanto el sellado síncrono como el worker de sellado diferido,
+        que firma con el timestamp y el terminal capturados en la petición.
+
+        Returns:
+            Tuple: (content_hash, signature)
+        """
+        data = TimestampService.create_signature_data(
+            time_record_id=time_record_id,
+            user_id=user_id,
+            client_id=client_id,
+            action=action,
+            timestamp_utc=timestamp_utc,
+            terminal_id=terminal_id
+        )
+        content_hash = TimestampService.generate_content_hash(data)
+        signature = TimestampService.sign_hash(content_hash, key_version)
+        return content_hash, signature
+
     @staticmethod
     def seal_record(
         time_record,
@@ -154,23 +221,19 @@ class TimestampService:
         timestamp_utc = datetime.utcnow()
 
         # Identificador del terminal
-        ip_address = request.remote_addr or "unknown"
-        terminal_id = f"web_{ip_address}"
+        terminal_id = TimestampService.get_terminal_id(request)
 
-        # Crear datos para hashear
-        data = TimestampService.create_signature_data(
+        # Generar hash y firma
+        content_hash, signature = TimestampService.seal_values(
             time_record_id=time_record.id,
             user_id=time_record.user_id,
             client_id=time_record.client_id,
             action=action,
             timestamp_utc=timestamp_utc,
-            terminal_id=terminal_id
+            terminal_id=terminal_id,
+            key_version=key_version
         )
 
-        # Generar hash y firma
-        content_hash = TimestampService.generate_content_hash(data)
-        signature = TimestampService.sign_hash(content_hash, key_version)
-
         current_app.logger.info(
             f"Sealed {action} for TimeRecord {time_record.id} "
             f"(User {time_record.user_id}, Client {time_record.client_id})"
@@ -179,7 +242,7 @@ class TimestampService:
         return content_hash, signature, timestamp_utc, terminal_id
 
     @staticmethod
-    def verify_record_signature(signature_record) -> bool:
+    def verify_record_signature(signature_record):
         """
         Verifica la integridad de un registro de firma.
 
@@ -187,7 +250,9 @@ class TimestampService:
             signature_record: Instancia de TimeRecordSignature
 
         Returns:
-            bool: True si la firma es válida y el registro no ha sido alterado
+            bool: True si la firma es válida y el registro no ha sido alterado.
+            None si no tiene firma propia y aún no está en un lote Merkle
+            (MERKLE_SEALING=root_only, ventana sin cerrar): pendiente, no inválida
         """
         # Recrear los datos originales
         data = TimestampService.create_signature_data(
@@ -208,6 +273,13 @@ class TimestampService:
             )
             return False
 
+        # Sin firma propia (MERKLE_SEALING=root_only): la cubre la raíz de su lote
+        if signature_record.signature is None:
+            if signature_record.batch_id is None:
+                return None
+            from services.merkle_service import verify_leaf
+            return verify_leaf(signature_record)
+
         # Verificar la firma
         return TimestampService.verify_signature(
             content_hash=signature_record.content_hash,
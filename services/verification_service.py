@@ -0,0 +1,361 @@
+"""
+Verificación masiva de firmas de fichajes (inspecciones de trabajo y
+comprobación nocturna).
+
+A diferencia de TimestampService.verify_record_signature, que revisa una
+firma y carga su TimeRecord, aquí las firmas se leen por bloques con una
+única consulta (firma + user_id del TimeRecord), paginando por id, y los
+bloques se reparten entre un pool de procesos. El resultado se guarda en
+signature_verification_report y, en modo incremental, se avanza la marca
+de agua del cliente para no volver a verificar las mismas firmas.
+
+La marca no llega a las firmas creadas en los últimos
+VERIFY_WATERMARK_LAG_MINUTES: una transacción que confirma tarde (sellado
+diferido, fichajes simultáneos) puede dejar un id menor detrás de otro ya
+verificado, y se perdería. Esas firmas se vuelven a leer en la siguiente
+ejecución.
+"""
+import hashlib
+import hmac
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, or_, select
+
+from models.models import (
+    Client, TimeRecord, TimeRecordSignature,
+    SignatureVerificationWatermark, SignatureVerificationReport
+)
+from models.database import db
+from services.timestamp_service import TimestampService
+from utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_WATERMARK_LAG_MINUTES = 10
+
+_SIGNING_KEY_VAR = re.compile(r"^SIGNING_KEY_V(\d+)$")
+
+# Máximo de IDs inválidos que se guardan en el informe
+MAX_REPORTED_INVALID_IDS = 1000
+
+
+def get_verification_workers():
+    """Número de procesos del pool (VERIFY_WORKERS, por defecto nº de CPUs)."""
+    try:
+        return max(1, int(os.getenv("VERIFY_WORKERS", os.cpu_count() or 1)))
+    except ValueError:
+        return os.cpu_count() or 1
+
+
+def get_watermark_lag():
+    """Antigüedad mínima de una firma para dejarla atrás en la marca de agua."""
+    try:
+        return timedelta(minutes=max(0, int(os.getenv("VERIFY_WATERMARK_LAG_MINUTES", DEFAULT_WATERMARK_LAG_MINUTES))))
+    except ValueError:
+        return timedelta(minutes=DEFAULT_WATERMARK_LAG_MINUTES)
+
+
+def _settled_watermark(client_id, after_id, last_id, started_at):
+    """
+    Hasta dónde puede avanzar la marca: justo antes de la primera firma
+    leída que sea reciente (VERIFY_WATERMARK_LAG_MINUTES), o last_id.
+    """
+    first_recent = db.session.execute(
+        select(func.min(TimeRecordSignature.id)).where(
+            TimeRecordSignature.client_id == client_id,
+            TimeRecordSignature.id > after_id,
+            TimeRecordSignature.id <= last_id,
+            or_(
+                TimeRecordSignature.created_at.is_(None),
+                TimeRecordSignature.created_at >= started_at - get_watermark_lag(),
+            ),
+        )
+    ).scalar()
+    return last_id if first_recent is None else first_recent - 1
+
+
+def signature_row_columns():
+    """
+    Columnas de una fila de firma tal y como la espera verify_signature_rows
+    (el user_id sale del TimeRecord unido en la misma consulta).
+    """
+    return (
+        TimeRecordSignature.id,
+        TimeRecordSignature.time_record_id,
+        TimeRecord.user_id,
+        TimeRecordSignature.client_id,
+        TimeRecordSignature.action,
+        TimeRecordSignature.timestamp_utc,
+        TimeRecordSignature.terminal_id,
+        TimeRecordSignature.content_hash,
+        TimeRecordSignature.signature,
+        TimeRecordSignature.key_version,
+        TimeRecordSignature.batch_id,
+    )
+
+
+def verify_signature_rows(rows, keys):
+    """
+    Verifica un bloque de firmas. Se ejecuta en los procesos del pool, por lo
+    que no usa la app Flask ni la base de datos: recibe filas planas y las
+    claves ya resueltas por versión.
+
+    Args:
+        rows: lista de tuplas (id, time_record_id, user_id, client_id, action,
+              timestamp_utc, terminal_id, content_hash, signature, key_version, batch_id)
+        keys: dict {key_version: bytes}
+
+    Las firmas sin HMAC propio (MERKLE_SEALING=root_only) solo se validan aquí
+    por su hash; quedan pendientes de la verificación de su lote Merkle. Las
+    que aún no tienen lote (ventana sin cerrar) no son inválidas: se
+    devuelven aparte como pendientes. Tampoco lo son las firmadas con una
+    versión de clave que ya no está en el entorno (clave retirada tras una
+    rotación): si su hash cuadra, se devuelven como "clave no disponible".
+
+    Returns:
+        tuple: (válidas, [ids inválidos], {batch_id: [ids pendientes del lote]},
+        [ids pendientes de lote], [ids con clave no disponible])
+    """
+    valid = 0
+    invalid_ids = []
+    batch_leaves = {}
+    unbatched_ids = []
+    key_unavailable_ids = []
+    for (sig_id, time_record_id, user_id, client_id, action, timestamp_utc,
+         terminal_id, content_hash, signature, key_version, batch_id) in rows:
+        data = TimestampService.create_signature_data(
+            time_record_id=time_record_id,
+            user_id=user_id,
+            client_id=client_id,
+            action=action,
+            timestamp_utc=timestamp_utc,
+            terminal_id=terminal_id
+        )
+        if signature is None:
+            if TimestampService.generate_content_hash(data) != content_hash:
+                invalid_ids.append(sig_id)
+            elif batch_id is None:
+                unbatched_ids.append(sig_id)
+            else:
+                batch_leaves.setdefault(batch_id, []).append(sig_id)
+            continue
+
+        key = keys.get(key_version)
+        if TimestampService.generate_content_hash(data) != content_hash:
+            invalid_ids.append(sig_id)
+        elif key is None:
+            key_unavailable_ids.append(sig_id)
+        elif not hmac.compare_digest(
+            hmac.new(key, content_hash.encode('utf-8'), hashlib.sha256).hexdigest(),
+            signature
+        ):
+            invalid_ids.append(sig_id)
+        else:
+            valid += 1
+    return valid, invalid_ids, batch_leaves, unbatched_ids, key_unavailable_ids
+
+
+def _signature_chunks(client_id, date_from=None, date_to=None, after_id=0,
+                      chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Lee las firmas de un cliente por bloques, paginando por id (keyset).
+    Cada bloque es una única consulta con el user_id ya unido: sin N+1.
+    """
+    base = (
+        select(*signature_row_columns())
+        .join(TimeRecord, TimeRecord.id == TimeRecordSignature.time_record_id)
+        .where(TimeRecordSignature.client_id == client_id)
+    )
+    if date_from:
+        base = base.where(TimeRecordSignature.timestamp_utc >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        base = base.where(TimeRecordSignature.timestamp_utc < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+
+    last_id = after_id or 0
+    while True:
+        rows = db.session.execute(
+            base.where(TimeRecordSignature.id > last_id)
+            .order_by(TimeRecordSignature.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield [tuple(row) for row in rows]
+
+
+def load_signing_keys():
+    """
+    Resuelve en el proceso principal todas las versiones de clave presentes
+    en el entorno (SIGNING_KEY_V1, SIGNING_KEY_V2, ...). No exige que sean
+    consecutivas: tras retirar SIGNING_KEY_V1 sigue cargando V2 y siguientes.
+    """
+    keys = {}
+    for name, value in os.environ.items():
+        match = _SIGNING_KEY_VAR.match(name)
+        if match and value:
+            version = int(match.group(1))
+            keys[version] = TimestampService.get_signing_key(version)
+    return keys
+
+
+def verify_signatures_bulk(client_id, date_from=None, date_to=None, incremental=False,
+                           workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Verifica todas las firmas de un cliente (opcionalmente en un rango de fechas).
+
+    Args:
+        client_id: ID del cliente
+        date_from / date_to: rango de fechas (incluido) sobre timestamp_utc
+        incremental: si True, empieza tras la marca de agua del cliente y la avanza
+        workers: procesos del pool (1 = en el propio proceso)
+        chunk_size: firmas por bloque
+
+    Returns:
+        SignatureVerificationReport ya guardado
+    """
+    workers = workers or get_verification_workers()
+    started = time.perf_counter()
+
+    watermark = None
+    after_id = 0
+    if incremental:
+        watermark = db.session.get(SignatureVerificationWatermark, client_id)
+        after_id = watermark.last_signature_id if watermark else 0
+
+    report = SignatureVerificationReport(
+        client_id=client_id,
+        mode="incremental" if incremental else "full",
+        date_from=date_from,
+        date_to=date_to,
+        started_at=datetime.utcnow()
+    )
+
+    keys = load_signing_keys()
+    valid = 0
+    invalid_ids = []
+    unbatched_ids = []
+    key_unavailable_ids = []
+    first_id = None
+    last_id = None
+
+    batch_leaves = {}
+
+    def consume(chunk, result):
+        nonlocal valid, first_id, last_id
+        chunk_valid, chunk_invalid, chunk_batch_leaves, chunk_unbatched, chunk_unavailable = result
+        valid += chunk_valid
+        invalid_ids.extend(chunk_invalid)
+        unbatched_ids.extend(chunk_unbatched)
+        key_unavailable_ids.extend(chunk_unavailable)
+        for batch_id, ids in chunk_batch_leaves.items():
+            batch_leaves.setdefault(batch_id, []).extend(ids)
+        if first_id is None:
+            first_id = chunk[0][0]
+        last_id = chunk[-1][0]
+
+    chunks = _signature_chunks(client_id, date_from, date_to, after_id, chunk_size)
+    if workers == 1:
+        for chunk in chunks:
+            consume(chunk, verify_signature_rows(chunk, keys))
+    else:
+        # "spawn": el proceso padre puede tener hilos (scheduler, pool de conexiones).
+        # Como mucho 2 bloques por proceso en vuelo: memoria acotada
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            in_flight = []
+            for chunk in chunks:
+                in_flight.append((chunk, pool.submit(verify_signature_rows, chunk, keys)))
+                if len(in_flight) >= workers * 2:
+                    done_chunk, future = in_flight.pop(0)
+                    consume(done_chunk, future.result())
+            for done_chunk, future in in_flight:
+                consume(done_chunk, future.result())
+
+    # Firmas cubiertas solo por la raíz de su lote: un árbol por lote
+    if batch_leaves:
+        from services.merkle_service import verify_batch
+        for batch_id, ids in batch_leaves.items():
+            if verify_batch(batch_id):
+                valid += len(ids)
+            else:
+                invalid_ids.extend(ids)
+
+    report.first_signature_id = first_id
+    report.last_signature_id = last_id
+    report.valid_count = valid
+    report.invalid_count = len(invalid_ids)
+    report.pending_count = len(unbatched_ids)
+    report.key_unavailable_count = len(key_unavailable_ids)
+    report.total_checked = valid + len(invalid_ids)
+    report.invalid_signature_ids = json.dumps(invalid_ids[:MAX_REPORTED_INVALID_IDS]) if invalid_ids else None
+    report.finished_at = datetime.utcnow()
+    report.duration_seconds = round(time.perf_counter() - started, 3)
+    db.session.add(report)
+
+    if incremental and last_id is not None:
+        # La marca se detiene antes de la primera firma reciente o pendiente
+        # de lote: la siguiente ejecución las vuelve a leer. Las de clave no
+        # disponible no la frenan (una clave retirada no vuelve); una
+        # verificación completa las revisa si se restaura la clave
+        last_id = _settled_watermark(client_id, after_id, last_id, report.started_at)
+        if unbatched_ids:
+            last_id = min(last_id, min(unbatched_ids) - 1)
+        if last_id > after_id:
+            if watermark is None:
+                watermark = SignatureVerificationWatermark(client_id=client_id)
+                db.session.add(watermark)
+            watermark.last_signature_id = last_id
+
+    db.session.commit()
+
+    if invalid_ids:
+        logger.error(
+            f"⚠️ Verificación de firmas cliente {client_id}: "
+            f"{len(invalid_ids)} inválida(s) de {report.total_checked}"
+        )
+    else:
+        logger.info(
+            f"Verificación de firmas cliente {client_id}: {report.total_checked} "
+            f"firma(s) válidas en {report.duration_seconds}s"
+        )
+    if unbatched_ids:
+        logger.info(
+            f"Verificación de firmas cliente {client_id}: {len(unbatched_ids)} "
+            f"firma(s) pendientes de su lote Merkle"
+        )
+    if key_unavailable_ids:
+        logger.warning(
+            f"Verificación de firmas cliente {client_id}: {len(key_unavailable_ids)} "
+            f"firma(s) con una versión de clave que no está en el entorno"
+        )
+    return report
+
+
+def run_nightly_verification(workers=None):
+    """
+    Verificación incremental de todos los clientes activos.
+
+    Returns:
+        dict: {client_id: (total, inválidas)}
+    """
+    summary = {}
+    client_ids = db.session.execute(
+        select(Client.id).where(Client.is_active.is_(True)).order_by(Client.id)
+    ).scalars().all()
+
+    for client_id in client_ids:
+        try:
+            report = verify_signatures_bulk(client_id, incremental=True, workers=workers)
+            summary[client_id] = (report.total_checked, report.invalid_count)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error verificando firmas del cliente {client_id}: {str(e)}")
+    return summary
@@ -0,0 +1,516 @@
+"""
+Totales de trabajo precalculados por empleado: user_day_summary y user_week_summary.
+
+El dashboard de admin, la gestión de registros, el panel del empleado, el
+cálculo de horas extras y los totales semanales de la exportación mensual
+leen estas tablas (una fila por empleado y día/semana) en lugar de sumar
+todos los fichajes.
+
+Mantenimiento incremental y transaccional:
+- after_flush anota los días afectados por cualquier alta, edición o borrado
+  de TimeRecord y WorkPause (incluido el día anterior si cambió la fecha).
+- before_commit vuelve a calcular solo esos días y sus semanas dentro de la
+  misma transacción, así que los totales se confirman o se descartan junto
+  con los fichajes. Se toma antes el lock de fichajes del usuario
+  (lock_user_punches) para que dos transacciones del mismo empleado no
+  pisen sus totales.
+- Las semanas recalculadas se anotan en overtime_dirty_week para que el job
+  de horas extras las vuelva a calcular (mark_weeks_dirty).
+
+Las actualizaciones masivas (Query.update/delete) no pasan por el flush: si
+afectan a fichajes o pausas hay que llamar a mark_records_dirty().
+
+scripts/rebuild_work_summaries.py reconstruye y verifica las tablas.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, event, func, insert, select, tuple_
+from sqlalchemy.orm import Session, attributes
+
+from models.database import db
+from models.models import OvertimeDirtyWeek, TimeRecord, UserDaySummary, UserWeekSummary, WorkPause
+from services.period_engine import DAY, iter_totals, period_totals
+from services.punch_service import lock_user_punches
+from utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+_PENDING_DAYS = "work_summary_days"
+_PENDING_RECORDS = "work_summary_records"
+
+# Atributos que cambian los totales
+_RECORD_ATTRIBUTES = ("check_in", "check_out", "date", "user_id")
+_PAUSE_ATTRIBUTES = ("pause_start", "pause_end", "time_record_id")
+
+# Días por bloque al reconstruir rangos largos
+REBUILD_CHUNK_DAYS = 31
+
+WorkTotals = namedtuple("WorkTotals", "worked_seconds pause_seconds effective_seconds record_count")
+WorkTotals.__new__.__defaults__ = (0, 0, 0, 0)
+
+SummaryMismatch = namedtuple("SummaryMismatch", "kind user_id period expected stored")
+SummaryMismatch.__doc__ = """
+Diferencia entre los totales guardados y los recalculados desde los fichajes.
+
+- kind: "day" o "week"
+- period: fecha (día) o lunes de la semana
+- expected / stored: WorkTotals (stored es None si falta la fila)
+"""
+
+EMPTY_TOTALS = WorkTotals()
+
+_time_record = TimeRecord.__table__
+_day_summary = UserDaySummary.__table__
+_week_summary = UserWeekSummary.__table__
+_dirty_week = OvertimeDirtyWeek.__table__
+
+
+def week_start_of(value):
+    """Lunes de la semana que contiene value (date o datetime)."""
+    if isinstance(value, datetime):
+        value = value.date()
+    return value - timedelta(days=value.weekday())
+
+
+# --------------------------------------------------------------------
+#  Cálculo desde los fichajes
+# --------------------------------------------------------------------
+def _compute_day_totals(connection, client_id, date_from, date_to, user_ids=None):
+    """
+    Totales por (user_id, fecha) de los fichajes cerrados del rango, calculados
+    desde time_record y work_pause con el motor columnar (services/period_engine.py).
+
+    Returns:
+        dict {(user_id, date): WorkTotals}
+    """
+    totals = period_totals(connection, client_id, date_from, date_to, DAY, user_ids)
+    return {
+        (user_id, day): WorkTotals(worked, paused, effective, count)
+        for user_id, day, worked, paused, effective, count in iter_totals(totals)
+    }
+
+
+def _day_values(client_id, user_id, day, totals, now):
+    return {
+        "client_id": client_id,
+        "user_id": user_id,
+        "date": day,
+        "week_start": week_start_of(day),
+        "updated_at": now,
+        **totals._asdict(),
+    }
+
+
+def _refresh_weeks(connection, client_id, week_keys):
+    """Vuelve a sumar las semanas (user_id, week_start) desde user_day_summary."""
+    if not week_keys:
+        return
+    week_filter = and_(
+        _week_summary.c.client_id == client_id,
+        tuple_(_week_summary.c.user_id, _week_summary.c.week_start).in_(list(week_keys)),
+    )
+    connection.execute(delete(_week_summary).where(week_filter))
+    connection.execute(
+        insert(_week_summary).from_select(
+            ["client_id", "user_id", "week_start", "worked_seconds", "pause_seconds",
+             "effective_seconds", "record_count", "updated_at"],
+            select(
+                _day_summary.c.client_id, _day_summary.c.user_id, _day_summary.c.week_start,
+                func.sum(_day_summary.c.worked_seconds),
+                func.sum(_day_summary.c.pause_seconds),
+                func.sum(_day_summary.c.effective_seconds),
+                func.sum(_day_summary.c.record_count),
+                func.max(_day_summary.c.updated_at),
+            )
+            .where(
+                _day_summary.c.client_id == client_id,
+                tuple_(_day_summary.c.user_id, _day_summary.c.week_start).in_(list(week_keys)),
+            )
+            .group_by(_day_summary.c.client_id, _day_summary.c.user_id, _day_summary.c.week_start)
+        )
+    )
+
+
+def refresh_days(connection, client_id, days):
+    """
+    Recalcula los días indicados de un cliente y las semanas que los contienen.
+
+    Args:
+        connection: conexión de la transacción en curso
+        client_id: ID del cliente
+        days: iterable de (user_id, date)
+    """
+    days = set(days)
+    if not days:
+        return
+
+    user_ids = sorted({user_id for user_id, _ in days})
+    dates = [day for _, day in days]
+    computed = _compute_day_totals(connection, client_id, min(dates), max(dates), user_ids)
+
+    connection.execute(
+        delete(_day_summary).where(
+            _day_summary.c.client_id == client_id,
+            tuple_(_day_summary.c.user_id, _day_summary.c.date).in_(list(days)),
+        )
+    )
+    now = datetime.utcnow()
+    rows = [
+        _day_values(client_id, user_id, day, computed[(user_id, day)], now)
+        for user_id, day in days
+        if (user_id, day) in computed
+    ]
+    if rows:
+        connection.execute(insert(_day_summary), rows)
+
+    _refresh_weeks(connection, client_id, {(user_id, week_start_of(day)) for user_id, day in days})
+
+
+def mark_weeks_dirty(connection, client_id, week_keys):
+    """
+    Anota las semanas (user_id, week_start) de un cliente para recalcular sus
+    horas extras. Si ya estaban anotadas solo se renueva marked_at.
+    """
+    if not week_keys:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {"client_id": client_id, "user_id": user_id, "week_start": week_start, "marked_at": now}
+        for user_id, week_start in sorted(week_keys)
+    ]
+
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        # Otros motores: borrar e insertar dentro de la misma transacción
+        connection.execute(delete(_dirty_week).where(
+            _dirty_week.c.client_id == client_id,
+            tuple_(_dirty_week.c.user_id, _dirty_week.c.week_start).in_(sorted(week_keys)),
+        ))
+        connection.execute(insert(_dirty_week), rows)
+        return
+
+    statement = dialect_insert(_dirty_week)
+    statement = statement.on_conflict_do_update(
+        index_elements=[_dirty_week.c.client_id, _dirty_week.c.user_id, _dirty_week.c.week_start],
+        set_={"marked_at": statement.excluded.marked_at},
+    )
+    connection.execute(statement, rows)
+
+
+# --------------------------------------------------------------------
+#  Mantenimiento incremental (eventos de sesión)
+# --------------------------------------------------------------------
+def mark_records_dirty(record_ids, session=None):
+    """
+    Marca para recálculo los días de los fichajes indicados.
+    Necesario tras actualizaciones masivas de TimeRecord o WorkPause que no
+    pasan por el flush del ORM (Query.update / Query.delete).
+    """
+    session = session or db.session
+    session.info.setdefault(_PENDING_RECORDS, set()).update(record_ids)
+
+
+def _mark_day(session, client_id, user_id, day):
+    if client_id is not None and user_id is not None and day is not None:
+        session.info.setdefault(_PENDING_DAYS, set()).add((client_id, user_id, day))
+
+
+def _history_values(state, name):
+    history = state.attrs[name].history
+    return list(history.deleted or ()) + [getattr(state.object, name)]
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, TimeRecord):
+            state = attributes.instance_state(obj)
+            if obj in session.dirty and not any(
+                state.attrs[name].history.has_changes() for name in _RECORD_ATTRIBUTES
+            ):
+                continue
+            for user_id in _history_values(state, "user_id"):
+                for day in _history_values(state, "date"):
+                    _mark_day(session, obj.client_id, user_id, day)
+        elif isinstance(obj, WorkPause):
+            state = attributes.instance_state(obj)
+            if obj in session.dirty and not any(
+                state.attrs[name].history.has_changes() for name in _PAUSE_ATTRIBUTES
+            ):
+                continue
+            pending = session.info.setdefault(_PENDING_RECORDS, set())
+            pending.update(r for r in _history_values(state, "time_record_id") if r is not None)
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_changes(session):
+    # before_commit se ejecuta antes del flush final del commit: enviar ya
+    # los cambios pendientes para que after_flush anote sus días
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    if not session.info.get(_PENDING_DAYS) and not session.info.get(_PENDING_RECORDS):
+        return
+
+    days = session.info.pop(_PENDING_DAYS, set())
+    record_ids = session.info.pop(_PENDING_RECORDS, set())
+
+    connection = session.connection()
+    if record_ids:
+        rows = connection.execute(
+            select(_time_record.c.client_id, _time_record.c.user_id, _time_record.c.date)
+            .where(_time_record.c.id.in_(record_ids))
+        ).all()
+        days.update((row.client_id, row.user_id, row.date) for row in rows)
+    if not days:
+        return
+
+    by_client = {}
+    for client_id, user_id, day in days:
+        by_client.setdefault(client_id, set()).add((user_id, day))
+
+    # Mismo orden de locks en todas las transacciones para evitar interbloqueos
+    for user_id in sorted({user_id for _, user_id, _ in days}):
+        lock_user_punches(user_id, session)
+
+    for client_id, client_days in by_client.items():
+        refresh_days(connection, client_id, client_days)
+        mark_weeks_dirty(connection, client_id, {(user_id, week_start_of(day)) for user_id, day in client_days})
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_changes(session, previous_transaction):
+    session.info.pop(_PENDING_DAYS, None)
+    session.info.pop(_PENDING_RECORDS, None)
+
+
+# --------------------------------------------------------------------
+#  Lectura
+# --------------------------------------------------------------------
+def _totals(row):
+    if row is None:
+        return EMPTY_TOTALS
+    return WorkTotals(row.worked_seconds, row.pause_seconds, row.effective_seconds, row.record_count)
+
+
+def get_week_totals(user_id, week_start):
+    """WorkTotals de un empleado en la semana que empieza en week_start (lunes)."""
+    row = UserWeekSummary.query.filter_by(user_id=user_id, week_start=week_start).first()
+    return _totals(row)
+
+
+def get_week_totals_by_user(week_start, user_ids=None):
+    """
+    Totales de la semana de todos los empleados (o de user_ids) en una consulta.
+
+    Returns:
+        dict {user_id: WorkTotals} (los empleados sin fichajes no aparecen)
+    """
+    query = UserWeekSummary.query.filter(UserWeekSummary.week_start == week_start)
+    if user_ids is not None:
+        query = query.filter(UserWeekSummary.user_id.in_(user_ids))
+    return {row.user_id: _totals(row) for row in query}
+
+
+def get_day_totals(date_from, date_to, user_ids=None):
+    """
+    Totales diarios del rango (ambos incluidos).
+
+    Returns:
+        dict {(user_id, date): WorkTotals}
+    """
+    query = UserDaySummary.query.filter(
+        UserDaySummary.date >= date_from,
+        UserDaySummary.date <= date_to,
+    )
+    if user_ids is not None:
+        query = query.filter(UserDaySummary.user_id.in_(user_ids))
+    return {(row.user_id, row.date): _totals(row) for row in query}
+
+
+def get_range_totals_by_week(date_from, date_to, user_ids=None):
+    """
+    Totales por empleado y semana limitados a los días del rango (las semanas
+    partidas por el inicio o el fin del rango solo suman sus días dentro).
+
+    Returns:
+        dict {(user_id, week_start): WorkTotals}
+    """
+    query = (
+        db.session.query(
+            UserDaySummary.user_id,
+            UserDaySummary.week_start,
+            func.sum(UserDaySummary.worked_seconds).label("worked_seconds"),
+            func.sum(UserDaySummary.pause_seconds).label("pause_seconds"),
+            func.sum(UserDaySummary.effective_seconds).label("effective_seconds"),
+            func.sum(UserDaySummary.record_count).label("record_count"),
+        )
+        .filter(UserDaySummary.date >= date_from, UserDaySummary.date <= date_to)
+        .group_by(UserDaySummary.user_id, UserDaySummary.week_start)
+    )
+    if user_ids is not None:
+        query = query.filter(UserDaySummary.user_id.in_(user_ids))
+    return {(row.user_id, row.week_start): _totals(row) for row in query}
+
+
+def get_worked_before_by_day(week_start, user_ids=None):
+    """
+    Segundos trabajados por cada empleado en la semana antes de cada día
+    (acumulado de lunes hasta el día anterior), para calcular las horas
+    restantes de cualquier fichaje de la semana sin sumar los anteriores.
+
+    Returns:
+        dict {(user_id, date): segundos} con los 7 días de cada empleado
+        que tiene fichajes en la semana
+    """
+    week_end = week_start + timedelta(days=6)
+    day_totals = get_day_totals(week_start, week_end, user_ids)
+
+    result = {}
+    for user_id in {user_id for user_id, _ in day_totals}:
+        accumulated = 0
+        for offset in range(7):
+            day = week_start + timedelta(days=offset)
+            result[(user_id, day)] = accumulated
+            accumulated += day_totals.get((user_id, day), EMPTY_TOTALS).worked_seconds
+    return result
+
+
+# --------------------------------------------------------------------
+#  Reconstrucción y verificación
+# --------------------------------------------------------------------
+def _chunks(date_from, date_to):
+    start = date_from
+    while start <= date_to:
+        end = min(start + timedelta(days=REBUILD_CHUNK_DAYS - 1), date_to)
+        yield start, end
+        start = end + timedelta(days=1)
+
+
+def _record_bounds(connection, client_id):
+    return connection.execute(
+        select(func.min(_time_record.c.date), func.max(_time_record.c.date))
+        .where(_time_record.c.client_id == client_id)
+    ).one()
+
+
+def rebuild_summaries(client_id, date_from=None, date_to=None):
+    """
+    Reconstruye los totales de un cliente desde los fichajes (sin commit).
+
+    Las semanas que tocan el rango se recalculan completas. Por defecto
+    se usa el rango de fechas de todos sus fichajes.
+
+    Returns:
+        int: días con fichajes reconstruidos
+    """
+    connection = db.session.connection()
+    first, last = _record_bounds(connection, client_id)
+    date_from = date_from or first
+    date_to = date_to or last
+    if date_from is None or date_to is None:
+        return 0
+
+    now = datetime.utcnow()
+    rebuilt = 0
+    for start, end in _chunks(date_from, date_to):
+        computed = _compute_day_totals(connection, client_id, start, end)
+        connection.execute(
+            delete(_day_summary).where(
+                _day_summary.c.client_id == client_id,
+                _day_summary.c.date >= start,
+                _day_summary.c.date <= end,
+            )
+        )
+        if computed:
+            connection.execute(insert(_day_summary), [
+                _day_values(client_id, user_id, day, totals, now)
+                for (user_id, day), totals in computed.items()
+            ])
+        rebuilt += len(computed)
+
+    weeks = connection.execute(
+        select(_day_summary.c.user_id, _day_summary.c.week_start)
+        .where(
+            _day_summary.c.client_id == client_id,
+            _day_summary.c.week_start >= week_start_of(date_from),
+            _day_summary.c.week_start <= week_start_of(date_to),
+        )
+        .distinct()
+    ).all()
+    connection.execute(
+        delete(_week_summary).where(
+            _week_summary.c.client_id == client_id,
+            _week_summary.c.week_start >= week_start_of(date_from),
+            _week_summary.c.week_start <= week_start_of(date_to),
+        )
+    )
+    _refresh_weeks(connection, client_id, {(row.user_id, row.week_start) for row in weeks})
+
+    logger.info(f"Work summaries rebuilt for client {client_id} ({date_from} - {date_to}): {rebuilt} days")
+    return rebuilt
+
+
+def check_summaries(client_id, date_from=None, date_to=None):
+    """
+    Compara los totales guardados con los recalculados desde los fichajes.
+
+    Returns:
+        list de SummaryMismatch (vacía si todo cuadra)
+    """
+    connection = db.session.connection()
+    first, last = _record_bounds(connection, client_id)
+    date_from = date_from or first
+    date_to = date_to or last
+    if date_from is None or date_to is None:
+        return []
+
+    # Semanas completas, para poder comparar también user_week_summary
+    date_from = week_start_of(date_from)
+    date_to = week_start_of(date_to) + timedelta(days=6)
+
+    mismatches = []
+    expected_weeks = {}
+    for start, end in _chunks(date_from, date_to):
+        expected = _compute_day_totals(connection, client_id, start, end)
+        stored = {
+            (row.user_id, row.date): _totals(row)
+            for row in connection.execute(
+                select(_day_summary).where(
+                    _day_summary.c.client_id == client_id,
+                    _day_summary.c.date >= start,
+                    _day_summary.c.date <= end,
+                )
+            )
+        }
+        for key in sorted(set(expected) | set(stored)):
+            if expected.get(key, EMPTY_TOTALS) != stored.get(key, EMPTY_TOTALS):
+                mismatches.append(SummaryMismatch(
+                    "day", key[0], key[1], expected.get(key, EMPTY_TOTALS), stored.get(key)
+                ))
+        for (user_id, day), totals in expected.items():
+            key = (user_id, week_start_of(day))
+            current = expected_weeks.get(key, EMPTY_TOTALS)
+            expected_weeks[key] = WorkTotals(*(a + b for a, b in zip(current, totals)))
+
+    stored_weeks = {
+        (row.user_id, row.week_start): _totals(row)
+        for row in connection.execute(
+            select(_week_summary).where(
+                _week_summary.c.client_id == client_id,
+                _week_summary.c.week_start >= date_from,
+                _week_summary.c.week_start <= date_to,
+            )
+        )
+    }
+    for key in sorted(set(expected_weeks) | set(stored_weeks)):
+        if expected_weeks.get(key, EMPTY_TOTALS) != stored_weeks.get(key, EMPTY_TOTALS):
+            mismatches.append(SummaryMismatch(
+                "week", key[0], key[1], expected_weeks.get(key, EMPTY_TOTALS), stored_weeks.get(key)
+            ))
+
+    return mismatches
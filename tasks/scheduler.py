@@ -3,7 +3,7 @@ Scheduled tasks for the TimeTracker application.
 """
 from datetime import datetime, date, time as dt_time
 from models.models import TimeRecord, WorkPause
-from models.database import db
+from models.database import db, tenant_bypass
 from utils.timezone_utils import get_now_spain
 
 # Variable global para almacenar la referencia a la app Flask
@@ -33,7 +33,7 @@ def auto_close_open_records():
         print("ERROR: Scheduler app not initialized. Call init_scheduler_app(app) first.")
         return
 
-    with _app.app_context():
+    with _app.app_context(), tenant_bypass():
         try:
             # Get current date and create the auto-close datetime (23:59:59 of the same day)
             today = date.today()
@@ -103,7 +103,7 @@ def manual_auto_close_records(target_date=None, is_manual=True, app=None):
         except RuntimeError:
             raise RuntimeError("No Flask app available. Call init_scheduler_app(app) first or provide app parameter.")
 
-    with flask_app.app_context():
+    with flask_app.app_context(), tenant_bypass():
         try:
             if target_date is None:
                 target_date = date.today()
@@ -157,4 +157,111 @@ def manual_auto_close_records(target_date=None, is_manual=True, app=None):
             flask_app.logger.error(traceback.format_exc())
             if db.session:
                 db.session.rollback()
-            raise
\ No newline at end of file
+            raise
+
+def seal_pending_records():
+    """
+    Sella los fichajes encolados en pending_seal (SEALING_MODE=async).
+    Se ejecuta cada minuto desde APScheduler o desde /admin/cron/seals.
+    """
+    if _app is None:
+        print("ERROR: Scheduler app not initialized. Call init_scheduler_app(app) first.")
+        return
+
+    with _app.app_context(), tenant_bypass():
+        try:
+            from services.seal_service import run_seal_worker
+            return run_seal_worker()
+        except Exception as e:
+            _app.logger.error(f"Error in seal_pending_records: {str(e)}")
+            import traceback
+            _app.logger.error(traceback.format_exc())
+            if db.session:
+                db.session.rollback()
+
+
+def verify_signatures_nightly():
+    """
+    Verificación incremental nocturna de las firmas nuevas de todos los clientes.
+    """
+    if _app is None:
+        print("ERROR: Scheduler app not initialized. Call init_scheduler_app(app) first.")
+        return
+
+    with _app.app_context(), tenant_bypass():
+        try:
+            from services.verification_service import run_nightly_verification
+            summary = run_nightly_verification()
+            _app.logger.info(f"Nightly signature verification finished: {summary}")
+            return summary
+        except Exception as e:
+            _app.logger.error(f"Error in verify_signatures_nightly: {str(e)}")
+            import traceback
+            _app.logger.error(traceback.format_exc())
+            if db.session:
+                db.session.rollback()
+
+
+def build_merkle_batches():
+    """
+    Agrupa en lotes Merkle las firmas de las ventanas ya cerradas
+    (solo si MERKLE_SEALING está activo).
+    """
+    if _app is None:
+        print("ERROR: Scheduler app not initialized. Call init_scheduler_app(app) first.")
+        return
+
+    with _app.app_context(), tenant_bypass():
+        try:
+            from services.merkle_service import get_merkle_mode, build_seal_batches
+            if get_merkle_mode() == "off":
+                return 0
+            return build_seal_batches()
+        except Exception as e:
+            _app.logger.error(f"Error in build_merkle_batches: {str(e)}")
+            import traceback
+            _app.logger.error(traceback.format_exc())
+            if db.session:
+                db.session.rollback()
+
+
+def recompute_dirty_overtime():
+    """
+    Recalcula las horas extras de las semanas anotadas en overtime_dirty_week.
+    Se ejecuta cada minuto desde APScheduler o desde /admin/cron/overtime.
+    """
+    if _app is None:
+        print("ERROR: Scheduler app not initialized. Call init_scheduler_app(app) first.")
+        return
+
+    with _app.app_context(), tenant_bypass():
+        try:
+            from services.overtime_service import recompute_dirty_weeks
+            return recompute_dirty_weeks()
+        except Exception as e:
+            _app.logger.error(f"Error in recompute_dirty_overtime: {str(e)}")
+            import traceback
+            _app.logger.error(traceback.format_exc())
+            if db.session:
+                db.session.rollback()
+
+
+def mark_closed_overtime_week():
+    """
+    Anota la semana recién cerrada de todos los empleados para que el job
+    de horas extras genere también los déficits de quien no fichó.
+    """
+    if _app is None:
+        print("ERROR: Scheduler app not initialized. Call init_scheduler_app(app) first.")
+        return
+
+    with _app.app_context(), tenant_bypass():
+        try:
+            from services.overtime_service import mark_closed_week_dirty
+            return mark_closed_week_dirty()
+        except Exception as e:
+            _app.logger.error(f"Error in mark_closed_overtime_week: {str(e)}")
+            import traceback
+            _app.logger.error(traceback.format_exc())
+            if db.session:
+                db.session.rollback()
@@ -0,0 +1,149 @@
+"""
+Fixtures compartidas: la pila de main.py (Talisman, Compress, caché
+compartida, instrumentación SQL, contexto de plantillas) sobre una base de
+datos de prueba, sin scheduler ni migraciones.
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SIGNING_KEY_V1", "k1" * 16)
+
+from flask import Flask, session
+from flask_compress import Compress
+from flask_talisman import Talisman
+
+from models.database import db
+
+
+def create_test_app(database_uri, **config):
+    """App con los mismos blueprints y extensiones que main.py."""
+    from routes.admin import admin_bp
+    from routes.auth import auth_bp
+    from routes.export import export_bp
+    from routes.time import time_bp
+    from utils.query_stats import init_query_stats
+    from utils.shared_cache import init_cache
+    from utils.user_context import get_user_context
+
+    app = Flask(__name__, template_folder=os.path.join(ROOT, "templates"),
+                static_folder=os.path.join(ROOT, "static"))
+    app.config.update(
+        SECRET_KEY="test",
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=database_uri,
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        **config,
+    )
+    Talisman(app, content_security_policy=None, force_https=False)
+    Compress(app)
+    db.init_app(app)
+    init_cache(app)
+    init_query_stats(app)
+    for blueprint in (auth_bp, time_bp, admin_bp, export_bp):
+        app.register_blueprint(blueprint)
+
+    @app.context_processor
+    def inject_user():
+        context = None
+        if session.get("user_id"):
+            context = get_user_context(session["user_id"], session.get("client_id"))
+        client_config = context["client_config"] if context else {}
+        return dict(
+            current_user=context["user"] if context else None,
+            greeting="",
+            current_theme="dark-turquoise",
+            plan_config=client_config,
+            current_client=context["client"] if context else None,
+            client_config=client_config,
+        )
+
+    @app.route("/")
+    def index():
+        return "ok"
+
+    return app
+
+
+def seed_client():
+    """Cliente con un centro, una categoría, un super_admin y un empleado."""
+    from models.models import Category, Center, Client, User
+
+    client = Client(name="Cliente", slug="cliente", plan="pro")
+    db.session.add(client)
+    db.session.flush()
+    center = Center(client_id=client.id, name="Centro")
+    category = Category(client_id=client.id, name="Categoría")
+    db.session.add_all([center, category])
+    db.session.flush()
+    admin = User(client_id=client.id, username="admin", full_name="Admin", email="admin@x",
+                 role="super_admin", weekly_hours=40)
+    admin.set_password("p")
+    employee = User(client_id=client.id, username="emp", full_name="Empleado", email="emp@x",
+                    weekly_hours=40, center_id=center.id, category_id=category.id)
+    employee.set_password("p")
+    db.session.add_all([admin, employee])
+    db.session.commit()
+    return SimpleNamespace(client_id=client.id, center_id=center.id, category_id=category.id,
+                           admin_id=admin.id, employee_id=employee.id)
+
+
+def reset_process_caches():
+    """Las cachés del proceso sobreviven entre tests (y los ids se repiten)."""
+    from services.reference_cache import invalidate
+    from utils.principal import invalidate_principal
+
+    invalidate()
+    invalidate_principal()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_BACKEND", "memory")
+    app = create_test_app(f"sqlite:///{tmp_path / 'test.db'}")
+    reset_process_caches()
+    with app.app_context():
+        db.create_all()
+        app.seed = seed_client()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+    reset_process_caches()
+
+
+@pytest.fixture
+def postgres_app(monkeypatch):
+    """
+    Misma app contra PostgreSQL (TEST_POSTGRES_URL, base de datos desechable:
+    se crean y borran todas las tablas). Sin ella el test se omite.
+    """
+    database_uri = os.getenv("TEST_POSTGRES_URL")
+    if not database_uri:
+        pytest.skip("TEST_POSTGRES_URL no configurada")
+    monkeypatch.setenv("CACHE_BACKEND", "memory")
+    app = create_test_app(database_uri.replace("postgres://", "postgresql://"))
+    reset_process_caches()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        app.seed = seed_client()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+    reset_process_caches()
+
+
+@pytest.fixture
+def login(app):
+    """login(username) -> test_client con la sesión iniciada."""
+    def _login(username):
+        http = app.test_client()
+        http.post("/login", data={"username": username, "password": "p", "client_identifier": "cliente"})
+        return http
+    return _login
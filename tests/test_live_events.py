@@ -0,0 +1,46 @@
+"""
+Avisos en vivo de los fichajes: el centro del empleado sale de la sesión,
+así que fichar entrada, salida o pausa no consulta la tabla user (ni
+auth_version ni el User completo) y el evento llega con su centro.
+"""
+import re
+
+import pytest
+from sqlalchemy import event
+
+from models.database import db
+from services.live_events import read_events
+
+_USER_TABLE = re.compile(r'\bFROM "?user"?\b|\bJOIN "?user"?\b')
+
+
+@pytest.fixture
+def statements(app):
+    with app.app_context():
+        engine = db.engine
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        captured.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield captured
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def test_punches_do_not_read_the_user(app, login, statements, monkeypatch):
+    monkeypatch.setenv("LIVE_EVENTS_TRANSPORT", "longpoll")
+    http = login("emp")
+    statements.clear()
+
+    http.post("/check_in")
+    pause = http.post("/time/pause/start", json={"pause_type": "Descanso"}).get_json()
+    http.post(f"/time/pause/end/{pause['pause_id']}")
+    http.post("/check_out")
+
+    assert [s for s in statements if _USER_TABLE.search(s)] == []
+    with app.app_context():
+        events, _, _ = read_events(app.seed.client_id, 0)
+    assert [e["type"] for e in events] == ["check_in", "pause_start", "pause_end", "check_out"]
+    assert {e["center_id"] for e in events} == {app.seed.center_id}
+    assert {e["user_id"] for e in events} == {app.seed.employee_id}
@@ -0,0 +1,45 @@
+"""
+Acumulado semanal de /admin/records: con filtros por fecha o franja horaria
+el restante de cada fichaje se calcula solo con los fichajes que muestra la
+vista, igual con funciones de ventana que con la subconsulta de respaldo.
+"""
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from models.database import db
+from models.models import TimeRecord
+
+MONDAY = date.today() - timedelta(days=date.today().weekday())
+TUESDAY = MONDAY + timedelta(days=1)
+
+
+@pytest.fixture(params=[True, False], ids=["window", "subquery"])
+def records_app(request, app, monkeypatch):
+    monkeypatch.setattr("routes.admin.supports_window_functions", lambda bind: request.param)
+    seed = app.seed
+    with app.app_context():
+        # 40 h de contrato: lunes 8 h (08:00-16:00) y martes 6 h (14:00-20:00)
+        for day, start, end in ((MONDAY, time(8), time(16)), (TUESDAY, time(14), time(20))):
+            db.session.add(TimeRecord(client_id=seed.client_id, user_id=seed.employee_id, date=day,
+                                      check_in=datetime.combine(day, start),
+                                      check_out=datetime.combine(day, end)))
+        db.session.commit()
+    return app
+
+
+def _remaining(http, **filters):
+    html = http.get("/admin/records", query_string=filters).get_data(as_text=True)
+    return {value for value in ("32:00", "26:00", "34:00") if f"</span> {value}" in html}
+
+
+def test_unfiltered_week(records_app, login):
+    assert _remaining(login("admin")) == {"32:00", "26:00"}
+
+
+@pytest.mark.parametrize("filters", [
+    {"date_from": TUESDAY.isoformat()},
+    {"time_from": "12:00"},
+])
+def test_filtered_rows_only(records_app, login, filters):
+    assert _remaining(login("admin"), **filters) == {"34:00"}
@@ -0,0 +1,65 @@
+"""
+Revalidación de /admin/notifications/summary con la misma pila que main.py
+(Talisman + Compress + caché compartida): el ETag que devuelve el navegador
+tras una respuesta comprimida debe seguir dando 304, y el 304 solo consulta
+User.auth_version (admin_required).
+"""
+from datetime import date
+
+import pytest
+
+from models.database import db
+from models.models import LeaveRequest
+
+
+@pytest.fixture
+def summary_app(app):
+    app.config["QUERY_STATS_HEADERS"] = True
+    with app.app_context():
+        # Suficientes solicitudes para superar COMPRESS_MIN_SIZE
+        for i in range(20):
+            db.session.add(LeaveRequest(
+                client_id=app.seed.client_id, user_id=app.seed.employee_id, request_type="Vacaciones",
+                start_date=date.today(), end_date=date.today(), reason=f"Solicitud {i}",
+            ))
+        db.session.commit()
+    return app
+
+
+def _summary(http, etag=None):
+    headers = {"Accept-Encoding": "gzip"}
+    if etag:
+        headers["If-None-Match"] = etag
+    return http.get("/admin/notifications/summary", headers=headers)
+
+
+def test_compressed_etag_revalidates(summary_app, login):
+    http = login("admin")
+    first = _summary(http)
+    assert first.status_code == 200
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert first.headers["ETag"].endswith(':gzip"')
+
+    again = _summary(http, first.headers["ETag"])
+    assert again.status_code == 304
+
+
+def test_not_modified_reads_only_auth_version(summary_app, login):
+    http = login("admin")
+    first = _summary(http)
+
+    again = _summary(http, first.headers["ETag"])
+    assert again.status_code == 304
+    assert again.headers["X-DB-Query-Count"] == "1"
+
+
+def test_change_invalidates_etag(summary_app, login):
+    http = login("admin")
+    first = _summary(http)
+    with summary_app.app_context():
+        db.session.get(LeaveRequest, 1).status = "Aprobado"
+        db.session.commit()
+
+    again = _summary(http, first.headers["ETag"])
+    assert again.status_code == 200
+    assert again.headers["ETag"] != first.headers["ETag"]
@@ -0,0 +1,43 @@
+"""
+Revocación de permisos: desactivar o degradar a un admin (por el ORM o con
+un UPDATE masivo) le quita el acceso en su siguiente petición, aunque su
+Principal siga en la caché del proceso.
+"""
+import pytest
+from sqlalchemy import update
+
+from models.database import db
+from models.models import User
+
+
+def _deactivate_orm(app):
+    db.session.get(User, app.seed.admin_id).is_active = False
+
+
+def _deactivate_query_update(app):
+    User.query.filter_by(id=app.seed.admin_id).update({"is_active": False})
+
+
+def _demote_bulk_update(app):
+    db.session.execute(update(User).where(User.id == app.seed.admin_id).values(role=None))
+
+
+@pytest.mark.parametrize("revoke", [_deactivate_orm, _deactivate_query_update, _demote_bulk_update])
+def test_revocation_applies_on_next_request(app, login, revoke):
+    http = login("admin")
+    assert http.get("/admin/dashboard").status_code == 200
+
+    with app.app_context():
+        revoke(app)
+        db.session.commit()
+
+    response = http.get("/admin/dashboard")
+    assert response.status_code == 302
+    assert "/login" in response.headers["Location"]
+
+
+def test_unrelated_bulk_update_keeps_auth_version(app):
+    with app.app_context():
+        db.session.execute(update(User).where(User.id == app.seed.admin_id).values(full_name="Otro"))
+        db.session.commit()
+        assert (db.session.get(User, app.seed.admin_id).auth_version or 0) == 0
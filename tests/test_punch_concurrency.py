@@ -0,0 +1,85 @@
+"""
+Fichajes de entrada simultáneos de un mismo usuario: solo puede quedar un
+registro abierto. La carrera real necesita PostgreSQL (TEST_POSTGRES_URL);
+la traducción de la violación de uix_time_record_open_per_day se comprueba
+también en SQLite.
+"""
+import threading
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from models.database import db
+from models.models import EmployeeStatus, TimeRecord
+from services.punch_service import is_open_record_conflict
+
+CONCURRENT_PUNCHES = 8
+
+
+def _open_records(app, user_id):
+    with app.app_context():
+        return db.session.execute(
+            select(func.count()).select_from(TimeRecord).where(
+                TimeRecord.user_id == user_id, TimeRecord.check_out.is_(None)
+            )
+        ).scalar()
+
+
+def _login(app):
+    http = app.test_client()
+    http.post("/login", data={"username": "emp", "password": "p", "client_identifier": "cliente"})
+    return http
+
+
+def test_open_record_conflict_is_detected(app):
+    seed = app.seed
+    with app.app_context():
+        for _ in range(2):
+            db.session.add(TimeRecord(client_id=seed.client_id, user_id=seed.employee_id,
+                                      check_in=datetime.now(), date=date.today()))
+        with pytest.raises(IntegrityError) as exc:
+            db.session.flush()
+        db.session.rollback()
+    assert is_open_record_conflict(exc.value)
+
+
+def test_other_unique_violation_is_not_open_record_conflict(app):
+    seed = app.seed
+    with app.app_context():
+        for _ in range(2):
+            db.session.add(EmployeeStatus(client_id=seed.client_id, user_id=seed.employee_id,
+                                          date=date.today(), status="Trabajado"))
+        with pytest.raises(IntegrityError) as exc:
+            db.session.flush()
+        db.session.rollback()
+    assert not is_open_record_conflict(exc.value)
+
+
+def test_repeated_check_in_keeps_one_open_record(app):
+    http = _login(app)
+    for _ in range(3):
+        assert http.post("/check_in").status_code == 302
+    assert _open_records(app, app.seed.employee_id) == 1
+
+
+@pytest.mark.parametrize("fast_path", ["true", "false"])
+def test_concurrent_check_ins_leave_one_open_record(postgres_app, monkeypatch, fast_path):
+    monkeypatch.setenv("CHECKIN_FAST_PATH", fast_path)
+    clients = [_login(postgres_app) for _ in range(CONCURRENT_PUNCHES)]
+    barrier = threading.Barrier(CONCURRENT_PUNCHES)
+    statuses = []
+
+    def punch(http):
+        barrier.wait()
+        statuses.append(http.post("/check_in").status_code)
+
+    threads = [threading.Thread(target=punch, args=(http,)) for http in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [302] * CONCURRENT_PUNCHES
+    assert _open_records(postgres_app, postgres_app.seed.employee_id) == 1
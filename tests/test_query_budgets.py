@@ -0,0 +1,78 @@
+"""
+Presupuestos de consultas (@query_budget) en modo estricto: cada endpoint,
+con las cachés frías (primera petición tras arrancar), debe quedarse dentro
+de su presupuesto y no disparar cargas perezosas (raiseload).
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from models.database import db
+from models.models import EmployeeStatus, LeaveRequest, OvertimeEntry, TimeRecord
+
+TODAY = date.today()
+START = (TODAY - timedelta(days=10)).isoformat()
+EXPORT_FORM = {"start_date": START, "end_date": TODAY.isoformat(), "status": ["Trabajado"]}
+
+BUDGETED = [
+    ("GET", "/admin/dashboard", None),
+    ("GET", "/admin/dashboard/records", None),
+    ("GET", f"/admin/api/events?start={START}&end={TODAY.isoformat()}", None),
+    ("GET", "/admin/overtime", None),
+    ("GET", "/admin/overtime/limits", None),
+    ("GET", "/admin/overtime/limits/events", None),
+    ("GET", "/admin/notifications/summary", None),
+    ("GET", "/excel", None),
+    ("POST", "/excel", EXPORT_FORM),
+    ("GET", "/excel_monthly", None),
+    ("POST", "/excel_monthly", EXPORT_FORM),
+]
+
+
+@pytest.fixture
+def strict_app(app):
+    app.config["QUERY_STRICT_MODE"] = True
+    app.config["QUERY_STATS_HEADERS"] = True
+    seed = app.seed
+    with app.app_context():
+        for days_ago in range(8):
+            day = TODAY - timedelta(days=days_ago)
+            check_in = datetime.combine(day, datetime.min.time()) + timedelta(hours=8)
+            db.session.add(EmployeeStatus(client_id=seed.client_id, user_id=seed.employee_id,
+                                          date=day, status="Trabajado"))
+            db.session.add(TimeRecord(client_id=seed.client_id, user_id=seed.employee_id, date=day,
+                                      check_in=check_in,
+                                      check_out=None if days_ago == 0 else check_in + timedelta(hours=9)))
+        week_start = TODAY - timedelta(days=TODAY.weekday() + 7)
+        db.session.add(OvertimeEntry(client_id=seed.client_id, user_id=seed.employee_id,
+                                     week_start=week_start, week_end=week_start + timedelta(days=6),
+                                     total_worked_seconds=45 * 3600, contract_seconds=40 * 3600,
+                                     overtime_seconds=5 * 3600))
+        db.session.add(LeaveRequest(client_id=seed.client_id, user_id=seed.employee_id,
+                                    request_type="Vacaciones", start_date=TODAY, end_date=TODAY,
+                                    reason="Viaje"))
+        db.session.commit()
+    return app
+
+
+@pytest.mark.parametrize("method,url,data", BUDGETED, ids=[f"{m} {u.split('?')[0]}" for m, u, _ in BUDGETED])
+def test_budget_on_cold_cache(strict_app, login, method, url, data):
+    http = login("admin")
+    # QueryBudgetExceeded y los errores de raiseload se propagan (TESTING)
+    response = http.open(url, method=method, data=data)
+    assert response.status_code == 200
+    assert int(response.headers["X-DB-Query-Count"]) > 0
+
+
+def test_leave_requests_load_employees_eagerly(strict_app, login):
+    seed = strict_app.seed
+    with strict_app.app_context():
+        for user_id in (seed.admin_id, seed.employee_id):
+            db.session.add(LeaveRequest(client_id=seed.client_id, user_id=user_id,
+                                        request_type="Ausencia justificada", start_date=TODAY,
+                                        end_date=TODAY, reason="Médico"))
+        db.session.commit()
+
+    # raiseload: la página falla si el empleado o su centro se cargan por fila
+    response = login("admin").get("/admin/leave_requests")
+    assert response.status_code == 200
@@ -0,0 +1,54 @@
+"""
+Claves de firma tras una rotación: con SIGNING_KEY_V1 retirada el verificador
+sigue cargando V2 y las firmas antiguas se cuentan como "clave no
+disponible", no como manipuladas.
+"""
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.timestamp_service import TimestampService
+from services.verification_service import load_signing_keys, verify_signature_rows
+
+
+@pytest.fixture(autouse=True)
+def only_v2(monkeypatch):
+    for name in list(os.environ):
+        if name.startswith("SIGNING_KEY_V"):
+            monkeypatch.delenv(name)
+    monkeypatch.setenv("SIGNING_KEY_V2", "k2" * 16)
+    TimestampService.clear_key_cache()
+    yield
+    TimestampService.clear_key_cache()
+
+
+def _row(sig_id, key_version, tamper=False):
+    timestamp = datetime(2026, 4, 6, 9, 0)
+    data = TimestampService.create_signature_data(
+        time_record_id=sig_id, user_id=1, client_id=1,
+        action="check_in", timestamp_utc=timestamp, terminal_id="web",
+    )
+    content_hash = TimestampService.generate_content_hash(data)
+    signature = "0" * 64
+    if key_version in load_signing_keys():
+        signature = TimestampService.sign_hash(content_hash, key_version)
+    if tamper:
+        content_hash = "f" * 64
+    return (sig_id, sig_id, 1, 1, "check_in", timestamp, "web",
+            content_hash, signature, key_version, None)
+
+
+def test_loads_keys_with_gaps():
+    assert sorted(load_signing_keys()) == [2]
+
+
+def test_retired_key_is_not_tampered():
+    rows = [_row(1, 1), _row(2, 2), _row(3, 1, tamper=True)]
+    valid, invalid_ids, _, _, unavailable_ids = verify_signature_rows(rows, load_signing_keys())
+    assert valid == 1
+    assert invalid_ids == [3]
+    assert unavailable_ids == [1]
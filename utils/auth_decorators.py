@@ -6,26 +6,27 @@ coherencia en verificación de permisos.
 
 from functools import wraps
 from flask import session, redirect, url_for, flash, request, jsonify
-from models.models import User
+from utils.principal import get_current_principal
 
 
 def admin_required(f):
     """
     Decorador que requiere que el usuario sea administrador.
-    Verifica tanto en sesión como en base de datos para mayor seguridad.
+    Verifica tanto en sesión como en base de datos para mayor seguridad
+    (Principal de la petición, validado con User.auth_version).
 
     Valida que el usuario:
     - Esté autenticado (tenga user_id en sesión)
-    - Exista en la base de datos
+    - Exista en la base de datos y esté activo
     - Tenga rol 'admin' o 'super_admin'
 
     Si no cumple, limpia la sesión y redirige al login.
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        user = User.query.get(session.get("user_id"))
+        principal = get_current_principal()
         # Verificar que el usuario tenga rol de admin o super_admin
-        if not user or not user.role or user.role not in ('admin', 'super_admin'):
+        if not principal or not principal.is_admin:
             session.clear()
             flash("Sin permisos de administrador.", "danger")
             return redirect(url_for("auth.login"))
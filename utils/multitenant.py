@@ -4,8 +4,8 @@ Utilidades para sistema multi-tenant (multi-cliente)
 from flask import session, g, request, redirect, url_for, abort
 from functools import wraps
 from models.models import Client, User
+from services.reference_cache import get_reference
 import os
-import copy
 import plan_config
 
 
@@ -23,6 +23,15 @@ def get_current_client():
     return g.current_client
 
 
+def get_current_client_reference():
+    """
+    Datos del cliente actual desde la caché de referencia (ClientRef inmutable),
+    sin consultar la BD. Retorna None si no hay cliente en la sesión.
+    """
+    reference = get_reference(session.get('client_id'))
+    return reference.client if reference else None
+
+
 def get_current_client_id():
     """
     Obtiene el ID del cliente actual desde la sesión.
@@ -62,7 +71,7 @@ def get_client_plan():
     Obtiene el plan del cliente actual (lite o pro).
     Retorna 'pro' por defecto si no hay cliente.
     """
-    client = get_current_client()
+    client = get_current_client_reference()
     if client:
         return client.plan
 
@@ -114,14 +123,16 @@ def get_client_config():
     Obtiene la configuración completa del cliente actual.
     Similar a plan_config.py pero específico para el cliente.
     """
-    client = get_current_client()
+    client = get_current_client_reference()
     plan = get_client_plan()
 
     is_lite = plan == 'lite'
     is_pro = plan == 'pro'
 
-    # Tomar valores base del plan global para evitar duplicaciones
-    plan_defaults = copy.deepcopy(plan_config.PLAN_CONFIG.get(plan, plan_config.PLAN_CONFIG['pro']))
+    # Tomar valores base del plan global para evitar duplicaciones.
+    # features y messages son diccionarios planos: basta una copia superficial
+    # para no exponer el PLAN_CONFIG global (sin deepcopy en cada petición)
+    plan_defaults = plan_config.PLAN_CONFIG.get(plan, plan_config.PLAN_CONFIG['pro'])
 
     config = {
         'plan': plan,
@@ -141,8 +152,8 @@ def get_client_config():
         'show_center_selector': plan_defaults.get('show_center_selector'),
         'center_label': plan_defaults.get('center_label'),
         'center_label_plural': plan_defaults.get('center_label_plural'),
-        'features': plan_defaults.get('features', {}),
-        'messages': plan_defaults.get('messages', {}),
+        'features': dict(plan_defaults.get('features', {})),
+        'messages': dict(plan_defaults.get('messages', {})),
     })
 
     # Futuro: permitir overrides por cliente si existen atributos específicos
@@ -172,8 +183,8 @@ def setup_multitenant_filters(app, db):
     Este sistema intercepta queries de SQLAlchemy y automáticamente
     agrega filtros WHERE client_id = X para modelos que tienen client_id.
     """
-    from sqlalchemy import event, inspect
-    from sqlalchemy.orm import Query
-    # El filtro multitenant se aplica ahora en la clase TenantAwareQuery en models/database.py
-    # Esto permite aplicar el filtro ANTES de limit(), evitando el error de SQLAlchemy
-    app.logger.info("Multi-tenant filtering configured via TenantAwareQuery")
+    # El filtro multitenant se aplica a nivel de sentencia con el evento
+    # do_orm_execute + with_loader_criteria (ver models/database.py), para
+    # todos los modelos TenantScoped: Query legacy, select(), get, paginate,
+    # update/delete ORM y joins.
+    app.logger.info("Multi-tenant filtering configured via do_orm_execute (TenantScoped models)")
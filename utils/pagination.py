@@ -0,0 +1,131 @@
+"""
+Paginación por cursor (keyset) para listados largos.
+
+En lugar de OFFSET (que recorre y descarta todas las filas anteriores), cada
+página continúa desde la última fila de la anterior: el cursor guarda la
+clave (valor de orden, id) de esa fila y la siguiente página pide las filas
+estrictamente posteriores en el mismo orden. El coste de cada página es
+constante aunque el listado tenga años de datos, y las filas nuevas que se
+inserten mientras se navega no desplazan las páginas.
+
+El valor de orden suele ser una fecha (TimeRecord.date, created_at...),
+pero puede ser cualquier columna o expresión no nula (p.ej. username); el
+id desempata y hace el orden estable. El cursor es opaco (base64 de JSON)
+y conserva el tipo del valor (date, datetime o texto).
+
+Los endpoints "cargar más" reciben ?cursor= y ?limit= (page_args) y
+responden con las filas y next_cursor (None cuando no hay más). En las
+plantillas, load_more.html conecta el botón con el endpoint.
+
+Ejemplo:
+    cursor, limit = page_args(request.args)
+    records, next_cursor = paginate_keyset(
+        time_records_query(user_id=user_id), TimeRecord.date, TimeRecord.id, cursor, limit
+    )
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+_DATETIME = "dt"
+_DATE = "d"
+_TEXT = "s"
+
+
+def page_size(requested, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Tamaño de página pedido, acotado entre 1 y maximum (default si no viene)."""
+    if not requested:
+        return default
+    return max(1, min(int(requested), maximum))
+
+
+def page_args(args, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """(cursor, limit) de los parámetros ?cursor= y ?limit= de una petición."""
+    return args.get("cursor") or None, page_size(args.get("limit", type=int), default, maximum)
+
+
+def encode_cursor(value, row_id):
+    """Cursor opaco de la fila con valor de orden value e id row_id."""
+    if isinstance(value, datetime):
+        payload = [_DATETIME, value.isoformat(), row_id]
+    elif isinstance(value, date):
+        payload = [_DATE, value.isoformat(), row_id]
+    else:
+        payload = [_TEXT, str(value), row_id]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    (valor, id) de un cursor, o None si no hay cursor (primera página).
+
+    Raises:
+        ValueError: si el cursor no es uno generado por encode_cursor
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        kind, value, row_id = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Cursor no válido: {cursor!r}") from e
+
+    if kind == _DATETIME:
+        value = datetime.fromisoformat(value)
+    elif kind == _DATE:
+        value = date.fromisoformat(value)
+    elif kind != _TEXT:
+        raise ValueError(f"Cursor no válido: {cursor!r}")
+    return value, int(row_id)
+
+
+def keyset_condition(sort_column, id_column, position, descending=True):
+    """Filtro de las filas posteriores a position = (valor, id) en el orden (sort_column, id)."""
+    value, row_id = position
+    if descending:
+        return or_(sort_column < value, and_(sort_column == value, id_column < row_id))
+    return or_(sort_column > value, and_(sort_column == value, id_column > row_id))
+
+
+def paginate_keyset(query, sort_column, id_column, cursor=None, limit=DEFAULT_PAGE_SIZE,
+                    descending=True, key=None):
+    """
+    Una página de query ordenada por (sort_column, id_column) a partir de cursor.
+
+    Args:
+        query: Query del ORM (p.ej. de utils/query_helpers.py) sin ORDER BY ni LIMIT
+        sort_column: columna o expresión de orden (no nula)
+        cursor: cursor de la página anterior (str) o None
+        key: función fila -> (valor, id); por defecto lee los atributos de
+            sort_column e id_column de la fila (entidades)
+
+    Returns:
+        tuple: (filas, cursor de la siguiente página o None si no hay más)
+
+    Raises:
+        ValueError: si el cursor no es válido
+    """
+    position = decode_cursor(cursor)
+    if position is not None:
+        query = query.filter(keyset_condition(sort_column, id_column, position, descending))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+    rows = list(query.limit(limit + 1))
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    if key is None:
+        def key(row):
+            return getattr(row, sort_column.key), getattr(row, id_column.key)
+    return rows, encode_cursor(*key(rows[-1]))
@@ -0,0 +1,152 @@
+"""
+Principal de la petición: identidad y permisos del usuario autenticado.
+
+admin_required, get_admin_centro y los helpers de permisos de admin
+necesitan siempre los mismos datos (rol, centro, cliente). El Principal
+se resuelve una vez por petición (flask.g) y se reutiliza entre
+peticiones en una caché del proceso.
+
+Validez: User.auth_version se incrementa al cambiar rol, centro, cliente
+o is_active (evento before_update, y do_orm_execute para los UPDATE masivos
+del ORM). En cada petición se lee solo esa columna; si no coincide con la
+del Principal en caché se recarga, de modo que una revocación tiene efecto
+en la siguiente petición de cualquier worker. Un UPDATE en SQL directo
+sobre esas columnas debe incrementar auth_version él mismo.
+"""
+import threading
+from collections import namedtuple
+
+from flask import g, has_request_context, session
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, attributes
+
+from models.database import db
+from models.models import User
+
+# Columnas cuyo cambio invalida los principales cacheados
+AUTH_ATTRIBUTES = ("role", "center_id", "client_id", "is_active")
+
+_principals = {}
+_lock = threading.Lock()
+_MISSING = object()
+
+
+class Principal(namedtuple("Principal", "user_id client_id role center_id is_active version")):
+    """Instantánea inmutable de la identidad del usuario (no es una instancia ORM)."""
+
+    __slots__ = ()
+
+    @property
+    def is_admin(self):
+        return self.is_active and self.role in ("admin", "super_admin")
+
+    @property
+    def is_super_admin(self):
+        return self.is_active and self.role == "super_admin"
+
+    @property
+    def center_scope(self):
+        """center_id al que está limitado un admin de centro (None = acceso global)."""
+        if self.is_admin and not self.is_super_admin:
+            return self.center_id
+        return None
+
+
+def _from_user(user):
+    return Principal(
+        user_id=user.id,
+        client_id=user.client_id,
+        role=user.role,
+        center_id=user.center_id,
+        is_active=bool(user.is_active),
+        version=user.auth_version or 0,
+    )
+
+
+def _resolve(user_id):
+    # Una sola columna por PK (con el filtro multitenant de la sesión)
+    version = db.session.execute(
+        select(User.auth_version).where(User.id == user_id)
+    ).scalar()
+    if version is None:
+        invalidate_principal(user_id)
+        return None
+
+    cached = _principals.get(user_id)
+    if cached is not None and cached.version == version and cached.client_id == session.get("client_id"):
+        return cached
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    # El identity map de la sesión es débil: se retiene la instancia durante
+    # la petición para que el contexto de plantillas (utils/user_context.py)
+    # la reutilice sin volver a consultarla
+    g._principal_user = user
+    principal = _from_user(user)
+    with _lock:
+        _principals[user_id] = principal
+    return principal
+
+
+def get_current_principal():
+    """
+    Principal del usuario de la sesión, resuelto una vez por petición.
+
+    Returns:
+        Principal o None si no hay usuario autenticado (o ya no existe)
+    """
+    if not has_request_context():
+        return None
+
+    principal = g.get("_principal", _MISSING)
+    if principal is _MISSING:
+        user_id = session.get("user_id")
+        principal = _resolve(user_id) if user_id else None
+        g._principal = principal
+    return principal
+
+
+def invalidate_principal(user_id=None):
+    """Descarta el Principal cacheado de un usuario (o todos)."""
+    with _lock:
+        if user_id is None:
+            _principals.clear()
+        else:
+            _principals.pop(user_id, None)
+    if has_request_context() and getattr(g.get("_principal"), "user_id", None) == user_id:
+        g.pop("_principal", None)
+
+
+@event.listens_for(User, "before_update")
+def _bump_auth_version(mapper, connection, target):
+    """Incrementa auth_version si cambia algún atributo de autorización."""
+    state = attributes.instance_state(target)
+    if any(state.attrs[name].history.has_changes() for name in AUTH_ATTRIBUTES):
+        target.auth_version = (target.auth_version or 0) + 1
+        invalidate_principal(target.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_auth_version_on_bulk_update(execute_state):
+    """
+    Los UPDATE masivos (Query.update(), update(User)) no pasan por
+    before_update: si cambian un atributo de autorización se incrementa
+    auth_version en la misma sentencia.
+    """
+    mapper = execute_state.bind_mapper
+    if not execute_state.is_update or mapper is None or mapper.class_ is not User:
+        return
+    statement = execute_state.statement
+    values = statement._values or dict(statement._ordered_values or ())
+    names = {getattr(column, "key", column) for column in values}
+    if "auth_version" in names or not names.intersection(AUTH_ATTRIBUTES):
+        return
+    execute_state.statement = statement.values(
+        auth_version=func.coalesce(User.auth_version, 0) + 1
+    )
+
+
+@event.listens_for(User, "after_delete")
+def _drop_deleted_principal(mapper, connection, target):
+    invalidate_principal(target.id)
@@ -144,3 +144,31 @@ def leave_requests_query(user_id=None, status=None):
         query = query.filter_by(status=status)
 
     return query
+
+
+def users_by_id(user_ids):
+    """
+    Carga en una sola consulta los usuarios indicados, con centro y categoría.
+    Sustituye a User.query.get() dentro de bucles (patrón N+1).
+
+    Args:
+        user_ids: Iterable de IDs (se ignoran None y duplicados)
+
+    Returns:
+        dict {user_id: User}
+
+    Ejemplo:
+        users = users_by_id(r.modified_by for r in records)
+        modified_by = users.get(record.modified_by)
+    """
+    from sqlalchemy.orm import joinedload
+    from models.models import User
+
+    ids = {user_id for user_id in user_ids if user_id}
+    if not ids:
+        return {}
+
+    users = User.query.options(
+        joinedload(User.center), joinedload(User.category)
+    ).filter(User.id.in_(ids)).all()
+    return {user.id: user for user in users}
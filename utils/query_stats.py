@@ -0,0 +1,179 @@
+"""
+Instrumentación de consultas SQL por petición.
+
+- Cuenta las sentencias de cada petición y el tiempo total en base de datos
+  (cabeceras X-DB-Query-Count y X-DB-Time-Ms si QUERY_STATS_HEADERS está activo).
+- Agrupa las sentencias por huella (SQL normalizado, sin literales ni
+  listas IN) y avisa de los patrones N+1: la misma huella repetida
+  QUERY_NPLUS1_THRESHOLD veces o más en una petición.
+- Presupuestos por endpoint con el decorador @query_budget(n). Con
+  QUERY_STRICT_MODE (pensado para tests) superar un presupuesto lanza
+  QueryBudgetExceeded y las relaciones perezosas que emitirían SQL lanzan
+  error (raiseload), para obligar a cargarlas de forma explícita.
+- Mantiene el aviso de consultas lentas (> 1 segundo).
+
+Se activa con init_query_stats(app).
+"""
+import os
+import re
+import time
+from collections import Counter
+from functools import wraps
+
+from flask import g, has_request_context, request, current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, raiseload
+
+from utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+SLOW_QUERY_SECONDS = 1.0
+DEFAULT_NPLUS1_THRESHOLD = 5
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)\s*,?)+\)", re.IGNORECASE)
+_NUMBER = re.compile(r"\b\d+\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+
+class QueryBudgetExceeded(Exception):
+    """Una petición ha superado el presupuesto de consultas de su endpoint."""
+
+
+def _env_flag(name, default="false"):
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+
+def fingerprint(statement):
+    """
+    Huella de una sentencia: SQL normalizado sin literales.
+    Dos ejecuciones de la misma consulta con parámetros distintos dan la misma huella.
+    """
+    sql = _WHITESPACE.sub(" ", statement).strip()
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    return _IN_LIST.sub("IN (?)", sql)
+
+
+class RequestQueryStats:
+    """Contadores de una petición."""
+
+    __slots__ = ("count", "seconds", "fingerprints")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold):
+        """Huellas ejecutadas threshold veces o más (posibles N+1)."""
+        return [(fp, n) for fp, n in self.fingerprints.most_common() if n >= threshold]
+
+
+def get_request_stats():
+    """Estadísticas de la petición en curso (None fuera de una petición)."""
+    if not has_request_context():
+        return None
+    stats = g.get("_query_stats")
+    if stats is None:
+        stats = g._query_stats = RequestQueryStats()
+    return stats
+
+
+def query_budget(max_queries):
+    """
+    Decorador: número máximo de sentencias SQL que puede emitir el endpoint.
+
+    Ejemplo:
+        @admin_bp.route("/api/events")
+        @admin_required
+        @query_budget(10)
+        def api_events():
+            ...
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            g._query_budget = max_queries
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def _strict_mode():
+    return has_app_context() and current_app.config.get("QUERY_STRICT_MODE", False)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    total = time.perf_counter() - conn.info["query_start_time"].pop(-1)
+    if total > SLOW_QUERY_SECONDS:
+        logger.warning(f"⚠️ Slow query ({total:.2f}s): {statement[:200]}")
+
+    stats = get_request_stats()
+    if stats is not None:
+        stats.record(statement, total)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _apply_strict_raiseload(execute_state):
+    """Modo estricto: una relación no cargada explícitamente lanza error en vez de emitir SQL."""
+    if not execute_state.is_select or execute_state.is_column_load or execute_state.is_relationship_load:
+        return
+    if not _strict_mode():
+        return
+    execute_state.statement = execute_state.statement.options(raiseload("*", sql_only=True))
+
+
+def _report_request(response):
+    stats = g.get("_query_stats")
+    if stats is None:
+        return response
+
+    config = current_app.config
+    if config.get("QUERY_STATS_HEADERS", False):
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.seconds * 1000:.1f}"
+
+    endpoint = request.endpoint or request.path
+    for fp, n in stats.repeated(config.get("QUERY_NPLUS1_THRESHOLD", DEFAULT_NPLUS1_THRESHOLD)):
+        logger.warning(f"🔁 Posible N+1 en {endpoint}: {n}× {fp[:200]}")
+
+    budget = g.get("_query_budget")
+    if budget is not None and stats.count > budget:
+        message = f"{endpoint} ha ejecutado {stats.count} consultas (presupuesto {budget})"
+        if config.get("QUERY_STRICT_MODE", False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(f"💸 {message}")
+
+    return response
+
+
+def init_query_stats(app):
+    """
+    Registra la instrumentación en la app.
+
+    Configuración (app.config, con valor por defecto desde el entorno):
+        QUERY_STATS_HEADERS:    añadir X-DB-Query-Count / X-DB-Time-Ms a las respuestas
+        QUERY_NPLUS1_THRESHOLD: repeticiones de una huella para avisar de N+1
+        QUERY_STRICT_MODE:      raiseload + presupuestos que fallan (tests)
+    """
+    app.config.setdefault("QUERY_STATS_HEADERS", _env_flag("QUERY_STATS_HEADERS"))
+    app.config.setdefault(
+        "QUERY_NPLUS1_THRESHOLD",
+        int(os.getenv("QUERY_NPLUS1_THRESHOLD", DEFAULT_NPLUS1_THRESHOLD))
+    )
+    app.config.setdefault("QUERY_STRICT_MODE", _env_flag("QUERY_STRICT_MODE"))
+    app.after_request(_report_request)
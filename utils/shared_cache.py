@@ -0,0 +1,107 @@
+"""
+Caché de aplicación con backend configurable (CACHE_BACKEND).
+
+- "memory":     SimpleCache en el propio proceso (por defecto; 1 worker)
+- "filesystem": FileSystemCache en CACHE_DIR, compartida por todos los
+                workers de la misma máquina
+- "redis":      RedisCache en CACHE_REDIS_URL, compartida entre máquinas.
+                Necesita el paquete redis; en local se puede usar
+                scripts/dev_redis_server.py como sustituto
+
+Todos los backends serializan (pickle) los valores: solo se deben guardar
+instantáneas de datos simples (dict, str, int...), nunca instancias ORM.
+
+Invalidación por generaciones: cada ámbito (p.ej. un cliente) tiene un
+contador en la propia caché que forma parte de las claves; incrementarlo
+invalida de golpe todas sus entradas en todos los workers sin tener que
+enumerarlas.
+"""
+import os
+import tempfile
+
+from flask import current_app, has_app_context
+from flask_caching import Cache
+
+from utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_BACKENDS = {
+    "memory": "SimpleCache",
+    "filesystem": "FileSystemCache",
+    "redis": "RedisCache",
+}
+DEFAULT_CACHE_TIMEOUT = 300
+
+cache = Cache()
+
+
+def get_cache_backend():
+    """
+    Devuelve el backend configurado en CACHE_BACKEND.
+    Cualquier valor desconocido se trata como "memory".
+    """
+    backend = os.getenv("CACHE_BACKEND", "memory").lower()
+    return backend if backend in CACHE_BACKENDS else "memory"
+
+
+def cache_config(backend=None):
+    """Configuración de Flask-Caching para el backend indicado."""
+    backend = backend or get_cache_backend()
+    config = {
+        "CACHE_TYPE": CACHE_BACKENDS[backend],
+        "CACHE_DEFAULT_TIMEOUT": DEFAULT_CACHE_TIMEOUT,
+        "CACHE_KEY_PREFIX": os.getenv("CACHE_KEY_PREFIX", "timepro:"),
+    }
+    if backend == "filesystem":
+        config["CACHE_DIR"] = os.getenv("CACHE_DIR", os.path.join(tempfile.gettempdir(), "timepro-cache"))
+        config["CACHE_THRESHOLD"] = int(os.getenv("CACHE_THRESHOLD", 5000))
+    elif backend == "redis":
+        config["CACHE_REDIS_URL"] = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    return config
+
+
+def init_cache(app):
+    """
+    Inicializa la caché compartida de la app.
+    Si el backend no se puede crear (p.ej. falta el paquete redis) se usa
+    "memory" y se registra el error.
+    """
+    backend = get_cache_backend()
+    try:
+        cache.init_app(app, config=cache_config(backend))
+    except RuntimeError as e:
+        logger.error(f"No se pudo iniciar la caché '{backend}' ({e}); se usa 'memory'")
+        backend = "memory"
+        cache.init_app(app, config=cache_config(backend))
+    app.logger.info(f"Cache backend: {backend}")
+    return cache
+
+
+def cache_ready():
+    """True si la app en curso ha inicializado la caché (init_cache)."""
+    return has_app_context() and cache in current_app.extensions.get("cache", {})
+
+
+def get_generation(scope):
+    """Generación actual de un ámbito de invalidación (0 si no existe o la caché falla)."""
+    if not cache_ready():
+        return 0
+    try:
+        return cache.get(f"gen:{scope}") or 0
+    except Exception as e:
+        logger.warning(f"No se pudo leer la generación '{scope}' de la caché: {e}")
+        return 0
+
+
+def bump_generation(scope):
+    """Invalida todas las claves construidas con la generación de scope."""
+    if not cache_ready():
+        return
+    try:
+        # Sin caducidad: si el contador expirase volvería a 0 y revivirían entradas antiguas.
+        # Dos incrementos simultáneos pueden dar el mismo valor; basta con que cambie.
+        cache.set(f"gen:{scope}", get_generation(scope) + 1, timeout=0)
+    except Exception as e:
+        # La caché es una optimización: un fallo no debe romper la escritura en BD
+        logger.warning(f"No se pudo invalidar la caché '{scope}': {e}")
@@ -0,0 +1,93 @@
+"""
+Expresiones SQL portables entre PostgreSQL (producción) y SQLite (local).
+
+duration_seconds(start, end): segundos entre dos columnas DateTime,
+truncados hacia cero igual que int((end - start).total_seconds()) en Python,
+para que los totales calculados en la BD cuadren con los calculados en Python.
+
+time_of_day(value): hora del día de una columna DateTime, para filtrar por
+franja horaria en la BD igual que value.time() en Python.
+
+Ejemplo:
+    select(TimeRecord.id, duration_seconds(TimeRecord.check_in, TimeRecord.check_out))
+"""
+from sqlalchemy import Integer, Time
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+
+class duration_seconds(FunctionElement):
+    """Segundos enteros de end - start (NULL si alguno es NULL)."""
+    type = Integer()
+    name = "duration_seconds"
+    inherit_cache = True
+
+
+def _arguments(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return compiler.process(start, **kw), compiler.process(end, **kw)
+
+
+@compiles(duration_seconds)
+def _duration_seconds_default(element, compiler, **kw):
+    # MySQL: TIMESTAMPDIFF ya trunca a segundos enteros
+    start, end = _arguments(element, compiler, **kw)
+    return f"TIMESTAMPDIFF(SECOND, {start}, {end})"
+
+
+@compiles(duration_seconds, "postgresql")
+def _duration_seconds_postgresql(element, compiler, **kw):
+    start, end = _arguments(element, compiler, **kw)
+    return f"CAST(TRUNC(EXTRACT(EPOCH FROM ({end}) - ({start}))) AS INTEGER)"
+
+
+@compiles(duration_seconds, "sqlite")
+def _duration_seconds_sqlite(element, compiler, **kw):
+    # SQLAlchemy guarda 'YYYY-MM-DD HH:MM:SS.ffffff': segundos con strftime('%s')
+    # y microsegundos de la parte decimal (0 si no la hay); la división entera
+    # de SQLite trunca hacia cero
+    start, end = _arguments(element, compiler, **kw)
+
+    def micros(value):
+        return (
+            f"(CAST(strftime('%s', {value}) AS INTEGER) * 1000000"
+            f" + CAST(substr({value}, 21, 6) AS INTEGER))"
+        )
+
+    return f"(({micros(end)} - {micros(start)}) / 1000000)"
+
+
+class time_of_day(FunctionElement):
+    """
+    Hora del día de una columna DateTime, comparable con datetime.time
+    (p.ej. time_of_day(TimeRecord.check_in) >= time(8, 0)).
+    """
+    type = Time()
+    name = "time_of_day"
+    inherit_cache = True
+
+
+@compiles(time_of_day)
+def _time_of_day_default(element, compiler, **kw):
+    return f"TIME({compiler.process(list(element.clauses)[0], **kw)})"
+
+
+@compiles(time_of_day, "postgresql")
+def _time_of_day_postgresql(element, compiler, **kw):
+    return f"CAST({compiler.process(list(element.clauses)[0], **kw)} AS TIME)"
+
+
+@compiles(time_of_day, "sqlite")
+def _time_of_day_sqlite(element, compiler, **kw):
+    # 'HH:MM:SS.ffffff' del texto guardado, el mismo formato con el que
+    # SQLAlchemy envía los parámetros Time: la comparación de textos es la
+    # de las horas (time() de SQLite perdería los microsegundos)
+    return f"substr({compiler.process(list(element.clauses)[0], **kw)}, 12)"
+
+
+def supports_window_functions(bind):
+    """False solo en SQLite anterior a 3.25 (sin SUM() OVER / ROW_NUMBER())."""
+    dialect = bind.dialect
+    if dialect.name != "sqlite":
+        return True
+    return dialect.dbapi.sqlite_version_info >= (3, 25)
@@ -0,0 +1,121 @@
+"""
+Contexto de plantillas del usuario autenticado (context processor inject_user).
+
+Se guarda en la caché compartida (utils/shared_cache.py) una instantánea
+serializable: datos básicos del usuario, del cliente y su configuración de
+plan. Nunca instancias ORM, para que funcione con cualquier backend y con
+varios workers.
+
+La clave incluye dos generaciones:
+- "user:<id>":           cambia al editar o borrar el usuario
+- "reference:<client>":  cambia al editar el cliente, sus centros o categorías
+                         (ver services/reference_cache.py)
+de modo que cualquier edición invalida la instantánea en todos los workers.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes, object_session
+
+from models.database import db
+from models.models import User
+from services.reference_cache import get_reference, reference_scope
+from utils.multitenant import get_client_config
+from utils.shared_cache import cache, cache_ready, get_generation, bump_generation
+from utils.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+USER_CONTEXT_TIMEOUT = 300
+
+# Columnas de User incluidas en la instantánea
+CONTEXT_ATTRIBUTES = ("username", "full_name", "role", "client_id")
+
+_PENDING_KEY = "user_context_invalidate"
+
+
+def user_scope(user_id):
+    return f"user:{user_id}"
+
+
+def _context_key(user_id, client_id):
+    return (
+        f"user_context:{user_id}:{get_generation(user_scope(user_id))}"
+        f":{client_id}:{get_generation(reference_scope(client_id))}"
+    )
+
+
+def build_user_context(user):
+    """Instantánea serializable del usuario, su cliente y la configuración del plan."""
+    reference = get_reference(user.client_id)
+    client = reference.client if reference else None
+    return {
+        "user": {
+            "id": user.id,
+            "client_id": user.client_id,
+            "username": user.username,
+            "full_name": user.full_name,
+            "role": user.role,
+        },
+        "client": dict(client._asdict()) if client else None,
+        "client_config": get_client_config() if client else {},
+    }
+
+
+def get_user_context(user_id, client_id):
+    """
+    Instantánea del contexto del usuario (desde la caché o recién construida).
+
+    Returns:
+        dict o None si el usuario no existe
+    """
+    key = _context_key(user_id, client_id)
+    cached = None
+    if cache_ready():
+        try:
+            cached = cache.get(key)
+        except Exception as e:
+            logger.warning(f"No se pudo leer el contexto de usuario de la caché: {e}")
+    if cached is not None:
+        return cached
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+
+    snapshot = build_user_context(user)
+    if not cache_ready():
+        return snapshot
+    try:
+        cache.set(key, snapshot, timeout=USER_CONTEXT_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"No se pudo guardar el contexto de usuario en la caché: {e}")
+    return snapshot
+
+
+def invalidate_user_context(user_id):
+    """Invalida el contexto cacheado de un usuario en todos los workers."""
+    bump_generation(user_scope(user_id))
+
+
+@event.listens_for(User, "after_update")
+def _mark_user_updated(mapper, connection, target):
+    state = attributes.instance_state(target)
+    if any(state.attrs[name].history.has_changes() for name in CONTEXT_ATTRIBUTES):
+        _mark_user_changed(mapper, connection, target)
+
+
+@event.listens_for(User, "after_delete")
+def _mark_user_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_user_invalidations(session):
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        invalidate_user_context(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_user_invalidations(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)